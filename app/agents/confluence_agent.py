@@ -3,12 +3,22 @@ import json
 from pathlib import Path
 
 from deepagents import create_deep_agent
-from deepagents.backends import FilesystemBackend
-from langchain.chat_models import init_chat_model
-from langchain_mcp_adapters.client import MultiServerMCPClient
+from langchain.agents.middleware import ModelCallLimitMiddleware
 from structlog.stdlib import get_logger
 
+from app.agents.models import get_chat_model, get_embeddings
+from app.backends import get_checkpointer, get_thread_file_store
 from app.core.config import settings
+from app.core.usage_ledger import get_usage_callbacks
+from app.documents.attachments import create_attachment_search_tool
+from app.enums import ModelRole
+from app.middlewares import (
+    CritiqueBudgetMiddleware,
+    HistorySummarizationMiddleware,
+    ReportEditingMiddleware,
+    ToolOutputOffloadMiddleware,
+)
+from app.server.mcp_supervisor import McpServerSupervisor
 
 logger = get_logger(__name__)
 
@@ -17,8 +27,8 @@ logger = get_logger(__name__)
 # MCP Client Initialization
 # ============================================================================
 
-# Global MCP client instance (lazy initialization)
-_mcp_client: MultiServerMCPClient | None = None
+# Global MCP server supervisors (lazy initialization)
+_mcp_supervisors: dict[str, McpServerSupervisor] = {}
 _mcp_client_lock = asyncio.Lock()
 
 # Global MCP tools cache (lazy initialization with caching)
@@ -84,21 +94,27 @@ def _convert_mcp_json_config(config: dict) -> dict:
     return converted
 
 
-async def get_mcp_client() -> MultiServerMCPClient:
-    global _mcp_client
+async def get_mcp_supervisor(server_name: str = "mcp-atlassian") -> McpServerSupervisor:
+    """
+    获取 MCP 服务器的进程监管器（首次调用时启动服务器进程）。
 
-    if _mcp_client is not None:
-        return _mcp_client
+    监管器负责健康检查和故障切换，进程退出或卡死后工具调用自动转到热备进程，缓存的工具无需重建。
+    """
+    supervisor = _mcp_supervisors.get(server_name)
+    if supervisor is not None:
+        return supervisor
 
     async with _mcp_client_lock:
-        if _mcp_client is not None:
-            return _mcp_client
-
-        config_path = Path(".mcp.json")
-        config = await asyncio.to_thread(_load_mcp_config, config_path)
-        servers = _convert_mcp_json_config(config)
-        _mcp_client = MultiServerMCPClient(servers)
-        return _mcp_client
+        if server_name not in _mcp_supervisors:
+            config_path = Path(".mcp.json")
+            config = await asyncio.to_thread(_load_mcp_config, config_path)
+            servers = _convert_mcp_json_config(config)
+            if server_name not in servers:
+                raise ValueError(f"MCP server {server_name!r} is not configured in {config_path}")
+            supervisor = McpServerSupervisor(server_name, servers[server_name])
+            await supervisor.start()
+            _mcp_supervisors[server_name] = supervisor
+        return _mcp_supervisors[server_name]
 
 
 async def _fetch_all_mcp_tools() -> dict[str, dict]:
@@ -113,8 +129,14 @@ async def _fetch_all_mcp_tools() -> dict[str, dict]:
     Raises:
         ValueError: 如果没有找到任何工具
     """
-    client = await get_mcp_client()
-    all_tools = await client.get_tools(server_name="mcp-atlassian")
+    if settings.MCP_SIDECAR_SOCKET and Path(settings.MCP_SIDECAR_SOCKET).exists():
+        # 生产服务：经边车进程调用，所有 worker 共享同一个 mcp-atlassian 子进程
+        from app.server.mcp_sidecar import McpSidecarClient
+
+        all_tools = await McpSidecarClient(settings.MCP_SIDECAR_SOCKET).get_tools(server_name="mcp-atlassian")
+    else:
+        supervisor = await get_mcp_supervisor("mcp-atlassian")
+        all_tools = await supervisor.get_tools()
 
     if not all_tools:
         logger.error("no_tools_found_in_mcp_server")
@@ -172,42 +194,33 @@ async def reset_mcp_tools_cache() -> None:
     logger.info("mcp_tools_cache_reset")
 
 
-_mcp_init_task: asyncio.Task | None = None
+async def warmup_mcp_tools() -> bool:
+    """
+    预热 MCP 工具缓存（启动 MCP 服务器并获取工具列表），供服务的显式预热阶段调用。
 
+    导入本模块不会启动 MCP 服务器；未预热时首次构建 Agent 图会按需初始化。
+    预热失败只记录日志，首次使用时重试。
 
-async def _initialize_mcp_tools_async():
-    """实际异步初始化逻辑"""
+    Returns:
+        是否预热成功
+    """
     try:
-        logger.info("Initializing MCP tools (async)...")
         await get_mcp_tools()
-        logger.info("MCP tools initialized")
     except FileNotFoundError as e:
         logger.warning(
-            "mcp_config_not_found_during_init",
+            "mcp_config_not_found_during_warmup",
             error=str(e),
             details="MCP tools will be initialized on first use",
         )
+        return False
     except Exception as e:
         logger.warning(
-            "mcp_tools_initialization_failed",
+            "mcp_tools_warmup_failed",
             error=str(e),
             details="MCP tools will be initialized on first use",
         )
-
-
-def initialize_mcp_tools_on_import():
-    """
-    在模块加载阶段调用，不执行 await，只启动后台任务，不阻塞。
-    """
-    global _mcp_init_task
-    try:
-        loop = asyncio.get_running_loop()
-        _mcp_init_task = loop.create_task(_initialize_mcp_tools_async())
-        logger.info("Scheduled MCP tools initialization task")
-    except RuntimeError:
-        # 如果还没有事件循环，就等到第一次 async 初始化再启动
-        logger.info("No running event loop; MCP tools will initialize on demand")
-        _mcp_init_task = None
+        return False
+    return True
 
 
 # ============================================================================
@@ -221,6 +234,7 @@ async def get_confluence_tools() -> list:
 
     直接从 MCP 服务器获取工具，不进行额外封装。
     Agent 框架会自动处理异步调用。
+    已建立本地附件索引（LOCAL_INDEX_DB_PATH 存在）时追加 `confluence_attachment_search`。
 
     Returns:
         Confluence 相关工具的列表
@@ -245,6 +259,10 @@ async def get_confluence_tools() -> list:
         logger.error("no_confluence_tools_found")
         raise ValueError("No Confluence tools found in MCP server")
 
+    if Path(settings.LOCAL_INDEX_DB_PATH).exists():
+        embeddings = get_embeddings() if settings.LOCAL_INDEX_EMBEDDINGS else None
+        confluence_tools.append(create_attachment_search_tool(embeddings=embeddings))
+
     logger.info("confluence_tools_fetched", tool_count=len(confluence_tools))
     return confluence_tools
 
@@ -276,11 +294,15 @@ Important notes:
 async def _build_research_sub_agent():
     """构建研究子代理配置（异步）"""
     tools = await get_confluence_tools()
+    model = get_chat_model(ModelRole.RESEARCHER)
     return {
         "name": "confluence-research-agent",
         "description": "Used to research in-depth questions using the Confluence knowledge base. Only give this researcher one topic at a time. Do not pass multiple sub questions to this researcher. Instead, break down a large topic into necessary components and call multiple research agents in parallel, one for each sub-question.",
         "system_prompt": sub_research_prompt,
         "tools": tools,
+        "model": model,
+        # 研究子代理反复读取页面原文，已读过的原文替换为存根，过长的历史替换为摘要
+        "middleware": [ToolOutputOffloadMiddleware(), HistorySummarizationMiddleware(model)],
     }
 
 
@@ -328,6 +350,7 @@ async def _build_critique_sub_agent():
         "Provide this agent with specific information about how you want it to critique the report.",
         "system_prompt": sub_critique_prompt,
         "tools": [search_tool],
+        "model": get_chat_model(ModelRole.CRITIC),
     }
 
 
@@ -343,12 +366,19 @@ The first thing you should do is to write the original user question to `questio
 Use the confluence-research-agent to conduct deep research. It will respond to your questions/topics with detailed answers
 from the Confluence knowledge base.
 
-When you have enough information to write a final report, write it to `final_report.md`.
+When you have enough information to write a final report, write it to `final_report.md` one section at a time
+with `upsert_report_section`, in reading order (the title is a level-1 section, the other sections level 2).
+Each section is shown to the user as soon as you write it.
 
 You can call the confluence-critique-agent to get a critique of the final report. After that (if needed),
-you can do more research and edit the `final_report.md`. You can do this as many times as you want until you are satisfied.
+you can do more research and revise only the sections that need it: `patch_report_section` for small corrections,
+`upsert_report_section` to rewrite a section, `append_report_section` to add to one.
+Never rewrite the whole `final_report.md` with `write_file` or `edit_file`.
+The number of critique rounds and the time spent on them are limited:
+later critiques only review the sections you changed since the previous critique, and once the budget is used up or the report
+stops changing materially, the critique agent will tell you to stop. When that happens, finish the report and end the run.
 
-Only edit the file once at a time (if you call this tool in parallel, there may be conflicts).
+Write new sections one call at a time so that they appear in order.
 
 Here are instructions for writing the final report:
 
@@ -431,6 +461,17 @@ Use this to retrieve the complete content of a specific Confluence page after yo
 
 ## `get_confluence_comments`
 Use this to retrieve discussion and comments on a Confluence page for additional context.
+
+You have access to tools for writing the report (sections are addressed by their heading):
+
+## `upsert_report_section`
+Write a section, or replace an existing section including its subsections.
+
+## `append_report_section`
+Append content to the end of a section.
+
+## `patch_report_section`
+Replace an exact string inside a section.
 """
 
 # ============================================================================
@@ -442,17 +483,35 @@ async def create_confluence_research_agent_async():
     """
     异步创建 Confluence 研究代理。
     """
-    llm = init_chat_model(model=settings.INIT_LLM_MODEL)
+    llm = get_chat_model(ModelRole.ORCHESTRATOR)
     tools = await get_confluence_tools()
 
     # 异步构建子代理
     research_sub_agent = await _build_research_sub_agent()
     critique_sub_agent = await _build_critique_sub_agent()
 
-    return create_deep_agent(
+    # 按 thread_id 隔离的文件命名空间，并发研究不会互相覆盖 question.txt / final_report.md
+    backend = get_thread_file_store().backend_factory
+    agent = create_deep_agent(
         model=llm,
         tools=tools,
         system_prompt=confluence_research_instructions,
         subagents=[critique_sub_agent, research_sub_agent],
-        backend=FilesystemBackend(root_dir="./output"),
+        backend=backend,
+        checkpointer=get_checkpointer(),
+        middleware=[
+            CritiqueBudgetMiddleware(
+                critique_agent=critique_sub_agent["name"],
+                backend=backend,
+                max_iterations=settings.CRITIQUE_MAX_ITERATIONS,
+                time_budget_seconds=settings.CRITIQUE_TIME_BUDGET_SECONDS,
+                min_change_ratio=settings.CRITIQUE_MIN_CHANGE_RATIO,
+            ),
+            ReportEditingMiddleware(backend=backend),
+            ToolOutputOffloadMiddleware(),
+            HistorySummarizationMiddleware(llm),
+            # 兜底：限制单次运行的模型调用次数，封顶最坏情况下的耗时和 token 开销
+            ModelCallLimitMiddleware(run_limit=settings.RESEARCH_MAX_MODEL_CALLS, exit_behavior="end"),
+        ],
     )
+    return agent.with_config({"callbacks": get_usage_callbacks("confluence-research")})
@@ -0,0 +1,98 @@
+"""
+按角色创建聊天模型 (Per-role Chat Models)
+
+编排、研究、审阅、问答各自可以配置不同的模型，未配置的角色使用 `INIT_LLM_MODEL`。
+
+模型实例按 (模型名, API 地址) 在进程内复用：图的每次构建和所有子代理共享同一个客户端，
+OpenAI 兼容提供方的请求走 `app.core.llm_pool` 的共享连接池和并发限制。
+
+`get_embeddings()` 返回本地附件索引使用的向量化模型（EMBEDDING_MODEL），同样走共享连接池。
+"""
+
+import os
+import threading
+
+from langchain.chat_models import init_chat_model
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models import BaseChatModel
+from structlog.stdlib import get_logger
+
+from app.core.config import settings
+from app.core.llm_pool import get_shared_http_clients
+from app.enums import ModelRole
+
+logger = get_logger(__name__)
+
+# OpenAI 兼容提供方：API 地址的环境变量及默认值（与 langchain-openai / langchain-deepseek 一致）
+_OPENAI_COMPATIBLE_BASE_URLS = {
+    "openai": (("OPENAI_API_BASE", "OPENAI_BASE_URL"), "https://api.openai.com/v1"),
+    "deepseek": (("DEEPSEEK_API_BASE",), "https://api.deepseek.com/v1"),
+}
+
+_chat_models: dict[tuple[str, str | None], BaseChatModel] = {}
+_chat_models_lock = threading.Lock()
+_embeddings: Embeddings | None = None
+
+
+def get_model_name(role: ModelRole) -> str:
+    """返回角色配置的模型名（`provider:model` 格式），未配置时回退到 INIT_LLM_MODEL"""
+    configured = {
+        ModelRole.ORCHESTRATOR: settings.ORCHESTRATOR_MODEL,
+        ModelRole.RESEARCHER: settings.RESEARCHER_MODEL,
+        ModelRole.CRITIC: settings.CRITIC_MODEL,
+        ModelRole.QA: settings.QA_MODEL,
+        ModelRole.QA_FAST: settings.QA_FAST_MODEL,
+        # VL_MODEL_NAME 沿用与 INIT_LLM_MODEL 相同的 OpenAI 兼容提供方
+        ModelRole.VISION: settings.VL_MODEL_NAME
+        if ":" in settings.VL_MODEL_NAME
+        else f"openai:{settings.VL_MODEL_NAME}",
+    }[role]
+    return configured or settings.INIT_LLM_MODEL
+
+
+def _provider_base_url(model_name: str) -> str | None:
+    """返回 OpenAI 兼容提供方的 API 地址，其他提供方返回 None"""
+    provider = model_name.split(":", 1)[0] if ":" in model_name else None
+    if provider not in _OPENAI_COMPATIBLE_BASE_URLS:
+        return None
+    env_names, default = _OPENAI_COMPATIBLE_BASE_URLS[provider]
+    return next((os.environ[name] for name in env_names if os.environ.get(name)), default)
+
+
+def get_chat_model(role: ModelRole) -> BaseChatModel:
+    """获取角色对应的聊天模型（进程内按模型名和 API 地址复用）"""
+    model_name = get_model_name(role)
+    base_url = _provider_base_url(model_name)
+    key = (model_name, base_url)
+
+    with _chat_models_lock:
+        model = _chat_models.get(key)
+        if model is None:
+            kwargs = {}
+            if base_url is not None:
+                http_client, http_async_client = get_shared_http_clients(base_url)
+                kwargs = {"http_client": http_client, "http_async_client": http_async_client}
+            model = _chat_models[key] = init_chat_model(model=model_name, **kwargs)
+            logger.info("chat_model_created", role=str(role), model=model_name, base_url=base_url)
+    return model
+
+
+def get_embeddings() -> Embeddings:
+    """获取 EMBEDDING_MODEL 向量化模型（OpenAI 兼容接口，进程内复用，走共享连接池）"""
+    global _embeddings
+
+    with _chat_models_lock:
+        if _embeddings is None:
+            from langchain_openai import OpenAIEmbeddings
+
+            http_client, http_async_client = get_shared_http_clients(settings.EMBEDDING_BASE_URL)
+            _embeddings = OpenAIEmbeddings(
+                model=settings.EMBEDDING_MODEL,
+                base_url=settings.EMBEDDING_BASE_URL,
+                # 非 OpenAI 模型不能用 tiktoken 预先切分输入，分块已保证不超过 BGE_MAX_TOKENS
+                check_embedding_ctx_length=False,
+                http_client=http_client,
+                http_async_client=http_async_client,
+            )
+            logger.info("embeddings_created", model=settings.EMBEDDING_MODEL, base_url=settings.EMBEDDING_BASE_URL)
+    return _embeddings
@@ -8,17 +8,28 @@ Confluence 通用问答助手 (Universal Q&A Assistant)
 - 输出 Markdown 格式答案含来源引用
 """
 
-import asyncio
-
 from deepagents import create_deep_agent
-from langchain.chat_models import init_chat_model
+from langchain.agents.middleware import AgentMiddleware
+from langchain_core.language_models import BaseChatModel
 from structlog.stdlib import get_logger
 
 from app.agents.confluence_agent import (
     get_confluence_tools,
     reset_mcp_tools_cache,
 )
+from app.agents.models import get_chat_model
+from app.backends import get_checkpointer
 from app.core.config import settings
+from app.core.usage_ledger import get_usage_callbacks
+from app.enums import ModelRole
+from app.middlewares import (
+    CitationMiddleware,
+    ComplexityRoutingMiddleware,
+    DeadlineMiddleware,
+    HistorySummarizationMiddleware,
+    ToolOutputOffloadMiddleware,
+    VolatileContextMiddleware,
+)
 
 logger = get_logger(__name__)
 
@@ -63,11 +74,7 @@ Your task is to provide answers that are:
 - Provide explanations or historical context as needed to enhance understanding.
 - End with a conclusion or overall perspective if relevant.
 
-<context>
-{context}
-</context>
-
-Current date & time in ISO format (UTC timezone) is: {date}.
+The `context` is the set of numbered sources attached to the tool results in this conversation.
 
 ---
 
@@ -80,27 +87,26 @@ Current date & time in ISO format (UTC timezone) is: {date}.
 2. **执行检索**: 并发执行搜索和获取操作
    - 使用 confluence_search 找到相关文档
    - 使用 get_confluence_page 获取完整内容
+   - 答案可能在附件（PDF、Office 文件）中时，使用 confluence_attachment_search（如可用）检索附件内容
    - 每个搜索查询只执行一次
 
-3. **构建 Context**: 将检索到的文档按以下格式整理后填入上方 <context> 标签:
+3. **使用来源编号**: 系统会在每个工具结果前标注可引用来源，格式如下:
    ```
+   可引用来源（回答中只使用以下 [编号] 引用，不要输出 URL）：
    [1] 《文档标题1》
-   文档内容摘要...
-
    [2] 《文档标题2》
-   文档内容摘要...
    ```
-   **注意**: Context 中只包含编号、标题和内容，不包含 URL。
+   这些带编号的工具结果就是回答所依据的 context。引用时直接使用系统标注的编号，不需要自行整理或重新编号。
 
 4. **生成回答**: 根据上述 Perplexica 风格要求生成带引文的回答
 
 ## 重要约束
 
 - 所有信息必须来自 Confluence，不要编造
-- 响应时间控制在 20 秒内
+- 响应时间有严格预算，超时的工具调用会被取消，请优先并发检索、避免不必要的调用
 - 避免重复的工具调用
-- **禁止在回答中生成任何 URL 或链接**，只使用 [n] 格式的引用编号
-- **禁止生成「参考来源」或「参考文献」部分**，系统会自动生成"""
+- **禁止在回答中生成任何 URL 或链接**，只使用系统标注的 [n] 引用编号
+- **禁止生成「参考来源」或「参考文献」部分**，系统会根据引用编号自动生成"""
 
 
 # ============================================================================
@@ -108,32 +114,46 @@ Current date & time in ISO format (UTC timezone) is: {date}.
 # ============================================================================
 
 
-async def _create_universal_qa_agent_async():
+def _qa_middleware(llm: BaseChatModel) -> list[AgentMiddleware]:
+    """通用问答助手的中间件；未配置 QA_FAST_MODEL 时不做复杂度分流"""
+    middleware: list[AgentMiddleware] = [
+        DeadlineMiddleware(
+            budget_seconds=settings.UNIVERSAL_QA_DEADLINE_SECONDS,
+            answer_reserve_seconds=settings.UNIVERSAL_QA_ANSWER_RESERVE_SECONDS,
+        ),
+        # 已读过的页面原文替换为存根、过长的历史替换为摘要，每轮输入 token 不随运行长度增长
+        ToolOutputOffloadMiddleware(),
+        HistorySummarizationMiddleware(llm),
+        CitationMiddleware(),
+    ]
+    if settings.QA_FAST_MODEL:
+        # 简单问题改用快速模型
+        middleware.append(
+            ComplexityRoutingMiddleware(
+                fast_model=get_chat_model(ModelRole.QA_FAST),
+                simple_max_chars=settings.QA_SIMPLE_MAX_CHARS,
+            )
+        )
+    # 日期等易变内容追加在系统提示词末尾，静态部分作为稳定前缀命中提供方缓存
+    middleware.append(VolatileContextMiddleware())
+    return middleware
+
+
+async def create_universal_qa_agent_async():
     """
     异步创建 Confluence 通用问答助手。
     """
-    llm = init_chat_model(model=settings.INIT_LLM_MODEL)
+    llm = get_chat_model(ModelRole.QA)
     tools = await get_confluence_tools()
 
-    return create_deep_agent(
+    agent = create_deep_agent(
         model=llm,
         tools=tools,
         system_prompt=universal_qa_instructions,
+        middleware=_qa_middleware(llm),
+        checkpointer=get_checkpointer(),
     )
-
-
-def _create_universal_qa_agent_impl():
-    """
-    创建 Confluence 通用问答助手的同步包装。
-    """
-    return asyncio.run(_create_universal_qa_agent_async())
-
-
-# ============================================================================
-# 全局 Agent 实例和调用接口
-# ============================================================================
-
-universal_qa_agent = _create_universal_qa_agent_impl()
+    return agent.with_config({"callbacks": get_usage_callbacks("universal-qa")})
 
 
 # ============================================================================
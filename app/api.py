@@ -0,0 +1,12 @@
+"""
+LangGraph Server 自定义 HTTP 路由
+
+在 langgraph.json 中通过 `"http": {"app": "./app/api.py:app"}` 挂载，与 Agent 接口共用同一个服务进程。
+"""
+
+from starlette.applications import Starlette
+
+from app.sign_check import routes as sign_check_routes
+from app.workers import routes as parse_job_routes
+
+app = Starlette(routes=[*sign_check_routes, *parse_job_routes])
@@ -0,0 +1,45 @@
+"""
+代理文件后端模块 - deepagents 文件工具（ls / read_file / write_file / edit_file）的存储实现。
+
+此模块包含以下子模块：
+
+1. **thread_store** - 按线程隔离的文件存储
+   - ThreadFileStore: 进程级存储，内存热数据 + 后台批量写入 SQLite + 空闲换出与过期清理
+   - ThreadScopedBackend: 绑定单个 thread_id 命名空间的 BackendProtocol 实现
+   - get_thread_file_store: 获取全局存储单例
+
+2. **checkpointer** - 线程状态持久化
+   - SQLiteCheckpointSaver: WAL 模式 SQLite checkpointer，按哈希寻址的压缩 blob、checkpoint 压缩与保留期清理
+   - get_checkpointer: 获取全局 checkpointer 单例（未配置 CHECKPOINT_DB_PATH 时为 None）
+
+"""
+
+# ============================================================================
+# 线程状态持久化
+# ============================================================================
+from app.backends.checkpointer import SQLiteCheckpointSaver, get_checkpointer
+
+# ============================================================================
+# 文件后端导出
+# ============================================================================
+from app.backends.thread_store import (
+    DEFAULT_THREAD_ID,
+    ThreadFileStore,
+    ThreadScopedBackend,
+    get_thread_file_store,
+)
+
+# ============================================================================
+# 导出列表 - 定义公共 API
+# ============================================================================
+
+__all__ = [
+    # 线程文件存储
+    "DEFAULT_THREAD_ID",
+    "ThreadFileStore",
+    "ThreadScopedBackend",
+    "get_thread_file_store",
+    # 线程状态持久化
+    "SQLiteCheckpointSaver",
+    "get_checkpointer",
+]
@@ -0,0 +1,534 @@
+"""
+持久化 Checkpointer (Durable SQLite Checkpointer)
+
+替代内存 checkpointer，把 LangGraph 线程状态写入 WAL 模式的 SQLite：
+- 通道值按 (通道, 版本) 保存，未变化的通道不会随每个 checkpoint 重复写入
+- 列表型通道（messages 等）逐条元素存入按内容哈希寻址的 blob 表，追加一条消息只写入一条新 blob；
+  大段工具输出（页面原文）只存一份，超过阈值的 blob 使用 zlib 压缩
+- 压缩：每个线程（及子图命名空间）只保留最近 CHECKPOINT_KEEP_LAST 个 checkpoint，较早的 checkpoint 及其
+  pending writes 在写入时顺带删除
+- 保留期：后台线程定期删除空闲超过 CHECKPOINT_RETENTION_SECONDS 的线程，并清理不再被引用的 blob
+
+状态只在 SQLite 中，进程内不缓存任何线程数据，空闲线程不占用内存；重启后线程可以继续。
+"""
+
+import asyncio
+import atexit
+import hashlib
+import json
+import random
+import sqlite3
+import threading
+import time
+import zlib
+from collections.abc import AsyncIterator, Iterator, Sequence
+from pathlib import Path
+from typing import Any
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+from structlog.stdlib import get_logger
+
+from app.core.config import settings
+
+logger = get_logger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS checkpoints (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL,
+    checkpoint_id TEXT NOT NULL,
+    parent_checkpoint_id TEXT,
+    checkpoint_type TEXT NOT NULL,
+    checkpoint BLOB NOT NULL,
+    metadata_type TEXT NOT NULL,
+    metadata BLOB NOT NULL,
+    channel_versions TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+);
+CREATE TABLE IF NOT EXISTS channel_values (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL,
+    channel TEXT NOT NULL,
+    version TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    refs TEXT NOT NULL,
+    PRIMARY KEY (thread_id, checkpoint_ns, channel, version)
+);
+CREATE TABLE IF NOT EXISTS writes (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL,
+    checkpoint_id TEXT NOT NULL,
+    task_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    channel TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    refs TEXT NOT NULL,
+    task_path TEXT NOT NULL,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+);
+CREATE TABLE IF NOT EXISTS blobs (
+    hash TEXT PRIMARY KEY,
+    type TEXT NOT NULL,
+    data BLOB NOT NULL,
+    compressed INTEGER NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS threads (
+    thread_id TEXT PRIMARY KEY,
+    last_access REAL NOT NULL
+);
+"""
+
+# 通道值 / pending write 的存储形式：refs 均为 blob 哈希的 JSON 数组
+_KIND_EMPTY = "empty"
+_KIND_VALUE = "value"
+_KIND_LIST = "list"
+
+
+class SQLiteCheckpointSaver(BaseCheckpointSaver[str]):
+    """
+    SQLite checkpointer（线程安全；异步方法通过 `asyncio.to_thread` 调用同步实现）。
+
+    Args:
+        db_path: SQLite 文件路径
+        keep_last: 每个线程命名空间保留的 checkpoint 数
+        retention_seconds: 线程空闲超过该时长后删除
+        gc_interval: 后台清理间隔（秒）
+        compress_min_bytes: 超过该大小的 blob 使用 zlib 压缩
+    """
+
+    def __init__(
+        self,
+        db_path: str | Path,
+        keep_last: int = 3,
+        retention_seconds: float = 30 * 86400.0,
+        gc_interval: float = 600.0,
+        compress_min_bytes: int = 1024,
+    ) -> None:
+        super().__init__()
+        self.db_path = Path(db_path)
+        self.keep_last = max(keep_last, 1)
+        self.retention_seconds = retention_seconds
+        self.gc_interval = gc_interval
+        self.compress_min_bytes = compress_min_bytes
+
+        self._lock = threading.Lock()
+        self._conn: sqlite3.Connection | None = None
+        self._stop = threading.Event()
+        self._collector: threading.Thread | None = None
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=30)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(_SCHEMA)
+        return self._conn
+
+    # ------------------------------------------------------------------
+    # Blob
+    # ------------------------------------------------------------------
+
+    def _put_blob(self, conn: sqlite3.Connection, value: Any) -> str:
+        type_, data = self.serde.dumps_typed(value)
+        digest = hashlib.sha256(type_.encode() + b"\0" + data).hexdigest()
+        compressed = len(data) >= self.compress_min_bytes
+        conn.execute(
+            "INSERT OR IGNORE INTO blobs (hash, type, data, compressed, size) VALUES (?, ?, ?, ?, ?)",
+            (digest, type_, zlib.compress(data, 6) if compressed else data, int(compressed), len(data)),
+        )
+        return digest
+
+    def _store(self, conn: sqlite3.Connection, value: Any) -> tuple[str, str]:
+        """把值写入 blob 表，返回 (kind, refs)；列表逐条元素存储，追加元素时已有元素不重复写入"""
+        if isinstance(value, list):
+            return _KIND_LIST, json.dumps([self._put_blob(conn, item) for item in value])
+        return _KIND_VALUE, json.dumps([self._put_blob(conn, value)])
+
+    def _load(self, conn: sqlite3.Connection, kind: str, refs: str) -> Any:
+        hashes = json.loads(refs)
+        blobs = {}
+        for start in range(0, len(hashes), 500):
+            batch = hashes[start : start + 500]
+            placeholders = ",".join("?" * len(batch))
+            for digest, type_, data, compressed in conn.execute(
+                f"SELECT hash, type, data, compressed FROM blobs WHERE hash IN ({placeholders})", batch
+            ):
+                blobs[digest] = self.serde.loads_typed((type_, zlib.decompress(data) if compressed else data))
+        values = [blobs[digest] for digest in hashes]
+        return values if kind == _KIND_LIST else values[0]
+
+    # ------------------------------------------------------------------
+    # 读取
+    # ------------------------------------------------------------------
+
+    def _tuple(self, conn: sqlite3.Connection, row: tuple) -> CheckpointTuple:
+        thread_id, checkpoint_ns, checkpoint_id, parent_id, cp_type, cp_data, md_type, md_data, versions = row[:9]
+        checkpoint: Checkpoint = self.serde.loads_typed((cp_type, cp_data))
+        channel_values = {}
+        for channel, version in json.loads(versions).items():
+            stored = conn.execute(
+                "SELECT kind, refs FROM channel_values"
+                " WHERE thread_id = ? AND checkpoint_ns = ? AND channel = ? AND version = ?",
+                (thread_id, checkpoint_ns, channel, str(version)),
+            ).fetchone()
+            if stored is not None and stored[0] != _KIND_EMPTY:
+                channel_values[channel] = self._load(conn, *stored)
+
+        writes = conn.execute(
+            "SELECT task_id, channel, kind, refs FROM writes"
+            " WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ? ORDER BY task_id, idx",
+            (thread_id, checkpoint_ns, checkpoint_id),
+        ).fetchall()
+        return CheckpointTuple(
+            config=_config(thread_id, checkpoint_ns, checkpoint_id),
+            checkpoint={**checkpoint, "channel_values": channel_values},
+            metadata=self.serde.loads_typed((md_type, md_data)),
+            parent_config=_config(thread_id, checkpoint_ns, parent_id) if parent_id else None,
+            pending_writes=[
+                (task_id, channel, self._load(conn, kind, refs)) for task_id, channel, kind, refs in writes
+            ],
+        )
+
+    def get_tuple(self, config: RunnableConfig) -> CheckpointTuple | None:
+        configurable = config["configurable"]
+        thread_id = str(configurable["thread_id"])
+        checkpoint_ns = configurable.get("checkpoint_ns", "")
+        sql = (
+            "SELECT thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, checkpoint_type, checkpoint,"
+            " metadata_type, metadata, channel_versions FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ?"
+        )
+        params: tuple = (thread_id, checkpoint_ns)
+        if checkpoint_id := get_checkpoint_id(config):
+            sql += " AND checkpoint_id = ?"
+            params += (checkpoint_id,)
+        else:
+            sql += " ORDER BY checkpoint_id DESC LIMIT 1"
+
+        with self._lock:
+            conn = self._connection()
+            row = conn.execute(sql, params).fetchone()
+            if row is None:
+                return None
+            conn.execute("INSERT OR REPLACE INTO threads VALUES (?, ?)", (thread_id, time.time()))
+            conn.commit()
+            return self._tuple(conn, row)
+
+    def list(
+        self,
+        config: RunnableConfig | None,
+        *,
+        filter: dict[str, Any] | None = None,  # noqa: A002
+        before: RunnableConfig | None = None,
+        limit: int | None = None,
+    ) -> Iterator[CheckpointTuple]:
+        where, params = [], []
+        if config is not None:
+            configurable = config["configurable"]
+            where.append("thread_id = ?")
+            params.append(str(configurable["thread_id"]))
+            if (checkpoint_ns := configurable.get("checkpoint_ns")) is not None:
+                where.append("checkpoint_ns = ?")
+                params.append(checkpoint_ns)
+            if checkpoint_id := get_checkpoint_id(config):
+                where.append("checkpoint_id = ?")
+                params.append(checkpoint_id)
+        if before is not None and (before_id := get_checkpoint_id(before)):
+            where.append("checkpoint_id < ?")
+            params.append(before_id)
+        sql = (
+            "SELECT thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, checkpoint_type, checkpoint,"
+            " metadata_type, metadata, channel_versions FROM checkpoints"
+        )
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY checkpoint_id DESC"
+
+        with self._lock:
+            conn = self._connection()
+            rows = conn.execute(sql, params).fetchall()
+            results = []
+            for row in rows:
+                if limit is not None and len(results) >= limit:
+                    break
+                if filter:
+                    metadata = self.serde.loads_typed((row[6], row[7]))
+                    if not all(metadata.get(key) == value for key, value in filter.items()):
+                        continue
+                results.append(self._tuple(conn, row))
+        yield from results
+
+    # ------------------------------------------------------------------
+    # 写入
+    # ------------------------------------------------------------------
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        configurable = config["configurable"]
+        thread_id = str(configurable["thread_id"])
+        checkpoint_ns = configurable.get("checkpoint_ns", "")
+        stored = checkpoint.copy()
+        values: dict[str, Any] = stored.pop("channel_values")  # type: ignore[misc]
+        cp_type, cp_data = self.serde.dumps_typed(stored)
+        md_type, md_data = self.serde.dumps_typed(get_checkpoint_metadata(config, metadata))
+
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                for channel, version in new_versions.items():
+                    kind, refs = self._store(conn, values[channel]) if channel in values else (_KIND_EMPTY, "[]")
+                    conn.execute(
+                        "INSERT OR REPLACE INTO channel_values VALUES (?, ?, ?, ?, ?, ?)",
+                        (thread_id, checkpoint_ns, channel, str(version), kind, refs),
+                    )
+                conn.execute(
+                    "INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        thread_id,
+                        checkpoint_ns,
+                        checkpoint["id"],
+                        configurable.get("checkpoint_id"),
+                        cp_type,
+                        cp_data,
+                        md_type,
+                        md_data,
+                        json.dumps({k: str(v) for k, v in checkpoint["channel_versions"].items()}),
+                        time.time(),
+                    ),
+                )
+                conn.execute("INSERT OR REPLACE INTO threads VALUES (?, ?)", (thread_id, time.time()))
+                self._compact(conn, thread_id, checkpoint_ns)
+        self._ensure_collector()
+        return _config(thread_id, checkpoint_ns, checkpoint["id"])
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        configurable = config["configurable"]
+        key = (str(configurable["thread_id"]), configurable.get("checkpoint_ns", ""), configurable["checkpoint_id"])
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                for idx, (channel, value) in enumerate(writes):
+                    # 特殊通道（错误、中断等）使用固定的负序号，重复写入时覆盖；普通写入已存在时保持不变
+                    conflict = "REPLACE" if channel in WRITES_IDX_MAP else "IGNORE"
+                    kind, refs = self._store(conn, value)
+                    conn.execute(
+                        f"INSERT OR {conflict} INTO writes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        (*key, task_id, WRITES_IDX_MAP.get(channel, idx), channel, kind, refs, task_path),
+                    )
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                _delete_threads(conn, [str(thread_id)])
+
+    # ------------------------------------------------------------------
+    # 异步接口
+    # ------------------------------------------------------------------
+
+    async def aget_tuple(self, config: RunnableConfig) -> CheckpointTuple | None:
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(
+        self,
+        config: RunnableConfig | None,
+        *,
+        filter: dict[str, Any] | None = None,  # noqa: A002
+        before: RunnableConfig | None = None,
+        limit: int | None = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        results = await asyncio.to_thread(lambda: list(self.list(config, filter=filter, before=before, limit=limit)))
+        for item in results:
+            yield item
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await asyncio.to_thread(self.delete_thread, thread_id)
+
+    def get_next_version(self, current: str | None, _channel: None) -> str:
+        if current is None:
+            current_v = 0
+        elif isinstance(current, int):
+            current_v = current
+        else:
+            current_v = int(current.split(".")[0])
+        return f"{current_v + 1:032}.{random.random():016}"
+
+    # ------------------------------------------------------------------
+    # 压缩与清理
+    # ------------------------------------------------------------------
+
+    def _compact(self, conn: sqlite3.Connection, thread_id: str, checkpoint_ns: str) -> None:
+        """删除该命名空间中最近 keep_last 个之前的 checkpoint、pending writes 和不再引用的通道值"""
+        stale = [
+            row[0]
+            for row in conn.execute(
+                "SELECT checkpoint_id FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ?"
+                " ORDER BY checkpoint_id DESC LIMIT -1 OFFSET ?",
+                (thread_id, checkpoint_ns, self.keep_last),
+            )
+        ]
+        if not stale:
+            return
+        conn.executemany(
+            "DELETE FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+            [(thread_id, checkpoint_ns, checkpoint_id) for checkpoint_id in stale],
+        )
+        conn.executemany(
+            "DELETE FROM writes WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+            [(thread_id, checkpoint_ns, checkpoint_id) for checkpoint_id in stale],
+        )
+
+        referenced = set()
+        for (versions,) in conn.execute(
+            "SELECT channel_versions FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ?",
+            (thread_id, checkpoint_ns),
+        ):
+            referenced.update(json.loads(versions).items())
+        unreferenced = [
+            (thread_id, checkpoint_ns, channel, version)
+            for channel, version in conn.execute(
+                "SELECT channel, version FROM channel_values WHERE thread_id = ? AND checkpoint_ns = ?",
+                (thread_id, checkpoint_ns),
+            )
+            if (channel, version) not in referenced
+        ]
+        conn.executemany(
+            "DELETE FROM channel_values WHERE thread_id = ? AND checkpoint_ns = ? AND channel = ? AND version = ?",
+            unreferenced,
+        )
+
+    def _ensure_collector(self) -> None:
+        if self._collector is not None and self._collector.is_alive():
+            return
+        with self._lock:
+            if self._collector is None or not self._collector.is_alive():
+                self._collector = threading.Thread(target=self._gc_loop, name="checkpoint-gc", daemon=True)
+                self._collector.start()
+
+    def _gc_loop(self) -> None:
+        while not self._stop.wait(self.gc_interval):
+            try:
+                self.gc()
+            except Exception:
+                logger.exception("checkpoint_gc_failed", db_path=str(self.db_path))
+
+    def gc(self) -> dict[str, int]:
+        """删除超过保留期限的线程，并清理不再被引用的 blob"""
+        cutoff = time.time() - self.retention_seconds
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                expired = [
+                    row[0] for row in conn.execute("SELECT thread_id FROM threads WHERE last_access < ?", (cutoff,))
+                ]
+                _delete_threads(conn, expired)
+                blobs = conn.execute(
+                    "DELETE FROM blobs WHERE hash NOT IN ("
+                    " SELECT j.value FROM channel_values, json_each(channel_values.refs) AS j"
+                    " UNION SELECT j.value FROM writes, json_each(writes.refs) AS j)"
+                ).rowcount
+        if expired or blobs:
+            logger.info("checkpoint_gc", expired_threads=len(expired), deleted_blobs=blobs)
+        return {"expired_threads": len(expired), "deleted_blobs": blobs}
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            conn = self._connection()
+            stored, raw = conn.execute(
+                "SELECT COALESCE(SUM(LENGTH(data)), 0), COALESCE(SUM(size), 0) FROM blobs"
+            ).fetchone()
+            return {
+                "threads": conn.execute("SELECT COUNT(*) FROM threads").fetchone()[0],
+                "checkpoints": conn.execute("SELECT COUNT(*) FROM checkpoints").fetchone()[0],
+                "blobs": conn.execute("SELECT COUNT(*) FROM blobs").fetchone()[0],
+                "blob_bytes": raw,
+                "blob_stored_bytes": stored,
+            }
+
+    def close(self) -> None:
+        self._stop.set()
+        if self._collector is not None:
+            self._collector.join(timeout=5)
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+def _config(thread_id: str, checkpoint_ns: str, checkpoint_id: str) -> RunnableConfig:
+    return {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint_id}}
+
+
+def _delete_threads(conn: sqlite3.Connection, thread_ids: list[str]) -> None:
+    params = [(thread_id,) for thread_id in thread_ids]
+    for table in ("checkpoints", "channel_values", "writes", "threads"):
+        conn.executemany(f"DELETE FROM {table} WHERE thread_id = ?", params)  # noqa: S608
+
+
+# ============================================================================
+# 全局实例
+# ============================================================================
+
+_checkpointer: SQLiteCheckpointSaver | None = None
+_checkpointer_lock = threading.Lock()
+
+
+def get_checkpointer() -> SQLiteCheckpointSaver | None:
+    """获取进程级 checkpointer 单例；未配置 CHECKPOINT_DB_PATH 时返回 None（由运行环境提供持久化）"""
+    global _checkpointer
+
+    if not settings.CHECKPOINT_DB_PATH:
+        return None
+    if _checkpointer is None:
+        with _checkpointer_lock:
+            if _checkpointer is None:
+                _checkpointer = SQLiteCheckpointSaver(
+                    db_path=settings.CHECKPOINT_DB_PATH,
+                    keep_last=settings.CHECKPOINT_KEEP_LAST,
+                    retention_seconds=settings.CHECKPOINT_RETENTION_SECONDS,
+                    gc_interval=settings.CHECKPOINT_GC_INTERVAL,
+                    compress_min_bytes=settings.CHECKPOINT_COMPRESS_MIN_BYTES,
+                )
+                atexit.register(_checkpointer.close)
+    return _checkpointer
@@ -0,0 +1,424 @@
+"""
+按线程隔离的文件后端 (Thread-scoped File Backend)
+
+替代共享 `./output` 目录的 FilesystemBackend：
+- 每个 LangGraph thread 拥有独立的虚拟文件命名空间，并发研究互不覆盖 `question.txt` / `final_report.md`
+- 热文件常驻内存，文件操作不做同步磁盘 I/O；冷线程的首次加载可通过 `preload` 放到线程池中执行
+- 后台线程定期把脏文件批量写入 SQLite，同一文件多次修改只写最后一版（写合并）
+- 按空闲时间和内存上限把线程换出内存，按保留期限从 SQLite 中清理已结束的线程
+"""
+
+import asyncio
+import atexit
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+from deepagents.backends.protocol import BackendProtocol, EditResult, FileInfo, GrepMatch, WriteResult
+from deepagents.backends.utils import (
+    create_file_data,
+    file_data_to_string,
+    format_read_response,
+    grep_matches_from_files,
+    perform_string_replacement,
+    update_file_data,
+)
+from langchain.tools import ToolRuntime
+from structlog.stdlib import get_logger
+from wcmatch import glob as wcglob
+
+from app.core.config import settings
+
+logger = get_logger(__name__)
+
+# 没有 thread_id（如直接 invoke 且未配置 checkpointer）时使用的命名空间
+DEFAULT_THREAD_ID = "__default__"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS thread_files (
+    thread_id TEXT NOT NULL,
+    path TEXT NOT NULL,
+    content TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    modified_at TEXT NOT NULL,
+    PRIMARY KEY (thread_id, path)
+);
+CREATE TABLE IF NOT EXISTS threads (
+    thread_id TEXT PRIMARY KEY,
+    last_access REAL NOT NULL
+);
+"""
+
+
+@dataclass(slots=True)
+class _ThreadFiles:
+    """单个线程在内存中的文件集合"""
+
+    files: dict[str, dict[str, Any]] = field(default_factory=dict)
+    last_access: float = field(default_factory=time.time)
+    size: int = 0
+
+
+def _file_size(file_data: dict[str, Any]) -> int:
+    return sum(len(line) + 1 for line in file_data.get("content", []))
+
+
+class ThreadFileStore:
+    """
+    进程级的线程文件存储。
+
+    Args:
+        db_path: 持久化 SQLite 文件路径
+        flush_interval: 后台落盘间隔（秒）
+        idle_seconds: 线程空闲超过该时长后从内存换出（已落盘，再次访问时从 SQLite 加载）
+        retention_seconds: 线程空闲超过该时长后从 SQLite 中删除
+        max_memory_bytes: 内存中文件内容总量上限，超出时按最近最少使用换出线程
+    """
+
+    def __init__(
+        self,
+        db_path: str | Path,
+        flush_interval: float = 2.0,
+        idle_seconds: float = 1800.0,
+        retention_seconds: float = 7 * 86400.0,
+        max_memory_bytes: int = 64 * 1024 * 1024,
+    ) -> None:
+        self.db_path = Path(db_path)
+        self.flush_interval = flush_interval
+        self.idle_seconds = idle_seconds
+        self.retention_seconds = retention_seconds
+        self.max_memory_bytes = max_memory_bytes
+
+        self._lock = threading.RLock()
+        self._threads: OrderedDict[str, _ThreadFiles] = OrderedDict()
+        self._memory_bytes = 0
+        # 脏文件集合：落盘时读取内存中的最新内容，实现写合并
+        self._dirty: set[tuple[str, str]] = set()
+
+        self._db_lock = threading.Lock()
+        self._conn: sqlite3.Connection | None = None
+        self._stop = threading.Event()
+        self._flusher: threading.Thread | None = None
+
+    # ------------------------------------------------------------------
+    # 内存访问
+    # ------------------------------------------------------------------
+
+    def get_files(self, thread_id: str) -> dict[str, dict[str, Any]]:
+        """返回线程的文件映射 {path: file_data}，冷线程会先从 SQLite 加载"""
+        with self._lock:
+            entry = self._touch(thread_id)
+        if entry is not None:
+            return entry.files
+
+        # 冷加载不持有 `_lock`：两把锁从不嵌套持有，加载期间其他线程的文件操作也不会被阻塞
+        loaded = self._load_thread(thread_id)
+        with self._lock:
+            entry = self._touch(thread_id)
+            if entry is None:
+                entry = loaded
+                self._threads[thread_id] = entry
+                self._memory_bytes += entry.size
+                entry.last_access = time.time()
+            return entry.files
+
+    async def preload(self, thread_id: str) -> None:
+        """在线程池中加载冷线程（以及首次打开 SQLite），供异步代码在访问文件前调用，避免阻塞事件循环"""
+        with self._lock:
+            if thread_id in self._threads:
+                return
+        await asyncio.to_thread(self.get_files, thread_id)
+
+    def put_file(self, thread_id: str, path: str, file_data: dict[str, Any]) -> None:
+        """写入文件并标记为脏，由后台线程落盘"""
+        while True:
+            self.get_files(thread_id)
+            with self._lock:
+                entry = self._touch(thread_id)
+                if entry is None:
+                    # 加载后、写入前被换出（内存超限），重新加载
+                    continue
+                previous = entry.files.get(path)
+                delta = _file_size(file_data) - (_file_size(previous) if previous else 0)
+                entry.files[path] = file_data
+                entry.size += delta
+                self._memory_bytes += delta
+                self._dirty.add((thread_id, path))
+                break
+        self._ensure_flusher()
+
+    def _touch(self, thread_id: str) -> _ThreadFiles | None:
+        """更新常驻线程的访问时间和 LRU 顺序（调用方持有 `_lock`），线程不在内存中时返回 None"""
+        entry = self._threads.get(thread_id)
+        if entry is not None:
+            self._threads.move_to_end(thread_id)
+            entry.last_access = time.time()
+        return entry
+
+    def backend(self, thread_id: str) -> "ThreadScopedBackend":
+        return ThreadScopedBackend(self, thread_id)
+
+    def backend_factory(self, runtime: ToolRuntime) -> "ThreadScopedBackend":
+        """deepagents BackendFactory：按 ToolRuntime 中的 thread_id 返回对应命名空间的后端"""
+        config = getattr(runtime, "config", None) or {}
+        thread_id = config.get("configurable", {}).get("thread_id") or DEFAULT_THREAD_ID
+        return self.backend(str(thread_id))
+
+    # ------------------------------------------------------------------
+    # 持久化
+    # ------------------------------------------------------------------
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(_SCHEMA)
+        return self._conn
+
+    def _load_thread(self, thread_id: str) -> _ThreadFiles:
+        with self._db_lock:
+            conn = self._connection()
+            with conn:
+                rows = conn.execute(
+                    "SELECT path, content, created_at, modified_at FROM thread_files WHERE thread_id = ?",
+                    (thread_id,),
+                ).fetchall()
+                # 刷新访问时间：与 gc 的过期清理在同一把锁下串行，刚加载的线程不会被当作过期删除
+                if rows:
+                    conn.execute(
+                        "UPDATE threads SET last_access = MAX(last_access, ?) WHERE thread_id = ?",
+                        (time.time(), thread_id),
+                    )
+        entry = _ThreadFiles()
+        for path, content, created_at, modified_at in rows:
+            entry.files[path] = {"content": content.split("\n"), "created_at": created_at, "modified_at": modified_at}
+            entry.size += len(content) + 1
+        return entry
+
+    def _ensure_flusher(self) -> None:
+        if self._flusher is not None and self._flusher.is_alive():
+            return
+        with self._lock:
+            if self._flusher is None or not self._flusher.is_alive():
+                self._flusher = threading.Thread(target=self._flush_loop, name="thread-store-flusher", daemon=True)
+                self._flusher.start()
+
+    def _flush_loop(self) -> None:
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+                self.gc()
+            except Exception:
+                logger.exception("thread_store_flush_failed", db_path=str(self.db_path))
+
+    def flush(self) -> None:
+        """把脏文件的最新内容批量写入 SQLite"""
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+            rows = []
+            touched: dict[str, float] = {}
+            for thread_id, path in dirty:
+                entry = self._threads.get(thread_id)
+                file_data = entry.files.get(path) if entry else None
+                if file_data is None:
+                    continue
+                rows.append(
+                    (
+                        thread_id,
+                        path,
+                        file_data_to_string(file_data),
+                        file_data.get("created_at", ""),
+                        file_data.get("modified_at", ""),
+                    )
+                )
+                touched[thread_id] = entry.last_access if entry else time.time()
+
+        if not rows:
+            return
+        with self._db_lock:
+            conn = self._connection()
+            with conn:
+                conn.executemany("INSERT OR REPLACE INTO thread_files VALUES (?, ?, ?, ?, ?)", rows)
+                conn.executemany("INSERT OR REPLACE INTO threads VALUES (?, ?)", touched.items())
+        logger.debug("thread_store_flushed", files=len(rows), threads=len(touched))
+
+    def gc(self) -> None:
+        """换出空闲或超出内存上限的线程，并清理超过保留期限的已结束线程"""
+        now = time.time()
+        evicted = []
+        # `_lock` 与 `_db_lock` 从不嵌套持有：先在 `_lock` 下取常驻线程快照，再进入 `_db_lock`
+        with self._lock:
+            dirty_threads = {thread_id for thread_id, _ in self._dirty}
+            for thread_id, entry in list(self._threads.items()):
+                over_budget = self._memory_bytes > self.max_memory_bytes
+                idle = now - entry.last_access > self.idle_seconds
+                if not (idle or over_budget) or thread_id in dirty_threads:
+                    continue
+                # OrderedDict 按最近访问排序，超出内存上限时从最久未访问的线程开始换出
+                del self._threads[thread_id]
+                self._memory_bytes -= entry.size
+                evicted.append(thread_id)
+            resident = set(self._threads)
+
+        with self._db_lock:
+            conn = self._connection()
+            with conn:
+                if evicted:
+                    conn.executemany(
+                        "UPDATE threads SET last_access = MAX(last_access, ?) WHERE thread_id = ?",
+                        [(now, thread_id) for thread_id in evicted],
+                    )
+                cutoff = now - self.retention_seconds
+                expired = [
+                    row[0]
+                    for row in conn.execute("SELECT thread_id FROM threads WHERE last_access < ?", (cutoff,))
+                    if row[0] not in resident
+                ]
+                conn.executemany("DELETE FROM thread_files WHERE thread_id = ?", [(t,) for t in expired])
+                conn.executemany("DELETE FROM threads WHERE thread_id = ?", [(t,) for t in expired])
+
+        if evicted or expired:
+            logger.info("thread_store_gc", evicted_threads=len(evicted), expired_threads=len(expired))
+
+    def close(self) -> None:
+        """停止后台线程并落盘剩余的脏文件"""
+        self._stop.set()
+        if self._flusher is not None:
+            self._flusher.join(timeout=self.flush_interval * 2)
+        self.flush()
+        with self._db_lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+class ThreadScopedBackend(BackendProtocol):
+    """
+    绑定到单个线程命名空间的 deepagents 文件后端。
+
+    所有操作只访问内存，持久化由 `ThreadFileStore` 在后台完成。
+    """
+
+    def __init__(self, store: ThreadFileStore, thread_id: str) -> None:
+        self.store = store
+        self.thread_id = thread_id
+
+    @property
+    def _files(self) -> dict[str, dict[str, Any]]:
+        return self.store.get_files(self.thread_id)
+
+    def read_text(self, file_path: str) -> str | None:
+        """读取文件原文（不带行号），文件不存在时返回 None"""
+        file_data = self._files.get(file_path)
+        return None if file_data is None else file_data_to_string(file_data)
+
+    def ls_info(self, path: str) -> list[FileInfo]:
+        normalized_path = path if path.endswith("/") else path + "/"
+        infos: list[FileInfo] = []
+        subdirs: set[str] = set()
+        for file_path, file_data in self._files.items():
+            if not file_path.startswith(normalized_path):
+                continue
+            relative = file_path[len(normalized_path) :]
+            if "/" in relative:
+                subdirs.add(normalized_path + relative.split("/")[0] + "/")
+                continue
+            infos.append(
+                {
+                    "path": file_path,
+                    "is_dir": False,
+                    "size": _file_size(file_data),
+                    "modified_at": file_data.get("modified_at", ""),
+                }
+            )
+        infos += [{"path": subdir, "is_dir": True, "size": 0, "modified_at": ""} for subdir in sorted(subdirs)]
+        infos.sort(key=lambda info: info.get("path", ""))
+        return infos
+
+    def read(self, file_path: str, offset: int = 0, limit: int = 2000) -> str:
+        file_data = self._files.get(file_path)
+        if file_data is None:
+            return f"Error: File '{file_path}' not found"
+        return format_read_response(file_data, offset, limit)
+
+    def write(self, file_path: str, content: str) -> WriteResult:
+        if file_path in self._files:
+            return WriteResult(
+                error=f"Cannot write to {file_path} because it already exists. "
+                "Read and then make an edit, or write to a new path."
+            )
+        self.store.put_file(self.thread_id, file_path, create_file_data(content))
+        return WriteResult(path=file_path, files_update=None)
+
+    def write_text(self, file_path: str, content: str) -> None:
+        """覆盖写入文件全文（不存在时创建），供按章节编辑报告等需要整体替换的场景"""
+        file_data = self._files.get(file_path)
+        new_data = create_file_data(content) if file_data is None else update_file_data(file_data, content)
+        self.store.put_file(self.thread_id, file_path, new_data)
+
+    def edit(self, file_path: str, old_string: str, new_string: str, replace_all: bool = False) -> EditResult:
+        file_data = self._files.get(file_path)
+        if file_data is None:
+            return EditResult(error=f"Error: File '{file_path}' not found")
+
+        result = perform_string_replacement(file_data_to_string(file_data), old_string, new_string, replace_all)
+        if isinstance(result, str):
+            return EditResult(error=result)
+
+        new_content, occurrences = result
+        self.store.put_file(self.thread_id, file_path, update_file_data(file_data, new_content))
+        return EditResult(path=file_path, files_update=None, occurrences=int(occurrences))
+
+    def grep_raw(self, pattern: str, path: str | None = None, glob: str | None = None) -> list[GrepMatch] | str:
+        return grep_matches_from_files(dict(self._files), pattern, path, glob)
+
+    def glob_info(self, pattern: str, path: str = "/") -> list[FileInfo]:
+        base = path if path.endswith("/") else path + "/"
+        infos: list[FileInfo] = []
+        for file_path, file_data in self._files.items():
+            if not file_path.startswith(base):
+                continue
+            relative = file_path[len(base) :]
+            if wcglob.globmatch(relative, pattern, flags=wcglob.BRACE | wcglob.GLOBSTAR):
+                infos.append(
+                    {
+                        "path": file_path,
+                        "is_dir": False,
+                        "size": _file_size(file_data),
+                        "modified_at": file_data.get("modified_at", ""),
+                    }
+                )
+        infos.sort(key=lambda info: info.get("modified_at", ""), reverse=True)
+        return infos
+
+
+# ============================================================================
+# 全局实例
+# ============================================================================
+
+_thread_file_store: ThreadFileStore | None = None
+_thread_file_store_lock = threading.Lock()
+
+
+def get_thread_file_store() -> ThreadFileStore:
+    """获取进程级线程文件存储单例（延迟初始化，进程退出时自动落盘）"""
+    global _thread_file_store
+
+    if _thread_file_store is None:
+        with _thread_file_store_lock:
+            if _thread_file_store is None:
+                _thread_file_store = ThreadFileStore(
+                    db_path=settings.THREAD_STORE_DB_PATH,
+                    flush_interval=settings.THREAD_STORE_FLUSH_INTERVAL,
+                    idle_seconds=settings.THREAD_STORE_IDLE_SECONDS,
+                    retention_seconds=settings.THREAD_STORE_RETENTION_SECONDS,
+                    max_memory_bytes=settings.THREAD_STORE_MAX_MEMORY_BYTES,
+                )
+                atexit.register(_thread_file_store.close)
+    return _thread_file_store
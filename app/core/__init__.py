@@ -1,7 +1,5 @@
 from .config import settings
 from .log_adapter import logger, setup_logging
 
-__all__ = ["settings", "logger"]
-
-# 初始化日志库
-setup_logging()
+# 导入本包不初始化日志：由各入口（服务启动、命令行 main()）显式调用 setup_logging()
+__all__ = ["settings", "logger", "setup_logging"]
@@ -1,5 +1,7 @@
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
+from app.enums import QueueBackend
+
 
 class Settings(BaseSettings):
     """应用配置类，从环境变量和 .env 文件加载配置"""
@@ -19,9 +21,49 @@ class Settings(BaseSettings):
     INIT_LLM_MODEL: str = "openai:deepseek-ai/DeepSeek-V3.2-Exp"
     VL_MODEL_NAME: str = "Qwen/Qwen3-VL-32B-Instruct"
 
+    ORCHESTRATOR_MODEL: str | None = None
+    """深度研究主代理（编排）使用的模型，未配置时使用 INIT_LLM_MODEL"""
+
+    RESEARCHER_MODEL: str | None = None
+    """研究子代理使用的模型，未配置时使用 INIT_LLM_MODEL"""
+
+    CRITIC_MODEL: str | None = None
+    """审阅子代理使用的模型，未配置时使用 INIT_LLM_MODEL"""
+
+    QA_MODEL: str | None = None
+    """通用问答使用的模型，未配置时使用 INIT_LLM_MODEL"""
+
+    QA_FAST_MODEL: str | None = None
+    """通用问答中简单问题使用的低成本快速模型，未配置时不做复杂度分流"""
+
+    QA_SIMPLE_MAX_CHARS: int = 60
+    """复杂度分类：问题长度（字符）不超过该值且没有复杂度信号时视为简单问题"""
+
     UPLOAD_DIR: str = "/app/uploads"
     """文件上传临时目录，用于存储待处理的文档和图片"""
 
+    # ==================== LLM 连接池 ====================
+    LLM_MAX_CONCURRENCY: int = 32
+    """每个提供方（API 地址）同时在途的 LLM 请求上限，超出时排队等待"""
+
+    LLM_MAX_CONNECTIONS: int = 64
+    """每个提供方共享连接池的最大连接数"""
+
+    LLM_MAX_KEEPALIVE_CONNECTIONS: int = 32
+    """每个提供方保持的空闲 keep-alive 连接数"""
+
+    LLM_KEEPALIVE_EXPIRY: float = 60.0
+    """空闲连接保持时长（秒）"""
+
+    LLM_HTTP2: bool = True
+    """是否启用 HTTP/2（需要安装 h2，未安装时自动使用 HTTP/1.1）"""
+
+    LLM_REQUEST_TIMEOUT: float = 120.0
+    """单次 LLM 请求超时（秒）"""
+
+    LLM_QUEUE_WAIT_LOG_SECONDS: float = 0.5
+    """请求排队等待超过该时长时输出日志（秒）"""
+
     # ==================== 向量和排序模型 ====================
     EMBEDDING_MODEL: str = "Qwen/Qwen3-Embedding-8B"
     """向量化模型，用于文档相似度检索"""
@@ -29,12 +71,265 @@ class Settings(BaseSettings):
     RERANK_MODEL: str = "Qwen/Qwen3-Reranker-8B"
     """重排序模型，用于优化检索结果排序"""
 
-    LLM_MODEL: str = "deepseek-ai/DeepSeek-V3.2-Exp"
-    """大语言模型，用于复杂推理任务"""
-
     # ==================== API 端点配置 ====================
     RERANK_BASE_URL: str = "https://api.siliconflow.cn/v1/rerank"
     """重排序 API 端点"""
 
+    EMBEDDING_BASE_URL: str = "https://api.siliconflow.cn/v1"
+    """向量化 API 端点（OpenAI 兼容）"""
+
+    # ==================== Confluence ====================
+    CONFLUENCE_URL: str | None = None
+    """Confluence 地址（与 mcp-atlassian 共用同名环境变量），用于下载附件建立本地索引"""
+
+    CONFLUENCE_USERNAME: str | None = None
+    """Confluence Cloud 用户名（与 CONFLUENCE_API_TOKEN 一起使用）"""
+
+    CONFLUENCE_API_TOKEN: str | None = None
+    """Confluence Cloud API Token"""
+
+    CONFLUENCE_PERSONAL_TOKEN: str | None = None
+    """Confluence Server / Data Center 个人访问令牌"""
+
+    CONFLUENCE_RATE_LIMIT_RPS: float = 10.0
+    """对 Confluence 的请求速率上限（每秒，MCP 工具与 REST 客户端共享）"""
+
+    CONFLUENCE_RATE_LIMIT_BURST: int = 20
+    """令牌桶容量：允许的瞬时突发请求数"""
+
+    CONFLUENCE_INITIAL_CONCURRENCY: int = 4
+    """自适应并发的初始上限"""
+
+    CONFLUENCE_MIN_CONCURRENCY: int = 1
+    """自适应并发上限的下限"""
+
+    CONFLUENCE_MAX_CONCURRENCY: int = 16
+    """自适应并发上限的上限"""
+
+    CONFLUENCE_LATENCY_TOLERANCE: float = 2.0
+    """近期请求延迟超过基线的该倍数时视为服务端过载，降低并发上限"""
+
+    CONFLUENCE_DEFAULT_RETRY_AFTER: float = 5.0
+    """收到 429 但未携带 Retry-After 时暂停发出请求的时长（秒）"""
+
+    CONFLUENCE_THROTTLE_RETRIES: int = 3
+    """被限流（429）请求的最大自动重试次数"""
+
+    CONFLUENCE_QUEUE_WAIT_LOG_SECONDS: float = 1.0
+    """请求排队等待超过该时长时输出日志（秒）"""
+
+    # ==================== 通用问答 ====================
+    UNIVERSAL_QA_DEADLINE_SECONDS: float = 20.0
+    """通用问答单次运行的时间预算（秒），工具调用以剩余预算作为超时"""
+
+    UNIVERSAL_QA_ANSWER_RESERVE_SECONDS: float = 6.0
+    """为最终作答预留的时间（秒），剩余时间低于该值时禁用工具并强制作答"""
+
+    # ==================== 深度研究 ====================
+    CRITIQUE_MAX_ITERATIONS: int = 2
+    """单次研究运行允许的最大审阅轮数"""
+
+    CRITIQUE_TIME_BUDGET_SECONDS: float = 600.0
+    """从首次审阅开始计算的审阅循环总时长上限（秒）"""
+
+    CRITIQUE_MIN_CHANGE_RATIO: float = 0.05
+    """距上次审阅报告变化比例低于该值时视为已收敛，不再审阅"""
+
+    RESEARCH_MAX_MODEL_CALLS: int = 80
+    """单次研究运行主代理的最大模型调用次数"""
+
+    # ==================== 签名检查 ====================
+    SIGN_CHECK_CONCURRENCY: int = 8
+    """批量签名检查同时在途的视觉模型调用数"""
+
+    SIGN_CHECK_MAX_ATTEMPTS: int = 3
+    """单个文档的最大模型调用次数（含重试），输出不是合法 JSON 或状态代码无效时也会重试"""
+
+    SIGN_CHECK_OUTPUT_DIR: str = "./data/sign_check"
+    """批量签名检查结果（JSONL）的默认输出目录"""
+
+    SIGN_CHECK_MAX_FINISHED_JOBS: int = 100
+    """内存中保留的已结束批处理任务数，超出时移除最早提交的（结果文件不受影响）"""
+
+    SIGN_CHECK_PREDETECT: bool = True
+    """发送给视觉模型前先在 CPU 上检测候选签名区域，只发送缩小后的区域拼接图（需要可选依赖 numpy、Pillow）"""
+
+    SIGN_CHECK_PREDETECT_DECIDE_MISSING: bool = False
+    """预检测的候选区域全部为空白时，不调用模型直接判定为 missing"""
+
+    SIGN_CHECK_MAX_IMAGE_SIDE: int = 1600
+    """预处理后发送给视觉模型的图片最大边长（像素）"""
+
+    # ==================== 文档处理 ====================
+    PDF_RASTER_DPI: int = 200
+    """PDF 扫描件栅格化的分辨率（DPI）"""
+
+    PDF_RASTER_WORKERS: int | None = None
+    """文档处理进程池大小（PDF 栅格化和附件文本抽取共用），未设置时等于 CPU 核数"""
+
+    PDF_PAGE_CACHE_DIR: str = "./data/page_cache"
+    """PDF 页面图片的磁盘缓存目录，按文件内容哈希和 DPI 组织，重试和重复处理时直接复用"""
+
+    LOCAL_INDEX_DB_PATH: str = "./data/local_index.db"
+    """本地附件索引（全文检索和向量）的 SQLite 路径"""
+
+    LOCAL_INDEX_EMBEDDINGS: bool = False
+    """索引附件时是否调用 EMBEDDING_MODEL 生成向量（关闭时只建全文索引）"""
+
+    ATTACHMENT_CONCURRENCY: int = 4
+    """同时下载和抽取的附件数"""
+
+    ATTACHMENT_MAX_BYTES: int = 50 * 1024 * 1024
+    """超过该大小的附件不下载、不索引（字节）"""
+
+    # ==================== 解析队列 ====================
+    PARSER_QUEUE_BACKEND: QueueBackend = QueueBackend.SQLITE
+    """解析任务队列后端：sqlite（本地）或 kafka"""
+
+    PARSER_QUEUE_DB_PATH: str = "./data/parser_queue.db"
+    """SQLite 队列的数据库路径（多个 worker 进程共享）"""
+
+    KAFKA_BOOTSTRAP_SERVERS: str = "localhost:9092"
+    """Kafka 集群地址（逗号分隔）"""
+
+    KAFKA_PARSER_TOPIC: str = "document-parse-jobs"
+    """解析任务主题；处理失败的任务写入 `<主题>.dlq`"""
+
+    PARSER_BATCH_SIZE: int = 32
+    """每个微批次最多拉取的任务数"""
+
+    PARSER_MAX_IN_FLIGHT: int = 8
+    """每个 worker 同时处理的任务数"""
+
+    PARSER_MAX_ATTEMPTS: int = 3
+    """单个任务的最大处理次数（含重试），仍失败时转入死信"""
+
+    PARSER_LEASE_SECONDS: float = 300.0
+    """一个微批次的最长处理时间（秒）：SQLite 队列的租约时长、Kafka 的 max.poll.interval，超时未提交的任务会被重新投递"""
+
+    # ==================== 上下文预算 ====================
+    TOOL_OUTPUT_OFFLOAD_MIN_TOKENS: int = 800
+    """小于该大小（估算 token）的工具输出始终保留原文"""
+
+    TOOL_OUTPUT_OFFLOAD_TRIGGER_TOKENS: int = 12000
+    """已被模型读过的大体积工具输出累计超过该值时，批量替换为存根（原文可按需取回）"""
+
+    HISTORY_SUMMARY_TRIGGER_TOKENS: int = 60000
+    """消息历史超过该大小（估算 token）时把较早的轮次替换为摘要"""
+
+    HISTORY_SUMMARY_KEEP_MESSAGES: int = 20
+    """摘要后保留的最近消息数"""
+
+    # ==================== 线程状态持久化 ====================
+    CHECKPOINT_DB_PATH: str | None = None
+    """
+    LangGraph 线程状态（checkpoint）的 SQLite 路径。生产服务（`python -m app.server.main`，镜像默认入口）
+    未配置时使用 ./data/checkpoints.db；其他运行方式未配置时由运行环境提供持久化（如 langgraph dev 的内存存储）
+    """
+
+    CHECKPOINT_KEEP_LAST: int = 3
+    """每个线程保留的最近 checkpoint 数，较早的 checkpoint 在写入时压缩删除"""
+
+    CHECKPOINT_RETENTION_SECONDS: float = 30 * 86400.0
+    """线程空闲超过该时长后删除其全部 checkpoint（秒）"""
+
+    CHECKPOINT_GC_INTERVAL: float = 600.0
+    """后台清理过期线程和无引用 blob 的间隔（秒）"""
+
+    CHECKPOINT_COMPRESS_MIN_BYTES: int = 1024
+    """超过该大小的状态 blob（消息、工具输出）使用 zlib 压缩（字节）"""
+
+    # ==================== 生产服务 ====================
+    SERVER_WORKERS: int | None = None
+    """生产服务（`python -m app.server.main`）的 worker 进程数，未配置时使用 CPU 核数"""
+
+    SERVER_DRAIN_SECONDS: float = 60.0
+    """收到停止信号后等待在途请求（含流式回答）完成的最长时间（秒）"""
+
+    SERVER_WARMUP_GRAPHS: bool = True
+    """worker 启动后是否在后台预先构建全部 Agent 图；关闭时首个请求按需构建"""
+
+    SERVER_GRAPHS_CONFIG: str = "langgraph.json"
+    """生产服务读取 assistant_id 与图工厂映射的配置文件（langgraph.json 格式，与 `langgraph dev` 共用）"""
+
+    MCP_SIDECAR_SOCKET: str | None = None
+    """MCP 边车进程的 Unix socket 路径；配置且存在时通过边车调用 MCP 工具，所有 worker 共享同一组 MCP 会话"""
+
+    # ==================== MCP 服务器监管 ====================
+    MCP_PING_INTERVAL_SECONDS: float = 15.0
+    """对每个 MCP 服务器进程发送健康检查 ping 的间隔（秒）"""
+
+    MCP_HANG_THRESHOLD_SECONDS: float = 10.0
+    """ping 超过该时长未响应时判定进程卡死，切换到热备进程（秒）"""
+
+    MCP_WARM_STANDBY: bool = True
+    """是否为每个 MCP 服务器保持一个已初始化的热备进程，故障时立即切换"""
+
+    MCP_START_TIMEOUT_SECONDS: float = 120.0
+    """MCP 服务器进程启动（含初始化）超时；首次运行 uvx 可能需要下载（秒）"""
+
+    MCP_RESTART_BACKOFF_MAX_SECONDS: float = 60.0
+    """连续启动失败时重启退避的最长等待（秒）"""
+
+    # ==================== 线程文件存储 ====================
+    THREAD_STORE_DB_PATH: str = "./data/thread_files.db"
+    """按线程隔离的代理文件（question.txt、final_report.md 等）的持久化 SQLite 路径"""
+
+    THREAD_STORE_FLUSH_INTERVAL: float = 2.0
+    """脏文件批量落盘间隔（秒）"""
+
+    THREAD_STORE_IDLE_SECONDS: float = 1800.0
+    """线程空闲超过该时长后从内存换出（秒）"""
+
+    THREAD_STORE_RETENTION_SECONDS: float = 7 * 86400.0
+    """线程空闲超过该时长后从 SQLite 中删除（秒）"""
+
+    THREAD_STORE_MAX_MEMORY_BYTES: int = 64 * 1024 * 1024
+    """内存中线程文件内容总量上限（字节），超出时换出最久未访问的线程"""
+
+    # ==================== 日志配置 ====================
+    LOG_LEVEL: str = "INFO"
+    """日志级别"""
+
+    LOG_JSON: bool = False
+    """是否输出 JSON 日志（生产环境建议开启）"""
+
+    LOG_QUEUED: bool | None = None
+    """是否启用队列模式（后台线程渲染、批量写入、过载丢弃），未配置时跟随 LOG_JSON"""
+
+    LOG_QUEUE_SIZE: int = 10000
+    """日志队列容量，超过 80% 时丢弃 WARNING 以下日志，满时丢弃全部日志"""
+
+    LOG_BATCH_SIZE: int = 256
+    """后台线程单次批量写入的最大日志条数"""
+
+    LOG_FLUSH_INTERVAL: float = 0.5
+    """后台线程批量刷新间隔（秒）"""
+
+    LOG_RATE_LIMITS: dict[str, float] = {
+        "mcp_tools_fetched": 1 / 60,
+        "confluence_tools_fetched": 1 / 60,
+    }
+    """按事件名的令牌桶限流 {事件名: 每秒允许条数}，环境变量使用 JSON 格式"""
+
+    LOG_RATE_LIMIT_BURST: float = 1.0
+    """令牌桶容量，即限流事件允许的突发条数"""
+
+    LOG_SAMPLE_RATES: dict[str, float] = {}
+    """按事件名的概率采样 {事件名: 保留概率 0~1}，环境变量使用 JSON 格式"""
+
+    LOG_SUPPRESSED_SUMMARY_INTERVAL: float = 60.0
+    """被限流/采样丢弃事件的汇总日志输出间隔（秒）"""
+
+    # ==================== 用量统计 ====================
+    USAGE_LEDGER_ENABLED: bool = True
+    """是否记录每次 LLM 调用的 token 用量和工具返回大小"""
+
+    USAGE_LEDGER_DB_PATH: str = "./data/usage_ledger.db"
+    """用量账本 SQLite 文件路径"""
+
+    USAGE_LEDGER_FLUSH_INTERVAL: float = 5.0
+    """用量记录批量落盘间隔（秒）"""
+
 
 settings: Settings = Settings()  # type: ignore
@@ -0,0 +1,307 @@
+"""
+LLM HTTP 连接池 (Shared LLM HTTP Pool)
+
+进程内所有聊天模型按提供方（base URL）共享 HTTP 客户端：
+- 共享 keep-alive 连接池，并行子代理不再各自建立 TLS 连接；安装了 `h2` 时启用 HTTP/2 多路复用
+- 按提供方限制同时在途的请求数（异步请求按事件循环、同步请求按进程计），超出时排队等待，避免压垮上游或触发限流
+- 底层连接池按事件循环各建一个，共享客户端可以在多个事件循环中使用（如多次 `asyncio.run`）
+- 记录排队等待指标（`get_llm_pool_stats`），等待超过阈值时输出 `llm_request_queued` 日志
+"""
+
+import asyncio
+import importlib.util
+import threading
+import time
+import weakref
+from collections.abc import AsyncIterator, Callable, Iterator
+from dataclasses import asdict, dataclass
+from typing import Any
+
+import httpx
+from structlog.stdlib import get_logger
+
+from app.core.config import settings
+
+logger = get_logger(__name__)
+
+
+@dataclass(slots=True)
+class ProviderPoolStats:
+    """单个提供方的请求排队统计"""
+
+    provider: str
+    max_concurrency: int
+    in_flight: int = 0
+    """当前在途请求数"""
+    waiting: int = 0
+    """当前排队等待的请求数"""
+    requests: int = 0
+    """累计请求数"""
+    queued_requests: int = 0
+    """累计需要排队的请求数"""
+    total_wait_seconds: float = 0.0
+    max_wait_seconds: float = 0.0
+
+    @property
+    def avg_wait_seconds(self) -> float:
+        return self.total_wait_seconds / self.requests if self.requests else 0.0
+
+    def to_dict(self) -> dict[str, Any]:
+        return {**asdict(self), "avg_wait_seconds": self.avg_wait_seconds}
+
+
+class _ProviderLimiter:
+    """
+    按提供方限制在途请求数，并记录排队等待时间。
+
+    asyncio 信号量只能在创建它的事件循环中使用，因此按事件循环各建一个（循环被回收时自动移除）；
+    同步客户端使用线程信号量。统计在所有事件循环和线程之间共享。
+    """
+
+    def __init__(self, provider: str, max_concurrency: int, log_wait_seconds: float) -> None:
+        self._max_concurrency = max_concurrency
+        self._log_wait_seconds = log_wait_seconds
+        self._loop_semaphores: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore] = (
+            weakref.WeakKeyDictionary()
+        )
+        self._sync_semaphore = threading.BoundedSemaphore(max_concurrency)
+        self._lock = threading.Lock()
+        self.stats = ProviderPoolStats(provider=provider, max_concurrency=max_concurrency)
+
+    def _loop_semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            semaphore = self._loop_semaphores.get(loop)
+            if semaphore is None:
+                semaphore = self._loop_semaphores[loop] = asyncio.Semaphore(self._max_concurrency)
+        return semaphore
+
+    async def acquire(self) -> Callable[[], None]:
+        """等待并发名额，返回释放名额的函数"""
+        semaphore = self._loop_semaphore()
+        started = time.perf_counter()
+        queued = semaphore.locked()
+        self._waiting(queued, 1)
+        try:
+            await semaphore.acquire()
+        finally:
+            self._waiting(queued, -1)
+        self._record(time.perf_counter() - started, queued)
+        return lambda: self._release(semaphore.release)
+
+    def acquire_sync(self) -> Callable[[], None]:
+        """同步客户端等待并发名额（阻塞当前线程），返回释放名额的函数"""
+        started = time.perf_counter()
+        queued = not self._sync_semaphore.acquire(blocking=False)
+        if queued:
+            self._waiting(queued, 1)
+            try:
+                self._sync_semaphore.acquire()
+            finally:
+                self._waiting(queued, -1)
+        self._record(time.perf_counter() - started, queued)
+        return lambda: self._release(self._sync_semaphore.release)
+
+    def _waiting(self, queued: bool, delta: int) -> None:
+        if queued:
+            with self._lock:
+                self.stats.waiting += delta
+
+    def _record(self, wait: float, queued: bool) -> None:
+        stats = self.stats
+        with self._lock:
+            stats.requests += 1
+            stats.in_flight += 1
+            stats.total_wait_seconds += wait
+            stats.max_wait_seconds = max(stats.max_wait_seconds, wait)
+            if queued:
+                stats.queued_requests += 1
+        if wait >= self._log_wait_seconds:
+            logger.info(
+                "llm_request_queued",
+                provider=stats.provider,
+                wait_seconds=round(wait, 3),
+                in_flight=stats.in_flight,
+                waiting=stats.waiting,
+                max_concurrency=stats.max_concurrency,
+            )
+
+    def _release(self, release: Callable[[], None]) -> None:
+        with self._lock:
+            self.stats.in_flight -= 1
+        release()
+
+
+class _ReleasingStream(httpx.AsyncByteStream):
+    """响应体读取完毕（或关闭）时释放并发名额，流式响应在整个流结束前都占用名额"""
+
+    def __init__(self, stream: httpx.AsyncByteStream, release: Callable[[], None]) -> None:
+        self._stream = stream
+        self._release: Callable[[], None] | None = release
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self) -> None:
+        try:
+            await self._stream.aclose()
+        finally:
+            if self._release is not None:
+                self._release()
+                self._release = None
+
+
+class _ReleasingSyncStream(httpx.SyncByteStream):
+    """同步版本的 `_ReleasingStream`"""
+
+    def __init__(self, stream: httpx.SyncByteStream, release: Callable[[], None]) -> None:
+        self._stream = stream
+        self._release: Callable[[], None] | None = release
+
+    def __iter__(self) -> Iterator[bytes]:
+        yield from self._stream
+
+    def close(self) -> None:
+        try:
+            self._stream.close()
+        finally:
+            if self._release is not None:
+                self._release()
+                self._release = None
+
+
+class _BoundedAsyncTransport(httpx.AsyncBaseTransport):
+    """
+    带并发限制的异步传输层。
+
+    httpx 的连接池绑定在首次使用它的事件循环上，共享客户端在另一个事件循环中复用会出现
+    "bound to a different event loop" 或传输已关闭的错误（如命令行多次调用 `asyncio.run`）。
+    因此底层传输按事件循环各建一个，循环被回收时自动移除。
+    """
+
+    def __init__(self, transport_factory: Callable[[], httpx.AsyncBaseTransport], limiter: _ProviderLimiter) -> None:
+        self._transport_factory = transport_factory
+        self._limiter = limiter
+        self._transports: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncBaseTransport] = (
+            weakref.WeakKeyDictionary()
+        )
+        self._lock = threading.Lock()
+
+    def _transport(self) -> httpx.AsyncBaseTransport:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            transport = self._transports.get(loop)
+            if transport is None:
+                transport = self._transports[loop] = self._transport_factory()
+        return transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        transport = self._transport()
+        release = await self._limiter.acquire()
+        try:
+            response = await transport.handle_async_request(request)
+        except BaseException:
+            release()
+            raise
+        if response.is_closed:
+            # 响应体已完整读取（如测试用的 MockTransport）
+            release()
+        else:
+            response.stream = _ReleasingStream(response.stream, release)  # type: ignore[arg-type]
+        return response
+
+    async def aclose(self) -> None:
+        with self._lock:
+            transport = self._transports.pop(asyncio.get_running_loop(), None)
+        if transport is not None:
+            await transport.aclose()
+
+
+class _BoundedSyncTransport(httpx.BaseTransport):
+    """带并发限制的同步传输层，与异步客户端共享提供方的并发上限和统计"""
+
+    def __init__(self, transport: httpx.BaseTransport, limiter: _ProviderLimiter) -> None:
+        self._transport = transport
+        self._limiter = limiter
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        release = self._limiter.acquire_sync()
+        try:
+            response = self._transport.handle_request(request)
+        except BaseException:
+            release()
+            raise
+        if response.is_closed:
+            release()
+        else:
+            response.stream = _ReleasingSyncStream(response.stream, release)  # type: ignore[arg-type]
+        return response
+
+    def close(self) -> None:
+        self._transport.close()
+
+
+@dataclass(slots=True)
+class _ProviderClients:
+    sync_client: httpx.Client
+    async_client: httpx.AsyncClient
+    limiter: _ProviderLimiter
+
+
+_providers: dict[str, _ProviderClients] = {}
+_providers_lock = threading.Lock()
+
+
+def http2_available() -> bool:
+    """是否启用 HTTP/2（需要配置开启且安装了可选依赖 `h2`）"""
+    return settings.LLM_HTTP2 and importlib.util.find_spec("h2") is not None
+
+
+def _create_provider_clients(base_url: str) -> _ProviderClients:
+    limits = httpx.Limits(
+        max_connections=settings.LLM_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.LLM_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=settings.LLM_KEEPALIVE_EXPIRY,
+    )
+    timeout = httpx.Timeout(settings.LLM_REQUEST_TIMEOUT, connect=10.0)
+    http2 = http2_available()
+    limiter = _ProviderLimiter(base_url, settings.LLM_MAX_CONCURRENCY, settings.LLM_QUEUE_WAIT_LOG_SECONDS)
+    transport = _BoundedAsyncTransport(lambda: httpx.AsyncHTTPTransport(http2=http2, limits=limits), limiter)
+    logger.info(
+        "llm_http_pool_created",
+        provider=base_url,
+        http2=http2,
+        max_concurrency=settings.LLM_MAX_CONCURRENCY,
+        max_connections=settings.LLM_MAX_CONNECTIONS,
+    )
+    return _ProviderClients(
+        sync_client=httpx.Client(
+            transport=_BoundedSyncTransport(httpx.HTTPTransport(http2=http2, limits=limits), limiter), timeout=timeout
+        ),
+        async_client=httpx.AsyncClient(transport=transport, timeout=timeout),
+        limiter=limiter,
+    )
+
+
+def get_shared_http_clients(base_url: str) -> tuple[httpx.Client, httpx.AsyncClient]:
+    """
+    获取提供方共享的 HTTP 客户端。
+
+    Args:
+        base_url: 提供方 API 地址，相同地址共享连接池和并发限制
+
+    Returns:
+        (同步客户端, 异步客户端)
+    """
+    with _providers_lock:
+        clients = _providers.get(base_url)
+        if clients is None:
+            clients = _providers[base_url] = _create_provider_clients(base_url)
+    return clients.sync_client, clients.async_client
+
+
+def get_llm_pool_stats() -> list[dict[str, Any]]:
+    """返回所有提供方的排队统计，用于调整并发上限"""
+    with _providers_lock:
+        return [clients.limiter.stats.to_dict() for clients in _providers.values()]
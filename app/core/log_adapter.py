@@ -1,17 +1,36 @@
+import atexit
+import json
 import logging
+import queue
+import random
 import sys
+import threading
+import time
+from datetime import UTC, datetime
+from logging.handlers import QueueHandler, QueueListener
 from types import TracebackType
+from typing import Any
 
 import structlog
 from structlog.stdlib import get_logger
 from structlog.types import EventDict, Processor
 
+from app.core.config import settings
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson 随 langgraph 依赖安装，缺失时回退到标准库
+    orjson = None  # type: ignore[assignment]
+
 # logging.basicConfig(level=logging.INFO)
 logger = get_logger()
 
 # 单例初始化标志：确保日志系统仅初始化一次
 _logging_configured = False
 
+# 队列模式下的后台写入线程，进程退出时停止并刷新
+_queue_listener: "_BatchingQueueListener | None" = None
+
 
 def drop_color_message_key(logger: logging.Logger, method_name: str, event_dict: EventDict) -> EventDict:  # noqa: ARG001
     """
@@ -22,13 +41,292 @@ def drop_color_message_key(logger: logging.Logger, method_name: str, event_dict:
     return event_dict
 
 
-def setup_logging(json_logs: bool = False, log_level: str = "INFO") -> None:
-    global _logging_configured
+def add_record_timestamp(logger: logging.Logger, method_name: str, event_dict: EventDict) -> EventDict:  # noqa: ARG001
+    """
+    队列模式下非 structlog 日志在后台线程中渲染，使用 LogRecord 的创建时间而不是渲染时间。
+    """
+    record = event_dict.get("_record")
+    created = record.created if record is not None else time.time()
+    event_dict["timestamp"] = datetime.fromtimestamp(created, tz=UTC).isoformat().replace("+00:00", "Z")
+    return event_dict
+
+
+def capture_exc_info(logger: logging.Logger, method_name: str, event_dict: EventDict) -> EventDict:  # noqa: ARG001
+    """
+    队列模式下异常在后台线程渲染，需要在调用方线程中把 `exc_info=True` 解析为异常元组。
+    """
+    if event_dict.get("exc_info") is True:
+        event_dict["exc_info"] = sys.exc_info()
+    return event_dict
+
+
+class EventRateLimiter:
+    """
+    按事件名限流和采样的 structlog 处理器，用于抑制高频事件（如每次构建图都会输出的工具列表日志）。
+
+    - 令牌桶限流：`rate_limits` 中的事件按 {事件名: 每秒速率} 补充令牌，桶容量为 `burst`
+    - 概率采样：`sample_rates` 中的事件按 {事件名: 保留概率} 随机保留
+    - WARNING 及以上级别的日志永不抑制
+    - 被抑制的事件会计数：该事件下一次输出时附带 `suppressed` 字段，
+      并每隔 `summary_interval` 秒输出一条 `log_events_suppressed` 汇总；
+      突发结束后不再有新事件时，由定时器在间隔到期时输出剩余的汇总
+    """
+
+    _ALWAYS_KEEP = frozenset({"warning", "warn", "error", "exception", "critical", "fatal"})
+
+    def __init__(
+        self,
+        rate_limits: dict[str, float],
+        sample_rates: dict[str, float],
+        burst: float = 1.0,
+        summary_interval: float = 60.0,
+    ) -> None:
+        self.rate_limits = rate_limits
+        self.sample_rates = sample_rates
+        self.burst = max(burst, 1.0)
+        self.summary_interval = summary_interval
+
+        self._lock = threading.Lock()
+        # {事件名: (剩余令牌, 上次补充时间)}
+        self._buckets: dict[str, tuple[float, float]] = {}
+        self._suppressed: dict[str, int] = {}
+        self._pending_summary: dict[str, int] = {}
+        self._last_summary = time.monotonic()
+        self._timer: threading.Timer | None = None
+
+    def __call__(self, logger: logging.Logger, method_name: str, event_dict: EventDict) -> EventDict:
+        event = event_dict.get("event")
+        if (
+            not isinstance(event, str)
+            or method_name in self._ALWAYS_KEEP
+            or (event not in self.rate_limits and event not in self.sample_rates)
+        ):
+            return event_dict
+
+        now = time.monotonic()
+        with self._lock:
+            if self._allow(event, now):
+                suppressed = self._suppressed.pop(event, 0)
+                if suppressed:
+                    event_dict["suppressed"] = suppressed
+                return event_dict
+
+            self._suppressed[event] = self._suppressed.get(event, 0) + 1
+            self._pending_summary[event] = self._pending_summary.get(event, 0) + 1
+            summary = self._take_summary(now)
+            if summary is None:
+                self._schedule_flush(now)
+
+        if summary:
+            self._emit(summary)
+        raise structlog.DropEvent
+
+    def flush(self) -> None:
+        """立即输出尚未汇报的被抑制事件计数（定时器到期或进程退出时调用）"""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            summary, self._pending_summary = self._pending_summary, {}
+            if summary:
+                self._last_summary = time.monotonic()
+        if summary:
+            self._emit(summary)
+
+    @staticmethod
+    def _emit(summary: dict[str, int]) -> None:
+        # 通过标准库 logger 输出，不会再次经过本处理器
+        logging.getLogger(__name__).info("log_events_suppressed", extra={"suppressed": summary})
+
+    def _schedule_flush(self, now: float) -> None:
+        """汇总间隔未到时启动定时器，突发之后没有新事件也能输出汇总（调用方持有锁）"""
+        if self._timer is not None:
+            return
+        self._timer = threading.Timer(max(0.0, self.summary_interval - (now - self._last_summary)), self._on_timer)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _on_timer(self) -> None:
+        with self._lock:
+            self._timer = None
+        self.flush()
+
+    def _allow(self, event: str, now: float) -> bool:
+        sample_rate = self.sample_rates.get(event)
+        if sample_rate is not None and random.random() >= sample_rate:
+            return False
+
+        rate = self.rate_limits.get(event)
+        if rate is None:
+            return True
+        tokens, last = self._buckets.get(event, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - last) * rate)
+        if tokens < 1.0:
+            self._buckets[event] = (tokens, now)
+            return False
+        self._buckets[event] = (tokens - 1.0, now)
+        return True
+
+    def _take_summary(self, now: float) -> dict[str, int] | None:
+        if now - self._last_summary < self.summary_interval or not self._pending_summary:
+            return None
+        self._last_summary = now
+        summary, self._pending_summary = self._pending_summary, {}
+        return summary
+
+
+def _json_dumps(obj: Any, **kwargs: Any) -> str:
+    """JSONRenderer 的序列化函数：优先使用 orjson，返回 str 以兼容 ProcessorFormatter"""
+    if orjson is not None:
+        return orjson.dumps(obj, default=kwargs.get("default"), option=orjson.OPT_NON_STR_KEYS).decode()
+    return json.dumps(obj, ensure_ascii=False, **kwargs)
+
+
+class _NonBlockingQueueHandler(QueueHandler):
+    """
+    非阻塞的队列处理器，运行在调用方线程（通常是事件循环）。
+
+    - 不在调用方格式化日志，渲染全部交给后台线程
+    - 队列超过高水位时丢弃 WARNING 以下的日志，队列满时丢弃任何日志，永不阻塞
+    """
+
+    def __init__(self, log_queue: queue.Queue, high_watermark: int) -> None:
+        super().__init__(log_queue)
+        self.high_watermark = high_watermark
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # 非 structlog 日志没有经过 merge_contextvars，在调用方线程中捕获上下文变量，交给 ExtraAdder 合并
+        if not isinstance(record.msg, dict):
+            for key, value in structlog.contextvars.get_contextvars().items():
+                record.__dict__.setdefault(key, value)
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        if record.levelno < logging.WARNING and self.queue.qsize() >= self.high_watermark:
+            self.dropped += 1
+            return
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class _BatchStreamHandler(logging.StreamHandler):
+    """在后台线程中格式化日志并按批写入流，减少 write/flush 系统调用次数"""
+
+    def __init__(self, batch_size: int) -> None:
+        super().__init__()
+        self.batch_size = batch_size
+        self._buffer: list[str] = []
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            self._buffer.append(self.format(record))
+        except Exception:
+            self.handleError(record)
+            return
+        if len(self._buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        with self.lock:  # type: ignore[union-attr]
+            if not self._buffer:
+                return
+            lines, self._buffer = self._buffer, []
+            try:
+                self.stream.write(self.terminator.join(lines) + self.terminator)
+                self.stream.flush()
+            except Exception:
+                # 写入失败时丢弃本批次，避免阻塞后台线程
+                pass
+
+
+class _BatchingQueueListener(QueueListener):
+    """
+    后台写入线程：从队列中取出日志交给批量处理器，队列空闲 `flush_interval` 秒时刷新批次，
+    并定期汇报被丢弃的日志数量。
+    """
+
+    def __init__(
+        self,
+        log_queue: queue.Queue,
+        handler: _BatchStreamHandler,
+        queue_handler: _NonBlockingQueueHandler,
+        flush_interval: float,
+    ) -> None:
+        super().__init__(log_queue, handler)
+        self.batch_handler = handler
+        self.queue_handler = queue_handler
+        self.flush_interval = flush_interval
+        self._last_flush = time.monotonic()
+
+    def dequeue(self, block: bool) -> logging.LogRecord:
+        while True:
+            if time.monotonic() - self._last_flush >= self.flush_interval:
+                self._flush()
+            try:
+                return self.queue.get(block=block, timeout=self.flush_interval)
+            except queue.Empty:
+                self._flush()
+                if not block:
+                    raise
+
+    def enqueue_sentinel(self) -> None:
+        # 队列可能已满，阻塞等待后台线程腾出空间，确保停止信号送达
+        self.queue.put(self._sentinel)
+
+    def stop(self) -> None:
+        super().stop()
+        self._flush()
+
+    def _flush(self) -> None:
+        self._last_flush = time.monotonic()
+        dropped, self.queue_handler.dropped = self.queue_handler.dropped, 0
+        if dropped:
+            self.batch_handler.handle(
+                logging.makeLogRecord(
+                    {
+                        "name": __name__,
+                        "levelno": logging.WARNING,
+                        "levelname": "WARNING",
+                        "msg": "log_records_dropped",
+                        "dropped": dropped,
+                    }
+                )
+            )
+        self.batch_handler.flush()
+
+
+def _stop_queue_listener() -> None:
+    global _queue_listener
+
+    if _queue_listener is not None:
+        _queue_listener.stop()
+        _queue_listener = None
+
+
+def setup_logging(json_logs: bool | None = None, log_level: str | None = None, queued: bool | None = None) -> None:
+    """
+    初始化日志系统。
+
+    Args:
+        json_logs: 是否输出 JSON 日志，默认读取 `settings.LOG_JSON`
+        log_level: 日志级别，默认读取 `settings.LOG_LEVEL`
+        queued: 是否启用队列模式（后台线程渲染、批量写入、过载丢弃），默认读取 `settings.LOG_QUEUED`，
+            未配置时跟随 `json_logs`
+    """
+    global _logging_configured, _queue_listener
 
     # 如果已经配置过，直接返回，避免重复初始化
     if _logging_configured:
         return
 
+    json_logs = settings.LOG_JSON if json_logs is None else json_logs
+    log_level = log_level or settings.LOG_LEVEL
+    if queued is None:
+        queued = json_logs if settings.LOG_QUEUED is None else settings.LOG_QUEUED
+
     root_logger = logging.getLogger()
 
     # 清除所有现有的处理器
@@ -36,27 +334,50 @@ def setup_logging(json_logs: bool = False, log_level: str = "INFO") -> None:
         for handler in root_logger.handlers[:]:
             root_logger.removeHandler(handler)
 
-    timestamper = structlog.processors.TimeStamper(fmt="%Y-%m-%d %H:%M:%S%Z.%f", utc=False)
+    # JSON 模式使用 ISO 格式 UTC 时间戳，由 C 实现直接格式化，开销远低于 strftime
+    if json_logs:
+        timestamper = structlog.processors.TimeStamper(fmt="iso", utc=True)
+    else:
+        timestamper = structlog.processors.TimeStamper(fmt="%Y-%m-%d %H:%M:%S%Z.%f", utc=False)
 
-    shared_processors: list[Processor] = [
+    # structlog 日志在调用方线程（事件循环）中执行的处理器，只保留必须在调用时完成的步骤
+    structlog_processors: list[Processor] = []
+    rate_limiter: EventRateLimiter | None = None
+    if settings.LOG_RATE_LIMITS or settings.LOG_SAMPLE_RATES:
+        # 放在最前面，被抑制的事件不再执行后续任何处理器
+        rate_limiter = EventRateLimiter(
+            rate_limits=settings.LOG_RATE_LIMITS,
+            sample_rates=settings.LOG_SAMPLE_RATES,
+            burst=settings.LOG_RATE_LIMIT_BURST,
+            summary_interval=settings.LOG_SUPPRESSED_SUMMARY_INTERVAL,
+        )
+        structlog_processors.append(rate_limiter)
+    structlog_processors += [
         structlog.contextvars.merge_contextvars,
         structlog.stdlib.add_log_level,
         # structlog.stdlib.add_logger_name,
         structlog.stdlib.PositionalArgumentsFormatter(),
-        structlog.stdlib.ExtraAdder(),
-        drop_color_message_key,
         timestamper,
         structlog.processors.StackInfoRenderer(),
     ]
+    if queued:
+        structlog_processors.append(capture_exc_info)
 
-    if json_logs:
-        # 仅在 JSON 日志中重命名 `event` 为 `message`
-        shared_processors.append(structlog.processors.EventRenamer("message"))
-        # 仅在 JSON 日志中格式化异常信息
-        shared_processors.append(structlog.processors.format_exc_info)
+    # 非 structlog 日志（uvicorn、langgraph 等）的预处理链
+    # 队列模式下该链在后台线程运行：上下文变量已在入队时捕获，时间戳取自 LogRecord
+    foreign_pre_chain: list[Processor] = [
+        structlog.stdlib.add_log_level,
+        structlog.stdlib.PositionalArgumentsFormatter(),
+        structlog.stdlib.ExtraAdder(),
+        drop_color_message_key,
+        add_record_timestamp if queued else timestamper,
+        structlog.processors.StackInfoRenderer(),
+    ]
+    if not queued:
+        foreign_pre_chain.insert(0, structlog.contextvars.merge_contextvars)
 
     structlog.configure(
-        processors=shared_processors
+        processors=structlog_processors
         + [
             # 为 `ProcessorFormatter` 准备事件字典
             structlog.stdlib.ProcessorFormatter.wrap_for_formatter,
@@ -65,30 +386,52 @@ def setup_logging(json_logs: bool = False, log_level: str = "INFO") -> None:
         cache_logger_on_first_use=True,
     )
 
-    log_renderer: structlog.types.Processor
+    # 渲染阶段的处理器，队列模式下在后台线程运行
+    render_processors: list[Processor] = [
+        # 移除 _record & _from_structlog 元数据
+        structlog.stdlib.ProcessorFormatter.remove_processors_meta,
+    ]
     if json_logs:
-        log_renderer = structlog.processors.JSONRenderer()
+        render_processors += [
+            # 仅在 JSON 日志中重命名 `event` 为 `message`
+            structlog.processors.EventRenamer("message"),
+            # 仅在 JSON 日志中格式化异常信息
+            structlog.processors.format_exc_info,
+            structlog.processors.JSONRenderer(serializer=_json_dumps),
+        ]
     else:
-        log_renderer = structlog.dev.ConsoleRenderer(
-            exception_formatter=structlog.dev.RichTracebackFormatter(show_locals=False)
+        render_processors.append(
+            structlog.dev.ConsoleRenderer(exception_formatter=structlog.dev.RichTracebackFormatter(show_locals=False))
         )
 
     formatter = structlog.stdlib.ProcessorFormatter(
         # 仅对不来自 structlog 的日志条目运行
-        foreign_pre_chain=shared_processors,
+        foreign_pre_chain=foreign_pre_chain,
         # 在预处理链之后对所有条目运行
-        processors=[
-            # 移除 _record & _from_structlog 元数据
-            structlog.stdlib.ProcessorFormatter.remove_processors_meta,
-            log_renderer,
-        ],
+        processors=render_processors,
     )
 
     # 创建并添加唯一的处理器
-    handler = logging.StreamHandler()
-    handler.setFormatter(formatter)
+    handler: logging.Handler
+    if queued:
+        # 调用方只负责入队，格式化和批量写入由后台线程完成
+        log_queue: queue.Queue = queue.Queue(maxsize=settings.LOG_QUEUE_SIZE)
+        handler = _NonBlockingQueueHandler(log_queue, high_watermark=int(settings.LOG_QUEUE_SIZE * 0.8))
+        batch_handler = _BatchStreamHandler(batch_size=settings.LOG_BATCH_SIZE)
+        batch_handler.setFormatter(formatter)
+        _queue_listener = _BatchingQueueListener(
+            log_queue, batch_handler, handler, flush_interval=settings.LOG_FLUSH_INTERVAL
+        )
+        _queue_listener.start()
+        atexit.register(_stop_queue_listener)
+    else:
+        handler = logging.StreamHandler()
+        handler.setFormatter(formatter)
     root_logger.addHandler(handler)
     root_logger.setLevel(log_level.upper())
+    if rate_limiter is not None:
+        # atexit 后注册先执行：在停止后台写入线程之前输出剩余的抑制汇总
+        atexit.register(rate_limiter.flush)
 
     # logger_name_list = [name for name in logging.root.manager.loggerDict]
     # rich.print(f"logger_name_list: {logger_name_list}")
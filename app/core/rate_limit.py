@@ -0,0 +1,366 @@
+"""
+Confluence 客户端限流 (Adaptive Rate Limiter)
+
+并行的研究子代理会在短时间内发出大量 `confluence_search` / `confluence_get_page` 调用，
+触发 Confluence 的 429 并拖慢其他用户。进程内所有对 Confluence 的调用共享一个限流器：
+- 令牌桶限制请求速率（CONFLUENCE_RATE_LIMIT_RPS / CONFLUENCE_RATE_LIMIT_BURST）
+- AIMD 自适应并发：请求成功时并发上限加性增长；收到 429 或延迟明显升高时乘性下降
+- 收到 429 时遵循 Retry-After，在此之前暂停发出新请求，并自动重试被限流的请求
+- 记录排队深度与等待时间（`get_rate_limit_stats`），等待超过阈值时输出 `rate_limit_queued` 日志
+
+生产服务（`app.server`）中 MCP 工具调用全部经边车进程转发，限流器在边车中生效，同一容器内所有 worker 共享。
+"""
+
+import asyncio
+import math
+import re
+import threading
+import time
+from collections.abc import AsyncIterator, Awaitable, Callable
+from contextlib import asynccontextmanager
+from dataclasses import asdict, dataclass
+from email.utils import parsedate_to_datetime
+from typing import Any
+
+from structlog.stdlib import get_logger
+
+from app.core.config import settings
+
+logger = get_logger(__name__)
+
+# 延迟基线（慢速 EWMA）与近期延迟（快速 EWMA）的平滑系数
+_BASELINE_ALPHA = 0.05
+_RECENT_ALPHA = 0.3
+# mcp-atlassian 把上游 HTTP 错误转为工具错误文本（requests 的 `429 Client Error: Too Many Requests for url: ...`，
+# 或 `HTTP 429` / `status code 429`）；只匹配 HTTP 状态码的写法，避免页面 ID、搜索结果中的 "429" 被误判为限流
+_THROTTLE_TEXT_RE = re.compile(
+    r"\b429\s+(?:client\s+error|too\s+many\s+requests)\b"
+    r"|\bHTTP(?:/\d(?:\.\d)?|\s+error)?\W{0,3}429\b"
+    r"|\bstatus(?:[\s_]code)?\W{0,3}429\b",
+    re.IGNORECASE,
+)
+_RETRY_AFTER_TEXT_RE = re.compile(r"retry.?after\W{0,3}(\d+(?:\.\d+)?)", re.IGNORECASE)
+
+
+def parse_retry_after(value: str | None) -> float | None:
+    """解析 Retry-After（秒数或 HTTP 日期），无法解析时返回 None"""
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+@dataclass(slots=True)
+class RateLimitStats:
+    """限流器统计"""
+
+    name: str
+    concurrency_limit: float
+    """当前自适应并发上限"""
+    in_flight: int = 0
+    """当前在途请求数"""
+    waiting: int = 0
+    """当前排队等待的请求数（队列深度）"""
+    requests: int = 0
+    """累计请求数（含重试）"""
+    throttled: int = 0
+    """累计被服务端限流（429）的请求数"""
+    latency_backoffs: int = 0
+    """因延迟升高而降低并发上限的次数"""
+    total_wait_seconds: float = 0.0
+    max_wait_seconds: float = 0.0
+    latency_seconds: float = 0.0
+    """近期请求延迟（EWMA）"""
+    paused_until: float = 0.0
+    """遵循 Retry-After 暂停到的时间（monotonic）"""
+
+    @property
+    def avg_wait_seconds(self) -> float:
+        return self.total_wait_seconds / self.requests if self.requests else 0.0
+
+    def to_dict(self) -> dict[str, Any]:
+        data = asdict(self)
+        data["paused_seconds"] = max(data.pop("paused_until") - time.monotonic(), 0.0)
+        return {**data, "avg_wait_seconds": self.avg_wait_seconds}
+
+
+class Permit:
+    """一次请求的许可；请求被服务端限流时调用 `throttle`"""
+
+    __slots__ = ("retry_after", "sent_at", "throttled")
+
+    def __init__(self) -> None:
+        self.sent_at = time.monotonic()
+        self.throttled = False
+        self.retry_after: float | None = None
+
+    def throttle(self, retry_after: float | None = None) -> None:
+        self.throttled = True
+        self.retry_after = retry_after
+
+
+class AdaptiveRateLimiter:
+    """
+    令牌桶 + AIMD 自适应并发限流器。
+
+    Args:
+        name: 名称（用于日志和统计）
+        rate: 每秒请求数
+        burst: 令牌桶容量
+        min_concurrency: 并发上限的下限
+        max_concurrency: 并发上限的上限
+        initial_concurrency: 初始并发上限
+        backoff_factor: 乘性下降系数
+        latency_tolerance: 近期延迟超过基线的该倍数时视为服务端过载
+        default_retry_after: 429 未携带 Retry-After 时的暂停时长（秒）
+        max_retries: 被限流请求的最大重试次数
+        log_wait_seconds: 排队等待超过该时长时输出日志（秒）
+    """
+
+    def __init__(
+        self,
+        name: str,
+        rate: float,
+        burst: int,
+        min_concurrency: int = 1,
+        max_concurrency: int = 16,
+        initial_concurrency: int = 4,
+        backoff_factor: float = 0.5,
+        latency_tolerance: float = 2.0,
+        default_retry_after: float = 5.0,
+        max_retries: int = 3,
+        log_wait_seconds: float = 1.0,
+    ) -> None:
+        self.rate = rate
+        self.burst = burst
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.backoff_factor = backoff_factor
+        self.latency_tolerance = latency_tolerance
+        self.default_retry_after = default_retry_after
+        self.max_retries = max_retries
+        self._log_wait_seconds = log_wait_seconds
+
+        self._tokens = float(burst)
+        self._refilled_at = time.monotonic()
+        self._token_lock = asyncio.Lock()
+        self._slots = asyncio.Condition()
+        self._last_decrease = 0.0
+        self._baseline_latency: float | None = None
+        self.stats = RateLimitStats(
+            name=name, concurrency_limit=float(min(max(initial_concurrency, min_concurrency), max_concurrency))
+        )
+
+    # ------------------------------------------------------------------
+    # 许可获取与释放
+    # ------------------------------------------------------------------
+
+    async def _acquire_slot(self) -> None:
+        async with self._slots:
+            await self._slots.wait_for(lambda: self.stats.in_flight < int(self.stats.concurrency_limit))
+            self.stats.in_flight += 1
+
+    async def _release_slot(self) -> None:
+        async with self._slots:
+            self.stats.in_flight -= 1
+            self._slots.notify_all()
+
+    async def _acquire_token(self) -> None:
+        # 排队者依次取令牌，先到先得
+        async with self._token_lock:
+            while True:
+                now = time.monotonic()
+                if now < self.stats.paused_until:
+                    await asyncio.sleep(self.stats.paused_until - now)
+                    continue
+                self._tokens = min(self.burst, self._tokens + (now - self._refilled_at) * self.rate)
+                self._refilled_at = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    @asynccontextmanager
+    async def slot(self, track_latency: bool = True) -> AsyncIterator[Permit]:
+        """
+        获取一次请求的许可（排队等待并发名额和令牌），退出时根据结果调整并发上限。
+
+        Args:
+            track_latency: 是否以本次请求的耗时判断服务端负载（大文件下载等耗时取决于数据量的请求应关闭）
+        """
+        stats = self.stats
+        started = time.monotonic()
+        stats.waiting += 1
+        try:
+            await self._acquire_slot()
+            try:
+                await self._acquire_token()
+            except BaseException:
+                await self._release_slot()
+                raise
+        finally:
+            stats.waiting -= 1
+
+        wait = time.monotonic() - started
+        stats.requests += 1
+        stats.total_wait_seconds += wait
+        stats.max_wait_seconds = max(stats.max_wait_seconds, wait)
+        if wait >= self._log_wait_seconds:
+            logger.info(
+                "rate_limit_queued",
+                limiter=stats.name,
+                wait_seconds=round(wait, 3),
+                in_flight=stats.in_flight,
+                waiting=stats.waiting,
+                concurrency_limit=round(stats.concurrency_limit, 2),
+            )
+
+        permit = Permit()
+        succeeded = False
+        try:
+            yield permit
+            succeeded = True
+        finally:
+            if permit.throttled:
+                self._on_throttled(permit)
+            elif succeeded and track_latency:
+                self._on_success(permit)
+            await self._release_slot()
+
+    # ------------------------------------------------------------------
+    # AIMD
+    # ------------------------------------------------------------------
+
+    def _decrease(self, permit: Permit) -> bool:
+        # 同一时刻发出的一批请求只触发一次下降
+        if permit.sent_at < self._last_decrease:
+            return False
+        self._last_decrease = time.monotonic()
+        self.stats.concurrency_limit = max(self.min_concurrency, self.stats.concurrency_limit * self.backoff_factor)
+        return True
+
+    def _on_throttled(self, permit: Permit) -> None:
+        stats = self.stats
+        stats.throttled += 1
+        retry_after = permit.retry_after if permit.retry_after else self.default_retry_after
+        stats.paused_until = max(stats.paused_until, time.monotonic() + retry_after)
+        if self._decrease(permit):
+            logger.warning(
+                "rate_limit_throttled",
+                limiter=stats.name,
+                retry_after=round(retry_after, 3),
+                concurrency_limit=round(stats.concurrency_limit, 2),
+            )
+
+    def _on_success(self, permit: Permit) -> None:
+        stats = self.stats
+        latency = time.monotonic() - permit.sent_at
+        if self._baseline_latency is None:
+            self._baseline_latency = stats.latency_seconds = latency
+            return
+        stats.latency_seconds += _RECENT_ALPHA * (latency - stats.latency_seconds)
+        self._baseline_latency += _BASELINE_ALPHA * (latency - self._baseline_latency)
+
+        if stats.latency_seconds > self._baseline_latency * self.latency_tolerance:
+            if self._decrease(permit):
+                stats.latency_backoffs += 1
+                logger.info(
+                    "rate_limit_latency_backoff",
+                    limiter=stats.name,
+                    latency_seconds=round(stats.latency_seconds, 3),
+                    baseline_seconds=round(self._baseline_latency, 3),
+                    concurrency_limit=round(stats.concurrency_limit, 2),
+                )
+        elif stats.in_flight >= int(stats.concurrency_limit):
+            # 只在并发上限被用满时增长，空闲时不虚增上限
+            stats.concurrency_limit = min(self.max_concurrency, stats.concurrency_limit + 1 / stats.concurrency_limit)
+
+    # ------------------------------------------------------------------
+    # 调用封装
+    # ------------------------------------------------------------------
+
+    async def run[T](self, call: Callable[[], Awaitable[T]], throttle_delay: Callable[[T], float | None]) -> T:
+        """
+        在限流下执行调用，被服务端限流时等待后重试。
+
+        Args:
+            call: 发出一次请求
+            throttle_delay: 判断结果是否被限流：未被限流返回 None；
+                否则返回服务端要求的等待秒数（0 或 NaN 表示未指定，使用默认值）
+
+        Returns:
+            最后一次调用的结果（重试次数用尽时可能仍是被限流的结果）
+        """
+        for _attempt in range(self.max_retries + 1):
+            async with self.slot() as permit:
+                result = await call()
+                delay = throttle_delay(result)
+                if delay is None:
+                    return result
+                permit.throttle(None if math.isnan(delay) or delay <= 0 else delay)
+        return result
+
+
+# ============================================================================
+# MCP 工具调用
+# ============================================================================
+
+
+def mcp_throttle_delay(result: Any) -> float | None:
+    """MCP 工具结果（`CallToolResult`）是否为上游 429 错误；是时返回错误文本中的 Retry-After 秒数（未给出时为 0）"""
+    if not result.isError:
+        return None
+    text = " ".join(getattr(content, "text", "") for content in result.content)
+    if not _THROTTLE_TEXT_RE.search(text):
+        return None
+    match = _RETRY_AFTER_TEXT_RE.search(text)
+    return float(match.group(1)) if match else 0.0
+
+
+async def call_mcp_tool_limited[T](tool_name: str, call: Callable[[], Awaitable[T]]) -> T:
+    """执行一次 MCP 工具调用；Confluence 工具（`confluence_*`）在 Confluence 限流器下执行，被限流时自动重试"""
+    if not tool_name.startswith("confluence_"):
+        return await call()
+    return await get_confluence_limiter().run(call, mcp_throttle_delay)
+
+
+# ============================================================================
+# 全局实例
+# ============================================================================
+
+_limiters: dict[str, AdaptiveRateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_confluence_limiter() -> AdaptiveRateLimiter:
+    """获取进程内共享的 Confluence 限流器（MCP 工具与 REST 客户端共用）"""
+    limiter = _limiters.get("confluence")
+    if limiter is not None:
+        return limiter
+    with _limiters_lock:
+        if "confluence" not in _limiters:
+            _limiters["confluence"] = AdaptiveRateLimiter(
+                "confluence",
+                rate=settings.CONFLUENCE_RATE_LIMIT_RPS,
+                burst=settings.CONFLUENCE_RATE_LIMIT_BURST,
+                min_concurrency=settings.CONFLUENCE_MIN_CONCURRENCY,
+                max_concurrency=settings.CONFLUENCE_MAX_CONCURRENCY,
+                initial_concurrency=settings.CONFLUENCE_INITIAL_CONCURRENCY,
+                latency_tolerance=settings.CONFLUENCE_LATENCY_TOLERANCE,
+                default_retry_after=settings.CONFLUENCE_DEFAULT_RETRY_AFTER,
+                max_retries=settings.CONFLUENCE_THROTTLE_RETRIES,
+                log_wait_seconds=settings.CONFLUENCE_QUEUE_WAIT_LOG_SECONDS,
+            )
+        return _limiters["confluence"]
+
+
+def get_rate_limit_stats() -> list[dict[str, Any]]:
+    """返回进程内所有限流器的统计（队列深度、等待时间、当前并发上限、限流次数）"""
+    with _limiters_lock:
+        return [limiter.stats.to_dict() for limiter in _limiters.values()]
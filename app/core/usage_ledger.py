@@ -0,0 +1,586 @@
+"""
+LLM 用量账本 (Usage Ledger)
+
+记录两个 Agent 图中每一次 LLM 调用的 token 用量以及每一次工具返回的载荷大小，
+按 run / thread / 子代理归因：
+
+- 通过 LangChain 回调 (`UsageLedgerCallbackHandler`) 采集，覆盖主代理、子代理及摘要等全部模型调用
+- 内存中实时聚合，供运行期查询 (`UsageLedger.snapshot`)
+- 后台任务定期批量落盘到本地 SQLite，不阻塞事件循环
+- 提供命令行报表，定位最昂贵的 prompt 和工具返回（上下文膨胀热点）
+
+命令行用法：
+    python -m app.core.usage_ledger --top 20
+"""
+
+import argparse
+import asyncio
+import atexit
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, field, fields
+from pathlib import Path
+from typing import Any
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatGeneration, LLMResult
+from structlog.stdlib import get_logger
+
+from app.core.config import settings
+from app.core.log_adapter import setup_logging
+
+logger = get_logger(__name__)
+
+# 预览文本的最大长度（字符）
+_PREVIEW_CHARS = 200
+
+# 内存聚合保留的最大 run 数量（LRU 淘汰）
+_MAX_TRACKED_RUNS = 1024
+
+
+# ============================================================================
+# 数据结构
+# ============================================================================
+
+
+@dataclass(slots=True)
+class LLMCallRecord:
+    """单次 LLM 调用的用量记录"""
+
+    ts: float
+    run_id: str
+    thread_id: str | None
+    agent: str
+    model: str | None
+    prompt_tokens: int
+    completion_tokens: int
+    cached_tokens: int
+    prompt_chars: int
+    latency_ms: float
+    prompt_preview: str
+    first_token_ms: float | None = None
+    """首个 token 的延迟（仅流式调用可用）"""
+
+
+@dataclass(slots=True)
+class ToolResultRecord:
+    """单次工具调用返回的载荷记录"""
+
+    ts: float
+    run_id: str
+    thread_id: str | None
+    agent: str
+    tool_name: str
+    result_chars: int
+    result_preview: str
+
+
+@dataclass(slots=True)
+class UsageTotals:
+    """按 (run, agent) 聚合的用量"""
+
+    llm_calls: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cached_tokens: int = 0
+    tool_calls: int = 0
+    tool_result_chars: int = 0
+
+    @property
+    def cache_hit_rate(self) -> float:
+        return self.cached_tokens / self.prompt_tokens if self.prompt_tokens else 0.0
+
+
+@dataclass(slots=True)
+class _RunInfo:
+    """回调树中单个 run 的归因信息"""
+
+    root_id: str
+    thread_id: str | None
+    agent: str
+    started_at: float = field(default_factory=time.perf_counter)
+    prompt_chars: int = 0
+    prompt_preview: str = ""
+    first_token_at: float | None = None
+    tool_name: str | None = None
+
+
+# ============================================================================
+# 账本
+# ============================================================================
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS llm_calls (
+    ts REAL NOT NULL,
+    run_id TEXT NOT NULL,
+    thread_id TEXT,
+    agent TEXT NOT NULL,
+    model TEXT,
+    prompt_tokens INTEGER NOT NULL,
+    completion_tokens INTEGER NOT NULL,
+    cached_tokens INTEGER NOT NULL,
+    prompt_chars INTEGER NOT NULL,
+    latency_ms REAL NOT NULL,
+    prompt_preview TEXT NOT NULL,
+    first_token_ms REAL
+);
+CREATE TABLE IF NOT EXISTS tool_results (
+    ts REAL NOT NULL,
+    run_id TEXT NOT NULL,
+    thread_id TEXT,
+    agent TEXT NOT NULL,
+    tool_name TEXT NOT NULL,
+    result_chars INTEGER NOT NULL,
+    result_preview TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_llm_calls_run ON llm_calls (run_id);
+CREATE INDEX IF NOT EXISTS idx_tool_results_run ON tool_results (run_id);
+"""
+
+
+def _connect(db_path: Path) -> sqlite3.Connection:
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(_SCHEMA)
+    # 兼容旧版本创建的账本：补充后续新增的列
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(llm_calls)")}
+    if "first_token_ms" not in columns:
+        conn.execute("ALTER TABLE llm_calls ADD COLUMN first_token_ms REAL")
+    return conn
+
+
+def _insert_sql(table: str, record_type: type) -> str:
+    columns = [f.name for f in fields(record_type)]
+    return f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+
+
+_INSERT_LLM_CALL = _insert_sql("llm_calls", LLMCallRecord)
+_INSERT_TOOL_RESULT = _insert_sql("tool_results", ToolResultRecord)
+
+
+class UsageLedger:
+    """
+    进程内用量账本。
+
+    记录先进入内存缓冲区并更新聚合，再由后台任务按 `flush_interval` 批量写入 SQLite。
+    写入在线程池中执行，避免在事件循环中做同步磁盘 I/O。
+    """
+
+    def __init__(self, db_path: str | Path, flush_interval: float = 5.0, max_pending: int = 10_000) -> None:
+        self.db_path = Path(db_path)
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+
+        self._lock = threading.Lock()
+        self._pending_llm: list[LLMCallRecord] = []
+        self._pending_tools: list[ToolResultRecord] = []
+        self._totals: OrderedDict[tuple[str, str], UsageTotals] = OrderedDict()
+        self._flush_task: asyncio.Task | None = None
+        self._dropped = 0
+
+    # ------------------------------------------------------------------
+    # 记录
+    # ------------------------------------------------------------------
+
+    def record_llm_call(self, record: LLMCallRecord) -> None:
+        with self._lock:
+            totals = self._get_totals(record.run_id, record.agent)
+            totals.llm_calls += 1
+            totals.prompt_tokens += record.prompt_tokens
+            totals.completion_tokens += record.completion_tokens
+            totals.cached_tokens += record.cached_tokens
+            self._append(self._pending_llm, record)
+        self._ensure_flusher()
+
+    def record_tool_result(self, record: ToolResultRecord) -> None:
+        with self._lock:
+            totals = self._get_totals(record.run_id, record.agent)
+            totals.tool_calls += 1
+            totals.tool_result_chars += record.result_chars
+            self._append(self._pending_tools, record)
+        self._ensure_flusher()
+
+    def _append(self, buffer: list, record: Any) -> None:
+        # 落盘跟不上时丢弃最新记录而不是无限增长；内存聚合仍然准确
+        if len(self._pending_llm) + len(self._pending_tools) >= self.max_pending:
+            self._dropped += 1
+            return
+        buffer.append(record)
+
+    def _get_totals(self, run_id: str, agent: str) -> UsageTotals:
+        key = (run_id, agent)
+        totals = self._totals.get(key)
+        if totals is None:
+            totals = self._totals[key] = UsageTotals()
+            while len(self._totals) > _MAX_TRACKED_RUNS:
+                self._totals.popitem(last=False)
+        else:
+            self._totals.move_to_end(key)
+        return totals
+
+    def snapshot(self, run_id: str | None = None) -> dict[tuple[str, str], UsageTotals]:
+        """返回内存中的聚合用量 {(run_id, agent): totals}，可按 run 过滤"""
+        with self._lock:
+            return {
+                key: UsageTotals(**asdict(totals))
+                for key, totals in self._totals.items()
+                if run_id is None or key[0] == run_id
+            }
+
+    # ------------------------------------------------------------------
+    # 落盘
+    # ------------------------------------------------------------------
+
+    def _ensure_flusher(self) -> None:
+        if self._flush_task is not None and not self._flush_task.done():
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # 同步上下文中没有事件循环，等待下一次异步记录或进程退出时落盘
+            return
+        self._flush_task = loop.create_task(self._flush_loop())
+
+    async def _flush_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.aflush()
+            except Exception:
+                logger.exception("usage_ledger_flush_failed", db_path=str(self.db_path))
+
+    async def aflush(self) -> None:
+        """异步落盘：在线程池中写入 SQLite"""
+        await asyncio.to_thread(self.flush)
+
+    def flush(self) -> None:
+        """同步落盘当前缓冲区中的全部记录"""
+        with self._lock:
+            llm_calls, self._pending_llm = self._pending_llm, []
+            tool_results, self._pending_tools = self._pending_tools, []
+            dropped, self._dropped = self._dropped, 0
+
+        if dropped:
+            logger.warning("usage_ledger_records_dropped", dropped=dropped)
+        if not llm_calls and not tool_results:
+            return
+
+        conn = _connect(self.db_path)
+        try:
+            with conn:
+                conn.executemany(_INSERT_LLM_CALL, [tuple(asdict(r).values()) for r in llm_calls])
+                conn.executemany(_INSERT_TOOL_RESULT, [tuple(asdict(r).values()) for r in tool_results])
+        finally:
+            conn.close()
+
+    def callback_handler(self, agent: str) -> "UsageLedgerCallbackHandler":
+        """创建绑定到本账本的回调处理器，`agent` 为图中主代理的名称"""
+        return UsageLedgerCallbackHandler(self, agent)
+
+
+# ============================================================================
+# 回调采集
+# ============================================================================
+
+
+def _message_text(message: BaseMessage) -> str:
+    content = message.content
+    if isinstance(content, str):
+        return content
+    return "".join(block if isinstance(block, str) else str(block.get("text", "")) for block in content)
+
+
+def _payload_text(output: Any) -> str:
+    """工具输出可能是 ToolMessage、Command 或任意对象，统一转换为文本以估算大小"""
+    if isinstance(output, BaseMessage):
+        return _message_text(output)
+    update = getattr(output, "update", None)
+    if isinstance(update, dict):
+        return "".join(_message_text(m) for m in update.get("messages", []) if isinstance(m, BaseMessage))
+    return output if isinstance(output, str) else str(output)
+
+
+def _extract_usage(response: LLMResult) -> tuple[int, int, int, str | None]:
+    """从 LLMResult 中提取 (prompt_tokens, completion_tokens, cached_tokens, model)"""
+    llm_output = response.llm_output or {}
+    model = llm_output.get("model_name")
+
+    for generations in response.generations:
+        for generation in generations:
+            if not isinstance(generation, ChatGeneration):
+                continue
+            message = generation.message
+            model = model or message.response_metadata.get("model_name")
+            usage = getattr(message, "usage_metadata", None)
+            if usage:
+                cached = (usage.get("input_token_details") or {}).get("cache_read", 0)
+                return usage.get("input_tokens", 0), usage.get("output_tokens", 0), cached or 0, model
+
+    # 兼容只在 llm_output 中返回 OpenAI 风格 token_usage 的提供方
+    token_usage = llm_output.get("token_usage") or {}
+    cached = (token_usage.get("prompt_tokens_details") or {}).get("cached_tokens", 0)
+    return token_usage.get("prompt_tokens", 0), token_usage.get("completion_tokens", 0), cached or 0, model
+
+
+class UsageLedgerCallbackHandler(BaseCallbackHandler):
+    """
+    采集 LLM 与工具用量的回调处理器。
+
+    挂载到图的 config 上后会随调用树传播到所有子调用。归因规则：
+    - run: 优先使用 LangGraph Server 写入 metadata 的 `run_id`，否则使用调用树根节点 ID
+    - thread: metadata 中的 `thread_id`
+    - agent: 默认为主代理名称；`task` 工具调用下的所有子调用归属于对应的 `subagent_type`
+    """
+
+    # 仅做内存操作，同步内联执行，保证父子 run 的事件顺序
+    run_inline = True
+
+    def __init__(self, ledger: UsageLedger, agent: str) -> None:
+        self.ledger = ledger
+        self.agent = agent
+        self._runs: dict[UUID, _RunInfo] = {}
+
+    def _register(self, run_id: UUID, parent_run_id: UUID | None, metadata: dict[str, Any] | None) -> _RunInfo:
+        parent = self._runs.get(parent_run_id) if parent_run_id else None
+        if parent is not None:
+            info = _RunInfo(root_id=parent.root_id, thread_id=parent.thread_id, agent=parent.agent)
+        else:
+            metadata = metadata or {}
+            info = _RunInfo(
+                root_id=str(metadata.get("run_id") or run_id),
+                thread_id=metadata.get("thread_id"),
+                agent=self.agent,
+            )
+        self._runs[run_id] = info
+        return info
+
+    def on_chain_start(
+        self,
+        serialized: dict[str, Any],
+        inputs: dict[str, Any],
+        *,
+        run_id: UUID,
+        parent_run_id: UUID | None = None,
+        metadata: dict[str, Any] | None = None,
+        **kwargs: Any,
+    ) -> None:
+        self._register(run_id, parent_run_id, metadata)
+
+    def on_chain_end(self, outputs: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        self._runs.pop(run_id, None)
+
+    def on_chain_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._runs.pop(run_id, None)
+
+    def on_chat_model_start(
+        self,
+        serialized: dict[str, Any],
+        messages: list[list[BaseMessage]],
+        *,
+        run_id: UUID,
+        parent_run_id: UUID | None = None,
+        metadata: dict[str, Any] | None = None,
+        **kwargs: Any,
+    ) -> None:
+        info = self._register(run_id, parent_run_id, metadata)
+        prompt = messages[0] if messages else []
+        info.prompt_chars = sum(len(_message_text(m)) for m in prompt)
+        if prompt:
+            info.prompt_preview = _message_text(prompt[-1])[:_PREVIEW_CHARS]
+
+    def on_llm_new_token(self, token: str, *, run_id: UUID, **kwargs: Any) -> None:
+        info = self._runs.get(run_id)
+        if info is not None and info.first_token_at is None:
+            info.first_token_at = time.perf_counter()
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        info = self._runs.pop(run_id, None)
+        if info is None:
+            return
+        prompt_tokens, completion_tokens, cached_tokens, model = _extract_usage(response)
+        self.ledger.record_llm_call(
+            LLMCallRecord(
+                ts=time.time(),
+                run_id=info.root_id,
+                thread_id=info.thread_id,
+                agent=info.agent,
+                model=model,
+                prompt_tokens=prompt_tokens,
+                completion_tokens=completion_tokens,
+                cached_tokens=cached_tokens,
+                prompt_chars=info.prompt_chars,
+                latency_ms=(time.perf_counter() - info.started_at) * 1000,
+                prompt_preview=info.prompt_preview,
+                first_token_ms=(info.first_token_at - info.started_at) * 1000 if info.first_token_at else None,
+            )
+        )
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._runs.pop(run_id, None)
+
+    def on_tool_start(
+        self,
+        serialized: dict[str, Any],
+        input_str: str,
+        *,
+        run_id: UUID,
+        parent_run_id: UUID | None = None,
+        metadata: dict[str, Any] | None = None,
+        inputs: dict[str, Any] | None = None,
+        **kwargs: Any,
+    ) -> None:
+        info = self._register(run_id, parent_run_id, metadata)
+        info.tool_name = (serialized or {}).get("name") or kwargs.get("name") or "unknown"
+        # deepagents 通过 `task` 工具调用子代理，子调用均归属于该子代理
+        if info.tool_name == "task" and inputs and inputs.get("subagent_type"):
+            info.agent = str(inputs["subagent_type"])
+
+    def on_tool_end(self, output: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        info = self._runs.pop(run_id, None)
+        if info is None:
+            return
+        text = _payload_text(output)
+        self.ledger.record_tool_result(
+            ToolResultRecord(
+                ts=time.time(),
+                run_id=info.root_id,
+                thread_id=info.thread_id,
+                agent=info.agent,
+                tool_name=info.tool_name or "unknown",
+                result_chars=len(text),
+                result_preview=text[:_PREVIEW_CHARS],
+            )
+        )
+
+    def on_tool_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._runs.pop(run_id, None)
+
+
+# ============================================================================
+# 全局实例
+# ============================================================================
+
+_usage_ledger: UsageLedger | None = None
+
+
+def get_usage_ledger() -> UsageLedger:
+    """获取进程级用量账本单例（延迟初始化，进程退出时自动落盘）"""
+    global _usage_ledger
+
+    if _usage_ledger is None:
+        _usage_ledger = UsageLedger(
+            db_path=settings.USAGE_LEDGER_DB_PATH,
+            flush_interval=settings.USAGE_LEDGER_FLUSH_INTERVAL,
+        )
+        atexit.register(_usage_ledger.flush)
+    return _usage_ledger
+
+
+def get_usage_callbacks(agent: str) -> list[BaseCallbackHandler]:
+    """返回需要挂载到图 config 上的回调列表；关闭用量统计时返回空列表"""
+    if not settings.USAGE_LEDGER_ENABLED:
+        return []
+    return [get_usage_ledger().callback_handler(agent)]
+
+
+# ============================================================================
+# 命令行报表
+# ============================================================================
+
+
+def print_report(db_path: str | Path, top: int = 20) -> None:
+    """打印按代理汇总的用量、最昂贵的 prompt 以及最大的工具返回"""
+    from rich.console import Console
+    from rich.table import Table
+
+    conn = _connect(Path(db_path))
+    console = Console()
+    try:
+        summary = Table(title="Usage by agent")
+        for column in (
+            "agent",
+            "calls",
+            "prompt",
+            "completion",
+            "cached",
+            "cache hit",
+            "avg ttft ms",
+            "tool calls",
+            "tool chars",
+        ):
+            summary.add_column(column, justify="left" if column == "agent" else "right")
+        rows = conn.execute(
+            """
+            SELECT l.agent, l.calls, l.prompt, l.completion, l.cached, l.ttft,
+                   COALESCE(t.tool_calls, 0), COALESCE(t.tool_chars, 0)
+            FROM (
+                SELECT agent, COUNT(*) AS calls, SUM(prompt_tokens) AS prompt,
+                       SUM(completion_tokens) AS completion, SUM(cached_tokens) AS cached,
+                       AVG(first_token_ms) AS ttft
+                FROM llm_calls GROUP BY agent
+            ) AS l
+            LEFT JOIN (
+                SELECT agent, COUNT(*) AS tool_calls, SUM(result_chars) AS tool_chars
+                FROM tool_results GROUP BY agent
+            ) AS t ON t.agent = l.agent
+            ORDER BY l.prompt DESC
+            """
+        ).fetchall()
+        for agent, calls, prompt, completion, cached, ttft, tool_calls, tool_chars in rows:
+            hit_rate = f"{cached / prompt:.1%}" if prompt else "-"
+            summary.add_row(
+                agent,
+                *map(str, (calls, prompt, completion, cached)),
+                hit_rate,
+                f"{ttft:.0f}" if ttft is not None else "-",
+                str(tool_calls),
+                str(tool_chars),
+            )
+        console.print(summary)
+
+        prompts = Table(title=f"Top {top} prompts by prompt tokens")
+        for column in ("prompt", "cached", "completion", "agent", "thread", "latency ms", "last message"):
+            prompts.add_column(column)
+        for row in conn.execute(
+            """
+            SELECT prompt_tokens, cached_tokens, completion_tokens, agent, thread_id, latency_ms, prompt_preview
+            FROM llm_calls ORDER BY prompt_tokens DESC LIMIT ?
+            """,
+            (top,),
+        ):
+            prompts.add_row(*map(str, row[:5]), f"{row[5]:.0f}", row[6].replace("\n", " ")[:80])
+        console.print(prompts)
+
+        payloads = Table(title=f"Top {top} tool payloads by size")
+        for column in ("chars", "tool", "agent", "thread", "preview"):
+            payloads.add_column(column)
+        for row in conn.execute(
+            """
+            SELECT result_chars, tool_name, agent, thread_id, result_preview
+            FROM tool_results ORDER BY result_chars DESC LIMIT ?
+            """,
+            (top,),
+        ):
+            payloads.add_row(*map(str, row[:4]), row[4].replace("\n", " ")[:80])
+        console.print(payloads)
+    finally:
+        conn.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="LLM 用量账本报表")
+    parser.add_argument("--db", default=settings.USAGE_LEDGER_DB_PATH, help="SQLite 账本路径")
+    parser.add_argument("--top", type=int, default=20, help="展示最昂贵的前 N 条记录")
+    args = parser.parse_args()
+    setup_logging()
+    print_report(args.db, top=args.top)
+
+
+if __name__ == "__main__":
+    main()
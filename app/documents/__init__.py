@@ -0,0 +1,120 @@
+"""
+文档处理模块 - 把上传的文档和 Confluence 附件转换为下游（签名检查、检索）可以处理的形式。
+
+此模块包含以下子模块：
+
+1. **rasterize** - PDF 栅格化（可选依赖 PyMuPDF）
+   - iter_document_pages: 把文档流展开为页面流，PDF 逐页流式产出
+   - rasterize_pdf: 进程池渲染、mmap 输入、按页磁盘缓存
+   - RasterPage: 栅格化后的一页
+
+2. **extract** - 附件文本抽取
+   - extract_text / extract_text_async: PDF、Office、HTML、纯文本，在进程池中执行
+
+3. **chunking** - 文本分块
+   - iter_chunks: 按标题、段落和句子流式切分，不超过 BGE_MAX_TOKENS，chunk_id 由页面 id、版本号和偏移量确定
+   - chunk_text: 只返回块文本
+   - TokenCounter: bge-m3 分词器按批计数、按文本哈希缓存（可选依赖 tokenizers / transformers）
+   - rechunk_pages: 逐页重新分块，按内容哈希只返回新增和失效的块
+
+4. **index** - 本地附件索引
+   - LocalIndex: SQLite FTS5 全文索引 + 可选向量，结果归属到附件所在页面
+   - get_local_index: 进程级单例
+
+5. **confluence** - Confluence REST 客户端
+   - ConfluenceClient: 列出页面和附件、流式下载附件
+
+6. **attachments** - 附件索引流水线
+   - AttachmentIndexer: 按版本号和内容哈希增量索引页面附件
+   - create_attachment_search_tool: `confluence_attachment_search` 检索工具
+
+"""
+
+# ============================================================================
+# 附件索引流水线
+# ============================================================================
+from app.documents.attachments import AttachmentIndexer, AttachmentIndexStats, create_attachment_search_tool
+
+# ============================================================================
+# 文本分块
+# ============================================================================
+from app.documents.chunking import (
+    ChunkDiff,
+    PageText,
+    TextChunk,
+    TokenCounter,
+    chunk_text,
+    diff_chunks,
+    estimate_tokens,
+    get_token_counter,
+    iter_chunks,
+    rechunk_pages,
+)
+
+# ============================================================================
+# Confluence REST 客户端
+# ============================================================================
+from app.documents.confluence import ConfluenceAttachment, ConfluenceClient, ConfluencePage
+
+# ============================================================================
+# 附件文本抽取
+# ============================================================================
+from app.documents.extract import extract_text, extract_text_async, supported_suffixes
+
+# ============================================================================
+# 本地附件索引
+# ============================================================================
+from app.documents.index import IndexedAttachment, LocalIndex, get_local_index
+
+# ============================================================================
+# PDF 栅格化
+# ============================================================================
+from app.documents.rasterize import (
+    PDF_SUFFIX,
+    RasterPage,
+    get_document_executor,
+    iter_document_pages,
+    rasterize_available,
+    rasterize_pdf,
+)
+
+# ============================================================================
+# 导出列表 - 定义公共 API
+# ============================================================================
+
+__all__ = [
+    # PDF 栅格化
+    "PDF_SUFFIX",
+    "RasterPage",
+    "get_document_executor",
+    "iter_document_pages",
+    "rasterize_available",
+    "rasterize_pdf",
+    # 附件文本抽取
+    "extract_text",
+    "extract_text_async",
+    "supported_suffixes",
+    # 文本分块
+    "ChunkDiff",
+    "PageText",
+    "TextChunk",
+    "TokenCounter",
+    "chunk_text",
+    "diff_chunks",
+    "estimate_tokens",
+    "get_token_counter",
+    "iter_chunks",
+    "rechunk_pages",
+    # 本地附件索引
+    "IndexedAttachment",
+    "LocalIndex",
+    "get_local_index",
+    # Confluence REST 客户端
+    "ConfluenceAttachment",
+    "ConfluenceClient",
+    "ConfluencePage",
+    # 附件索引流水线
+    "AttachmentIndexer",
+    "AttachmentIndexStats",
+    "create_attachment_search_tool",
+]
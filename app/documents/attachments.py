@@ -0,0 +1,275 @@
+"""
+附件索引流水线 (Attachment Indexing Pipeline)
+
+拉取 Confluence 页面的附件，抽取文本后写入本地附件索引：
+- 附件版本号未变时不下载；下载后内容哈希未变时只更新元数据，不重新抽取
+- 文本抽取在共享进程池中执行，分块不超过 `BGE_MAX_TOKENS`，开启 LOCAL_INDEX_EMBEDDINGS 时同时写入向量
+- 文本块归属到附件所在页面，检索结果可以直接作为引用来源
+- 页面上已删除的附件同步从索引中删除
+
+命令行用法::
+
+    python -m app.documents.attachments --space DEV
+    python -m app.documents.attachments --page 123456 --page 234567
+"""
+
+import argparse
+import asyncio
+import json
+import tempfile
+import time
+from collections.abc import AsyncIterable, AsyncIterator, Iterable
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from structlog.stdlib import get_logger
+
+from app.core.config import settings
+from app.core.log_adapter import setup_logging
+from app.documents.chunking import chunk_text
+from app.documents.confluence import ConfluenceAttachment, ConfluenceClient, ConfluencePage
+from app.documents.extract import extract_text_async, supported_suffixes
+from app.documents.index import IndexedAttachment, LocalIndex, get_local_index
+
+if TYPE_CHECKING:
+    from langchain_core.embeddings import Embeddings
+    from langchain_core.tools import BaseTool
+
+logger = get_logger(__name__)
+
+# 每次向量化请求的文本块数
+_EMBED_BATCH_SIZE = 16
+
+
+@dataclass(slots=True)
+class AttachmentIndexStats:
+    """一次索引运行的统计"""
+
+    pages: int = 0
+    attachments: int = 0
+    indexed: int = 0
+    """重新抽取并写入索引的附件数"""
+    unchanged: int = 0
+    """版本号或内容哈希未变、跳过抽取的附件数"""
+    skipped: int = 0
+    """类型不支持或超过大小上限的附件数"""
+    removed: int = 0
+    failed: int = 0
+    chunks: int = 0
+    started_at: float = field(default_factory=time.perf_counter)
+
+    def summary(self) -> dict[str, float]:
+        result = asdict(self)
+        result["elapsed_seconds"] = round(time.perf_counter() - result.pop("started_at"), 1)
+        return result
+
+
+class AttachmentIndexer:
+    """
+    附件索引器。
+
+    Args:
+        client: Confluence 客户端；只索引本地文件（`index_file`）时可以为 None
+        index: 本地附件索引，默认进程级单例
+        embeddings: 向量化模型；为 None 时只建全文索引
+        concurrency: 同时下载和抽取的附件数
+    """
+
+    def __init__(
+        self,
+        client: ConfluenceClient | None,
+        index: LocalIndex | None = None,
+        embeddings: "Embeddings | None" = None,
+        concurrency: int = settings.ATTACHMENT_CONCURRENCY,
+    ) -> None:
+        self.client = client
+        self.index = index or get_local_index()
+        self.embeddings = embeddings
+        self.concurrency = concurrency
+        self.stats = AttachmentIndexStats()
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._suffixes = supported_suffixes()
+
+    async def index_pages(
+        self, pages: Iterable[ConfluencePage] | AsyncIterable[ConfluencePage]
+    ) -> AttachmentIndexStats:
+        """索引多个页面的附件，返回统计"""
+        self.stats = AttachmentIndexStats()
+        # 限制同时处理的页面数，页面列表很长时不会一次创建全部任务
+        page_slots = asyncio.Semaphore(self.concurrency * 2)
+
+        async def index_page(page: ConfluencePage) -> None:
+            try:
+                await self.index_page(page)
+            except Exception as e:
+                self.stats.failed += 1
+                logger.warning("attachment_list_failed", page_id=page.id, error=f"{type(e).__name__}: {e}")
+            finally:
+                page_slots.release()
+
+        async with asyncio.TaskGroup() as group:
+            async for page in _aiter(pages):
+                await page_slots.acquire()
+                group.create_task(index_page(page))
+        logger.info("attachment_index_finished", **self.stats.summary())
+        return self.stats
+
+    def _require_client(self) -> ConfluenceClient:
+        if self.client is None:
+            raise ValueError("AttachmentIndexer has no Confluence client")
+        return self.client
+
+    async def index_page(self, page: ConfluencePage) -> int:
+        """
+        索引单个页面的全部附件，并删除页面上已不存在的附件。
+
+        Returns:
+            处理失败的附件数
+
+        Raises:
+            httpx.HTTPError: 无法列出页面附件
+        """
+        attachments = await self._require_client().list_attachments(page.id)
+
+        self.stats.pages += 1
+        self.stats.attachments += len(attachments)
+        results = await asyncio.gather(*(self.index_attachment(page, attachment) for attachment in attachments))
+        self.stats.removed += await asyncio.to_thread(self.index.remove_missing, page.id, {a.id for a in attachments})
+        return results.count(False)
+
+    async def index_attachment(self, page: ConfluencePage, attachment: ConfluenceAttachment) -> bool:
+        """索引单个附件，失败时记录日志并返回 False"""
+        suffix = Path(attachment.title).suffix.lower()
+        if suffix not in self._suffixes or (attachment.file_size or 0) > settings.ATTACHMENT_MAX_BYTES:
+            self.stats.skipped += 1
+            return True
+
+        indexed = attachment.to_indexed(page)
+        state = await asyncio.to_thread(self.index.get_state, attachment.id)
+        if state is not None and attachment.version is not None and state.version == attachment.version:
+            # 版本未变，但页面可能被改名或移动：仍需更新所属页面的标题和地址
+            await asyncio.to_thread(self.index.touch, indexed)
+            self.stats.unchanged += 1
+            return True
+
+        async with self._semaphore:
+            with tempfile.TemporaryDirectory(prefix="attachment-") as directory:
+                target = Path(directory) / f"{attachment.id}{suffix}"
+                try:
+                    sha256 = await self._require_client().download(attachment, target, settings.ATTACHMENT_MAX_BYTES)
+                    if state is not None and state.sha256 == sha256:
+                        await asyncio.to_thread(self.index.touch, indexed)
+                        self.stats.unchanged += 1
+                        return True
+                    await self.index_file(target, indexed, sha256)
+                    return True
+                except Exception as e:
+                    self.stats.failed += 1
+                    logger.warning(
+                        "attachment_index_failed",
+                        page_id=page.id,
+                        attachment_id=attachment.id,
+                        title=attachment.title,
+                        error=f"{type(e).__name__}: {e}",
+                    )
+                    return False
+
+    async def index_file(self, path: Path, attachment: IndexedAttachment, sha256: str) -> int:
+        """抽取本地文件的文本并写入索引，返回文本块数量"""
+        text = await extract_text_async(path)
+        chunks = chunk_text(text) if text else []
+        embeddings = None
+        if self.embeddings is not None and chunks:
+            embeddings = []
+            for start in range(0, len(chunks), _EMBED_BATCH_SIZE):
+                embeddings.extend(await self.embeddings.aembed_documents(chunks[start : start + _EMBED_BATCH_SIZE]))
+
+        await asyncio.to_thread(self.index.replace, attachment, sha256, chunks, embeddings)
+        self.stats.indexed += 1
+        self.stats.chunks += len(chunks)
+        logger.info(
+            "attachment_indexed",
+            attachment_id=attachment.attachment_id,
+            title=attachment.title,
+            page_id=attachment.page_id,
+            chunks=len(chunks),
+        )
+        return len(chunks)
+
+
+async def _aiter(pages: Iterable[ConfluencePage] | AsyncIterable[ConfluencePage]) -> AsyncIterator[ConfluencePage]:
+    if isinstance(pages, AsyncIterable):
+        async for page in pages:
+            yield page
+    else:
+        for page in pages:
+            yield page
+
+
+# ============================================================================
+# 检索工具
+# ============================================================================
+
+
+def create_attachment_search_tool(
+    index: LocalIndex | None = None, embeddings: "Embeddings | None" = None
+) -> "BaseTool":
+    """创建检索本地附件索引的工具，结果中的页面 id / title / url 可直接作为引用来源"""
+    from langchain_core.tools import StructuredTool
+
+    index = index or get_local_index()
+
+    async def confluence_attachment_search(query: str, limit: int = 8) -> str:
+        embedding = await embeddings.aembed_query(query) if embeddings is not None else None
+        results = await asyncio.to_thread(index.search, query, limit, embedding)
+        return json.dumps(results, ensure_ascii=False)
+
+    return StructuredTool.from_function(
+        coroutine=confluence_attachment_search,
+        name="confluence_attachment_search",
+        description=(
+            "Search the text of files attached to Confluence pages (PDF, Word, Excel, PowerPoint, etc.), "
+            "which confluence_search cannot see. Each result is attributed to the page the file is attached to. "
+            "Use specific keywords of at least 3 characters."
+        ),
+    )
+
+
+# ============================================================================
+# 命令行
+# ============================================================================
+
+
+async def _run(space_keys: list[str], page_ids: list[str]) -> AttachmentIndexStats:
+    from app.agents.models import get_embeddings
+
+    async with ConfluenceClient() as client:
+        embeddings = get_embeddings() if settings.LOCAL_INDEX_EMBEDDINGS else None
+        indexer = AttachmentIndexer(client, embeddings=embeddings)
+
+        async def pages() -> AsyncIterator[ConfluencePage]:
+            for space_key in space_keys:
+                async for page in client.iter_space_pages(space_key):
+                    yield page
+            for page_id in page_ids:
+                yield await client.get_page(page_id)
+
+        return await indexer.index_pages(pages())
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="把 Confluence 页面附件的文本写入本地索引")
+    parser.add_argument("--space", action="append", default=[], help="索引空间内所有页面的附件（可重复）")
+    parser.add_argument("--page", action="append", default=[], help="索引指定页面的附件（可重复）")
+    args = parser.parse_args()
+    if not args.space and not args.page:
+        parser.error("at least one --space or --page is required")
+
+    setup_logging()
+    stats = asyncio.run(_run(args.space, args.page))
+    print(json.dumps(stats.summary(), ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,436 @@
+"""
+文本分块 (Text Chunking)
+
+把规范化后的 Confluence 页面（Markdown）和抽取出的附件文本切成不超过向量模型上下文（`BGE_MAX_TOKENS`）的块：
+- 先按标题切成章节（代码块内的 `#` 不算标题），文本块不跨章节；章节过长时在段落边界切分，
+  段落过长时在句子边界切分，仍然过长时按长度硬切
+- token 数使用 bge-m3 自带的分词器计算（`models/bge-m3/tokenizer.json`，可选依赖 tokenizers / transformers），
+  按批编码并按文本哈希缓存；分词器不可用时按字符估算（CJK 字符约 1 token，其他字符约 4 字符 1 token）
+- 同一章节内相邻块保留少量重叠，避免答案恰好落在切分点上
+- `iter_chunks` 逐块产出，chunk_id 由页面 id、版本号和块在页面中的偏移量确定，重复分块得到相同的 id
+
+增量重新分块：文本块只在所属章节内打包，修改一个章节不会改变其他章节的切分结果。
+`rechunk_pages` 逐页分块并按内容哈希与已存储的文本块对比，只返回新增和失效的块；
+内容未变的块沿用原 id 和向量，整个空间重新分块时内存占用只与单个页面有关，未变段落的 token 数直接命中缓存。
+"""
+
+import hashlib
+import importlib.util
+import re
+import threading
+from collections import OrderedDict
+from collections.abc import Callable, Iterable, Iterator, Sequence
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from structlog.stdlib import get_logger
+
+from app.core.consts import BGE_MAX_TOKENS, BGE_MODEL_PATH
+
+logger = get_logger(__name__)
+
+_PARAGRAPH_RE = re.compile(r"(?<=\n)\s*\n")
+_SENTENCE_RE = re.compile(r"(?<=[。！？；.!?;])\s*")
+_CJK_RE = re.compile(r"[　-〿぀-ヿ㐀-䶿一-鿿가-힯＀-￯]")
+_HEADING_RE = re.compile(r" {0,3}#{1,6}(?:\s|$)")
+_FENCE_RE = re.compile(r" {0,3}(?:```|~~~)")
+
+# token 数缓存的条目数（每条为 16 字节摘要 + 整数）
+_TOKEN_CACHE_SIZE = 200_000
+
+
+def estimate_tokens(text: str) -> int:
+    """估算文本的 token 数"""
+    cjk = len(_CJK_RE.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def _digest(text: str) -> bytes:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+
+# ============================================================================
+# token 计数
+# ============================================================================
+
+
+def _load_encoder(model_path: Path) -> tuple[Callable[[list[str]], list[int]], int] | None:
+    """加载 bge-m3 分词器，返回（批量计数函数, 特殊 token 数）；优先使用轻量的 tokenizers"""
+    tokenizer_file = model_path / "tokenizer.json"
+    if tokenizer_file.is_file() and importlib.util.find_spec("tokenizers") is not None:
+        from tokenizers import Tokenizer
+
+        fast = Tokenizer.from_file(str(tokenizer_file))
+        special = len(fast.encode("", add_special_tokens=True).ids)
+        return lambda texts: [len(e.ids) for e in fast.encode_batch(texts, add_special_tokens=False)], special
+
+    if model_path.is_dir() and importlib.util.find_spec("transformers") is not None:
+        from transformers import AutoTokenizer
+
+        tokenizer = AutoTokenizer.from_pretrained(str(model_path))
+        special = tokenizer.num_special_tokens_to_add()
+        return lambda texts: [len(ids) for ids in tokenizer(texts, add_special_tokens=False)["input_ids"]], special
+    return None
+
+
+class TokenCounter:
+    """
+    bge-m3 token 计数器（线程安全）。
+
+    分词器在首次计数时加载；同一批文本一次编码，结果按文本摘要放入 LRU 缓存。
+    分词器不可用时退化为 `estimate_tokens`，`exact` 为 False。
+
+    Args:
+        model_path: 分词器所在目录（含 `tokenizer.json`）
+        cache_size: 缓存的文本条数
+    """
+
+    def __init__(self, model_path: str | Path = BGE_MODEL_PATH, cache_size: int = _TOKEN_CACHE_SIZE) -> None:
+        self.model_path = Path(model_path)
+        self.cache_size = cache_size
+        self.hits = 0
+        self.misses = 0
+        self._cache: OrderedDict[bytes, int] = OrderedDict()
+        self._lock = threading.Lock()
+        self._encoder: Callable[[list[str]], list[int]] | None = None
+        self._special_tokens = 0
+        self._loaded = False
+
+    def _load(self) -> None:
+        with self._lock:
+            if self._loaded:
+                return
+            try:
+                loaded = _load_encoder(self.model_path)
+            except Exception as e:
+                logger.warning("bge_tokenizer_load_failed", model_path=str(self.model_path), error=str(e))
+                loaded = None
+            if loaded is None:
+                logger.warning("bge_tokenizer_unavailable", model_path=str(self.model_path), fallback="estimate")
+            else:
+                self._encoder, self._special_tokens = loaded
+            self._loaded = True
+
+    @property
+    def exact(self) -> bool:
+        """是否使用真实分词器计数"""
+        self._load()
+        return self._encoder is not None
+
+    @property
+    def special_tokens(self) -> int:
+        """模型输入额外添加的特殊 token 数（bge-m3 为 `<s>` 和 `</s>`），需要从上下文长度中预留"""
+        self._load()
+        return self._special_tokens
+
+    def count(self, text: str) -> int:
+        return self.count_batch([text])[0]
+
+    def count_batch(self, texts: Sequence[str]) -> list[int]:
+        """按批计算 token 数（不含特殊 token），缓存未命中的文本一次编码"""
+        self._load()
+        keys = [_digest(text) for text in texts]
+        counts: list[int | None] = []
+        with self._lock:
+            for key in keys:
+                count = self._cache.get(key)
+                if count is not None:
+                    self._cache.move_to_end(key)
+                counts.append(count)
+
+        missing = {key: text for key, text, count in zip(keys, texts, counts, strict=True) if count is None}
+        if missing:
+            batch = list(missing.values())
+            encoded = self._encoder(batch) if self._encoder is not None else [estimate_tokens(t) for t in batch]
+            computed = dict(zip(missing, encoded, strict=True))
+            with self._lock:
+                self._cache.update(computed)
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+                self.misses += len(computed)
+                self.hits += len(keys) - len(computed)
+            counts = [computed[key] if count is None else count for key, count in zip(keys, counts, strict=True)]
+        else:
+            with self._lock:
+                self.hits += len(keys)
+        return [count or 0 for count in counts]
+
+
+_token_counter: TokenCounter | None = None
+_token_counter_lock = threading.Lock()
+
+
+def get_token_counter() -> TokenCounter:
+    """获取进程级 token 计数器单例"""
+    global _token_counter
+
+    if _token_counter is None:
+        with _token_counter_lock:
+            if _token_counter is None:
+                _token_counter = TokenCounter()
+    return _token_counter
+
+
+# ============================================================================
+# 切分
+# ============================================================================
+
+
+@dataclass(frozen=True, slots=True)
+class TextChunk:
+    """页面中的一个文本块"""
+
+    chunk_id: str
+    """由页面 id、版本号和偏移量确定的稳定 id"""
+
+    page_id: str
+    version: int | None
+    offset: int
+    """块在页面文本中的起始字符偏移"""
+
+    text: str
+    token_count: int
+    """各片段分别编码的 token 数之和（不含特殊 token）"""
+
+    heading: str | None
+    """所属章节的标题行"""
+
+    content_hash: str
+    """文本内容哈希，用于增量重新分块"""
+
+
+def chunk_id(page_id: str, version: int | None, offset: int) -> str:
+    """文本块的稳定 id"""
+    return hashlib.blake2b(f"{page_id}:{version}:{offset}".encode(), digest_size=12).hexdigest()
+
+
+def _sections(text: str) -> list[tuple[int, int, str | None]]:
+    """按标题把文本切成章节 (start, end, heading)；只有标题没有正文的章节并入下一章节"""
+    bounds: list[tuple[int, str | None]] = [(0, None)]
+    position = 0
+    in_fence = False
+    for line in text.splitlines(keepends=True):
+        if _FENCE_RE.match(line):
+            in_fence = not in_fence
+        elif not in_fence and _HEADING_RE.match(line):
+            bounds.append((position, line.strip()))
+        position += len(line)
+
+    sections: list[tuple[int, int, str | None]] = []
+    carry: int | None = None
+    for (start, heading), (end, _) in zip(bounds, [*bounds[1:], (len(text), None)], strict=True):
+        body = text[start:end]
+        if heading is not None:
+            body = body.split("\n", 1)[1] if "\n" in body else ""
+        if not body.strip():
+            # 空章节（如一级标题后紧跟二级标题）：标题并入下一章节
+            if heading is not None and carry is None:
+                carry = start
+            continue
+        sections.append((start if carry is None else carry, end, heading))
+        carry = None
+    if carry is not None:
+        sections.append((carry, len(text), None))
+    return sections
+
+
+def _cut(text: str, start: int, end: int, tokens: int, limit: int) -> list[tuple[int, int]]:
+    """把超出上限的片段在段落、句子边界拆开，没有边界时按长度硬切"""
+    for pattern in (_PARAGRAPH_RE, _SENTENCE_RE):
+        bounds = [match.end() for match in pattern.finditer(text, start, end) if start < match.end() < end]
+        if bounds:
+            return list(zip([start, *bounds], [*bounds, end], strict=True))
+    # 没有可用的边界：按 token 比例硬切
+    size = max(1, (end - start) * limit // tokens)
+    return [(i, min(i + size, end)) for i in range(start, end, size)]
+
+
+def _pieces(text: str, spans: list[tuple[int, int]], limit: int, counter: TokenCounter) -> list[tuple[int, int, int]]:
+    """把片段拆到都不超过 `limit` 个 token，返回 (start, end, tokens)；同一层级的片段按批计数"""
+    pieces: list[tuple[int, int, int]] = []
+    for (start, end), tokens in zip(spans, counter.count_batch([text[s:e] for s, e in spans]), strict=True):
+        if tokens <= limit or end - start <= 1:
+            pieces.append((start, end, tokens))
+        else:
+            pieces.extend(_pieces(text, _cut(text, start, end, tokens, limit), limit, counter))
+    return pieces
+
+
+def iter_chunks(
+    text: str,
+    page_id: str = "",
+    version: int | None = None,
+    max_tokens: int = BGE_MAX_TOKENS,
+    overlap_tokens: int = 200,
+    counter: TokenCounter | None = None,
+) -> Iterator[TextChunk]:
+    """
+    逐块切分页面文本。
+
+    Args:
+        text: 规范化后的页面文本（Markdown）或附件文本
+        page_id: 页面（或附件）id，参与生成 chunk_id
+        version: 页面版本号，参与生成 chunk_id
+        max_tokens: 每块的最大 token 数（已为特殊 token 预留位置）
+        overlap_tokens: 同一章节内相邻块之间重叠的最大 token 数
+        counter: token 计数器，默认进程级单例
+
+    Yields:
+        按偏移量递增的非空文本块
+    """
+    counter = counter or get_token_counter()
+    budget = max_tokens - counter.special_tokens
+    overlap_tokens = min(overlap_tokens, budget // 4)
+    sections = _sections(text)
+    counts = counter.count_batch([text[start:end] for start, end, _ in sections])
+
+    for (start, end, heading), tokens in zip(sections, counts, strict=True):
+        if tokens <= budget:
+            pieces = [(start, end, tokens)]
+        else:
+            # 片段不超过 budget - overlap_tokens，带上重叠开头后也不会超出 budget
+            pieces = _pieces(text, [(start, end)], budget - overlap_tokens, counter)
+
+        current: list[tuple[int, int, int]] = []
+        for piece in pieces:
+            if current and sum(p[2] for p in current) + piece[2] > budget:
+                yield _chunk(text, current, page_id, version, heading)
+                # 以上一块末尾不超过 overlap_tokens 的片段作为重叠开头
+                tail: list[tuple[int, int, int]] = []
+                for previous in reversed(current):
+                    if sum(p[2] for p in tail) + previous[2] > overlap_tokens:
+                        break
+                    tail.insert(0, previous)
+                current = tail
+            current.append(piece)
+        if current and text[current[0][0] : current[-1][1]].strip():
+            yield _chunk(text, current, page_id, version, heading)
+
+
+def _chunk(
+    text: str, pieces: list[tuple[int, int, int]], page_id: str, version: int | None, heading: str | None
+) -> TextChunk:
+    raw = text[pieces[0][0] : pieces[-1][1]]
+    stripped = raw.lstrip()
+    offset = pieces[0][0] + len(raw) - len(stripped)
+    stripped = stripped.rstrip()
+    return TextChunk(
+        chunk_id=chunk_id(page_id, version, offset),
+        page_id=page_id,
+        version=version,
+        offset=offset,
+        text=stripped,
+        token_count=sum(piece[2] for piece in pieces),
+        heading=heading,
+        content_hash=_digest(stripped).hex(),
+    )
+
+
+def chunk_text(text: str, max_tokens: int = BGE_MAX_TOKENS, overlap_tokens: int = 200) -> list[str]:
+    """
+    把文本切分为不超过 `max_tokens` 的块，只返回块文本。
+
+    Args:
+        text: 待切分的文本
+        max_tokens: 每块的最大 token 数
+        overlap_tokens: 相邻块之间重叠的 token 数
+
+    Returns:
+        非空文本块列表
+    """
+    return [chunk.text for chunk in iter_chunks(text, max_tokens=max_tokens, overlap_tokens=overlap_tokens)]
+
+
+# ============================================================================
+# 增量重新分块
+# ============================================================================
+
+
+@dataclass(frozen=True, slots=True)
+class PageText:
+    """待分块的页面"""
+
+    page_id: str
+    version: int | None
+    text: str
+    """规范化后的页面正文（Markdown）"""
+
+
+@dataclass(slots=True)
+class ChunkDiff:
+    """一个页面重新分块后与已存储文本块的差异"""
+
+    page_id: str
+    version: int | None
+    added: list[TextChunk] = field(default_factory=list)
+    """内容是新的文本块，需要写入（和向量化）"""
+    kept: list[str] = field(default_factory=list)
+    """内容未变、沿用原 id 的已存储文本块"""
+    removed: list[str] = field(default_factory=list)
+    """内容已不在页面中的已存储文本块，需要删除"""
+
+    @property
+    def changed(self) -> bool:
+        return bool(self.added or self.removed)
+
+
+def diff_chunks(page: PageText, chunks: Iterable[TextChunk], stored: Iterable[tuple[str, str]]) -> ChunkDiff:
+    """
+    按内容哈希对比新分块结果与已存储的文本块。
+
+    Args:
+        page: 重新分块的页面
+        chunks: 新分块结果
+        stored: 该页面已存储的 (chunk_id, content_hash)
+    """
+    available: dict[str, list[str]] = {}
+    for stored_id, content_hash in stored:
+        available.setdefault(content_hash, []).append(stored_id)
+
+    diff = ChunkDiff(page_id=page.page_id, version=page.version)
+    for chunk in chunks:
+        ids = available.get(chunk.content_hash)
+        if ids:
+            diff.kept.append(ids.pop(0))
+        else:
+            diff.added.append(chunk)
+    diff.removed = [stored_id for ids in available.values() for stored_id in ids]
+    return diff
+
+
+def rechunk_pages(
+    pages: Iterable[PageText],
+    stored: Callable[[str], Iterable[tuple[str, str]]],
+    max_tokens: int = BGE_MAX_TOKENS,
+    overlap_tokens: int = 200,
+    counter: TokenCounter | None = None,
+) -> Iterator[ChunkDiff]:
+    """
+    逐页重新分块并与已存储的文本块对比。
+
+    页面按需从 `pages` 中读取，每次只持有一个页面的文本和文本块；调用方应用完一个差异后再取下一个，
+    整个空间重新分块的内存占用与空间大小无关。
+
+    Args:
+        pages: 页面流（可以是惰性生成器）
+        stored: 按页面 id 返回已存储的 (chunk_id, content_hash)
+        max_tokens: 每块的最大 token 数
+        overlap_tokens: 相邻块之间重叠的 token 数
+        counter: token 计数器，默认进程级单例
+
+    Yields:
+        每个页面的差异（包括没有变化的页面，`changed` 为 False）
+    """
+    counter = counter or get_token_counter()
+    for page in pages:
+        chunks = iter_chunks(page.text, page.page_id, page.version, max_tokens, overlap_tokens, counter)
+        diff = diff_chunks(page, chunks, stored(page.page_id))
+        logger.debug(
+            "page_rechunked",
+            page_id=page.page_id,
+            version=page.version,
+            added=len(diff.added),
+            kept=len(diff.kept),
+            removed=len(diff.removed),
+        )
+        yield diff
@@ -0,0 +1,185 @@
+"""
+Confluence REST 客户端 (Confluence REST Client)
+
+代理通过 mcp-atlassian 的 MCP 工具访问 Confluence，但 MCP 工具不提供附件下载。
+本模块直接调用 Confluence REST API，列出页面和附件并流式下载附件，供本地附件索引使用。
+
+认证与 mcp-atlassian 共用同名环境变量：
+- Cloud：CONFLUENCE_URL（如 `https://example.atlassian.net/wiki`）+ CONFLUENCE_USERNAME + CONFLUENCE_API_TOKEN
+- Server / Data Center：CONFLUENCE_URL + CONFLUENCE_PERSONAL_TOKEN
+"""
+
+import hashlib
+from collections.abc import AsyncIterator
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+import httpx
+from structlog.stdlib import get_logger
+
+from app.core.config import settings
+from app.core.rate_limit import get_confluence_limiter, parse_retry_after
+from app.documents.index import IndexedAttachment
+
+logger = get_logger(__name__)
+
+_PAGE_SIZE = 100
+
+
+def _throttle_delay(response: httpx.Response) -> float | None:
+    """429（以及带 Retry-After 的 503）视为被限流，返回 Retry-After 秒数（未给出时为 0）"""
+    retry_after = parse_retry_after(response.headers.get("Retry-After"))
+    if response.status_code == 429 or (response.status_code == 503 and retry_after is not None):
+        return retry_after or 0.0
+    return None
+
+
+@dataclass(slots=True)
+class ConfluencePage:
+    id: str
+    title: str
+    url: str | None = None
+
+
+@dataclass(slots=True)
+class ConfluenceAttachment:
+    id: str
+    title: str
+    download_path: str
+    """相对 CONFLUENCE_URL 的下载地址"""
+    media_type: str | None = None
+    file_size: int | None = None
+    version: int | None = None
+
+    def to_indexed(self, page: ConfluencePage) -> IndexedAttachment:
+        return IndexedAttachment(
+            attachment_id=self.id,
+            title=self.title,
+            page_id=page.id,
+            page_title=page.title,
+            page_url=page.url,
+            media_type=self.media_type,
+            version=self.version,
+        )
+
+
+class ConfluenceClient:
+    """
+    Confluence REST 客户端。
+
+    Args:
+        base_url: Confluence 地址，默认 `CONFLUENCE_URL`
+        timeout: 单次请求超时（秒）
+
+    Raises:
+        ValueError: 未配置 Confluence 地址或凭据
+    """
+
+    def __init__(self, base_url: str | None = None, timeout: float = 30.0) -> None:
+        base_url = base_url or settings.CONFLUENCE_URL
+        if not base_url:
+            raise ValueError("CONFLUENCE_URL is not configured")
+        self.base_url = base_url.rstrip("/")
+
+        headers = {"Accept": "application/json"}
+        auth = None
+        if settings.CONFLUENCE_PERSONAL_TOKEN:
+            headers["Authorization"] = f"Bearer {settings.CONFLUENCE_PERSONAL_TOKEN}"
+        elif settings.CONFLUENCE_USERNAME and settings.CONFLUENCE_API_TOKEN:
+            auth = httpx.BasicAuth(settings.CONFLUENCE_USERNAME, settings.CONFLUENCE_API_TOKEN)
+        else:
+            raise ValueError("Set CONFLUENCE_PERSONAL_TOKEN or CONFLUENCE_USERNAME and CONFLUENCE_API_TOKEN")
+
+        self._client = httpx.AsyncClient(
+            base_url=self.base_url, headers=headers, auth=auth, timeout=timeout, follow_redirects=True
+        )
+        # 与 MCP 工具共享限流器，附件索引不会和代理的检索争抢 Confluence 配额
+        self._limiter = get_confluence_limiter()
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
+
+    async def __aenter__(self) -> "ConfluenceClient":
+        return self
+
+    async def __aexit__(self, *_exc: object) -> None:
+        await self.aclose()
+
+    async def _get(self, path: str, params: dict[str, Any] | None = None) -> dict[str, Any]:
+        response = await self._limiter.run(lambda: self._client.get(path, params=params), _throttle_delay)
+        response.raise_for_status()
+        return response.json()
+
+    async def _paginate(self, path: str, params: dict[str, Any]) -> AsyncIterator[dict[str, Any]]:
+        start = 0
+        while True:
+            data = await self._get(path, {**params, "start": start, "limit": _PAGE_SIZE})
+            results = data.get("results", [])
+            for item in results:
+                yield item
+            if len(results) < _PAGE_SIZE:
+                return
+            start += len(results)
+
+    def _page(self, data: dict[str, Any]) -> ConfluencePage:
+        webui = data.get("_links", {}).get("webui")
+        return ConfluencePage(
+            id=str(data["id"]), title=data.get("title", ""), url=f"{self.base_url}{webui}" if webui else None
+        )
+
+    # ------------------------------------------------------------------
+    # 页面与附件
+    # ------------------------------------------------------------------
+
+    async def get_page(self, page_id: str) -> ConfluencePage:
+        return self._page(await self._get(f"/rest/api/content/{page_id}"))
+
+    async def iter_space_pages(self, space_key: str) -> AsyncIterator[ConfluencePage]:
+        """列出空间内的所有页面"""
+        async for item in self._paginate("/rest/api/content", {"spaceKey": space_key, "type": "page"}):
+            yield self._page(item)
+
+    async def list_attachments(self, page_id: str) -> list[ConfluenceAttachment]:
+        """列出页面的所有附件（当前版本）"""
+        attachments = []
+        async for item in self._paginate(f"/rest/api/content/{page_id}/child/attachment", {"expand": "version"}):
+            extensions = item.get("extensions", {})
+            attachments.append(
+                ConfluenceAttachment(
+                    id=str(item["id"]),
+                    title=item.get("title", ""),
+                    download_path=item.get("_links", {}).get("download", ""),
+                    media_type=item.get("metadata", {}).get("mediaType") or extensions.get("mediaType"),
+                    file_size=extensions.get("fileSize"),
+                    version=item.get("version", {}).get("number"),
+                )
+            )
+        return attachments
+
+    async def download(self, attachment: ConfluenceAttachment, target: Path, max_bytes: int | None = None) -> str:
+        """
+        流式下载附件到本地文件，返回内容的 sha256。
+
+        Raises:
+            ValueError: 附件超过 `max_bytes`
+            httpx.HTTPError: 下载失败
+        """
+        digest = hashlib.sha256()
+        size = 0
+        async with (
+            self._limiter.slot(track_latency=False) as permit,
+            self._client.stream("GET", attachment.download_path) as response,
+        ):
+            delay = _throttle_delay(response)
+            if delay is not None:
+                permit.throttle(delay or None)
+            response.raise_for_status()
+            with target.open("wb") as file:
+                async for chunk in response.aiter_bytes():
+                    size += len(chunk)
+                    if max_bytes is not None and size > max_bytes:
+                        raise ValueError(f"Attachment exceeds {max_bytes} bytes")
+                    digest.update(chunk)
+                    file.write(chunk)
+        return digest.hexdigest()
@@ -0,0 +1,150 @@
+"""
+附件文本抽取 (Text Extraction)
+
+在进程池中从附件里抽取纯文本，供分块和索引使用：
+- PDF：PyMuPDF 逐页抽取文本层（扫描件没有文本层时结果为空）
+- Word / PowerPoint / Excel（docx、pptx、xlsx）：直接解析 Office Open XML，无需额外依赖
+- 纯文本、Markdown、CSV、JSON、HTML
+
+抽取与 PDF 栅格化共享进程池；PDF 依赖可选的 PyMuPDF，未安装时 PDF 不可抽取。
+"""
+
+import asyncio
+import re
+import zipfile
+from concurrent.futures import Executor
+from html.parser import HTMLParser
+from pathlib import Path
+from xml.etree import ElementTree
+
+from app.documents.rasterize import PDF_SUFFIX, get_document_executor, rasterize_available
+
+OFFICE_SUFFIXES = frozenset({".docx", ".pptx", ".xlsx"})
+TEXT_SUFFIXES = frozenset({".txt", ".md", ".csv", ".json", ".log", ".xml", ".yaml", ".yml"})
+HTML_SUFFIXES = frozenset({".html", ".htm"})
+
+_SLIDE_RE = re.compile(r"ppt/slides/slide(\d+)\.xml$")
+_SHEET_RE = re.compile(r"xl/worksheets/sheet(\d+)\.xml$")
+
+
+def supported_suffixes() -> frozenset[str]:
+    """当前环境可以抽取文本的文件后缀"""
+    suffixes = OFFICE_SUFFIXES | TEXT_SUFFIXES | HTML_SUFFIXES
+    return suffixes | {PDF_SUFFIX} if rasterize_available() else suffixes
+
+
+# ============================================================================
+# 各格式的抽取（在 worker 进程中执行）
+# ============================================================================
+
+
+def _xml_paragraphs(data: bytes, paragraph_tag: str, text_tag: str) -> list[str]:
+    """按段落收集 Office XML 中的文本节点"""
+    paragraphs = []
+    for element in ElementTree.fromstring(data).iter():
+        if element.tag.rsplit("}", 1)[-1] == paragraph_tag:
+            text = "".join(node.text or "" for node in element.iter() if node.tag.rsplit("}", 1)[-1] == text_tag)
+            if text.strip():
+                paragraphs.append(text)
+    return paragraphs
+
+
+def _numbered(names: list[str], pattern: re.Pattern[str]) -> list[str]:
+    matched = [(int(m.group(1)), name) for name in names if (m := pattern.search(name))]
+    return [name for _, name in sorted(matched)]
+
+
+def _extract_office(path: str, suffix: str) -> str:
+    with zipfile.ZipFile(path) as archive:
+        names = archive.namelist()
+        if suffix == ".docx":
+            return "\n".join(_xml_paragraphs(archive.read("word/document.xml"), "p", "t"))
+        if suffix == ".pptx":
+            slides = ["\n".join(_xml_paragraphs(archive.read(name), "p", "t")) for name in _numbered(names, _SLIDE_RE)]
+            return "\n\n".join(slide for slide in slides if slide)
+
+        # xlsx：单元格文本大多在共享字符串表中，按行输出，单元格以制表符分隔
+        shared = (
+            _xml_paragraphs(archive.read("xl/sharedStrings.xml"), "si", "t") if "xl/sharedStrings.xml" in names else []
+        )
+        sheets = []
+        for name in _numbered(names, _SHEET_RE):
+            rows = []
+            for row in ElementTree.fromstring(archive.read(name)).iter():
+                if row.tag.rsplit("}", 1)[-1] != "row":
+                    continue
+                cells = []
+                for cell in row:
+                    value = next(
+                        (n.text for n in cell.iter() if n.tag.rsplit("}", 1)[-1] in ("v", "t") and n.text), None
+                    )
+                    if value is None:
+                        continue
+                    if cell.get("t") == "s" and value.isdigit() and int(value) < len(shared):
+                        value = shared[int(value)]
+                    cells.append(value)
+                if cells:
+                    rows.append("\t".join(cells))
+            sheets.append("\n".join(rows))
+        return "\n\n".join(sheet for sheet in sheets if sheet)
+
+
+class _HTMLText(HTMLParser):
+    _SKIP = frozenset({"script", "style"})
+    _BLOCK = frozenset({"p", "div", "br", "li", "tr", "h1", "h2", "h3", "h4", "h5", "h6", "table", "section"})
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.parts: list[str] = []
+        self._skipping = 0
+
+    def handle_starttag(self, tag: str, attrs: list[tuple[str, str | None]]) -> None:
+        if tag in self._SKIP:
+            self._skipping += 1
+        elif tag in self._BLOCK:
+            self.parts.append("\n")
+
+    def handle_endtag(self, tag: str) -> None:
+        if tag in self._SKIP:
+            self._skipping = max(0, self._skipping - 1)
+
+    def handle_data(self, data: str) -> None:
+        if not self._skipping:
+            self.parts.append(data)
+
+
+def _extract_pdf(path: str) -> str:
+    import fitz
+
+    with fitz.open(path) as document:
+        return "\n\n".join(page.get_text().strip() for page in document)
+
+
+def extract_text(path: str) -> str:
+    """
+    抽取文件的纯文本（同步，适合在进程池中执行）。
+
+    Raises:
+        ValueError: 不支持的文件类型
+    """
+    suffix = Path(path).suffix.lower()
+    if suffix == PDF_SUFFIX:
+        text = _extract_pdf(path)
+    elif suffix in OFFICE_SUFFIXES:
+        text = _extract_office(path, suffix)
+    elif suffix in HTML_SUFFIXES:
+        parser = _HTMLText()
+        parser.feed(Path(path).read_text(encoding="utf-8", errors="replace"))
+        text = "".join(parser.parts)
+    elif suffix in TEXT_SUFFIXES:
+        text = Path(path).read_text(encoding="utf-8", errors="replace")
+    else:
+        raise ValueError(f"Unsupported attachment type: {suffix or path}")
+    # 合并多余空行，去掉行尾空白
+    return re.sub(r"\n{3,}", "\n\n", "\n".join(line.rstrip() for line in text.splitlines())).strip()
+
+
+async def extract_text_async(path: str | Path, executor: Executor | None = None) -> str:
+    """在进程池中抽取文件文本"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor or get_document_executor(), extract_text, str(path))
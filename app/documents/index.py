@@ -0,0 +1,363 @@
+"""
+本地附件索引 (Local Attachment Index)
+
+`confluence_search` 只能检索页面正文，看不到附件内容。本模块把附件抽取出的文本块存入本地 SQLite：
+- 全文索引：FTS5 trigram 分词（对中文无需额外分词器），按 bm25 排序
+- 向量索引：可选，存放 EMBEDDING_MODEL 生成的 float32 向量，按余弦相似度暴力检索
+- 每个附件记录所属页面、版本号和内容哈希：版本未变时不必下载，内容未变时不必重新抽取
+- 检索结果归属到附件所在页面（id / title / url），引用中间件据此生成来源编号
+- FTS5 表的 UNINDEXED 列不能用于查找，文本块通过 `chunk_rows` 映射表按 rowid 定位（替换、删除、取结果均不扫表）
+
+检索结果同时按全文和向量两路召回时，用倒数排名融合（RRF）合并。
+"""
+
+import sqlite3
+import threading
+import time
+from array import array
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+from structlog.stdlib import get_logger
+
+from app.core.config import settings
+
+logger = get_logger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS attachments (
+    attachment_id TEXT PRIMARY KEY,
+    title TEXT NOT NULL,
+    page_id TEXT,
+    page_title TEXT,
+    page_url TEXT,
+    media_type TEXT,
+    version INTEGER,
+    sha256 TEXT NOT NULL,
+    chunk_count INTEGER NOT NULL,
+    indexed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_attachments_page ON attachments (page_id);
+CREATE VIRTUAL TABLE IF NOT EXISTS chunks USING fts5 (
+    text, title, attachment_id UNINDEXED, chunk_index UNINDEXED, tokenize = 'trigram'
+);
+CREATE TABLE IF NOT EXISTS chunk_rows (
+    attachment_id TEXT NOT NULL,
+    chunk_index INTEGER NOT NULL,
+    chunk_rowid INTEGER NOT NULL,
+    PRIMARY KEY (attachment_id, chunk_index)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS chunk_vectors (
+    attachment_id TEXT NOT NULL,
+    chunk_index INTEGER NOT NULL,
+    embedding BLOB NOT NULL,
+    PRIMARY KEY (attachment_id, chunk_index)
+);
+"""
+
+# 倒数排名融合的平滑常数
+_RRF_K = 60
+
+
+@dataclass(slots=True)
+class IndexedAttachment:
+    """索引中的附件及其所属页面"""
+
+    attachment_id: str
+    title: str
+    page_id: str | None = None
+    page_title: str | None = None
+    page_url: str | None = None
+    media_type: str | None = None
+    version: int | None = None
+
+
+@dataclass(slots=True)
+class IndexState:
+    """附件上次索引时的状态，用于增量跳过"""
+
+    version: int | None
+    sha256: str
+
+
+def _match_expression(query: str) -> str | None:
+    """把查询词转换为 FTS5 表达式；trigram 分词要求每个词至少 3 个字符"""
+    terms = [term.replace('"', '""') for term in query.split() if len(term) >= 3]
+    return " OR ".join(f'"{term}"' for term in terms) or None
+
+
+def _cosine_ranking(query: list[float], rows: list[tuple[str, int, bytes]], limit: int) -> list[tuple[str, int]]:
+    """按余弦相似度返回最相近的 (attachment_id, chunk_index)"""
+    try:
+        import numpy as np
+    except ImportError:
+        np = None
+
+    if np is not None and rows:
+        matrix = np.stack([np.frombuffer(row[2], dtype=np.float32) for row in rows])
+        vector = np.asarray(query, dtype=np.float32)
+        scores = matrix @ vector / (np.linalg.norm(matrix, axis=1) * np.linalg.norm(vector) + 1e-12)
+        order = np.argsort(-scores)[:limit]
+        return [(rows[i][0], rows[i][1]) for i in order.tolist()]
+
+    query_norm = sum(v * v for v in query) ** 0.5 or 1.0
+    scored = []
+    for attachment_id, chunk_index, blob in rows:
+        vector = array("f", blob)
+        norm = sum(v * v for v in vector) ** 0.5 or 1.0
+        scored.append(
+            (sum(a * b for a, b in zip(query, vector, strict=False)) / (norm * query_norm), attachment_id, chunk_index)
+        )
+    scored.sort(reverse=True)
+    return [(attachment_id, chunk_index) for _, attachment_id, chunk_index in scored[:limit]]
+
+
+class LocalIndex:
+    """
+    本地附件索引（线程安全，方法均为同步调用，异步代码中通过 `asyncio.to_thread` 调用）。
+
+    Args:
+        db_path: SQLite 文件路径
+    """
+
+    def __init__(self, db_path: str | Path) -> None:
+        self.db_path = Path(db_path)
+        self._lock = threading.Lock()
+        self._conn: sqlite3.Connection | None = None
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(_SCHEMA)
+            self._backfill_chunk_rows(self._conn)
+        return self._conn
+
+    @staticmethod
+    def _backfill_chunk_rows(conn: sqlite3.Connection) -> None:
+        """旧版本建立的索引没有 `chunk_rows` 映射表，首次打开时补齐（仅扫描一次）"""
+        if conn.execute("SELECT EXISTS (SELECT 1 FROM chunk_rows)").fetchone()[0]:
+            return
+        with conn:
+            cursor = conn.execute(
+                "INSERT INTO chunk_rows (attachment_id, chunk_index, chunk_rowid)"
+                " SELECT attachment_id, chunk_index, rowid FROM chunks"
+            )
+        if cursor.rowcount > 0:
+            logger.info("local_index_chunk_rows_backfilled", chunks=cursor.rowcount)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    # ------------------------------------------------------------------
+    # 写入
+    # ------------------------------------------------------------------
+
+    def get_state(self, attachment_id: str) -> IndexState | None:
+        """附件上次索引时的版本号和内容哈希，未索引过时返回 None"""
+        with self._lock:
+            row = (
+                self._connection()
+                .execute("SELECT version, sha256 FROM attachments WHERE attachment_id = ?", (attachment_id,))
+                .fetchone()
+            )
+        return IndexState(version=row[0], sha256=row[1]) if row else None
+
+    def touch(self, attachment: IndexedAttachment) -> None:
+        """内容未变（只是版本号、附件名或页面信息变了）时更新元数据，不重建文本块"""
+        with self._lock, self._connection() as conn:
+            row = conn.execute(
+                "SELECT title FROM attachments WHERE attachment_id = ?", (attachment.attachment_id,)
+            ).fetchone()
+            if row is not None and row[0] != attachment.title:
+                # 附件名参与全文检索，改名后同步到文本块
+                conn.executemany(
+                    "UPDATE chunks SET title = ? WHERE rowid = ?",
+                    [(attachment.title, rowid) for rowid in self._chunk_rowids(conn, attachment.attachment_id)],
+                )
+            conn.execute(
+                "UPDATE attachments SET title = ?, page_id = ?, page_title = ?, page_url = ?, version = ?, indexed_at = ?"
+                " WHERE attachment_id = ?",
+                (
+                    attachment.title,
+                    attachment.page_id,
+                    attachment.page_title,
+                    attachment.page_url,
+                    attachment.version,
+                    time.time(),
+                    attachment.attachment_id,
+                ),
+            )
+
+    def replace(
+        self,
+        attachment: IndexedAttachment,
+        sha256: str,
+        chunks: list[str],
+        embeddings: list[list[float]] | None = None,
+    ) -> None:
+        """在一个事务中替换附件的全部文本块和向量"""
+        with self._lock, self._connection() as conn:
+            self._delete(conn, attachment.attachment_id)
+            conn.execute(
+                "INSERT INTO attachments (attachment_id, title, page_id, page_title, page_url, media_type, version,"
+                " sha256, chunk_count, indexed_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    attachment.attachment_id,
+                    attachment.title,
+                    attachment.page_id,
+                    attachment.page_title,
+                    attachment.page_url,
+                    attachment.media_type,
+                    attachment.version,
+                    sha256,
+                    len(chunks),
+                    time.time(),
+                ),
+            )
+            rows = []
+            for index, chunk in enumerate(chunks):
+                cursor = conn.execute(
+                    "INSERT INTO chunks (text, title, attachment_id, chunk_index) VALUES (?, ?, ?, ?)",
+                    (chunk, attachment.title, attachment.attachment_id, index),
+                )
+                rows.append((attachment.attachment_id, index, cursor.lastrowid))
+            conn.executemany("INSERT INTO chunk_rows (attachment_id, chunk_index, chunk_rowid) VALUES (?, ?, ?)", rows)
+            if embeddings:
+                conn.executemany(
+                    "INSERT INTO chunk_vectors (attachment_id, chunk_index, embedding) VALUES (?, ?, ?)",
+                    [
+                        (attachment.attachment_id, index, array("f", vector).tobytes())
+                        for index, vector in enumerate(embeddings)
+                    ],
+                )
+
+    def remove_missing(self, page_id: str, keep: set[str]) -> int:
+        """删除页面上已不存在的附件，返回删除数量"""
+        with self._lock, self._connection() as conn:
+            stale = [
+                row[0]
+                for row in conn.execute("SELECT attachment_id FROM attachments WHERE page_id = ?", (page_id,))
+                if row[0] not in keep
+            ]
+            for attachment_id in stale:
+                self._delete(conn, attachment_id)
+        return len(stale)
+
+    @staticmethod
+    def _chunk_rowids(conn: sqlite3.Connection, attachment_id: str) -> list[int]:
+        return [
+            row[0]
+            for row in conn.execute("SELECT chunk_rowid FROM chunk_rows WHERE attachment_id = ?", (attachment_id,))
+        ]
+
+    @classmethod
+    def _delete(cls, conn: sqlite3.Connection, attachment_id: str) -> None:
+        conn.executemany(
+            "DELETE FROM chunks WHERE rowid = ?", [(rowid,) for rowid in cls._chunk_rowids(conn, attachment_id)]
+        )
+        conn.execute("DELETE FROM chunk_rows WHERE attachment_id = ?", (attachment_id,))
+        conn.execute("DELETE FROM attachments WHERE attachment_id = ?", (attachment_id,))
+        conn.execute("DELETE FROM chunk_vectors WHERE attachment_id = ?", (attachment_id,))
+
+    # ------------------------------------------------------------------
+    # 检索
+    # ------------------------------------------------------------------
+
+    def search(self, query: str, limit: int = 8, embedding: list[float] | None = None) -> list[dict[str, Any]]:
+        """
+        检索附件文本块。
+
+        Args:
+            query: 查询文本
+            limit: 返回的最大结果数
+            embedding: 查询向量；提供时与全文检索结果融合
+
+        Returns:
+            结果列表，`id` / `title` / `url` 为附件所在页面（无所属页面时为附件本身），`attachment` 为附件名
+        """
+        with self._lock:
+            conn = self._connection()
+            rankings = [self._text_ranking(conn, query, limit * 2)]
+            if embedding is not None:
+                rows = conn.execute("SELECT attachment_id, chunk_index, embedding FROM chunk_vectors").fetchall()
+                rankings.append(_cosine_ranking(embedding, rows, limit * 2))
+
+            scores: dict[tuple[str, int], float] = {}
+            for ranking in rankings:
+                for rank, key in enumerate(ranking):
+                    scores[key] = scores.get(key, 0.0) + 1 / (_RRF_K + rank + 1)
+            top = sorted(scores, key=scores.__getitem__, reverse=True)[:limit]
+            return [result for key in top if (result := self._result(conn, *key)) is not None]
+
+    @staticmethod
+    def _text_ranking(conn: sqlite3.Connection, query: str, limit: int) -> list[tuple[str, int]]:
+        expression = _match_expression(query)
+        if expression is not None:
+            sql = "SELECT attachment_id, chunk_index FROM chunks WHERE chunks MATCH ? ORDER BY bm25(chunks) LIMIT ?"
+            return [(row[0], int(row[1])) for row in conn.execute(sql, (expression, limit))]
+        # 查询词过短，无法使用 trigram 索引：退化为子串匹配
+        terms = [term for term in query.split() if term]
+        if not terms:
+            return []
+        # trigram 表上不足 3 个字符的 LIKE 模式不返回结果，改用 instr
+        where = " AND ".join("instr(text, ?) > 0" for _ in terms)
+        sql = f"SELECT attachment_id, chunk_index FROM chunks WHERE {where} LIMIT ?"
+        return [(row[0], int(row[1])) for row in conn.execute(sql, (*terms, limit))]
+
+    @staticmethod
+    def _result(conn: sqlite3.Connection, attachment_id: str, chunk_index: int) -> dict[str, Any] | None:
+        row = conn.execute(
+            "SELECT r.chunk_rowid, a.title, a.page_id, a.page_title, a.page_url FROM chunk_rows r"
+            " JOIN attachments a ON a.attachment_id = r.attachment_id"
+            " WHERE r.attachment_id = ? AND r.chunk_index = ?",
+            (attachment_id, chunk_index),
+        ).fetchone()
+        if row is None:
+            return None
+        rowid, title, page_id, page_title, page_url = row
+        text_row = conn.execute("SELECT text FROM chunks WHERE rowid = ?", (rowid,)).fetchone()
+        if text_row is None:
+            return None
+        text = text_row[0]
+        return {
+            "id": page_id or attachment_id,
+            "title": page_title or title,
+            "url": page_url,
+            "attachment": {"id": attachment_id, "name": title, "chunk": chunk_index},
+            "content": text,
+        }
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            conn = self._connection()
+            return {
+                "attachments": conn.execute("SELECT COUNT(*) FROM attachments").fetchone()[0],
+                "chunks": conn.execute("SELECT COALESCE(SUM(chunk_count), 0) FROM attachments").fetchone()[0],
+                "vectors": conn.execute("SELECT COUNT(*) FROM chunk_vectors").fetchone()[0],
+            }
+
+
+# ============================================================================
+# 全局实例
+# ============================================================================
+
+_local_index: LocalIndex | None = None
+_local_index_lock = threading.Lock()
+
+
+def get_local_index() -> LocalIndex:
+    """获取进程级本地附件索引单例"""
+    global _local_index
+
+    if _local_index is None:
+        with _local_index_lock:
+            if _local_index is None:
+                _local_index = LocalIndex(settings.LOCAL_INDEX_DB_PATH)
+    return _local_index
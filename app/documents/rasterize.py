@@ -0,0 +1,246 @@
+"""
+PDF 栅格化 (PDF Rasterization)
+
+把上传的多页扫描 PDF 拆成逐页图片，供签名检查和文档解析使用：
+- 页面在按 CPU 核数创建的进程池中渲染（渲染是 CPU 密集型，线程受 GIL 限制无法并行）
+- worker 进程通过 mmap 映射输入文件，由 PyMuPDF 按需读取，不把整个文档读入内存；已打开的文档在进程内复用
+- 页面渲染完成即按页序流式产出，只预渲染有限的页数，下游处理慢时不会堆积
+- 页面图片按 文件内容哈希/DPI 缓存在磁盘上，重试和重复处理直接复用缓存，不再渲染
+
+依赖可选的 PyMuPDF（`fitz`），延迟导入；未安装时跳过 PDF 并记录警告。
+"""
+
+import asyncio
+import atexit
+import hashlib
+import importlib.util
+import json
+import mmap
+import multiprocessing
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from collections.abc import AsyncIterable, AsyncIterator, Iterable
+from concurrent.futures import Executor, ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+from structlog.stdlib import get_logger
+
+from app.core.config import settings
+
+logger = get_logger(__name__)
+
+PDF_SUFFIX = ".pdf"
+
+# 每个 worker 进程保持打开的文档数
+_MAX_OPEN_DOCUMENTS = 4
+
+
+def rasterize_available() -> bool:
+    """是否安装了 PDF 栅格化所需的可选依赖（PyMuPDF）"""
+    return importlib.util.find_spec("fitz") is not None
+
+
+@dataclass(frozen=True, slots=True)
+class RasterPage:
+    """PDF 栅格化后的一页"""
+
+    source: Path
+    """原 PDF 路径"""
+
+    page: int
+    """页码（从 1 开始）"""
+
+    path: Path
+    """缓存的页面图片路径"""
+
+    @property
+    def name(self) -> str:
+        """结果记录中使用的文档名"""
+        return f"{self.source}#page={self.page}"
+
+
+# ============================================================================
+# worker 进程
+# ============================================================================
+
+# (路径, 内容哈希) -> (文档, 映射)；文档引用映射的内存，映射随文档一起释放
+_open_documents: OrderedDict[tuple[str, str], tuple[Any, mmap.mmap]] = OrderedDict()
+
+
+def _open_document(path: str, digest: str) -> Any:
+    import fitz
+
+    key = (path, digest)
+    entry = _open_documents.get(key)
+    if entry is not None:
+        _open_documents.move_to_end(key)
+        return entry[0]
+
+    with open(path, "rb") as file:
+        mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    document = fitz.open(stream=memoryview(mapped), filetype="pdf")
+    _open_documents[key] = (document, mapped)
+    while len(_open_documents) > _MAX_OPEN_DOCUMENTS:
+        _, (evicted, _mapped) = _open_documents.popitem(last=False)
+        evicted.close()
+    return document
+
+
+def _page_count(path: str, digest: str) -> int:
+    return _open_document(path, digest).page_count
+
+
+def _render_page(path: str, digest: str, index: int, dpi: int, target: str) -> None:
+    pixmap = _open_document(path, digest)[index].get_pixmap(dpi=dpi)
+    # 先写临时文件再改名，中断时不会留下半张图片
+    temporary = f"{target}.{os.getpid()}.tmp"
+    pixmap.save(temporary, output="png")
+    os.replace(temporary, target)
+
+
+# ============================================================================
+# 进程池与缓存
+# ============================================================================
+
+_executor: ProcessPoolExecutor | None = None
+_executor_lock = threading.Lock()
+
+
+def _pool_size() -> int:
+    return settings.PDF_RASTER_WORKERS or os.cpu_count() or 1
+
+
+def get_document_executor() -> ProcessPoolExecutor:
+    """获取进程内共享的文档处理进程池（栅格化和文本抽取共用，首次调用时创建，进程退出时关闭）"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # spawn：服务进程中有事件循环和后台线程，fork 出的子进程可能继承被持有的锁
+            _executor = ProcessPoolExecutor(max_workers=_pool_size(), mp_context=multiprocessing.get_context("spawn"))
+            atexit.register(_executor.shutdown, cancel_futures=True)
+            logger.info("document_pool_started", workers=_pool_size())
+    return _executor
+
+
+def file_digest(path: Path) -> str:
+    """通过 mmap 计算文件内容的 sha256，不把文件读入内存"""
+    with path.open("rb") as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            return hashlib.sha256().hexdigest()
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            return hashlib.sha256(mapped).hexdigest()
+
+
+def page_cache_dir(digest: str, dpi: int, cache_dir: str | Path | None = None) -> Path:
+    """文档页面图片的缓存目录"""
+    return Path(cache_dir or settings.PDF_PAGE_CACHE_DIR) / digest[:2] / digest / str(dpi)
+
+
+# ============================================================================
+# 流式栅格化
+# ============================================================================
+
+
+async def rasterize_pdf(
+    path: str | Path,
+    dpi: int | None = None,
+    executor: Executor | None = None,
+    cache_dir: str | Path | None = None,
+) -> AsyncIterator[RasterPage]:
+    """
+    逐页栅格化 PDF，按页序产出页面图片。
+
+    已缓存的页面直接产出；其余页面提交到进程池，最多同时预渲染 2 倍进程数的页面。
+
+    Args:
+        path: PDF 路径
+        dpi: 渲染分辨率，默认 `PDF_RASTER_DPI`
+        executor: 渲染使用的进程池，默认共享进程池
+        cache_dir: 页面缓存根目录，默认 `PDF_PAGE_CACHE_DIR`
+    """
+    path = Path(path)
+    dpi = dpi or settings.PDF_RASTER_DPI
+    executor = executor or get_document_executor()
+    loop = asyncio.get_running_loop()
+    started = time.perf_counter()
+
+    digest = await asyncio.to_thread(file_digest, path)
+    directory = page_cache_dir(digest, dpi, cache_dir)
+    manifest = directory / "manifest.json"
+    try:
+        page_count = json.loads(manifest.read_text(encoding="utf-8"))["pages"]
+    except (OSError, ValueError, KeyError):
+        page_count = await loop.run_in_executor(executor, _page_count, str(path), digest)
+        directory.mkdir(parents=True, exist_ok=True)
+        manifest.write_text(json.dumps({"source": str(path), "pages": page_count}), encoding="utf-8")
+
+    pending: deque[tuple[int, Path, asyncio.Future[None] | None]] = deque()
+    next_index = rendered = 0
+    try:
+        while next_index < page_count or pending:
+            while next_index < page_count and len(pending) < _pool_size() * 2:
+                target = directory / f"page-{next_index + 1:04d}.png"
+                future = None
+                if not target.exists():
+                    future = loop.run_in_executor(
+                        executor, _render_page, str(path), digest, next_index, dpi, str(target)
+                    )
+                pending.append((next_index, target, future))
+                next_index += 1
+
+            index, target, future = pending.popleft()
+            if future is not None:
+                await future
+                rendered += 1
+            yield RasterPage(source=path, page=index + 1, path=target)
+    finally:
+        # 下游提前停止或渲染失败时，取消尚未开始的渲染
+        for _, _, future in pending:
+            if future is not None:
+                future.cancel()
+
+    logger.info(
+        "pdf_rasterized",
+        document=str(path),
+        pages=page_count,
+        rendered=rendered,
+        cached=page_count - rendered,
+        dpi=dpi,
+        elapsed_ms=round((time.perf_counter() - started) * 1000, 1),
+    )
+
+
+async def iter_document_pages(
+    documents: Iterable[Path] | AsyncIterable[Path], dpi: int | None = None
+) -> AsyncIterator[Path | RasterPage]:
+    """
+    把文档流展开为页面流：图片原样产出，PDF 逐页栅格化后产出。
+
+    单个 PDF 无法打开或渲染失败时记录警告并继续处理后续文档。
+    """
+    available = rasterize_available()
+    async for document in _aiter(documents):
+        if document.suffix.lower() != PDF_SUFFIX:
+            yield document
+            continue
+        if not available:
+            logger.warning("pdf_rasterize_unavailable", document=str(document), reason="PyMuPDF is not installed")
+            continue
+        try:
+            async for page in rasterize_pdf(document, dpi):
+                yield page
+        except Exception as e:
+            logger.warning("pdf_rasterize_failed", document=str(document), error=f"{type(e).__name__}: {e}")
+
+
+async def _aiter(documents: Iterable[Path] | AsyncIterable[Path]) -> AsyncIterator[Path]:
+    if isinstance(documents, AsyncIterable):
+        async for document in documents:
+            yield document
+    else:
+        for document in documents:
+            yield document
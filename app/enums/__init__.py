@@ -1 +1,97 @@
-from enum import StrEnum  # noqa
+from enum import StrEnum
+
+
+class ModelRole(StrEnum):
+    """模型角色，每个角色可以单独配置模型"""
+
+    ORCHESTRATOR = "orchestrator"
+    """深度研究主代理"""
+
+    RESEARCHER = "researcher"
+    """研究子代理"""
+
+    CRITIC = "critic"
+    """审阅子代理"""
+
+    QA = "qa"
+    """通用问答"""
+
+    QA_FAST = "qa_fast"
+    """通用问答中的简单问题"""
+
+    VISION = "vision"
+    """扫描件签名检查等视觉任务"""
+
+
+class QuestionComplexity(StrEnum):
+    """问题复杂度分级"""
+
+    SIMPLE = "simple"
+    COMPLEX = "complex"
+
+
+class SignatureStatus(StrEnum):
+    """签名位置状态代码（与 CHECK_IMAGE_SIGN_PROMPT 中的 status_codes 一致）"""
+
+    MISSING = "missing"
+    """完全空白，无任何痕迹（最严重）"""
+
+    FAINT = "faint"
+    """笔迹极淡，颜色很浅"""
+
+    BLURRY = "blurry"
+    """模糊失焦，边缘不清"""
+
+    ILLEGIBLE = "illegible"
+    """极度潦草，无法辨认"""
+
+    PARTIAL = "partial"
+    """不完整，被遮挡或裁切"""
+
+    STAINED = "stained"
+    """有污渍、水渍覆盖"""
+
+    SMUDGED = "smudged"
+    """墨迹晕染、印油不清"""
+
+    OK = "ok"
+    """清晰正常"""
+
+    NA = "na"
+    """标注了 N/A、/、无等（豁免）"""
+
+    @property
+    def severity(self) -> int:
+        """严重程度，数值越大越严重：missing > faint > partial > blurry > 其他问题 > ok > na"""
+        return {
+            SignatureStatus.MISSING: 6,
+            SignatureStatus.FAINT: 5,
+            SignatureStatus.PARTIAL: 4,
+            SignatureStatus.BLURRY: 3,
+            SignatureStatus.OK: 1,
+            SignatureStatus.NA: 0,
+        }.get(self, 2)
+
+    @property
+    def is_problem(self) -> bool:
+        return self not in (SignatureStatus.OK, SignatureStatus.NA)
+
+
+class ParseJobKind(StrEnum):
+    """文档解析任务类型"""
+
+    PAGE_UPDATE = "page_update"
+    """Confluence 页面新建或更新：重新索引页面附件"""
+
+    FILE = "file"
+    """上传到 UPLOAD_DIR 的文件：抽取文本写入本地索引"""
+
+
+class QueueBackend(StrEnum):
+    """解析任务队列后端"""
+
+    SQLITE = "sqlite"
+    """本地 SQLite 队列，适合开发测试和单机多进程"""
+
+    KAFKA = "kafka"
+    """Kafka 队列，消费组为 KAFKA_CONSUMER_PARSER_GROUP_ID"""
@@ -0,0 +1,72 @@
+"""
+Agent 中间件模块 - 挂载到 deepagents / LangChain Agent 上的横切能力。
+
+此模块包含以下子模块：
+
+1. **deadline** - 运行时间预算
+   - DeadlineMiddleware: 工具调用超时、临近截止时强制作答并标记部分回答
+
+2. **critique** - 审阅循环预算
+   - CritiqueBudgetMiddleware: 审阅次数/时长上限、收敛检测、只审阅变化章节
+
+3. **citations** - 服务端引用解析
+   - CitationMiddleware: 为工具结果标注来源编号，重写最终回答的引用并生成「参考来源」列表
+
+4. **model_routing** - 复杂度分流
+   - ComplexityRoutingMiddleware: 简单问题改用快速模型，记录分流决策
+   - classify_question: 启发式问题复杂度分类
+
+5. **prompt_context** - 易变上下文
+   - VolatileContextMiddleware: 把日期等易变内容追加到系统提示词末尾，保持可缓存的静态前缀
+
+6. **tool_offload** - 工具输出卸载
+   - ToolOutputOffloadMiddleware: 已读过的大体积工具输出批量替换为存根，原文按需取回
+   - read_tool_output: 取回已卸载原文的工具
+
+7. **summarization** - 历史摘要
+   - HistorySummarizationMiddleware: 历史超过 token 阈值时异步摘要较早的轮次，保留引用来源
+
+8. **report_editing** - 按章节编辑报告
+   - ReportEditingMiddleware: 按标题 upsert / append / patch 报告章节，每次写入推送 `report_section` 流事件
+
+"""
+
+# ============================================================================
+# 中间件导出
+# ============================================================================
+from app.middlewares.citations import CitationMiddleware
+from app.middlewares.critique import CritiqueBudgetMiddleware
+from app.middlewares.deadline import PARTIAL_ANSWER_NOTICE, DeadlineMiddleware
+from app.middlewares.model_routing import ComplexityRoutingMiddleware, classify_question
+from app.middlewares.prompt_context import VolatileContextMiddleware, current_date_section
+from app.middlewares.report_editing import REPORT_SECTION_EVENT, ReportEditingMiddleware
+from app.middlewares.summarization import HistorySummarizationMiddleware
+from app.middlewares.tool_offload import ToolOutputOffloadMiddleware, read_tool_output
+
+# ============================================================================
+# 导出列表 - 定义公共 API
+# ============================================================================
+
+__all__ = [
+    # 时间预算
+    "DeadlineMiddleware",
+    "PARTIAL_ANSWER_NOTICE",
+    # 审阅循环预算
+    "CritiqueBudgetMiddleware",
+    # 引用解析
+    "CitationMiddleware",
+    # 复杂度分流
+    "ComplexityRoutingMiddleware",
+    "classify_question",
+    # 易变上下文
+    "VolatileContextMiddleware",
+    "current_date_section",
+    # 工具输出卸载
+    "ToolOutputOffloadMiddleware",
+    "read_tool_output",
+    # 历史摘要
+    "HistorySummarizationMiddleware",
+    # 按章节编辑报告
+    "ReportEditingMiddleware",
+    "REPORT_SECTION_EVENT",
+]
@@ -0,0 +1,87 @@
+"""
+引用 (Citation) 中间件
+
+模型只负责输出 `[n]` 引用编号，来源列表由服务端生成，保证引用真实存在且编号连续：
+- 调用模型前，按对话中工具返回的页面首次出现顺序编号，并在工具结果前附加 `[n] 《标题》` 说明
+  （只改变模型看到的内容，不写回状态；编号由消息历史确定，多次调用结果一致，不影响前缀缓存）；
+  同时通过 custom 流推送这份来源列表，流式解析（`astream_with_citations`）与最终回答使用同一套编号
+- 运行结束时重写最终回答：按首次引用顺序重新编号，丢弃无效编号，追加去重的「参考来源」列表，
+  并把实际引用的来源写入 `citation_sources` 状态供客户端使用
+"""
+
+from collections.abc import Awaitable, Callable
+from typing import Any, NotRequired
+
+from langchain.agents.middleware import AgentMiddleware, AgentState, ModelRequest, ModelResponse
+from langchain_core.messages import AIMessage
+from langgraph.runtime import Runtime
+from structlog.stdlib import get_logger
+
+from app.utils.citations import (
+    CITATION_SOURCES_EVENT,
+    SOURCES_HEADING,
+    CitationResolver,
+    collect_sources,
+    format_source_labels,
+    message_sources,
+    message_text,
+)
+
+logger = get_logger(__name__)
+
+
+class CitationState(AgentState):
+    citation_sources: NotRequired[list[dict[str, Any]]]
+    """最终回答实际引用的来源（按输出编号排列）"""
+
+
+class CitationMiddleware(AgentMiddleware[CitationState]):
+    """引用中间件：为工具结果标注来源编号，并在服务端生成「参考来源」列表。"""
+
+    state_schema = CitationState
+
+    async def awrap_model_call(
+        self,
+        request: ModelRequest,
+        handler: Callable[[ModelRequest], Awaitable[ModelResponse]],
+    ) -> ModelResponse | AIMessage:
+        sources = collect_sources(request.messages)
+        if request.runtime is not None:
+            request.runtime.stream_writer(
+                {"type": CITATION_SOURCES_EVENT, "sources": [source.to_dict() for source in sources]}
+            )
+        if not sources:
+            return await handler(request)
+
+        numbering = {source.page_id: index for index, source in enumerate(sources, start=1)}
+        messages = []
+        for message in request.messages:
+            sources_in_message = message_sources(message)
+            if sources_in_message:
+                labels = format_source_labels(sources_in_message, numbering)
+                message = message.model_copy(update={"content": f"{labels}\n\n{message_text(message.content)}"})
+            messages.append(message)
+        return await handler(request.override(messages=messages))
+
+    def after_agent(self, state: CitationState, runtime: Runtime) -> dict[str, Any] | None:
+        messages = state["messages"]
+        answer = messages[-1] if messages else None
+        if not isinstance(answer, AIMessage) or answer.tool_calls:
+            return None
+
+        content = message_text(answer.content)
+        if SOURCES_HEADING in content:
+            # 已经处理过（例如从中断处恢复的运行）
+            return None
+
+        resolver = CitationResolver(collect_sources(messages))
+        resolved = resolver.resolve(content)
+        cited = resolver.cited_sources
+        logger.info("citations_resolved", cited_sources=len(cited))
+        return {
+            "messages": [answer.model_copy(update={"content": resolved})],
+            "citation_sources": [source.to_dict() for source in cited],
+        }
+
+    async def aafter_agent(self, state: CitationState, runtime: Runtime) -> dict[str, Any] | None:
+        return self.after_agent(state, runtime)
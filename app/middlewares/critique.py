@@ -0,0 +1,185 @@
+"""
+审阅循环预算 (Critique Budget) 中间件
+
+研究代理会反复调用审阅子代理并重写报告。此中间件拦截对审阅子代理的 `task` 调用：
+- 限制单次运行内的审阅次数和审阅循环总时长
+- 收敛检测：距上次审阅报告变化比例低于阈值时，不再审阅
+- 增量审阅：第二次起只把变化的章节交给审阅子代理，而不是让其重读整份报告
+- 模型在同一轮中并行发起多个审阅调用时只执行第一个，其余调用直接返回提示
+"""
+
+import asyncio
+import time
+from collections.abc import Awaitable, Callable
+from typing import Annotated, Any, NotRequired
+
+from deepagents.backends.protocol import BackendFactory, BackendProtocol
+from langchain.agents.middleware import AgentMiddleware, AgentState
+from langchain.agents.middleware.types import PrivateStateAttr, ToolCallRequest
+from langchain_core.messages import AIMessage, ToolCall, ToolMessage
+from langgraph.runtime import Runtime
+from langgraph.types import Command
+from structlog.stdlib import get_logger
+
+from app.utils.report_sections import (
+    SectionFingerprints,
+    diff_sections,
+    read_backend_text,
+    section_fingerprints,
+    split_sections,
+)
+
+logger = get_logger(__name__)
+
+
+class CritiqueState(AgentState):
+    critique_count: NotRequired[Annotated[int, PrivateStateAttr]]
+    """本次运行已完成的审阅次数"""
+
+    critique_started_at: NotRequired[Annotated[float | None, PrivateStateAttr]]
+    """首次审阅的开始时间（Unix 时间戳）"""
+
+    critique_fingerprints: NotRequired[Annotated[SectionFingerprints, PrivateStateAttr]]
+    """上一次审阅时报告的章节指纹"""
+
+
+class CritiqueBudgetMiddleware(AgentMiddleware[CritiqueState]):
+    """
+    审阅循环预算中间件。
+
+    Args:
+        critique_agent: 审阅子代理名称（`task` 工具的 `subagent_type`）
+        backend: 报告所在的文件后端，或根据 ToolRuntime 创建后端的工厂函数
+        report_path: 报告文件路径
+        max_iterations: 单次运行允许的最大审阅次数
+        time_budget_seconds: 从首次审阅开始计算的审阅循环总时长上限（秒）
+        min_change_ratio: 距上次审阅的报告变化比例低于该值时视为已收敛
+    """
+
+    state_schema = CritiqueState
+
+    def __init__(
+        self,
+        critique_agent: str,
+        backend: BackendProtocol | BackendFactory,
+        report_path: str = "/final_report.md",
+        max_iterations: int = 2,
+        time_budget_seconds: float = 600.0,
+        min_change_ratio: float = 0.05,
+    ) -> None:
+        super().__init__()
+        self.critique_agent = critique_agent
+        self.backend = backend
+        self.report_path = report_path
+        self.max_iterations = max_iterations
+        self.time_budget_seconds = time_budget_seconds
+        self.min_change_ratio = min_change_ratio
+
+    def before_agent(self, state: CritiqueState, runtime: Runtime) -> dict[str, Any] | None:
+        # 审阅预算按单次运行计算
+        return {"critique_count": 0, "critique_started_at": None, "critique_fingerprints": {}}
+
+    async def abefore_agent(self, state: CritiqueState, runtime: Runtime) -> dict[str, Any] | None:
+        return self.before_agent(state, runtime)
+
+    async def awrap_tool_call(
+        self,
+        request: ToolCallRequest,
+        handler: Callable[[ToolCallRequest], Awaitable[ToolMessage | Command]],
+    ) -> ToolMessage | Command:
+        if not self._is_critique_call(request.tool_call):
+            return await handler(request)
+        if not _is_first_critique_call(request, self._is_critique_call):
+            # 并行的审阅调用读到的是同一份计数，且私有状态在一步内只能写入一次
+            logger.info("critique_parallel_call_rejected", tool_call_id=request.tool_call["id"])
+            return _stop_message(request, "同一轮中只执行一个审阅任务，本次审阅调用已忽略。请等待已发起的审阅结果。")
+
+        args = request.tool_call.get("args") or {}
+        state = request.state
+        count = state.get("critique_count", 0)
+        now = time.time()
+        started_at = state.get("critique_started_at") or now
+
+        if count >= self.max_iterations:
+            logger.info("critique_budget_exhausted", reason="max_iterations", critique_count=count)
+            return _stop_message(
+                request, f"本次研究已完成 {count} 轮审阅，达到上限。不要再调用审阅代理，请直接完成报告。"
+            )
+        if now - started_at >= self.time_budget_seconds:
+            logger.info("critique_budget_exhausted", reason="time_budget", elapsed_seconds=round(now - started_at, 1))
+            return _stop_message(request, "审阅循环已超过时间预算。不要再调用审阅代理，请直接完成报告。")
+
+        report = await asyncio.to_thread(read_backend_text, self._get_backend(request), self.report_path)
+        sections = split_sections(report or "")
+        previous: SectionFingerprints = state.get("critique_fingerprints") or {}
+
+        if count > 0 and previous:
+            changed, removed, change_ratio = diff_sections(previous, sections)
+            if change_ratio < self.min_change_ratio:
+                logger.info("critique_converged", critique_count=count, change_ratio=round(change_ratio, 3))
+                return _stop_message(
+                    request,
+                    f"自上次审阅以来报告变化仅 {change_ratio:.1%}，审阅已收敛。不要再调用审阅代理，请直接完成报告。",
+                )
+            request = request.override(
+                tool_call={
+                    **request.tool_call,
+                    "args": {**args, "description": _incremental_description(args, changed, removed)},
+                }
+            )
+            logger.info(
+                "critique_incremental_review",
+                critique_count=count,
+                changed_sections=len(changed),
+                removed_sections=len(removed),
+                change_ratio=round(change_ratio, 3),
+            )
+
+        result = await handler(request)
+        update = {
+            "critique_count": count + 1,
+            "critique_started_at": started_at,
+            "critique_fingerprints": section_fingerprints(sections),
+        }
+        if isinstance(result, Command) and isinstance(result.update, dict):
+            return Command(update={**result.update, **update})
+        return Command(update={**update, "messages": [result]})
+
+    def _is_critique_call(self, tool_call: ToolCall) -> bool:
+        args = tool_call.get("args") or {}
+        return tool_call["name"] == "task" and args.get("subagent_type") == self.critique_agent
+
+    def _get_backend(self, request: ToolCallRequest) -> BackendProtocol:
+        if callable(self.backend):
+            return self.backend(request.runtime)
+        return self.backend
+
+
+def _is_first_critique_call(request: ToolCallRequest, is_critique: Callable[[ToolCall], bool]) -> bool:
+    """当前调用是否为发起它的模型消息中的第一个审阅调用"""
+    messages = request.state.get("messages", []) if isinstance(request.state, dict) else []
+    for message in reversed(messages):
+        if isinstance(message, AIMessage) and any(call["id"] == request.tool_call["id"] for call in message.tool_calls):
+            first = next(call for call in message.tool_calls if is_critique(call))
+            return first["id"] == request.tool_call["id"]
+    return True
+
+
+def _stop_message(request: ToolCallRequest, content: str) -> ToolMessage:
+    return ToolMessage(content=content, tool_call_id=request.tool_call["id"], name=request.tool_call["name"])
+
+
+def _incremental_description(args: dict[str, Any], changed: list, removed: list[str]) -> str:
+    """在审阅任务描述后附加变化章节，要求审阅代理只审阅这些内容"""
+    parts = [
+        args.get("description", ""),
+        "",
+        "---",
+        "这是增量审阅：上一轮审阅之后报告只有以下章节发生了变化。",
+        "只审阅这些章节，不要重新读取整份 `final_report.md`，也不要重复上一轮已经给出的意见。",
+    ]
+    if removed:
+        parts.append(f"已删除的章节：{', '.join(removed)}")
+    for section in changed:
+        parts += ["", section.text]
+    return "\n".join(parts)
@@ -0,0 +1,159 @@
+"""
+截止时间 (Deadline) 中间件
+
+为一次 Agent 运行设置真实的时间预算：
+- 每次运行开始时在主代理的私有状态中记录截止时间
+- 每个工具调用（MCP 工具、子代理 task）以剩余预算作为超时，超时即取消。子代理本身看不到截止时间，
+  只由外层的 task 调用超时约束：超时后整个子代理运行被取消，其中间结果不会返回给主代理
+- 剩余时间不足时禁用工具，强制模型根据已收集的上下文直接作答，并标记为部分回答
+- 模型调用同样以剩余预算（含作答预留）作为超时，超时后以部分回答标记结束本次运行
+"""
+
+import asyncio
+import time
+from collections.abc import Awaitable, Callable
+from typing import Annotated, Any, NotRequired
+
+from langchain.agents.middleware import AgentMiddleware, AgentState, ModelRequest, ModelResponse
+from langchain.agents.middleware.types import PrivateStateAttr, ToolCallRequest
+from langchain_core.messages import AIMessage, ToolMessage
+from langgraph.runtime import Runtime
+from langgraph.types import Command
+from structlog.stdlib import get_logger
+
+logger = get_logger(__name__)
+
+PARTIAL_ANSWER_NOTICE = "> ⚠️ 以下为部分回答：检索在时间预算内未能全部完成，内容仅基于已获取的资料。"
+
+FORCE_ANSWER_PROMPT = f"""
+
+## 时间预算已用尽
+
+检索时间已到，不能再调用任何工具。请立即根据对话中已经获取的资料作答：
+- 回答的第一行必须原样输出：{PARTIAL_ANSWER_NOTICE}
+- 只使用已获取的资料，不要编造；资料不足的部分请明确说明"""
+
+MODEL_TIMEOUT_ANSWER = f"{PARTIAL_ANSWER_NOTICE}\n\n回答未能在时间预算内生成完毕，请缩小问题范围后重试。"
+
+
+class DeadlineState(AgentState):
+    deadline_at: NotRequired[Annotated[float, PrivateStateAttr]]
+    """本次运行的截止时间（Unix 时间戳）"""
+
+
+class DeadlineMiddleware(AgentMiddleware[DeadlineState]):
+    """
+    截止时间中间件。
+
+    Args:
+        budget_seconds: 单次运行的总时间预算（秒）
+        answer_reserve_seconds: 为最终作答预留的时间（秒）。剩余时间低于该值时不再调用工具，
+            工具调用的超时也会扣除这部分预留
+    """
+
+    state_schema = DeadlineState
+
+    def __init__(self, budget_seconds: float, answer_reserve_seconds: float) -> None:
+        super().__init__()
+        self.budget_seconds = budget_seconds
+        self.answer_reserve_seconds = answer_reserve_seconds
+
+    def _tool_budget(self, state: Any) -> float | None:
+        """返回工具调用可用的剩余时间；没有截止时间时返回 None"""
+        deadline_at = state.get("deadline_at") if isinstance(state, dict) else None
+        if deadline_at is None:
+            return None
+        return deadline_at - time.time() - self.answer_reserve_seconds
+
+    def before_agent(self, state: DeadlineState, runtime: Runtime) -> dict[str, Any] | None:
+        # 每次用户提问都是一次新的运行，重新计算截止时间
+        return {"deadline_at": time.time() + self.budget_seconds}
+
+    async def abefore_agent(self, state: DeadlineState, runtime: Runtime) -> dict[str, Any] | None:
+        return self.before_agent(state, runtime)
+
+    async def awrap_model_call(
+        self,
+        request: ModelRequest,
+        handler: Callable[[ModelRequest], Awaitable[ModelResponse]],
+    ) -> ModelResponse | AIMessage:
+        budget = self._tool_budget(request.state)
+        if budget is None:
+            return await handler(request)
+        if budget > 0:
+            return await self._bounded_model_call(handler, request, budget)
+
+        logger.info("deadline_forcing_answer", overdue_seconds=round(-budget, 2))
+        response = await self._bounded_model_call(
+            handler,
+            request.override(
+                tools=[],
+                tool_choice=None,
+                system_prompt=(request.system_prompt or "") + FORCE_ANSWER_PROMPT,
+            ),
+            budget,
+        )
+        return ModelResponse(
+            result=[_mark_partial(m) for m in response.result],
+            structured_response=response.structured_response,
+        )
+
+    async def _bounded_model_call(
+        self,
+        handler: Callable[[ModelRequest], Awaitable[ModelResponse]],
+        request: ModelRequest,
+        budget: float,
+    ) -> ModelResponse:
+        """以剩余预算加作答预留作为模型调用的超时，超时后返回部分回答标记"""
+        timeout = budget + self.answer_reserve_seconds
+        if timeout > 0:
+            try:
+                return await asyncio.wait_for(handler(request), timeout=timeout)
+            except TimeoutError:
+                pass
+        logger.warning("deadline_model_call_cancelled", timeout_seconds=round(max(timeout, 0), 2))
+        message = AIMessage(content=MODEL_TIMEOUT_ANSWER, response_metadata={"partial_answer": True})
+        return ModelResponse(result=[message])
+
+    async def awrap_tool_call(
+        self,
+        request: ToolCallRequest,
+        handler: Callable[[ToolCallRequest], Awaitable[ToolMessage | Command]],
+    ) -> ToolMessage | Command:
+        budget = self._tool_budget(request.state)
+        if budget is None:
+            return await handler(request)
+
+        tool_name = request.tool_call["name"]
+        if budget <= 0:
+            logger.info("deadline_tool_call_skipped", tool_name=tool_name)
+            return _deadline_tool_message(request, "时间预算已用尽，未执行该工具调用。请根据已获取的资料直接作答。")
+
+        try:
+            return await asyncio.wait_for(handler(request), timeout=budget)
+        except TimeoutError:
+            logger.warning("deadline_tool_call_cancelled", tool_name=tool_name, timeout_seconds=round(budget, 2))
+            return _deadline_tool_message(
+                request, f"工具调用超过剩余时间预算（{budget:.1f} 秒）已被取消。请根据已获取的资料直接作答。"
+            )
+
+
+def _deadline_tool_message(request: ToolCallRequest, content: str) -> ToolMessage:
+    return ToolMessage(
+        content=content,
+        tool_call_id=request.tool_call["id"],
+        name=request.tool_call["name"],
+        status="error",
+    )
+
+
+def _mark_partial(message: Any) -> Any:
+    """在最终回答前加上部分回答标记（模型已自行输出时不重复添加）"""
+    if not isinstance(message, AIMessage) or message.tool_calls or not isinstance(message.content, str):
+        return message
+    content = message.content
+    if not content.lstrip().startswith(PARTIAL_ANSWER_NOTICE):
+        content = f"{PARTIAL_ANSWER_NOTICE}\n\n{content}"
+    return message.model_copy(
+        update={"content": content, "response_metadata": {**message.response_metadata, "partial_answer": True}}
+    )
@@ -0,0 +1,117 @@
+"""
+复杂度分流 (Complexity Routing) 中间件
+
+大部分通用问答是简单的查找类问题，不需要最强的模型：
+- 每次运行开始时用启发式规则对用户问题做复杂度分类（无需额外模型调用，耗时可忽略）
+- 简单问题的所有模型调用改用低成本快速模型，复杂问题保持默认模型
+- 分流决策记录到日志（`model_routed`），便于评估命中率和效果
+"""
+
+import re
+from collections.abc import Awaitable, Callable
+from typing import Annotated, Any, NotRequired
+
+from langchain.agents.middleware import AgentMiddleware, AgentState, ModelRequest, ModelResponse
+from langchain.agents.middleware.types import PrivateStateAttr
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.runtime import Runtime
+from structlog.stdlib import get_logger
+
+from app.enums import QuestionComplexity
+from app.utils.citations import message_text
+
+logger = get_logger(__name__)
+
+# 出现这些词通常意味着需要多文档检索、对比或综合分析
+_COMPLEX_KEYWORDS_RE = re.compile(
+    r"对比|比较|区别|差异|分析|为什么|原因|评估|总结|汇总|方案|设计|架构|优缺点|利弊|影响|所有|全部|"
+    r"compare|comparison|difference|why|analy[sz]|summar|design|architecture|pros and cons|trade-?off",
+    re.IGNORECASE,
+)
+_QUESTION_MARK_RE = re.compile(r"[?？]")
+
+Classifier = Callable[[str], tuple[QuestionComplexity, str]]
+"""复杂度分类函数：输入问题文本，返回 (复杂度, 判定原因)"""
+
+
+def classify_question(question: str, simple_max_chars: int = 60) -> tuple[QuestionComplexity, str]:
+    """
+    启发式问题复杂度分类。
+
+    Args:
+        question: 用户问题
+        simple_max_chars: 简单问题的最大长度（字符）
+
+    Returns:
+        (复杂度, 判定原因)
+    """
+    text = question.strip()
+    if len(text) > simple_max_chars:
+        return QuestionComplexity.COMPLEX, "length"
+    if len([line for line in text.splitlines() if line.strip()]) > 2:
+        return QuestionComplexity.COMPLEX, "multi_line"
+    if len(_QUESTION_MARK_RE.findall(text)) > 1:
+        return QuestionComplexity.COMPLEX, "multi_question"
+    if match := _COMPLEX_KEYWORDS_RE.search(text):
+        return QuestionComplexity.COMPLEX, f"keyword:{match.group().lower()}"
+    return QuestionComplexity.SIMPLE, "short_single_question"
+
+
+class RoutingState(AgentState):
+    question_complexity: NotRequired[Annotated[str, PrivateStateAttr]]
+    """本次运行用户问题的复杂度"""
+
+
+class ComplexityRoutingMiddleware(AgentMiddleware[RoutingState]):
+    """
+    复杂度分流中间件。
+
+    Args:
+        fast_model: 简单问题使用的快速模型
+        simple_max_chars: 简单问题的最大长度（字符），使用默认分类函数时生效
+        classifier: 自定义复杂度分类函数，默认使用 `classify_question`
+    """
+
+    state_schema = RoutingState
+
+    def __init__(
+        self,
+        fast_model: BaseChatModel,
+        simple_max_chars: int = 60,
+        classifier: Classifier | None = None,
+    ) -> None:
+        super().__init__()
+        self.fast_model = fast_model
+        self.classifier = classifier or (lambda question: classify_question(question, simple_max_chars))
+
+    def before_agent(self, state: RoutingState, runtime: Runtime) -> dict[str, Any] | None:
+        question = next(
+            (message_text(m.content) for m in reversed(state["messages"]) if isinstance(m, HumanMessage)),
+            "",
+        )
+        complexity, reason = self.classifier(question)
+        logger.info(
+            "model_routed",
+            complexity=str(complexity),
+            reason=reason,
+            question_chars=len(question),
+            model=_model_name(self.fast_model) if complexity == QuestionComplexity.SIMPLE else "default",
+        )
+        return {"question_complexity": str(complexity)}
+
+    async def abefore_agent(self, state: RoutingState, runtime: Runtime) -> dict[str, Any] | None:
+        return self.before_agent(state, runtime)
+
+    async def awrap_model_call(
+        self,
+        request: ModelRequest,
+        handler: Callable[[ModelRequest], Awaitable[ModelResponse]],
+    ) -> ModelResponse | AIMessage:
+        if request.state.get("question_complexity") == QuestionComplexity.SIMPLE:
+            request = request.override(model=self.fast_model)
+        return await handler(request)
+
+
+def _model_name(model: BaseChatModel) -> str:
+    return getattr(model, "model_name", None) or getattr(model, "model", None) or type(model).__name__
@@ -0,0 +1,48 @@
+"""
+易变上下文 (Volatile Context) 中间件
+
+提供方的前缀缓存（prompt caching）只对完全相同的前缀生效。系统提示词中间如果插入日期等易变内容，
+其后的全部内容都无法命中缓存。此中间件让静态系统提示词保持不变，把易变内容统一追加到系统提示词末尾：
+- 默认只追加当前 UTC 日期（按天变化，同一天内前缀完全稳定）
+- 需要追加的内容通过 `sections` 扩展，每个函数返回一段文本或 None
+"""
+
+from collections.abc import Awaitable, Callable, Sequence
+from datetime import UTC, datetime
+
+from langchain.agents.middleware import AgentMiddleware, ModelRequest, ModelResponse
+from langchain_core.messages import AIMessage
+
+VolatileSection = Callable[[ModelRequest], str | None]
+"""易变内容提供函数：根据本次模型请求返回需要追加的文本，不需要时返回 None"""
+
+
+def current_date_section(_request: ModelRequest) -> str:
+    """当前 UTC 日期，精确到天以保证同一天内前缀不变"""
+    return f"Current date (UTC timezone) is: {datetime.now(UTC).date().isoformat()}."
+
+
+class VolatileContextMiddleware(AgentMiddleware):
+    """
+    易变上下文中间件。
+
+    应放在中间件列表的最后（最内层），保证其追加的内容位于其他中间件修改之后、系统提示词的最末尾。
+
+    Args:
+        sections: 易变内容提供函数列表，默认只追加当前日期
+    """
+
+    def __init__(self, sections: Sequence[VolatileSection] | None = None) -> None:
+        super().__init__()
+        self.sections = list(sections) if sections is not None else [current_date_section]
+
+    async def awrap_model_call(
+        self,
+        request: ModelRequest,
+        handler: Callable[[ModelRequest], Awaitable[ModelResponse]],
+    ) -> ModelResponse | AIMessage:
+        parts = [text for section in self.sections if (text := section(request))]
+        if not parts:
+            return await handler(request)
+        suffix = "\n\n---\n\n" + "\n".join(parts)
+        return await handler(request.override(system_prompt=(request.system_prompt or "") + suffix))
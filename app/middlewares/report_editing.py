@@ -0,0 +1,308 @@
+"""
+按章节编辑报告 (Report Section Editing) 中间件
+
+研究代理原本以整个文件为单位写入和重写 `final_report.md`：每轮审阅后的修订都要重新输出整份报告，
+前端在运行结束前也看不到报告内容。此中间件为主代理提供按标题寻址的章节工具：
+- `upsert_report_section`: 写入或整体替换一个章节（不存在时新建）
+- `append_report_section`: 向章节末尾追加内容
+- `patch_report_section`: 在章节内做精确的字符串替换
+
+修订的输出 token 与改动大小成正比。每次写入后通过 LangGraph 的 custom 流推送结构化的
+`report_section` 事件（被替换的行范围 + 新章节原文），前端据此逐节显示报告。
+
+事件携带写入前后报告的版本号（内容哈希）：前端持有的版本与 `base_revision` 一致时按行范围拼接，
+否则（刷新页面、中途加入、漏收事件）从线程状态接口重新获取报告全文。主代理用 `write_file` / `edit_file`
+直接改写报告时同样推送事件（`op` 为 `write` / `edit`，行范围为整份报告），只有这类事件附带报告全文 `content`。
+"""
+
+import asyncio
+import hashlib
+import threading
+from collections.abc import Awaitable, Callable
+
+from deepagents.backends.protocol import BackendFactory, BackendProtocol
+from langchain.agents.middleware import AgentMiddleware
+from langchain.agents.middleware.types import ToolCallRequest
+from langchain.tools import ToolRuntime, tool
+from langchain_core.messages import ToolMessage
+from langchain_core.tools import BaseTool
+from langgraph.types import Command
+from structlog.stdlib import get_logger
+
+from app.utils.report_sections import (
+    find_section,
+    normalize_heading,
+    read_backend_text,
+    report_lines,
+    section_headings,
+    write_backend_text,
+)
+
+logger = get_logger(__name__)
+
+REPORT_SECTION_EVENT = "report_section"
+UPSERT_SECTION_TOOL = "upsert_report_section"
+APPEND_SECTION_TOOL = "append_report_section"
+PATCH_SECTION_TOOL = "patch_report_section"
+# 直接改写报告文件的 deepagents 文件工具 -> 事件 op
+_FILE_TOOL_OPS = {"write_file": "write", "edit_file": "edit"}
+
+
+def report_revision(text: str | None) -> str | None:
+    """报告版本号（内容哈希），报告不存在时为 None"""
+    return None if text is None else hashlib.sha1(text.encode()).hexdigest()[:16]
+
+
+def _body_lines(heading: str, content: str) -> list[str]:
+    """章节正文行；模型在正文开头重复了标题行时去掉"""
+    lines = report_lines(content.strip("\n"))
+    if lines and lines[0].lstrip().startswith("#") and normalize_heading(lines[0]) == normalize_heading(heading):
+        lines = lines[1:]
+    while lines and not lines[0].strip():
+        lines = lines[1:]
+    return lines
+
+
+def _section_lines(heading: str, level: int, body: list[str]) -> list[str]:
+    """完整章节行：标题行 + 空行 + 正文，末尾保留一个空行与下一章节分隔"""
+    title = f"{'#' * level} {' '.join(heading.strip().lstrip('#').split())}"
+    return [title, "", *body, ""] if body else [title, ""]
+
+
+class ReportEditingMiddleware(AgentMiddleware):
+    """
+    按章节编辑报告的中间件，向主代理提供 upsert / append / patch 三个章节工具。
+
+    同一中间件实例内的章节写入串行执行（读取-修改-写入），模型并行调用多个章节工具也不会互相覆盖，
+    事件在写入的同一临界区内推送，前端收到的顺序与写入顺序一致。
+
+    Args:
+        backend: 报告所在的文件后端，或根据 ToolRuntime 创建后端的工厂函数
+        report_path: 报告文件路径
+    """
+
+    def __init__(
+        self,
+        backend: BackendProtocol | BackendFactory,
+        report_path: str = "/final_report.md",
+    ) -> None:
+        super().__init__()
+        self.backend = backend
+        self.report_path = report_path
+        self._lock = threading.Lock()
+        self.tools = self._create_tools()
+
+    def _get_backend(self, runtime: ToolRuntime) -> BackendProtocol:
+        if callable(self.backend):
+            return self.backend(runtime)
+        return self.backend
+
+    async def awrap_tool_call(
+        self,
+        request: ToolCallRequest,
+        handler: Callable[[ToolCallRequest], Awaitable[ToolMessage | Command]],
+    ) -> ToolMessage | Command:
+        op = _FILE_TOOL_OPS.get(request.tool_call["name"])
+        path = (request.tool_call.get("args") or {}).get("file_path") or ""
+        if op is None or "/" + path.lstrip("/") != self.report_path:
+            return await handler(request)
+
+        backend = self._get_backend(request.runtime)
+        previous = await asyncio.to_thread(read_backend_text, backend, self.report_path)
+        result = await handler(request)
+        await asyncio.to_thread(self._emit_rewrite, request.runtime, op, backend, previous)
+        return result
+
+    def _create_tools(self) -> list[BaseTool]:
+        middleware = self
+
+        @tool(UPSERT_SECTION_TOOL)
+        def upsert_report_section(
+            heading: str,
+            content: str,
+            runtime: ToolRuntime,
+            level: int = 2,
+            after: str | None = None,
+        ) -> str:
+            """Write a section of the final report, replacing it (including its subsections) if it already exists.
+
+            Use this to write the report one section at a time and to rewrite a section after a critique.
+            The heading line is added for you; do not repeat it in `content`.
+
+            Args:
+                heading: Section heading text without the leading `#`s (e.g. "Overview").
+                content: Markdown body of the section.
+                level: Heading level for a new section (1 for the report title, 2 for sections, 3 for subsections).
+                    An existing section keeps its heading line.
+                after: For a new section, the heading of the section it should follow. Defaults to the end of the report.
+            """
+
+            def edit(lines: list[str]) -> tuple[int, int, list[str]] | str:
+                span = find_section(lines, heading)
+                if span is not None:
+                    # 已有章节保留原标题行（级别和写法），只替换正文
+                    start, end, _ = span
+                    body = _body_lines(heading, content)
+                    return start, end, [lines[start], "", *body, ""] if body else [lines[start], ""]
+                index = len(lines)
+                if after is not None:
+                    anchor = find_section(lines, after)
+                    if anchor is None:
+                        return _missing_section(after, lines)
+                    index = anchor[1]
+                section = _section_lines(heading, level, _body_lines(heading, content))
+                if index > 0 and lines[index - 1].strip():
+                    section = ["", *section]
+                return index, index, section
+
+            return middleware._edit(runtime, "upsert", heading, edit)
+
+        @tool(APPEND_SECTION_TOOL)
+        def append_report_section(heading: str, content: str, runtime: ToolRuntime, level: int = 2) -> str:
+            """Append Markdown to the end of a section of the final report (after its subsections).
+
+            Creates the section at the end of the report if it does not exist yet.
+
+            Args:
+                heading: Section heading text without the leading `#`s.
+                content: Markdown to append.
+                level: Heading level if the section has to be created.
+            """
+
+            def edit(lines: list[str]) -> tuple[int, int, list[str]] | str:
+                span = find_section(lines, heading)
+                body = _body_lines(heading, content)
+                if span is None:
+                    section = _section_lines(heading, level, body)
+                    if lines and lines[-1].strip():
+                        section = ["", *section]
+                    return len(lines), len(lines), section
+                start, end, _ = span
+                existing = lines[start:end]
+                while len(existing) > 1 and not existing[-1].strip():
+                    existing.pop()
+                return start, end, [*existing, "", *body, ""]
+
+            return middleware._edit(runtime, "append", heading, edit)
+
+        @tool(PATCH_SECTION_TOOL)
+        def patch_report_section(
+            heading: str,
+            old_string: str,
+            new_string: str,
+            runtime: ToolRuntime,
+            replace_all: bool = False,
+        ) -> str:
+            """Replace an exact string inside one section of the final report.
+
+            Use this for small corrections (a sentence, a number, a citation) instead of rewriting the section.
+
+            Args:
+                heading: Heading of the section that contains the text.
+                old_string: Exact text to replace; must occur exactly once in the section unless `replace_all` is true.
+                new_string: Replacement text.
+                replace_all: Replace every occurrence in the section.
+            """
+
+            def edit(lines: list[str]) -> tuple[int, int, list[str]] | str:
+                span = find_section(lines, heading)
+                if span is None:
+                    return _missing_section(heading, lines)
+                start, end, _ = span
+                text = "\n".join(lines[start:end])
+                occurrences = text.count(old_string) if old_string else 0
+                if occurrences == 0:
+                    return f"Error: old_string not found in section {heading!r}"
+                if occurrences > 1 and not replace_all:
+                    return (
+                        f"Error: old_string occurs {occurrences} times in section {heading!r}; "
+                        "include more context or set replace_all"
+                    )
+                return start, end, text.replace(old_string, new_string).split("\n")
+
+            return middleware._edit(runtime, "patch", heading, edit)
+
+        return [upsert_report_section, append_report_section, patch_report_section]
+
+    def _edit(
+        self,
+        runtime: ToolRuntime,
+        op: str,
+        heading: str,
+        edit: Callable[[list[str]], tuple[int, int, list[str]] | str],
+    ) -> str:
+        """读取报告、应用章节编辑并写回，成功后推送 `report_section` 事件"""
+        backend = self._get_backend(runtime)
+        with self._lock:
+            previous = read_backend_text(backend, self.report_path)
+            lines = report_lines(previous)
+            result = edit(lines)
+            if isinstance(result, str):
+                return result
+            start, end, new_lines = result
+            updated = [*lines[:start], *new_lines, *lines[end:]]
+            content = "\n".join(updated) + "\n"
+            error = write_backend_text(backend, self.report_path, content, previous)
+            if error:
+                return error
+            self._emit(runtime, op, heading, start, end, new_lines, previous, content)
+
+        created = start == end
+        logger.info(
+            "report_section_written",
+            op=op,
+            heading=heading,
+            created=created,
+            section_chars=sum(len(line) + 1 for line in new_lines),
+            report_lines=len(updated),
+        )
+        action = "Created" if created else "Updated"
+        return f"{action} section {heading!r} in {self.report_path} (report now has {len(updated)} lines)."
+
+    def _emit_rewrite(self, runtime: ToolRuntime, op: str, backend: BackendProtocol, previous: str | None) -> None:
+        """文件工具改写报告后推送事件；在写入锁内读取当前报告，推送顺序与章节写入一致"""
+        with self._lock:
+            current = read_backend_text(backend, self.report_path)
+            if current is None or current == previous:
+                return
+            # 整份报告被改写，行范围覆盖写入前的全部行
+            self._emit(
+                runtime, op, "", 0, len(report_lines(previous)), report_lines(current), previous, current, full=True
+            )
+
+    def _emit(
+        self,
+        runtime: ToolRuntime,
+        op: str,
+        heading: str,
+        start: int,
+        end: int,
+        new_lines: list[str],
+        previous: str | None,
+        content: str,
+        full: bool = False,
+    ) -> None:
+        """推送 `report_section` 事件；`full` 为 True 时附带报告全文（整份报告被改写）"""
+        event = {
+            "type": REPORT_SECTION_EVENT,
+            "op": op,
+            "path": self.report_path,
+            "heading": heading,
+            "created": start == end,
+            # 被替换的行范围（以写入前的报告计，0 起始，不含 end_line），前端用 text 的各行替换这一范围
+            "start_line": start,
+            "end_line": end,
+            "text": "\n".join(new_lines),
+            "line_count": len(report_lines(content)),
+            # 写入前后的报告版本；前端版本与 base_revision 不一致时从状态接口重新获取报告
+            "base_revision": report_revision(previous),
+            "revision": report_revision(content),
+        }
+        if full:
+            event["content"] = content
+        runtime.stream_writer(event)
+
+
+def _missing_section(heading: str, lines: list[str]) -> str:
+    outline = ", ".join(section_headings(lines)) or "(report is empty)"
+    return f"Error: section {heading!r} not found. Existing sections: {outline}"
@@ -0,0 +1,84 @@
+"""
+历史摘要 (History Summarization) 中间件
+
+deepagents 内置的摘要中间件在 170k token 才触发，且在事件循环中同步调用模型。此中间件：
+- 消息历史超过 HISTORY_SUMMARY_TRIGGER_TOKENS 时，把较早的轮次替换为一条摘要消息，
+  保留最近 HISTORY_SUMMARY_KEEP_MESSAGES 条消息（不拆开工具调用与其结果）
+- 异步调用摘要模型，不阻塞事件循环
+- 被摘要替换的工具结果的页面来源保存在摘要消息上，引用编号不受影响
+
+与工具输出卸载配合使用时放在其后：先卸载已读过的工具原文，剩余历史仍然过长时才做摘要。
+"""
+
+from typing import Any, cast
+
+from langchain.agents.middleware import AgentState, SummarizationMiddleware
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AnyMessage, HumanMessage, RemoveMessage
+from langgraph.graph.message import REMOVE_ALL_MESSAGES
+from langgraph.runtime import Runtime
+from structlog.stdlib import get_logger
+
+from app.core.config import settings
+from app.utils.citations import CITATION_SOURCES_KEY, collect_sources
+
+logger = get_logger(__name__)
+
+
+class HistorySummarizationMiddleware(SummarizationMiddleware):
+    """
+    历史摘要中间件。
+
+    Args:
+        model: 生成摘要的模型
+        trigger_tokens: 消息历史超过该大小（估算 token）时摘要
+        messages_to_keep: 摘要后保留的最近消息数
+    """
+
+    def __init__(
+        self,
+        model: BaseChatModel,
+        trigger_tokens: int = settings.HISTORY_SUMMARY_TRIGGER_TOKENS,
+        messages_to_keep: int = settings.HISTORY_SUMMARY_KEEP_MESSAGES,
+    ) -> None:
+        super().__init__(model=model, max_tokens_before_summary=trigger_tokens, messages_to_keep=messages_to_keep)
+
+    async def abefore_model(self, state: AgentState, runtime: Runtime) -> dict[str, Any] | None:
+        messages = state["messages"]
+        self._ensure_message_ids(messages)
+
+        tokens = self.token_counter(messages)
+        if tokens < cast("int", self.max_tokens_before_summary):
+            return None
+        cutoff = self._find_safe_cutoff(messages)
+        if cutoff <= 0:
+            return None
+
+        summarized, preserved = self._partition_messages(messages, cutoff)
+        summary = await self._acreate_summary(summarized)
+        if summary is None:
+            # 摘要失败时保留原历史，下次调用模型时重试
+            return None
+        sources = [source.to_dict() for source in collect_sources(summarized)]
+        logger.info("history_summarized", summarized_messages=len(summarized), tokens=tokens, sources=len(sources))
+        return {
+            "messages": [
+                RemoveMessage(id=REMOVE_ALL_MESSAGES),
+                HumanMessage(
+                    content=f"Here is a summary of the conversation to date:\n\n{summary}",
+                    additional_kwargs={CITATION_SOURCES_KEY: sources} if sources else {},
+                ),
+                *preserved,
+            ]
+        }
+
+    async def _acreate_summary(self, messages: list[AnyMessage]) -> str | None:
+        trimmed = self._trim_messages_for_summary(messages)
+        if not trimmed:
+            return "Previous conversation was too long to summarize."
+        try:
+            response = await self.model.ainvoke(self.summary_prompt.format(messages=trimmed))
+        except Exception as e:
+            logger.warning("history_summary_failed", error=f"{type(e).__name__}: {e}")
+            return None
+        return cast("str", response.content).strip()
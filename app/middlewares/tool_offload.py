@@ -0,0 +1,160 @@
+"""
+工具输出卸载 (Tool Output Offload) 中间件
+
+长时间的研究运行中，每次调用模型都会重发此前全部 `confluence_get_page` 等工具的原始输出，
+输入 token 和延迟随轮数近似平方增长。此中间件在调用模型前：
+- 找出已被模型读过（其后已有模型回复）、体积较大的工具输出
+- 这部分输出累计超过 TOOL_OUTPUT_OFFLOAD_TRIGGER_TOKENS 时一次性卸载：原文写入线程文件存储，
+  状态中的消息替换为紧凑的 JSON 存根（页面 id / 标题 / URL、开头摘录、取回方式）
+- 模型需要细节时调用 `read_tool_output` 按需取回原文
+
+存根保留页面来源结构，引用中间件仍能按原顺序编号；卸载按批次进行，两次卸载之间消息前缀保持不变，
+不影响提供方前缀缓存。
+"""
+
+import json
+import re
+from typing import Any
+
+from deepagents.backends.utils import create_file_data
+from langchain.agents.middleware import AgentMiddleware, AgentState
+from langchain.tools import ToolRuntime, tool
+from langchain_core.messages import AIMessage, AnyMessage, ToolMessage
+from langchain_core.messages.utils import count_tokens_approximately
+from langgraph.config import get_config
+from langgraph.runtime import Runtime
+from structlog.stdlib import get_logger
+
+from app.backends import DEFAULT_THREAD_ID, get_thread_file_store
+from app.core.config import settings
+from app.utils.citations import extract_sources, message_text
+
+logger = get_logger(__name__)
+
+READ_TOOL_OUTPUT_TOOL = "read_tool_output"
+
+# 卸载后的原文在线程文件存储中的目录
+_OFFLOAD_DIR = "/tool_outputs"
+# 存根中保留的开头摘录长度（字符）
+_PREVIEW_CHARS = 300
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def _offload_path(ref: str) -> str:
+    return f"{_OFFLOAD_DIR}/{re.sub(r'[^\w.-]', '_', ref)}.txt"
+
+
+def _is_offloaded(message: ToolMessage) -> bool:
+    return message_text(message.content).startswith('{"offloaded_tool_output"')
+
+
+def _preview(text: str) -> str:
+    """原文开头摘录；`confluence_get_page` 等返回 JSON 时优先摘录正文字段"""
+    try:
+        data = json.loads(text)
+    except ValueError:
+        data = None
+    if isinstance(data, dict) and isinstance(data.get("content"), str):
+        text = data["content"]
+    text = _WHITESPACE_RE.sub(" ", text).strip()
+    return text if len(text) <= _PREVIEW_CHARS else text[:_PREVIEW_CHARS] + "…"
+
+
+def _stub(message: ToolMessage, text: str) -> str:
+    ref = message.tool_call_id
+    return json.dumps(
+        {
+            "offloaded_tool_output": ref,
+            "tool": message.name,
+            "sources": [{"id": s.page_id, "title": s.title, "url": s.url} for s in extract_sources(text)],
+            "preview": _preview(text),
+            "note": f"Full output removed from context. Call {READ_TOOL_OUTPUT_TOOL}(ref={ref!r}) if you need details.",
+        },
+        ensure_ascii=False,
+    )
+
+
+@tool(READ_TOOL_OUTPUT_TOOL)
+def read_tool_output(
+    ref: str,
+    runtime: ToolRuntime,
+    offset: int = 0,
+    limit: int = 8000,
+) -> str:
+    """Read the full text of an earlier tool output that was removed from context.
+
+    Args:
+        ref: The `offloaded_tool_output` value from the stub.
+        offset: Character offset to start reading from.
+        limit: Maximum number of characters to return.
+    """
+    text = get_thread_file_store().backend_factory(runtime).read_text(_offload_path(ref))
+    if text is None:
+        return f"Error: no offloaded tool output with ref {ref!r}"
+    chunk = text[offset : offset + limit]
+    if offset + limit < len(text):
+        chunk += f"\n\n[{len(text) - offset - limit} more characters; call again with offset={offset + limit}]"
+    return chunk
+
+
+class ToolOutputOffloadMiddleware(AgentMiddleware):
+    """
+    工具输出卸载中间件。
+
+    Args:
+        min_tokens: 小于该大小（估算 token）的工具输出保留原文
+        trigger_tokens: 已读过、未卸载的大体积工具输出累计超过该值时批量卸载
+        exclude_tools: 不卸载的工具（`read_tool_output` 本身总是排除）
+    """
+
+    tools = [read_tool_output]
+
+    def __init__(
+        self,
+        min_tokens: int = settings.TOOL_OUTPUT_OFFLOAD_MIN_TOKENS,
+        trigger_tokens: int = settings.TOOL_OUTPUT_OFFLOAD_TRIGGER_TOKENS,
+        exclude_tools: tuple[str, ...] = (),
+    ) -> None:
+        super().__init__()
+        self.min_tokens = min_tokens
+        self.trigger_tokens = trigger_tokens
+        self.exclude_tools = {READ_TOOL_OUTPUT_TOOL, *exclude_tools}
+
+    def _candidates(self, messages: list[AnyMessage]) -> list[tuple[ToolMessage, str, int]]:
+        """已被模型读过、体积较大且尚未卸载的工具输出"""
+        last_ai = max((i for i, m in enumerate(messages) if isinstance(m, AIMessage)), default=-1)
+        candidates = []
+        for message in messages[:last_ai]:
+            if (
+                not isinstance(message, ToolMessage)
+                or message.name in self.exclude_tools
+                or message.status == "error"
+                or _is_offloaded(message)
+            ):
+                continue
+            tokens = count_tokens_approximately([message])
+            if tokens >= self.min_tokens:
+                candidates.append((message, message_text(message.content), tokens))
+        return candidates
+
+    def before_model(self, state: AgentState, runtime: Runtime) -> dict[str, Any] | None:
+        candidates = self._candidates(state["messages"])
+        tokens = sum(candidate[2] for candidate in candidates)
+        if not candidates or tokens < self.trigger_tokens:
+            return None
+
+        thread_id = str(get_config().get("configurable", {}).get("thread_id") or DEFAULT_THREAD_ID)
+        store = get_thread_file_store()
+        updates = []
+        for message, text, _tokens in candidates:
+            store.put_file(thread_id, _offload_path(message.tool_call_id), create_file_data(text))
+            updates.append(message.model_copy(update={"content": _stub(message, text)}))
+
+        logger.info("tool_outputs_offloaded", count=len(updates), tokens=tokens, thread_id=thread_id)
+        return {"messages": updates}
+
+    async def abefore_model(self, state: AgentState, runtime: Runtime) -> dict[str, Any] | None:
+        thread_id = str(get_config().get("configurable", {}).get("thread_id") or DEFAULT_THREAD_ID)
+        # 冷线程从 SQLite 加载是同步 I/O，先在线程池中完成，卸载时的写入只访问内存
+        await get_thread_file_store().preload(thread_id)
+        return self.before_model(state, runtime)
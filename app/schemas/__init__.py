@@ -0,0 +1,36 @@
+"""
+数据模型模块 - 跨模块共用的 pydantic 模型。
+
+此模块包含以下子模块：
+
+1. **sign_check** - 扫描件签名检查
+   - SignaturePosition / SignCheckResult: 视觉模型输出校验
+   - SignCheckRecord: 批处理结果记录
+
+2. **parse_job** - 文档解析任务
+   - ParseJob: 解析队列中的任务（页面更新或上传文件）
+
+"""
+
+# ============================================================================
+# 文档解析任务
+# ============================================================================
+from app.schemas.parse_job import ParseJob
+
+# ============================================================================
+# 签名检查
+# ============================================================================
+from app.schemas.sign_check import SignaturePosition, SignCheckRecord, SignCheckResult
+
+# ============================================================================
+# 导出列表 - 定义公共 API
+# ============================================================================
+
+__all__ = [
+    # 签名检查
+    "SignaturePosition",
+    "SignCheckResult",
+    "SignCheckRecord",
+    # 文档解析任务
+    "ParseJob",
+]
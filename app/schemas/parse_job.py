@@ -0,0 +1,45 @@
+"""
+文档解析任务的数据模型。
+
+- `ParseJob`: 解析队列中的一条任务（页面更新或上传文件），序列化为 JSON 在队列中传递
+"""
+
+import uuid
+from datetime import datetime
+from typing import Self
+
+from pydantic import BaseModel, Field, model_validator
+
+from app.enums import ParseJobKind
+
+
+class ParseJob(BaseModel):
+    """文档解析任务"""
+
+    kind: ParseJobKind
+    """任务类型"""
+
+    page_id: str | None = None
+    """页面 id（page_update 必填）"""
+
+    path: str | None = None
+    """相对 UPLOAD_DIR 的文件路径（file 必填）"""
+
+    job_id: str = Field(default_factory=lambda: uuid.uuid4().hex)
+    """任务 id"""
+
+    created_at: datetime = Field(default_factory=datetime.now)
+    """入队时间"""
+
+    @model_validator(mode="after")
+    def _check_target(self) -> Self:
+        if self.kind == ParseJobKind.PAGE_UPDATE and not self.page_id:
+            raise ValueError("page_update jobs require page_id")
+        if self.kind == ParseJobKind.FILE and not self.path:
+            raise ValueError("file jobs require path")
+        return self
+
+    @property
+    def key(self) -> str:
+        """任务目标：同一目标的任务结果相同，可以合并；Kafka 中作为消息 key，保证同一目标的任务有序"""
+        return f"page:{self.page_id}" if self.kind == ParseJobKind.PAGE_UPDATE else f"file:{self.path}"
@@ -0,0 +1,76 @@
+"""
+签名检查的数据模型。
+
+- `SignaturePosition` / `SignCheckResult`: 校验视觉模型按 CHECK_IMAGE_SIGN_PROMPT 输出的 JSON
+- `SignCheckRecord`: 批处理结果文件（JSONL）中的一行
+"""
+
+from datetime import datetime
+from typing import Any
+
+from pydantic import BaseModel, Field, RootModel
+
+from app.enums import SignatureStatus
+
+
+class SignaturePosition(BaseModel):
+    """单个签名位置的检查结果"""
+
+    status: SignatureStatus
+    """状态代码"""
+
+    description: str = ""
+    """问题说明（非 ok/na 时由模型填写）"""
+
+
+class SignCheckResult(RootModel[dict[str, SignaturePosition]]):
+    """视觉模型输出 {位置名称: 检查结果}，无签名位置时为空对象"""
+
+    @property
+    def worst_status(self) -> SignatureStatus | None:
+        """所有位置中最严重的状态，无签名位置时为 None"""
+        if not self.root:
+            return None
+        return max((position.status for position in self.root.values()), key=lambda status: status.severity)
+
+
+class SignCheckRecord(BaseModel):
+    """批处理中单个文档的处理记录"""
+
+    document: str
+    """文档路径"""
+
+    document_id: str
+    """文档内容哈希，用于断点续跑时识别已处理的文档"""
+
+    ok: bool
+    """是否处理成功"""
+
+    positions: dict[str, SignaturePosition] = Field(default_factory=dict)
+    """各签名位置的检查结果"""
+
+    worst_status: SignatureStatus | None = None
+    """最严重的状态"""
+
+    error: str | None = None
+    """最后一次失败的错误信息"""
+
+    attempts: int = 0
+    """模型调用次数（含重试）"""
+
+    latency_ms: float = 0.0
+    """处理耗时（毫秒）"""
+
+    model: str | None = None
+    """使用的视觉模型"""
+
+    decided_by: str = "model"
+    """结果来源：model（视觉模型）或 predetect（预检测直接判定）"""
+
+    input_bytes: int | None = None
+    """实际发送给模型的图片字节数（未发送时为 None）"""
+
+    regions: list[dict[str, Any]] = Field(default_factory=list)
+    """预检测的候选签名区域及指标"""
+
+    checked_at: datetime = Field(default_factory=datetime.now)
@@ -0,0 +1,83 @@
+"""
+生产服务模块 - 多 worker 部署与进程间共享的 MCP 会话。
+
+此模块包含以下子模块：
+
+1. **mcp_sidecar** - MCP 边车进程
+   - McpSidecar: 为每个 MCP 服务器保持一个长期会话，通过 Unix socket 向所有 worker 提供工具调用
+   - McpSidecarClient: worker 侧客户端，把边车提供的工具转换为 LangChain 工具
+   - run_sidecar: 边车进程入口
+
+2. **mcp_supervisor** - MCP 服务器进程监管
+   - McpServerSupervisor: 健康检查（ping / 卡死检测）、热备进程、故障切换与退避重启
+   - ServerUnavailableError: 服务器暂无可用进程
+
+3. **asgi** - 生产服务 ASGI 应用（`app.server.asgi:app`），启动后在后台预先构建 Agent 图
+
+4. **graphs** - Agent 图实例池
+   - GraphPool: 每个 assistant 只构建一次，预热失败时退避重试
+   - load_graph_factories: 从 langgraph.json 读取 assistant_id 与图工厂的映射
+
+5. **langgraph_api** - 前端（deep-agents-ui）使用的 LangGraph API 子集：assistants / threads / 流式运行
+
+6. **threads** - 线程登记表
+   - ThreadRegistry: 线程的创建时间、元数据、运行状态与标题（与 checkpointer 共用 SQLite 文件）
+   - get_thread_registry: 获取全局登记表单例
+
+7. **main** - 启动入口（`python -m app.server.main`）：边车进程 + uvicorn 多 worker + 优雅停机
+
+8. **bench** - 启动耗时基准（`python -m app.server.bench`）：入口模块导入耗时与首个请求延迟
+
+"""
+
+import importlib
+from typing import Any
+
+# ============================================================================
+# 按需导入
+# ============================================================================
+# 子模块依赖 mcp / langchain_core，按需导入：worker 进程导入 `app.server.asgi` 时不加载 MCP 客户端
+
+_EXPORTS = {
+    # MCP 边车
+    "McpSidecar": "app.server.mcp_sidecar",
+    "McpSidecarClient": "app.server.mcp_sidecar",
+    "run_sidecar": "app.server.mcp_sidecar",
+    # MCP 服务器监管
+    "McpServerSupervisor": "app.server.mcp_supervisor",
+    "ServerUnavailableError": "app.server.mcp_supervisor",
+    # Agent 图实例池
+    "GraphPool": "app.server.graphs",
+    "load_graph_factories": "app.server.graphs",
+    # 线程登记表
+    "ThreadRegistry": "app.server.threads",
+    "get_thread_registry": "app.server.threads",
+}
+
+
+def __getattr__(name: str) -> Any:
+    module_name = _EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return getattr(importlib.import_module(module_name), name)
+
+
+# ============================================================================
+# 导出列表 - 定义公共 API
+# ============================================================================
+
+__all__ = [
+    # MCP 边车
+    "McpSidecar",
+    "McpSidecarClient",
+    "run_sidecar",
+    # MCP 服务器监管
+    "McpServerSupervisor",
+    "ServerUnavailableError",
+    # Agent 图实例池
+    "GraphPool",
+    "load_graph_factories",
+    # 线程登记表
+    "ThreadRegistry",
+    "get_thread_registry",
+]
@@ -0,0 +1,165 @@
+"""
+生产服务 ASGI 应用
+
+每个 worker 进程一份：导入本模块不构建图，也不加载 langchain / MCP 客户端。启动后（lifespan）在后台
+预先构建全部 Agent 图（`SERVER_WARMUP_GRAPHS`，见 `app/server/graphs.py`），构建期间服务即可接受连接，健康检查返回 503，
+构建完成后返回 200；构建失败时按指数退避重试，直到全部就绪。未预热的图在首个请求到达时按需构建，
+之后的请求直接复用已编译的图实例。线程状态通过共享的 SQLite checkpointer 在 worker 之间共享，
+MCP 工具经边车进程调用（见 `app/server/mcp_sidecar.py`）。
+
+接口：
+- `GET /health`: 健康检查，全部 Agent 图就绪后返回 200（进程存活但图未就绪时返回 503）
+- `POST /runs/stream`: 流式运行 Agent（SSE：`message` 回答文本、`report_section` 报告章节写入、`error`、`end`），body 为
+  `{"assistant_id": "universal_qa", "input": {"messages": [...]}, "thread_id": "..."}`，
+  `thread_id` 可省略（新建线程，响应头 `X-Thread-Id` 返回线程 id）
+- `POST /runs/wait`: 同上，等待运行结束后返回完整回答
+- 前端使用的 LangGraph API 子集（assistants / threads / `POST /threads/{thread_id}/runs/stream`，见 `app/server/langgraph_api.py`）
+- `GET /metrics/rate-limits`: Confluence 限流器统计（本 worker 与 MCP 边车的队列深度、并发上限、限流次数）
+- `GET /metrics/llm-pool`: LLM 连接池统计（本 worker 各提供方的在途请求数、排队等待次数与时长）
+- `GET /metrics/mcp`: MCP 服务器监管统计（当前进程代数、热备状态、故障切换与重启次数）
+- `app/api.py` 中的自定义路由（签字检查、解析任务）
+"""
+
+import asyncio
+import json
+import uuid
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Any
+
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+from structlog.stdlib import get_logger
+
+from app.api import app as custom_app
+from app.core.config import settings
+from app.core.llm_pool import get_llm_pool_stats
+from app.core.log_adapter import setup_logging
+from app.core.rate_limit import get_rate_limit_stats
+from app.server import langgraph_api
+from app.server.graphs import graphs
+
+logger = get_logger(__name__)
+
+_sidecar_client: Any = None
+
+
+# ============================================================================
+# 请求处理
+# ============================================================================
+
+
+async def _parse_run(request: Request) -> tuple[Any, Any, dict[str, Any]] | JSONResponse:
+    """解析运行请求，返回 (graph, input, config) 或错误响应"""
+    body = await request.json()
+    assistant_id = body.get("assistant_id", "universal_qa")
+    try:
+        graph = await graphs.get(assistant_id)
+    except KeyError:
+        return JSONResponse({"error": f"unknown assistant_id: {assistant_id}"}, status_code=404)
+    thread_id = body.get("thread_id") or str(uuid.uuid4())
+    return graph, body.get("input"), {"configurable": {"thread_id": thread_id}}
+
+
+def _sse(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def health(_request: Request) -> JSONResponse:
+    return JSONResponse({"ready": graphs.ready}, status_code=200 if graphs.ready else 503)
+
+
+async def stream_run(request: Request) -> Response:
+    parsed = await _parse_run(request)
+    if isinstance(parsed, JSONResponse):
+        return parsed
+    graph, input, config = parsed
+    from app.utils.citations import astream_with_citations
+
+    async def events() -> AsyncIterator[str]:
+        try:
+            async for item in astream_with_citations(graph, input, config, custom_events=True):
+                if isinstance(item, str):
+                    yield _sse("message", item)
+                else:
+                    yield _sse(item.get("type", "custom"), item)
+        except Exception as e:
+            logger.exception("run_failed", thread_id=config["configurable"]["thread_id"])
+            yield _sse("error", f"{type(e).__name__}: {e}")
+        yield _sse("end", None)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"X-Thread-Id": config["configurable"]["thread_id"], "Cache-Control": "no-cache"},
+    )
+
+
+async def wait_run(request: Request) -> JSONResponse:
+    parsed = await _parse_run(request)
+    if isinstance(parsed, JSONResponse):
+        return parsed
+    graph, input, config = parsed
+    from app.utils.citations import astream_with_citations
+
+    answer = "".join([text async for text in astream_with_citations(graph, input, config)])
+    thread_id = config["configurable"]["thread_id"]
+    return JSONResponse({"thread_id": thread_id, "answer": answer}, headers={"X-Thread-Id": thread_id})
+
+
+async def _sidecar_request(op: str) -> Any:
+    """向 MCP 边车查询统计；未使用边车或查询失败时返回 None"""
+    global _sidecar_client
+    from langchain_core.tools import ToolException
+
+    from app.server.mcp_sidecar import McpSidecarClient
+
+    if not (settings.MCP_SIDECAR_SOCKET and Path(settings.MCP_SIDECAR_SOCKET).exists()):
+        return None
+    _sidecar_client = _sidecar_client or McpSidecarClient(settings.MCP_SIDECAR_SOCKET)
+    try:
+        return await _sidecar_client.request(op)
+    except (OSError, ToolException) as e:
+        logger.warning("sidecar_request_failed", op=op, error=f"{type(e).__name__}: {e}")
+        return None
+
+
+async def rate_limit_metrics(_request: Request) -> JSONResponse:
+    return JSONResponse({"worker": get_rate_limit_stats(), "sidecar": await _sidecar_request("rate_limit_stats")})
+
+
+async def llm_pool_metrics(_request: Request) -> JSONResponse:
+    return JSONResponse({"worker": get_llm_pool_stats()})
+
+
+async def mcp_metrics(_request: Request) -> JSONResponse:
+    return JSONResponse({"sidecar": await _sidecar_request("mcp_stats")})
+
+
+@asynccontextmanager
+async def lifespan(_app: Starlette) -> AsyncIterator[None]:
+    setup_logging()
+    warmup = asyncio.create_task(graphs.warm()) if settings.SERVER_WARMUP_GRAPHS else None
+    logger.info("server_worker_started", graphs=graphs.assistant_ids, warmup=warmup is not None)
+    yield
+    if warmup is not None and not warmup.done():
+        warmup.cancel()
+    logger.info("server_worker_stopped")
+
+
+app = Starlette(
+    routes=[
+        Route("/health", health, methods=["GET"]),
+        Route("/runs/stream", stream_run, methods=["POST"]),
+        Route("/runs/wait", wait_run, methods=["POST"]),
+        Route("/metrics/rate-limits", rate_limit_metrics, methods=["GET"]),
+        Route("/metrics/llm-pool", llm_pool_metrics, methods=["GET"]),
+        Route("/metrics/mcp", mcp_metrics, methods=["GET"]),
+        *langgraph_api.routes,
+        *custom_app.routes,
+    ],
+    lifespan=lifespan,
+)
@@ -0,0 +1,191 @@
+"""
+启动耗时基准 (Startup Benchmark)
+
+测量两部分耗时，每次测量都在新的子进程中进行，避免模块缓存影响结果：
+
+1. 导入耗时：导入入口模块（`main`、`app.server.asgi`、`app.api`）所需时间，并检查导入是否有副作用
+   ——是否加载了 langchain / deepagents / MCP 客户端、是否初始化了日志、是否启动了后台线程
+2. 首个请求延迟：启动单 worker 的 `app.server.asgi:app`，记录开始接受连接的时间、全部 Agent 图就绪的时间，
+   以及首个需要 Agent 图的请求与随后同一请求的延迟。默认请求 `GET /threads/{id}/state`（只构建图、不调用模型），
+   指定 `--question` 时改为 `POST /runs/wait`
+
+命令行用法::
+
+    python -m app.server.bench --repeat 5
+    python -m app.server.bench --no-warmup --assistant-id confluence
+    python -m app.server.bench --skip-serve --module main
+"""
+
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from typing import Any
+
+import httpx
+
+# 导入后检查是否已加载的重量级依赖
+HEAVY_MODULES = ("langchain", "langchain_core", "langgraph", "deepagents", "mcp", "langchain_mcp_adapters")
+
+DEFAULT_MODULES = ("main", "app.server.asgi", "app.api")
+
+# 在子进程中执行：导入模块并输出耗时与副作用
+_IMPORT_PROBE = """
+import json, logging, sys, threading, time
+started = time.perf_counter()
+import {module}
+seconds = time.perf_counter() - started
+print(json.dumps({{
+    "seconds": seconds,
+    "heavy_modules": [name for name in {heavy!r} if name in sys.modules],
+    "logging_configured": bool(logging.getLogger().handlers),
+    "threads": threading.active_count(),
+}}))
+"""
+
+
+# ============================================================================
+# 导入耗时
+# ============================================================================
+
+
+def measure_import(module: str, repeat: int) -> dict[str, Any]:
+    """在 `repeat` 个新进程中分别导入模块，返回耗时统计与最后一次的副作用检查结果"""
+    samples: list[float] = []
+    probe: dict[str, Any] = {}
+    for _ in range(repeat):
+        completed = subprocess.run(
+            [sys.executable, "-c", _IMPORT_PROBE.format(module=module, heavy=HEAVY_MODULES)],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        probe = json.loads(completed.stdout.strip().splitlines()[-1])
+        samples.append(probe["seconds"])
+    return {
+        "module": module,
+        "median_seconds": round(statistics.median(samples), 4),
+        "min_seconds": round(min(samples), 4),
+        "max_seconds": round(max(samples), 4),
+        "heavy_modules": probe["heavy_modules"],
+        "logging_configured": probe["logging_configured"],
+        "threads": probe["threads"],
+    }
+
+
+# ============================================================================
+# 首个请求延迟
+# ============================================================================
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _timed_request(client: httpx.Client, method: str, url: str, **kwargs: Any) -> dict[str, Any]:
+    started = time.perf_counter()
+    response = client.request(method, url, **kwargs)
+    return {"status": response.status_code, "seconds": round(time.perf_counter() - started, 4)}
+
+
+def measure_first_request(
+    assistant_id: str,
+    question: str | None = None,
+    warmup: bool = True,
+    timeout: float = 300.0,
+) -> dict[str, Any]:
+    """
+    启动单 worker 服务并测量首个请求延迟。
+
+    Args:
+        assistant_id: 请求使用的 Agent
+        question: 指定时发送 `POST /runs/wait`（会调用模型），否则请求线程状态（只构建图）
+        warmup: worker 启动后是否在后台预先构建 Agent 图（`SERVER_WARMUP_GRAPHS`）
+        timeout: 等待服务启动、图就绪和单个请求的最长时间（秒）
+    """
+    port = _free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    # 与 `app.server.main` 一样使用 SQLite checkpointer；未配置时写入临时目录，不污染 ./data
+    checkpoint_dir = tempfile.TemporaryDirectory(prefix="bench-")
+    env = {
+        **os.environ,
+        "SERVER_WARMUP_GRAPHS": str(warmup).lower(),
+        "CHECKPOINT_DB_PATH": os.environ.get("CHECKPOINT_DB_PATH") or f"{checkpoint_dir.name}/checkpoints.db",
+    }
+    command = [sys.executable, "-m", "uvicorn", "app.server.asgi:app", "--port", str(port), "--log-level", "warning"]
+
+    started = time.perf_counter()
+    process = subprocess.Popen(command, env=env)
+    result: dict[str, Any] = {"assistant_id": assistant_id, "warmup": warmup}
+    try:
+        with httpx.Client(base_url=base_url, timeout=timeout) as client:
+            # 开始接受连接（健康检查有响应，不论图是否就绪）
+            while "listening_seconds" not in result:
+                if process.poll() is not None:
+                    raise RuntimeError(f"server exited with code {process.returncode}")
+                if time.perf_counter() - started > timeout:
+                    raise TimeoutError("server did not start listening")
+                try:
+                    client.get("/health")
+                    result["listening_seconds"] = round(time.perf_counter() - started, 4)
+                except httpx.TransportError:
+                    time.sleep(0.02)
+
+            # 预热模式下等待全部图就绪；未就绪（构建失败或超时）时记为 None
+            result["ready_seconds"] = None
+            while warmup and time.perf_counter() - started < timeout:
+                if client.get("/health").status_code == 200:
+                    result["ready_seconds"] = round(time.perf_counter() - started, 4)
+                    break
+                time.sleep(0.05)
+
+            if question is None:
+                path = f"/threads/{uuid.uuid4()}/state"
+                request: dict[str, Any] = {"method": "GET", "url": path, "params": {"assistant_id": assistant_id}}
+            else:
+                body = {"assistant_id": assistant_id, "input": {"messages": [{"role": "user", "content": question}]}}
+                request = {"method": "POST", "url": "/runs/wait", "json": body}
+            result["first_request"] = _timed_request(client, **request)
+            result["second_request"] = _timed_request(client, **request)
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+        checkpoint_dir.cleanup()
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="测量入口模块导入耗时与首个请求延迟")
+    parser.add_argument("--module", action="append", default=[], help="要测量导入耗时的模块（可重复）")
+    parser.add_argument("--repeat", type=int, default=3, help="每个模块的导入次数（各自新进程）")
+    parser.add_argument("--assistant-id", default="universal_qa", help="首个请求使用的 Agent")
+    parser.add_argument("--question", default=None, help="发送 /runs/wait 的问题（默认只请求线程状态，不调用模型）")
+    parser.add_argument("--no-warmup", action="store_true", help="不在后台预先构建图，测量按需构建的首个请求")
+    parser.add_argument("--timeout", type=float, default=300.0, help="等待服务就绪与单个请求的最长时间（秒）")
+    parser.add_argument("--skip-serve", action="store_true", help="只测量导入耗时")
+    args = parser.parse_args()
+
+    report: dict[str, Any] = {
+        "imports": [measure_import(module, args.repeat) for module in args.module or DEFAULT_MODULES]
+    }
+    if not args.skip_serve:
+        report["first_request"] = measure_first_request(
+            args.assistant_id, question=args.question, warmup=not args.no_warmup, timeout=args.timeout
+        )
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
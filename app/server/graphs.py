@@ -0,0 +1,109 @@
+"""
+Agent 图实例池 (Graph Pool)
+
+assistant_id 与图工厂的映射读取自 langgraph.json 的 `graphs`（SERVER_GRAPHS_CONFIG），与 `langgraph dev`
+使用同一份配置：部署时替换 langgraph.json 即可切换对外提供的 Agent，前端的 assistant_id 无需改动。
+配置文件不存在时使用内置的 `GRAPH_FACTORIES`。
+
+每个 worker 进程一个图实例池：每个 assistant 只构建一次，并发请求共享同一个已编译的图。
+后台预热失败（如模型或 MCP 服务暂不可用）时按指数退避重试，直到全部图就绪，健康检查随之恢复。
+"""
+
+import asyncio
+import importlib
+import json
+import time
+from pathlib import Path
+from typing import Any
+
+from structlog.stdlib import get_logger
+
+from app.core.config import settings
+
+logger = get_logger(__name__)
+
+# 内置的 assistant_id -> Agent 工厂（与仓库中的 langgraph.json 一致）
+GRAPH_FACTORIES = {
+    "universal_qa": "app.agents.universal_assistant:create_universal_qa_agent_async",
+    "confluence": "app.agents.confluence_agent:create_confluence_research_agent_async",
+}
+
+# 预热重试的初始与最长间隔（秒）
+_WARMUP_RETRY_SECONDS = 5.0
+_WARMUP_MAX_RETRY_SECONDS = 300.0
+
+
+def load_graph_factories(config_path: str | Path) -> dict[str, str]:
+    """
+    读取 langgraph.json 中的图定义，转换为 `module:attr` 形式（`./main.py:factory` -> `main:factory`）。
+
+    配置文件不存在或没有 `graphs` 时返回内置的 `GRAPH_FACTORIES`。
+    """
+    path = Path(config_path)
+    if not path.is_file():
+        return dict(GRAPH_FACTORIES)
+    graphs = json.loads(path.read_text(encoding="utf-8")).get("graphs") or {}
+    factories = {}
+    for assistant_id, target in graphs.items():
+        file, _, attr = target.rpartition(":")
+        module = file.removeprefix("./").removesuffix(".py").replace("/", ".")
+        factories[assistant_id] = f"{module}:{attr}"
+    return factories or dict(GRAPH_FACTORIES)
+
+
+class GraphPool:
+    """
+    worker 进程内的 Agent 图实例池：每个 assistant 只构建一次，并发请求共享同一个已编译的图。
+
+    Args:
+        factories: assistant_id 到异步工厂函数（`module:attr`）的映射
+    """
+
+    def __init__(self, factories: dict[str, str]) -> None:
+        self._factories = factories
+        self._graphs: dict[str, Any] = {}
+        self._lock = asyncio.Lock()
+
+    @property
+    def assistant_ids(self) -> list[str]:
+        return list(self._factories)
+
+    @property
+    def ready(self) -> bool:
+        return len(self._graphs) == len(self._factories)
+
+    async def get(self, assistant_id: str) -> Any:
+        """获取 Agent 图，未构建时构建（未知 assistant_id 抛出 KeyError）"""
+        if assistant_id in self._graphs:
+            return self._graphs[assistant_id]
+        module_name, attr = self._factories[assistant_id].split(":")
+        async with self._lock:
+            if assistant_id not in self._graphs:
+                # 首次导入 Agent 模块（deepagents / langchain）耗时数秒，放到线程中执行，不阻塞事件循环
+                module = await asyncio.to_thread(importlib.import_module, module_name)
+                factory = getattr(module, attr)
+                self._graphs[assistant_id] = await factory()
+                logger.info("graph_built", assistant_id=assistant_id)
+        return self._graphs[assistant_id]
+
+    async def warm(
+        self, retry_seconds: float = _WARMUP_RETRY_SECONDS, max_retry_seconds: float = _WARMUP_MAX_RETRY_SECONDS
+    ) -> None:
+        """预先构建全部 Agent 图；有图构建失败时按指数退避重试，直到全部就绪（或任务被取消）"""
+        started = time.perf_counter()
+        delay = retry_seconds
+        while True:
+            for assistant_id in self._factories:
+                try:
+                    await self.get(assistant_id)
+                except Exception:
+                    logger.exception("graph_warmup_failed", assistant_id=assistant_id)
+            if self.ready:
+                break
+            logger.warning("graph_warmup_retry", retry_in_seconds=delay)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, max_retry_seconds)
+        logger.info("graph_warmup_finished", ready=self.ready, seconds=round(time.perf_counter() - started, 3))
+
+
+graphs = GraphPool(load_graph_factories(settings.SERVER_GRAPHS_CONFIG))
@@ -0,0 +1,452 @@
+"""
+LangGraph API 兼容接口 (LangGraph API Subset)
+
+前端（deep-agents-ui）通过 `@langchain/langgraph-sdk` 的 `Client` / `useStream` 访问后端。本模块在生产服务中实现
+其用到的 LangGraph API 子集，前端无需区分后端是 `langgraph dev` 还是 `python -m app.server.main`：
+- `POST /assistants/search`、`GET /assistants/{assistant_id}`: assistant 即 langgraph.json 中的图（assistant_id = graph_id）
+- `POST /threads`、`GET /threads/{thread_id}`、`DELETE /threads/{thread_id}`、`POST /threads/search`:
+  线程元数据见 `app.server.threads`
+- `GET /threads/{thread_id}/state`、`GET|POST /threads/{thread_id}/history`: 线程状态读取自共享的 checkpointer；
+  `state` 的 `values.files` 补充线程文件存储中的文件（报告），前端刷新页面后可恢复报告
+- `POST /threads/{thread_id}/runs/stream`: 流式运行（SSE），支持 `values` / `updates` / `custom` / `messages-tuple`
+  （以及 `debug` / `tasks` / `checkpoints`）流模式和 `stream_subgraphs`
+
+主图回答的消息块按引用中间件推送的来源列表实时改写引用编号（规则同 `astream_with_citations`），
+流式显示的编号与运行结束后状态中的最终回答一致。
+
+未实现：后台运行（`/runs` 创建后轮询）、断线后按 run_id 重新加入流（响应不带 `Content-Location`，
+SDK 不会尝试重连）、assistant 版本管理、cron 与 store 接口。客户端断开连接时运行随之取消。
+"""
+
+import asyncio
+import dataclasses
+import json
+import time
+import uuid
+from collections.abc import AsyncIterator
+from datetime import UTC, datetime
+from typing import Any
+
+from starlette.requests import Request
+from starlette.responses import Response, StreamingResponse
+from starlette.routing import Route
+from structlog.stdlib import get_logger
+
+from app.server.graphs import graphs
+from app.server.threads import get_thread_registry
+
+logger = get_logger(__name__)
+
+# LangGraph 流模式 -> astream 的 stream_mode（`messages-tuple` 即 astream 的 `messages`）
+_STREAM_MODES = {
+    "values": "values",
+    "updates": "updates",
+    "custom": "custom",
+    "messages-tuple": "messages",
+    "debug": "debug",
+    "tasks": "tasks",
+    "checkpoints": "checkpoints",
+}
+
+_STARTED_AT = datetime.now(UTC).isoformat()
+
+
+# ============================================================================
+# 序列化
+# ============================================================================
+
+
+def _default(value: Any) -> Any:
+    """LangGraph API 的 JSON 表示：消息等 pydantic 模型按字段导出，无法表示的值转为字符串"""
+    if hasattr(value, "model_dump"):
+        return value.model_dump()
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        return dataclasses.asdict(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, set | frozenset):
+        return list(value)
+    return str(value)
+
+
+def _dumps(data: Any) -> str:
+    return json.dumps(data, ensure_ascii=False, default=_default)
+
+
+def _json(data: Any, status_code: int = 200) -> Response:
+    return Response(_dumps(data), status_code=status_code, media_type="application/json")
+
+
+def _error(message: str, status_code: int) -> Response:
+    return _json({"detail": message}, status_code)
+
+
+def _sse(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {_dumps(data)}\n\n"
+
+
+async def _body(request: Request) -> dict[str, Any]:
+    body = await request.body()
+    return json.loads(body) if body else {}
+
+
+def _checkpoint(config: dict[str, Any] | None) -> dict[str, Any] | None:
+    configurable = (config or {}).get("configurable") or {}
+    if not configurable.get("checkpoint_id"):
+        return None
+    return {
+        "thread_id": configurable.get("thread_id"),
+        "checkpoint_ns": configurable.get("checkpoint_ns", ""),
+        "checkpoint_id": configurable["checkpoint_id"],
+    }
+
+
+def _thread_state(snapshot: Any) -> dict[str, Any]:
+    """StateSnapshot -> LangGraph API 的 ThreadState"""
+    tasks = [
+        {
+            "id": task.id,
+            "name": task.name,
+            "error": f"{type(task.error).__name__}: {task.error}" if task.error else None,
+            "interrupts": [dataclasses.asdict(interrupt) for interrupt in task.interrupts],
+            "checkpoint": None,
+            "state": None,
+            "result": task.result,
+        }
+        for task in snapshot.tasks
+    ]
+    return {
+        "values": snapshot.values,
+        "next": list(snapshot.next),
+        "tasks": tasks,
+        "interrupts": [interrupt for task in tasks for interrupt in task["interrupts"]],
+        "checkpoint": _checkpoint(snapshot.config),
+        "parent_checkpoint": _checkpoint(snapshot.parent_config),
+        "metadata": snapshot.metadata or {},
+        "created_at": snapshot.created_at,
+    }
+
+
+def _assistant(assistant_id: str) -> dict[str, Any]:
+    return {
+        "assistant_id": assistant_id,
+        "graph_id": assistant_id,
+        "name": assistant_id,
+        "description": None,
+        "config": {},
+        "context": {},
+        "metadata": {"created_by": "system"},
+        "version": 1,
+        "created_at": _STARTED_AT,
+        "updated_at": _STARTED_AT,
+    }
+
+
+def _first_human_text(input: Any) -> str | None:
+    """输入中第一条用户消息的文本，用作线程标题"""
+    from app.utils.citations import message_text
+
+    messages = input.get("messages") if isinstance(input, dict) else None
+    for message in messages or []:
+        if isinstance(message, dict) and (message.get("type") == "human" or message.get("role") == "user"):
+            return message_text(message.get("content")) or None
+    return None
+
+
+# ============================================================================
+# 引用编号改写
+# ============================================================================
+
+
+class _CitationRewriter:
+    """
+    改写主图模型输出的消息块中的引用编号。
+
+    只在收到引用中间件推送的来源列表后生效（未挂载引用中间件的 Agent 最终回答不会被重写，流式内容也保持原样）；
+    每次模型调用按其来源列表重新开始解析，上一条消息缓冲的剩余文本作为该消息的最后一个块输出。
+    """
+
+    def __init__(self) -> None:
+        self._resolver: Any = None
+        self._last: tuple[Any, dict[str, Any]] | None = None
+
+    def reset(self, sources: list[dict[str, Any]]) -> tuple[Any, dict[str, Any]] | None:
+        from app.utils.citations import CitationResolver, CitationSource
+
+        tail = self._tail(drain=True)
+        self._resolver = CitationResolver([CitationSource(**source) for source in sources])
+        self._last = None
+        return tail
+
+    def rewrite(self, message: Any, metadata: dict[str, Any]) -> Any:
+        from langchain_core.messages import AIMessageChunk
+
+        from app.utils.citations import message_text
+
+        # 子图（子代理）的命名空间形如 `tools:<id>|model:<id>`
+        if (
+            self._resolver is None
+            or not isinstance(message, AIMessageChunk)
+            or message.tool_call_chunks
+            or "|" in metadata.get("langgraph_checkpoint_ns", "")
+        ):
+            return message
+        self._last = (message, metadata)
+        return message.model_copy(update={"content": self._resolver.feed(message_text(message.content))})
+
+    def finish(self) -> tuple[Any, dict[str, Any]] | None:
+        return self._tail(drain=False)
+
+    def _tail(self, drain: bool) -> tuple[Any, dict[str, Any]] | None:
+        if self._resolver is None or self._last is None:
+            return None
+        text = self._resolver.drain() if drain else self._resolver.finish()
+        if not text:
+            return None
+        message, metadata = self._last
+        return message.model_copy(update={"content": text, "response_metadata": {}, "usage_metadata": None}), metadata
+
+
+# ============================================================================
+# Assistants
+# ============================================================================
+
+
+async def search_assistants(request: Request) -> Response:
+    body = await _body(request)
+    assistant_ids = [a for a in graphs.assistant_ids if body.get("graph_id") in (None, a)]
+    offset = int(body.get("offset", 0))
+    return _json([_assistant(a) for a in assistant_ids[offset : offset + int(body.get("limit", 10))]])
+
+
+async def get_assistant(request: Request) -> Response:
+    assistant_id = request.path_params["assistant_id"]
+    if assistant_id not in graphs.assistant_ids:
+        return _error(f"assistant not found: {assistant_id}", 404)
+    return _json(_assistant(assistant_id))
+
+
+# ============================================================================
+# Threads
+# ============================================================================
+
+
+async def create_thread(request: Request) -> Response:
+    body = await _body(request)
+    thread_id = body.get("thread_id") or str(uuid.uuid4())
+    registry = get_thread_registry()
+    if body.get("if_exists", "raise") == "raise" and await asyncio.to_thread(registry.get, thread_id):
+        return _error(f"thread already exists: {thread_id}", 409)
+    return _json(await asyncio.to_thread(registry.create, thread_id, body.get("metadata")))
+
+
+async def get_thread(request: Request) -> Response:
+    thread_id = request.path_params["thread_id"]
+    thread = await asyncio.to_thread(get_thread_registry().get, thread_id)
+    return _json(thread) if thread else _error(f"thread not found: {thread_id}", 404)
+
+
+async def delete_thread(request: Request) -> Response:
+    from app.backends import get_checkpointer
+
+    thread_id = request.path_params["thread_id"]
+    deleted = await asyncio.to_thread(get_thread_registry().delete, thread_id)
+    if (checkpointer := get_checkpointer()) is not None:
+        await checkpointer.adelete_thread(thread_id)
+    return Response(status_code=204) if deleted else _error(f"thread not found: {thread_id}", 404)
+
+
+async def search_threads(request: Request) -> Response:
+    body = await _body(request)
+    threads = await asyncio.to_thread(
+        get_thread_registry().search,
+        limit=int(body.get("limit", 10)),
+        offset=int(body.get("offset", 0)),
+        sort_by=body.get("sort_by") or "created_at",
+        sort_order=body.get("sort_order") or "desc",
+        metadata=body.get("metadata"),
+        status=body.get("status"),
+    )
+    return _json(threads)
+
+
+async def _thread_graph(request: Request, thread_id: str) -> Any:
+    """线程所属的 Agent 图：线程登记的 assistant，其次为查询参数 `assistant_id`，最后为第一个 assistant"""
+    thread = await asyncio.to_thread(get_thread_registry().get, thread_id)
+    assistant_id = (
+        (thread or {}).get("metadata", {}).get("graph_id")
+        or request.query_params.get("assistant_id")
+        or graphs.assistant_ids[0]
+    )
+    return await graphs.get(assistant_id)
+
+
+async def _thread_files(thread_id: str) -> dict[str, str]:
+    """线程文件存储中的文件原文 {path: content}：报告等文件不在图状态中，前端刷新页面后从这里恢复"""
+    from deepagents.backends.utils import file_data_to_string
+
+    from app.backends import get_thread_file_store
+
+    store = get_thread_file_store()
+    await store.preload(thread_id)
+    return {path: file_data_to_string(data) for path, data in dict(store.get_files(thread_id)).items()}
+
+
+async def get_thread_state(request: Request) -> Response:
+    thread_id = request.path_params["thread_id"]
+    try:
+        graph = await _thread_graph(request, thread_id)
+    except KeyError as e:
+        return _error(f"unknown assistant_id: {e}", 404)
+    snapshot = await graph.aget_state({"configurable": {"thread_id": thread_id}})
+    state = _thread_state(snapshot)
+    if isinstance(state["values"], dict) and "files" not in state["values"]:
+        state["values"] = {**state["values"], "files": await _thread_files(thread_id)}
+    return _json(state)
+
+
+async def get_thread_history(request: Request) -> Response:
+    thread_id = request.path_params["thread_id"]
+    body = await _body(request) if request.method == "POST" else dict(request.query_params)
+    try:
+        graph = await _thread_graph(request, thread_id)
+    except KeyError as e:
+        return _error(f"unknown assistant_id: {e}", 404)
+
+    config: dict[str, Any] = {"configurable": {"thread_id": thread_id, "checkpoint_ns": ""}}
+    if checkpoint_id := (body.get("checkpoint") or {}).get("checkpoint_id"):
+        config["configurable"]["checkpoint_id"] = checkpoint_id
+    before = body.get("before")
+    if isinstance(before, dict) and before.get("checkpoint_id"):
+        before = {"configurable": {"thread_id": thread_id, "checkpoint_id": before["checkpoint_id"]}}
+    else:
+        before = None
+    states = [
+        _thread_state(snapshot)
+        async for snapshot in graph.aget_state_history(
+            config, filter=body.get("metadata") or None, before=before, limit=int(body.get("limit", 10))
+        )
+    ]
+    return _json(states)
+
+
+# ============================================================================
+# Runs
+# ============================================================================
+
+
+def _run_config(thread_id: str, body: dict[str, Any]) -> dict[str, Any]:
+    config = dict(body.get("config") or {})
+    configurable = {**(config.get("configurable") or {}), "thread_id": thread_id}
+    # 从指定 checkpoint 继续（前端编辑消息后重新提交时使用）
+    checkpoint = body.get("checkpoint") or {}
+    if checkpoint_id := checkpoint.get("checkpoint_id") or body.get("checkpoint_id"):
+        configurable.update(checkpoint_id=checkpoint_id, checkpoint_ns=checkpoint.get("checkpoint_ns", ""))
+    config["configurable"] = configurable
+    if body.get("metadata"):
+        config["metadata"] = {**(config.get("metadata") or {}), **body["metadata"]}
+    return config
+
+
+def _run_input(body: dict[str, Any]) -> Any:
+    command = body.get("command")
+    if not command:
+        return body.get("input")
+    from langgraph.types import Command
+
+    return Command(resume=command.get("resume"), update=command.get("update"), goto=command.get("goto") or ())
+
+
+async def _run_events(
+    graph: Any,
+    body: dict[str, Any],
+    thread_id: str,
+    assistant_id: str,
+) -> AsyncIterator[str]:
+    from app.utils.citations import CITATION_SOURCES_EVENT
+
+    requested = body.get("stream_mode") or ["values"]
+    requested = [requested] if isinstance(requested, str) else list(requested)
+    modes = {_STREAM_MODES[mode] for mode in requested if mode in _STREAM_MODES}
+    if unsupported := [mode for mode in requested if mode not in _STREAM_MODES]:
+        logger.info("stream_modes_unsupported", modes=unsupported)
+    forward_custom = "custom" in modes
+    if "messages" in modes:
+        # 引用中间件通过 custom 流推送来源列表，用于改写消息块中的引用编号
+        modes.add("custom")
+    subgraphs = bool(body.get("stream_subgraphs"))
+    kwargs = {"context": body["context"]} if body.get("context") else {}
+
+    run_id = str(uuid.uuid4())
+    registry = get_thread_registry()
+    await asyncio.to_thread(registry.start_run, thread_id, assistant_id, _first_human_text(body.get("input")))
+    logger.info("run_started", thread_id=thread_id, run_id=run_id, assistant_id=assistant_id, stream_mode=requested)
+    started = time.perf_counter()
+    status = "idle"
+    rewriter = _CitationRewriter()
+    yield _sse("metadata", {"run_id": run_id, "attempt": 1})
+    try:
+        async for item in graph.astream(
+            _run_input(body),
+            _run_config(thread_id, body),
+            stream_mode=sorted(modes),
+            subgraphs=subgraphs,
+            **kwargs,
+        ):
+            namespace, mode, chunk = item if subgraphs else ((), *item)
+            suffix = "".join(f"|{part}" for part in namespace)
+            if mode == "custom":
+                if isinstance(chunk, dict) and chunk.get("type") == CITATION_SOURCES_EVENT and not namespace:
+                    if tail := rewriter.reset(chunk.get("sources", [])):
+                        yield _sse("messages", list(tail))
+                if forward_custom:
+                    yield _sse(f"custom{suffix}", chunk)
+            elif mode == "messages":
+                message, metadata = chunk
+                yield _sse(f"messages{suffix}", [rewriter.rewrite(message, metadata), metadata])
+            else:
+                yield _sse(f"{mode}{suffix}", chunk)
+        if tail := rewriter.finish():
+            yield _sse("messages", list(tail))
+    except Exception as e:
+        status = "error"
+        logger.exception("run_failed", thread_id=thread_id, run_id=run_id)
+        yield _sse("error", {"error": type(e).__name__, "message": str(e)})
+    finally:
+        # 客户端断开时生成器在取消状态下退出，不能再 await：直接同步更新（单行写入）
+        registry.finish_run(thread_id, status)
+        logger.info(
+            "run_finished",
+            thread_id=thread_id,
+            run_id=run_id,
+            status=status,
+            seconds=round(time.perf_counter() - started, 3),
+        )
+
+
+async def stream_thread_run(request: Request) -> Response:
+    thread_id = request.path_params["thread_id"]
+    body = await _body(request)
+    assistant_id = body.get("assistant_id") or graphs.assistant_ids[0]
+    try:
+        graph = await graphs.get(assistant_id)
+    except KeyError:
+        return _error(f"unknown assistant_id: {assistant_id}", 404)
+    return StreamingResponse(
+        _run_events(graph, body, thread_id, assistant_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+routes = [
+    Route("/assistants/search", search_assistants, methods=["POST"]),
+    Route("/assistants/{assistant_id}", get_assistant, methods=["GET"]),
+    Route("/threads", create_thread, methods=["POST"]),
+    Route("/threads/search", search_threads, methods=["POST"]),
+    Route("/threads/{thread_id}", get_thread, methods=["GET"]),
+    Route("/threads/{thread_id}", delete_thread, methods=["DELETE"]),
+    Route("/threads/{thread_id}/state", get_thread_state, methods=["GET"]),
+    Route("/threads/{thread_id}/history", get_thread_history, methods=["GET", "POST"]),
+    Route("/threads/{thread_id}/runs/stream", stream_thread_run, methods=["POST"]),
+]
@@ -0,0 +1,91 @@
+"""
+生产服务启动入口
+
+`langgraph dev` 是单进程开发服务器。生产环境使用：
+
+    python -m app.server.main --workers 8
+
+启动流程：
+1. 启动 MCP 边车进程，等待其 socket 就绪（所有 worker 共享同一个 mcp-atlassian 子进程）
+2. 启动 uvicorn 多 worker：每个 worker 启动后在后台预先构建全部 Agent 图，全部就绪前健康检查返回 503；
+   assistant 取自 langgraph.json（SERVER_GRAPHS_CONFIG），前端通过 LangGraph API 子集访问（见 `app/server/langgraph_api.py`）
+3. 收到 SIGTERM / SIGINT 时停止接受新连接，等待在途请求最多 SERVER_DRAIN_SECONDS 秒，再停止边车
+
+worker 之间通过 SQLite checkpointer 共享线程状态（未配置 CHECKPOINT_DB_PATH 时使用 ./data/checkpoints.db）。
+"""
+
+import argparse
+import multiprocessing
+import os
+import tempfile
+import time
+from pathlib import Path
+
+from structlog.stdlib import get_logger
+
+from app.core.config import settings
+from app.core.log_adapter import setup_logging
+from app.server.mcp_sidecar import run_sidecar
+
+logger = get_logger(__name__)
+
+# 边车首次启动可能需要 uvx 下载 mcp-atlassian
+_SIDECAR_START_TIMEOUT = 180.0
+
+
+def start_sidecar(socket_path: Path, config_path: Path) -> multiprocessing.Process | None:
+    """启动 MCP 边车进程并等待 socket 就绪；失败时返回 None（各 worker 自行连接 MCP 服务器）"""
+    socket_path.unlink(missing_ok=True)
+    process = multiprocessing.get_context("spawn").Process(
+        target=run_sidecar, args=(str(socket_path), str(config_path)), name="mcp-sidecar", daemon=True
+    )
+    process.start()
+    deadline = time.monotonic() + _SIDECAR_START_TIMEOUT
+    while not socket_path.exists():
+        if not process.is_alive() or time.monotonic() > deadline:
+            logger.warning("mcp_sidecar_start_failed", exitcode=process.exitcode)
+            process.terminate()
+            return None
+        time.sleep(0.2)
+    logger.info("mcp_sidecar_ready", socket=str(socket_path), pid=process.pid)
+    return process
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="多 worker 生产服务")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=2024)
+    parser.add_argument("--workers", type=int, default=settings.SERVER_WORKERS or os.cpu_count() or 1)
+    parser.add_argument("--mcp-config", type=Path, default=Path(".mcp.json"))
+    args = parser.parse_args()
+
+    setup_logging()
+    # worker 由 spawn 启动，通过环境变量获得共享配置
+    checkpoint_db = settings.CHECKPOINT_DB_PATH or "./data/checkpoints.db"
+    os.environ["CHECKPOINT_DB_PATH"] = checkpoint_db
+
+    socket_path = Path(settings.MCP_SIDECAR_SOCKET or Path(tempfile.gettempdir()) / f"mcp-sidecar-{os.getpid()}.sock")
+    sidecar = start_sidecar(socket_path, args.mcp_config) if args.mcp_config.exists() else None
+    if sidecar is not None:
+        os.environ["MCP_SIDECAR_SOCKET"] = str(socket_path)
+
+    import uvicorn
+
+    logger.info("server_starting", workers=args.workers, port=args.port, checkpoint_db=checkpoint_db)
+    try:
+        uvicorn.run(
+            "app.server.asgi:app",
+            host=args.host,
+            port=args.port,
+            workers=args.workers,
+            timeout_graceful_shutdown=int(settings.SERVER_DRAIN_SECONDS),
+            log_config=None,
+        )
+    finally:
+        if sidecar is not None:
+            sidecar.terminate()
+            sidecar.join(timeout=10)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+"""
+MCP 边车进程 (MCP Sidecar)
+
+`MultiServerMCPClient.get_tools()` 返回的工具每次调用都会新建会话，stdio 服务器（`uvx mcp-atlassian`）
+因此每次工具调用都启动一个子进程；多个 worker 进程各自初始化还会成倍增加。边车进程：
+- 按 `.mcp.json` 为每个 MCP 服务器保持长期会话，多个请求在同一会话上并发；
+  进程由监管器管理（健康检查、热备切换、退避重启，见 `app/server/mcp_supervisor.py`）
+- 通过本地 Unix socket 向同一容器内的所有 worker 提供工具列表和工具调用
+- 协议为按行分隔的 JSON，请求带 id，同一连接上可以并发多个请求
+- Confluence 限流器（`app/core/rate_limit.py`）在边车中生效，所有 worker 的工具调用共享同一份速率与并发配额
+
+worker 侧的 `McpSidecarClient` 把边车提供的工具转换为 LangChain 工具，调用语义与 langchain-mcp-adapters 一致
+（工具返回错误时抛出 ToolException）。
+"""
+
+import asyncio
+import itertools
+import json
+import os
+import signal
+from pathlib import Path
+from typing import Any
+
+from langchain_core.tools import BaseTool, StructuredTool, ToolException
+from structlog.stdlib import get_logger
+
+from app.core.rate_limit import call_mcp_tool_limited, get_rate_limit_stats
+from app.server.mcp_supervisor import McpServerSupervisor, tool_result_content
+
+logger = get_logger(__name__)
+
+# 单行消息上限：页面原文可能很大
+_STREAM_LIMIT = 64 * 1024 * 1024
+
+
+def _encode(message: dict[str, Any]) -> bytes:
+    return json.dumps(message, ensure_ascii=False).encode() + b"\n"
+
+
+# ============================================================================
+# 边车服务端
+# ============================================================================
+
+
+class McpSidecar:
+    """
+    MCP 边车服务端（在独立进程中运行）。
+
+    Args:
+        socket_path: Unix socket 路径
+        config_path: MCP 配置文件（Claude Code `.mcp.json` 格式）
+    """
+
+    def __init__(self, socket_path: str | Path, config_path: str | Path = ".mcp.json") -> None:
+        self.socket_path = Path(socket_path)
+        self.config_path = Path(config_path)
+        self._supervisors: dict[str, McpServerSupervisor] = {}
+        self._tools: list[dict[str, Any]] = []
+
+    async def _connect(self) -> None:
+        from app.agents.confluence_agent import _convert_mcp_json_config, _load_mcp_config
+
+        config = await asyncio.to_thread(_load_mcp_config, self.config_path)
+        for server_name, connection in _convert_mcp_json_config(config).items():
+            supervisor = self._supervisors[server_name] = McpServerSupervisor(server_name, connection)
+            await supervisor.start()
+            tools = await supervisor.list_tools()
+            self._tools += [
+                {
+                    "server": server_name,
+                    "name": tool.name,
+                    "description": tool.description or "",
+                    "input_schema": tool.inputSchema,
+                }
+                for tool in tools
+            ]
+            logger.info("mcp_sidecar_server_connected", server=server_name, tool_count=len(tools))
+
+    async def _dispatch(self, request: dict[str, Any]) -> dict[str, Any]:
+        op = request.get("op")
+        if op == "list_tools":
+            return {"result": self._tools}
+        if op == "call_tool":
+            supervisor = self._supervisors.get(request.get("server", ""))
+            if supervisor is None:
+                return {"error": f"unknown MCP server: {request.get('server')}"}
+            name, arguments = request["name"], request.get("arguments") or {}
+            result = await call_mcp_tool_limited(name, lambda: supervisor.call_tool(name, arguments))
+            return {"result": {"content": tool_result_content(result), "is_error": bool(result.isError)}}
+        if op == "rate_limit_stats":
+            return {"result": get_rate_limit_stats()}
+        if op == "mcp_stats":
+            return {"result": [supervisor.stats.to_dict() for supervisor in self._supervisors.values()]}
+        if op == "ping":
+            return {"result": "pong"}
+        return {"error": f"unknown op: {op}"}
+
+    async def _handle_request(self, request: dict[str, Any], writer: asyncio.StreamWriter, lock: asyncio.Lock) -> None:
+        try:
+            response = await self._dispatch(request)
+        except Exception as e:
+            response = {"error": f"{type(e).__name__}: {e}"}
+        async with lock:
+            writer.write(_encode({"id": request.get("id"), **response}))
+            await writer.drain()
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        lock = asyncio.Lock()
+        tasks: set[asyncio.Task] = set()
+        try:
+            while line := await reader.readline():
+                task = asyncio.create_task(self._handle_request(json.loads(line), writer, lock))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        except (ConnectionError, ValueError) as e:
+            logger.warning("mcp_sidecar_connection_error", error=f"{type(e).__name__}: {e}")
+        finally:
+            for task in tasks:
+                task.cancel()
+            writer.close()
+
+    async def serve(self, stop: asyncio.Event) -> None:
+        """连接所有 MCP 服务器并开始服务，直到 `stop` 被设置"""
+        try:
+            await self._connect()
+            self.socket_path.parent.mkdir(parents=True, exist_ok=True)
+            self.socket_path.unlink(missing_ok=True)
+            server = await asyncio.start_unix_server(
+                self._handle_connection, path=str(self.socket_path), limit=_STREAM_LIMIT
+            )
+            os.chmod(self.socket_path, 0o600)
+            logger.info("mcp_sidecar_started", socket=str(self.socket_path), tool_count=len(self._tools))
+            try:
+                async with server:
+                    await stop.wait()
+            finally:
+                self.socket_path.unlink(missing_ok=True)
+                logger.info("mcp_sidecar_stopped", socket=str(self.socket_path))
+        finally:
+            for supervisor in self._supervisors.values():
+                await supervisor.aclose()
+
+
+async def _run_sidecar(socket_path: str, config_path: str) -> None:
+    stop = asyncio.Event()
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, stop.set)
+    await McpSidecar(socket_path, config_path).serve(stop)
+
+
+def run_sidecar(socket_path: str, config_path: str = ".mcp.json") -> None:
+    """边车进程入口：收到 SIGTERM 时退出；忽略 SIGINT，由父进程在 worker 排空后停止边车"""
+    from app.core.log_adapter import setup_logging
+
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    setup_logging()
+    asyncio.run(_run_sidecar(socket_path, config_path))
+
+
+# ============================================================================
+# worker 侧客户端
+# ============================================================================
+
+
+class McpSidecarClient:
+    """
+    连接 MCP 边车的客户端（每个 worker 进程一个，单连接多路复用，断开后自动重连）。
+
+    Args:
+        socket_path: 边车的 Unix socket 路径
+    """
+
+    def __init__(self, socket_path: str | Path) -> None:
+        self.socket_path = Path(socket_path)
+        self._ids = itertools.count(1)
+        self._pending: dict[int, asyncio.Future] = {}
+        self._writer: asyncio.StreamWriter | None = None
+        self._reader_task: asyncio.Task | None = None
+        self._connect_lock = asyncio.Lock()
+
+    async def _ensure_connected(self) -> asyncio.StreamWriter:
+        async with self._connect_lock:
+            if self._writer is None or self._writer.is_closing():
+                reader, self._writer = await asyncio.open_unix_connection(str(self.socket_path), limit=_STREAM_LIMIT)
+                self._reader_task = asyncio.create_task(self._read_responses(reader))
+            return self._writer
+
+    async def _read_responses(self, reader: asyncio.StreamReader) -> None:
+        try:
+            while line := await reader.readline():
+                response = json.loads(line)
+                future = self._pending.pop(response.get("id"), None)
+                if future is not None and not future.done():
+                    future.set_result(response)
+        except (ConnectionError, ValueError) as e:
+            logger.warning("mcp_sidecar_client_disconnected", error=f"{type(e).__name__}: {e}")
+        finally:
+            # 连接断开：在途请求全部失败，下一次请求重新连接
+            pending, self._pending = self._pending, {}
+            for future in pending.values():
+                if not future.done():
+                    future.set_exception(ConnectionError("MCP sidecar connection closed"))
+            if self._writer is not None:
+                self._writer.close()
+
+    async def request(self, op: str, **params: Any) -> Any:
+        """发送请求并等待结果"""
+        writer = await self._ensure_connected()
+        request_id = next(self._ids)
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        try:
+            writer.write(_encode({"id": request_id, "op": op, **params}))
+            await writer.drain()
+            response = await future
+        finally:
+            self._pending.pop(request_id, None)
+        if "error" in response:
+            raise ToolException(response["error"])
+        return response["result"]
+
+    async def get_tools(self, server_name: str | None = None) -> list[BaseTool]:
+        """边车提供的工具（转换为 LangChain 工具，调用经边车转发）"""
+        specs = await self.request("list_tools")
+        return [self._tool(spec) for spec in specs if server_name is None or spec["server"] == server_name]
+
+    def _tool(self, spec: dict[str, Any]) -> BaseTool:
+        async def call_tool(**arguments: Any) -> str | list[str]:
+            result = await self.request("call_tool", server=spec["server"], name=spec["name"], arguments=arguments)
+            if result["is_error"]:
+                raise ToolException(result["content"])
+            return result["content"]
+
+        return StructuredTool(
+            name=spec["name"],
+            description=spec["description"],
+            args_schema=spec["input_schema"],
+            coroutine=call_tool,
+        )
+
+    async def aclose(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+        if self._reader_task is not None:
+            self._reader_task.cancel()
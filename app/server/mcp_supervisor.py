@@ -0,0 +1,357 @@
+"""
+MCP 服务器监管 (MCP Server Supervisor)
+
+`uvx mcp-atlassian` 子进程退出或卡死后，后续工具调用会失败或一直等待，缓存的客户端和工具也不会恢复。
+每个 MCP 服务器由一个监管器管理：
+- 保持一个工作进程和一个热备进程（均已完成 MCP 初始化）
+- 后台定期发送 MCP ping，超过 MCP_HANG_THRESHOLD_SECONDS 未响应视为卡死，连接断开视为退出
+- 工作进程故障时立即切换到热备进程，后续调用无需等待超时；因进程退出而中断的在途调用转到新进程重试一次，
+  卡死进程上的在途调用直接返回错误（卡死可能由该调用引起）
+- 故障进程被停止，按指数退避启动新的热备进程
+
+监管器在 MCP 边车中使用（生产服务），未使用边车时也直接在代理进程内使用（`langgraph dev`）。
+"""
+
+import asyncio
+import time
+from dataclasses import asdict, dataclass
+from typing import Any
+
+import anyio
+from langchain_core.tools import BaseTool, StructuredTool, ToolException
+from mcp import ClientSession, McpError
+from mcp.types import CONNECTION_CLOSED, CallToolResult
+from structlog.stdlib import get_logger
+
+from app.core.config import settings
+from app.core.rate_limit import call_mcp_tool_limited
+
+logger = get_logger(__name__)
+
+# 首次重启等待（秒），之后每次连续失败翻倍，上限 MCP_RESTART_BACKOFF_MAX_SECONDS
+_RESTART_BACKOFF_BASE = 1.0
+# stdio 客户端关闭时依次关闭 stdin、SIGTERM、SIGKILL，各等待 2 秒
+_STOP_TIMEOUT = 10.0
+
+
+class ServerUnavailableError(RuntimeError):
+    """MCP 服务器当前没有可用的进程"""
+
+
+def tool_result_content(result: CallToolResult) -> str | list[str]:
+    """MCP 工具结果中的文本内容（单条时为字符串）"""
+    texts = [content.text for content in result.content if getattr(content, "type", None) == "text"]
+    return texts[0] if len(texts) == 1 else texts
+
+
+def _is_connection_error(error: BaseException) -> bool:
+    """进程退出或连接断开导致的错误（工具自身的错误不算）"""
+    if isinstance(error, McpError):
+        return error.error.code == CONNECTION_CLOSED
+    return isinstance(error, anyio.ClosedResourceError | anyio.BrokenResourceError | anyio.EndOfStream | OSError)
+
+
+class _ServerProcess:
+    """一个 MCP 服务器进程及其会话；会话上下文在独立任务中进入和退出"""
+
+    def __init__(self, name: str, connection: dict[str, Any], generation: int) -> None:
+        self.name = name
+        self.generation = generation
+        self.session: ClientSession | None = None
+        self.failed = asyncio.Event()
+        self.hung = False
+        self._connection = connection
+        self._ready = asyncio.Event()
+        self._stop = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+    async def start(self, timeout: float) -> None:
+        """启动进程并完成 MCP 初始化"""
+        self._task = asyncio.create_task(self._run(), name=f"mcp-{self.name}-{self.generation}")
+        ready = asyncio.create_task(self._ready.wait())
+        try:
+            await asyncio.wait({ready, self._task}, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            ready.cancel()
+        if self.session is None:
+            await self.stop()
+            if self._task.done() and not self._task.cancelled() and self._task.exception() is not None:
+                raise ServerUnavailableError(f"MCP server {self.name} failed to start") from self._task.exception()
+            raise ServerUnavailableError(f"MCP server {self.name} did not start within {timeout}s")
+
+    async def _run(self) -> None:
+        from langchain_mcp_adapters.sessions import create_session
+
+        try:
+            async with create_session(self._connection) as session:  # type: ignore[arg-type]
+                await session.initialize()
+                self.session = session
+                self._ready.set()
+                await self._stop.wait()
+        finally:
+            self.session = None
+            self.failed.set()
+
+    async def stop(self) -> None:
+        self.failed.set()
+        self._stop.set()
+        if self._task is None:
+            return
+        try:
+            await asyncio.wait_for(asyncio.shield(self._task), _STOP_TIMEOUT)
+        except TimeoutError:
+            self._task.cancel()
+        except Exception:
+            # 进程已经异常退出
+            pass
+
+
+@dataclass(slots=True)
+class SupervisorStats:
+    """单个 MCP 服务器的监管统计"""
+
+    server: str
+    generation: int = 0
+    """当前工作进程的代数（每启动一个进程加一）"""
+    standby_ready: bool = False
+    failovers: int = 0
+    """切换到热备进程的次数"""
+    restarts: int = 0
+    """后台启动的热备 / 替换进程数"""
+    start_failures: int = 0
+    last_ping_seconds: float | None = None
+    last_failure: str | None = None
+
+    def to_dict(self) -> dict[str, Any]:
+        return asdict(self)
+
+
+class McpServerSupervisor:
+    """
+    MCP 服务器监管器。
+
+    Args:
+        name: 服务器名称（`.mcp.json` 中的键）
+        connection: langchain-mcp-adapters 连接配置
+        ping_interval: 健康检查间隔（秒）
+        hang_threshold: ping 超过该时长未响应视为卡死（秒）
+        warm_standby: 是否保持热备进程
+        start_timeout: 进程启动（含 MCP 初始化）超时（秒）
+        restart_backoff_max: 重启退避的最长等待（秒）
+    """
+
+    def __init__(
+        self,
+        name: str,
+        connection: dict[str, Any],
+        ping_interval: float = settings.MCP_PING_INTERVAL_SECONDS,
+        hang_threshold: float = settings.MCP_HANG_THRESHOLD_SECONDS,
+        warm_standby: bool = settings.MCP_WARM_STANDBY,
+        start_timeout: float = settings.MCP_START_TIMEOUT_SECONDS,
+        restart_backoff_max: float = settings.MCP_RESTART_BACKOFF_MAX_SECONDS,
+    ) -> None:
+        self.name = name
+        self.ping_interval = ping_interval
+        self.hang_threshold = hang_threshold
+        self.warm_standby = warm_standby
+        self.start_timeout = start_timeout
+        self.restart_backoff_max = restart_backoff_max
+        self.stats = SupervisorStats(server=name)
+
+        self._connection = connection
+        self._generation = 0
+        self._active: _ServerProcess | None = None
+        self._standby: _ServerProcess | None = None
+        self._available = asyncio.Event()
+        self._replenish_task: asyncio.Task | None = None
+        self._monitor_task: asyncio.Task | None = None
+        self._tools: list[Any] | None = None
+
+    # ------------------------------------------------------------------
+    # 生命周期
+    # ------------------------------------------------------------------
+
+    async def _spawn(self) -> _ServerProcess:
+        self._generation += 1
+        process = _ServerProcess(self.name, self._connection, self._generation)
+        await process.start(self.start_timeout)
+        logger.info("mcp_server_started", server=self.name, generation=process.generation)
+        return process
+
+    async def start(self) -> None:
+        """启动工作进程（失败时抛出 ServerUnavailableError），热备进程在后台启动"""
+        self._promote(await self._spawn())
+        self._schedule_replenish()
+        self._monitor_task = asyncio.create_task(self._monitor(), name=f"mcp-{self.name}-monitor")
+
+    async def aclose(self) -> None:
+        for task in (self._monitor_task, self._replenish_task):
+            if task is not None:
+                task.cancel()
+        for process in (self._active, self._standby):
+            if process is not None:
+                await process.stop()
+        self._active = self._standby = None
+        self._available.clear()
+
+    def _promote(self, process: _ServerProcess) -> None:
+        self._active = process
+        self.stats.generation = process.generation
+        self._available.set()
+
+    def _schedule_replenish(self) -> None:
+        if self._replenish_task is None or self._replenish_task.done():
+            self._replenish_task = asyncio.create_task(self._replenish(), name=f"mcp-{self.name}-replenish")
+
+    async def _replenish(self) -> None:
+        """补齐工作进程和热备进程，连续启动失败时指数退避"""
+        failures = 0
+        while self._active is None or (self.warm_standby and self._standby is None):
+            if failures:
+                await asyncio.sleep(min(_RESTART_BACKOFF_BASE * 2 ** (failures - 1), self.restart_backoff_max))
+            try:
+                process = await self._spawn()
+            except ServerUnavailableError as e:
+                failures += 1
+                self.stats.start_failures += 1
+                logger.warning(
+                    "mcp_server_start_failed", server=self.name, failures=failures, error=str(e.__cause__ or e)
+                )
+                continue
+            failures = 0
+            self.stats.restarts += 1
+            if self._active is None:
+                self._promote(process)
+            else:
+                self._standby = process
+            self.stats.standby_ready = self._standby is not None
+
+    async def _fail(self, process: _ServerProcess, reason: str) -> None:
+        """标记进程故障：工作进程故障时切换到热备进程，并在后台补齐"""
+        if process.failed.is_set() and process is not self._active and process is not self._standby:
+            return
+        self.stats.last_failure = reason
+        if process is self._standby:
+            self._standby = None
+        elif process is self._active:
+            standby, self._standby = self._standby, None
+            if standby is not None:
+                self._promote(standby)
+                self.stats.failovers += 1
+            else:
+                self._active = None
+                self._available.clear()
+            logger.warning(
+                "mcp_server_failover",
+                server=self.name,
+                reason=reason,
+                failed_generation=process.generation,
+                generation=self._active.generation if self._active else None,
+            )
+        self.stats.standby_ready = self._standby is not None
+        self._schedule_replenish()
+        await process.stop()
+
+    # ------------------------------------------------------------------
+    # 健康检查
+    # ------------------------------------------------------------------
+
+    async def _ping(self, process: _ServerProcess) -> None:
+        if process.session is None:
+            await self._fail(process, "exited")
+            return
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(process.session.send_ping(), self.hang_threshold)
+        except TimeoutError:
+            process.hung = True
+            await self._fail(process, f"ping timed out after {self.hang_threshold}s")
+            return
+        except Exception as e:
+            await self._fail(process, f"ping failed: {type(e).__name__}: {e}")
+            return
+        if process is self._active:
+            self.stats.last_ping_seconds = round(time.perf_counter() - started, 4)
+
+    async def _monitor(self) -> None:
+        while True:
+            await asyncio.sleep(self.ping_interval)
+            processes = [p for p in (self._active, self._standby) if p is not None]
+            await asyncio.gather(*(self._ping(p) for p in processes))
+
+    # ------------------------------------------------------------------
+    # 工具
+    # ------------------------------------------------------------------
+
+    async def _acquire(self) -> _ServerProcess:
+        try:
+            await asyncio.wait_for(self._available.wait(), self.start_timeout)
+        except TimeoutError:
+            raise ServerUnavailableError(f"MCP server {self.name} is unavailable") from None
+        assert self._active is not None
+        return self._active
+
+    async def _call(self, method: str, *args: Any) -> Any:
+        """
+        在工作进程上执行会话方法；进程退出时切换到热备进程重试一次。
+
+        进程被判定卡死时在途调用直接失败而不重试：卡死可能正是该调用引起的，重试会拖垮热备进程。
+        """
+        for attempt in range(2):
+            process = await self._acquire()
+            session = process.session
+            if session is None:
+                await self._fail(process, "exited")
+                continue
+            call = asyncio.ensure_future(getattr(session, method)(*args))
+            failed = asyncio.ensure_future(process.failed.wait())
+            try:
+                await asyncio.wait({call, failed}, return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                failed.cancel()
+            if not call.done():
+                call.cancel()
+                if process.hung:
+                    raise ServerUnavailableError(f"MCP server {self.name} stopped responding during {method}")
+                await self._fail(process, "exited")
+                continue
+            error = call.exception()
+            if error is None:
+                return call.result()
+            if not _is_connection_error(error) or attempt:
+                raise error
+            await self._fail(process, f"{method} failed: {type(error).__name__}: {error}")
+        raise ServerUnavailableError(f"MCP server {self.name} failed during {method}")
+
+    async def call_tool(self, name: str, arguments: dict[str, Any]) -> CallToolResult:
+        return await self._call("call_tool", name, arguments)
+
+    async def list_tools(self) -> list[Any]:
+        """服务器提供的工具定义（首次调用后缓存，进程切换后不变）"""
+        if self._tools is None:
+            self._tools = (await self._call("list_tools")).tools
+        return self._tools
+
+    async def get_tools(self) -> list[BaseTool]:
+        """转换为 LangChain 工具，调用经监管器转发（Confluence 工具受限流器约束）"""
+        return [self._tool(tool) for tool in await self.list_tools()]
+
+    def _tool(self, spec: Any) -> BaseTool:
+        name = spec.name
+
+        async def call_tool(**arguments: Any) -> str | list[str]:
+            try:
+                result = await call_mcp_tool_limited(name, lambda: self.call_tool(name, arguments))
+            except ServerUnavailableError as e:
+                raise ToolException(str(e)) from e
+            content = tool_result_content(result)
+            if result.isError:
+                raise ToolException(content)
+            return content
+
+        return StructuredTool(
+            name=name,
+            description=spec.description or "",
+            args_schema=spec.inputSchema,
+            coroutine=call_tool,
+        )
@@ -0,0 +1,183 @@
+"""
+线程登记表 (Thread Registry)
+
+线程状态保存在 checkpointer 中，但 checkpointer 不记录线程的创建时间、元数据和运行状态，
+前端的线程列表（`POST /threads/search`）需要这些信息。本模块把它们保存在 checkpointer 所在的 SQLite 文件中
+（独立的 `api_threads` 表），所有 worker 共享：
+- 创建线程、每次运行开始和结束时更新 `updated_at` 与 `status`（idle / busy / error）
+- 记录线程第一条用户消息作为标题，列表无需逐个加载线程状态
+- 超过 CHECKPOINT_RETENTION_SECONDS 未更新的线程随 checkpointer 一起过期，列表中不再返回
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from datetime import UTC, datetime
+from pathlib import Path
+from typing import Any
+
+from app.core.config import settings
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS api_threads (
+    thread_id TEXT PRIMARY KEY,
+    assistant_id TEXT,
+    title TEXT,
+    metadata TEXT NOT NULL,
+    status TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_api_threads_updated ON api_threads (updated_at);
+"""
+
+# 标题最多保留的字符数
+_TITLE_MAX_CHARS = 200
+
+_COLUMNS = "thread_id, assistant_id, title, metadata, status, created_at, updated_at"
+
+
+def _iso(timestamp: float) -> str:
+    return datetime.fromtimestamp(timestamp, UTC).isoformat()
+
+
+def _thread(row: tuple) -> dict[str, Any]:
+    """转换为 LangGraph API 的 Thread 结构"""
+    thread_id, assistant_id, title, metadata, status, created_at, updated_at = row
+    metadata = json.loads(metadata)
+    if assistant_id:
+        metadata.setdefault("graph_id", assistant_id)
+        metadata.setdefault("assistant_id", assistant_id)
+    return {
+        "thread_id": thread_id,
+        "created_at": _iso(created_at),
+        "updated_at": _iso(updated_at),
+        "metadata": metadata,
+        "status": status,
+        # 列表只需要第一条消息作为标题，不加载完整的线程状态
+        "values": {"messages": [{"type": "human", "content": title}]} if title else {},
+        "interrupts": {},
+    }
+
+
+class ThreadRegistry:
+    """
+    线程登记表（线程安全，方法均为同步调用，异步代码中通过 `asyncio.to_thread` 调用）。
+
+    Args:
+        db_path: SQLite 文件路径（与 checkpointer 共用）
+        retention_seconds: 线程未更新超过该时长后视为已过期
+    """
+
+    def __init__(self, db_path: str | Path, retention_seconds: float = 30 * 86400.0) -> None:
+        self.db_path = Path(db_path)
+        self.retention_seconds = retention_seconds
+        self._lock = threading.Lock()
+        self._conn: sqlite3.Connection | None = None
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=30)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(_SCHEMA)
+        return self._conn
+
+    def create(self, thread_id: str, metadata: dict[str, Any] | None = None) -> dict[str, Any]:
+        """创建线程；已存在时返回现有线程"""
+        now = time.time()
+        with self._lock, self._connection() as conn:
+            conn.execute(
+                "INSERT OR IGNORE INTO api_threads (thread_id, metadata, status, created_at, updated_at)"
+                " VALUES (?, ?, 'idle', ?, ?)",
+                (thread_id, json.dumps(metadata or {}, ensure_ascii=False), now, now),
+            )
+            row = conn.execute(f"SELECT {_COLUMNS} FROM api_threads WHERE thread_id = ?", (thread_id,)).fetchone()
+        return _thread(row)
+
+    def get(self, thread_id: str) -> dict[str, Any] | None:
+        with self._lock:
+            row = (
+                self._connection()
+                .execute(f"SELECT {_COLUMNS} FROM api_threads WHERE thread_id = ?", (thread_id,))
+                .fetchone()
+            )
+        return _thread(row) if row else None
+
+    def start_run(self, thread_id: str, assistant_id: str, title: str | None) -> None:
+        """运行开始：标记为 busy，记录所属 assistant 和标题（已有标题时保持不变）"""
+        now = time.time()
+        title = title[:_TITLE_MAX_CHARS] if title else None
+        with self._lock, self._connection() as conn:
+            conn.execute(
+                "INSERT INTO api_threads (thread_id, assistant_id, title, metadata, status, created_at, updated_at)"
+                " VALUES (?, ?, ?, '{}', 'busy', ?, ?) ON CONFLICT (thread_id) DO UPDATE SET"
+                " assistant_id = excluded.assistant_id, title = COALESCE(api_threads.title, excluded.title),"
+                " status = 'busy', updated_at = excluded.updated_at",
+                (thread_id, assistant_id, title, now, now),
+            )
+
+    def finish_run(self, thread_id: str, status: str = "idle") -> None:
+        with self._lock, self._connection() as conn:
+            conn.execute(
+                "UPDATE api_threads SET status = ?, updated_at = ? WHERE thread_id = ?",
+                (status, time.time(), thread_id),
+            )
+
+    def search(
+        self,
+        limit: int = 10,
+        offset: int = 0,
+        sort_by: str = "created_at",
+        sort_order: str = "desc",
+        metadata: dict[str, Any] | None = None,
+        status: str | None = None,
+    ) -> list[dict[str, Any]]:
+        """按创建 / 更新时间排序列出未过期的线程，可按元数据和状态过滤"""
+        column = "updated_at" if sort_by == "updated_at" else "created_at"
+        order = "ASC" if sort_order.lower() == "asc" else "DESC"
+        cutoff = time.time() - self.retention_seconds
+        with self._lock, self._connection() as conn:
+            conn.execute("DELETE FROM api_threads WHERE updated_at < ?", (cutoff,))
+            rows = conn.execute(
+                f"SELECT {_COLUMNS} FROM api_threads WHERE status = COALESCE(?, status)"  # noqa: S608
+                f" ORDER BY {column} {order}",
+                (status,),
+            ).fetchall()
+        threads = [_thread(row) for row in rows]
+        if metadata:
+            threads = [t for t in threads if all(t["metadata"].get(k) == v for k, v in metadata.items())]
+        return threads[offset : offset + limit]
+
+    def delete(self, thread_id: str) -> bool:
+        with self._lock, self._connection() as conn:
+            return conn.execute("DELETE FROM api_threads WHERE thread_id = ?", (thread_id,)).rowcount > 0
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+# ============================================================================
+# 全局实例
+# ============================================================================
+
+_registry: ThreadRegistry | None = None
+_registry_lock = threading.Lock()
+
+
+def get_thread_registry() -> ThreadRegistry:
+    """获取进程级线程登记表单例（与 checkpointer 使用同一个数据库文件）"""
+    global _registry
+
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = ThreadRegistry(
+                    settings.CHECKPOINT_DB_PATH or "./data/checkpoints.db",
+                    retention_seconds=settings.CHECKPOINT_RETENTION_SECONDS,
+                )
+    return _registry
@@ -0,0 +1,63 @@
+"""
+扫描件签名检查模块 - 使用视觉模型按 CHECK_IMAGE_SIGN_PROMPT 批量检查表格中的签名。
+
+此模块包含以下子模块：
+
+1. **engine** - 批处理引擎
+   - SignCheckEngine: 有界并发、重试、JSONL 增量输出与断点续跑
+   - SignCheckStats: 吞吐、耗时分位数、失败率和状态分布
+   - iter_images / iter_documents / parse_model_output: 输入扫描与模型输出校验
+
+2. **jobs** - 任务管理与 HTTP 接口
+   - submit_job: 后台提交批处理任务（同名任务仍在运行时抛出 JobConflictError）
+   - routes: `/sign-check/jobs` 路由
+
+3. **predetect** - 签名区域预检测（可选依赖 numpy、Pillow）
+   - prepare_for_model: 检测候选区域、计算墨迹指标并生成缩小的区域拼接图
+   - detect_regions / SignatureRegion / PreparedImage: 区域检测与结果
+
+"""
+
+# ============================================================================
+# 批处理引擎
+# ============================================================================
+from app.sign_check.engine import SignCheckEngine, SignCheckStats, iter_documents, iter_images, parse_model_output
+
+# ============================================================================
+# 任务管理
+# ============================================================================
+from app.sign_check.jobs import JobConflictError, routes, submit_job
+
+# ============================================================================
+# 签名区域预检测
+# ============================================================================
+from app.sign_check.predetect import (
+    PreparedImage,
+    SignatureRegion,
+    detect_regions,
+    predetect_available,
+    prepare_for_model,
+)
+
+# ============================================================================
+# 导出列表 - 定义公共 API
+# ============================================================================
+
+__all__ = [
+    # 批处理引擎
+    "SignCheckEngine",
+    "SignCheckStats",
+    "iter_documents",
+    "iter_images",
+    "parse_model_output",
+    # 任务管理
+    "JobConflictError",
+    "submit_job",
+    "routes",
+    # 签名区域预检测
+    "PreparedImage",
+    "SignatureRegion",
+    "detect_regions",
+    "predetect_available",
+    "prepare_for_model",
+]
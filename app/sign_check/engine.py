@@ -0,0 +1,393 @@
+"""
+批量签名检查引擎 (Batch Signature Check)
+
+按 CHECK_IMAGE_SIGN_PROMPT 对表格扫描件逐张调用视觉模型：
+- 输入目录中的多页 PDF 由 `app.documents.rasterize` 逐页栅格化后流式送入
+- 固定数量的 worker 消费有界队列，限制同时在途的模型调用，输入可以是目录扫描结果或异步流
+- 调用模型前先做签名区域预检测（`app.sign_check.predetect`），只发送缩小后的候选区域拼接图，
+  区域全部空白时可以不调用模型直接判定为 missing
+- 模型调用失败、输出不是合法 JSON 或状态代码无效时按指数退避重试
+- 每处理完一个文档立即向 JSONL 结果文件追加一行；重新运行时跳过已成功的文档（按内容哈希识别）
+- 统计吞吐、耗时分位数、失败率和状态分布
+
+命令行用法::
+
+    python -m app.sign_check.engine --input /app/uploads --output ./data/sign_check/result.jsonl
+"""
+
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import mimetypes
+import re
+import time
+from collections import Counter
+from collections.abc import AsyncIterable, AsyncIterator, Iterable
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, TextIO
+
+from structlog.stdlib import get_logger
+from tenacity import AsyncRetrying, stop_after_attempt, wait_random_exponential
+
+from app.core.config import settings
+from app.core.log_adapter import setup_logging
+from app.documents.rasterize import PDF_SUFFIX, RasterPage, iter_document_pages
+from app.enums import ModelRole, SignatureStatus
+from app.prompts import CHECK_IMAGE_SIGN_PROMPT
+from app.schemas.sign_check import SignaturePosition, SignCheckRecord, SignCheckResult
+from app.sign_check.predetect import PreparedImage, predetect_available, prepare_for_model
+
+if TYPE_CHECKING:
+    from langchain_core.language_models import BaseChatModel
+
+logger = get_logger(__name__)
+
+IMAGE_SUFFIXES = frozenset({".png", ".jpg", ".jpeg", ".tif", ".tiff", ".bmp", ".webp"})
+
+_CODE_FENCE_RE = re.compile(r"^\s*```(?:json)?\s*|\s*```\s*$")
+
+
+# ============================================================================
+# 统计
+# ============================================================================
+
+
+@dataclass(slots=True)
+class SignCheckStats:
+    """一次批处理的统计"""
+
+    total: int = 0
+    """已从输入中读取的文档数"""
+    skipped: int = 0
+    """此前已成功处理、本次跳过的文档数"""
+    succeeded: int = 0
+    failed: int = 0
+    retries: int = 0
+    """重试次数（不含首次调用）"""
+    predetect_decided: int = 0
+    """由预检测直接判定、未调用模型的文档数"""
+    original_bytes: int = 0
+    """已处理文档的原图总字节数"""
+    input_bytes: int = 0
+    """实际发送给模型的图片总字节数"""
+    status_counts: Counter[str] = field(default_factory=Counter)
+    """按文档最严重状态统计，无签名位置记为 `none`"""
+    latencies_ms: list[float] = field(default_factory=list)
+    started_at: float = field(default_factory=time.perf_counter)
+    finished_at: float | None = None
+
+    def summary(self) -> dict[str, Any]:
+        elapsed = (self.finished_at or time.perf_counter()) - self.started_at
+        processed = self.succeeded + self.failed
+        latencies = sorted(self.latencies_ms)
+
+        def percentile(p: float) -> float | None:
+            return round(latencies[min(int(len(latencies) * p), len(latencies) - 1)], 1) if latencies else None
+
+        return {
+            "total": self.total,
+            "skipped": self.skipped,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "retries": self.retries,
+            "predetect_decided": self.predetect_decided,
+            "input_ratio": round(self.input_bytes / self.original_bytes, 3) if self.original_bytes else None,
+            "failure_rate": round(self.failed / processed, 4) if processed else 0.0,
+            "elapsed_seconds": round(elapsed, 1),
+            "docs_per_minute": round(processed / elapsed * 60, 1) if elapsed > 0 else 0.0,
+            "latency_p50_ms": percentile(0.5),
+            "latency_p95_ms": percentile(0.95),
+            "status_counts": dict(self.status_counts),
+            "finished": self.finished_at is not None,
+        }
+
+
+# ============================================================================
+# 输入与结果文件
+# ============================================================================
+
+
+def iter_images(directory: str | Path) -> list[Path]:
+    """递归列出目录下的图片文件（按路径排序，保证多次运行顺序一致）"""
+    return sorted(p for p in Path(directory).rglob("*") if p.is_file() and p.suffix.lower() in IMAGE_SUFFIXES)
+
+
+def iter_documents(directory: str | Path) -> list[Path]:
+    """递归列出目录下的图片和 PDF 文件（按路径排序）"""
+    suffixes = IMAGE_SUFFIXES | {PDF_SUFFIX}
+    return sorted(p for p in Path(directory).rglob("*") if p.is_file() and p.suffix.lower() in suffixes)
+
+
+def load_completed(output_path: Path) -> set[str]:
+    """读取结果文件中已成功处理的文档 id；忽略中断时写了一半的行"""
+    completed: set[str] = set()
+    if not output_path.exists():
+        return completed
+    with output_path.open(encoding="utf-8") as f:
+        for line in f:
+            try:
+                row = json.loads(line)
+            except ValueError:
+                continue
+            if row.get("ok"):
+                completed.add(row["document_id"])
+    return completed
+
+
+def _terminate_partial_line(output_path: Path) -> None:
+    """上次运行中断时最后一行可能没有写完，补上换行，避免新记录拼接到半行之后"""
+    if not output_path.exists() or output_path.stat().st_size == 0:
+        return
+    with output_path.open("rb+") as f:
+        f.seek(-1, 2)
+        if f.read(1) != b"\n":
+            f.write(b"\n")
+
+
+def parse_model_output(text: str) -> SignCheckResult:
+    """
+    解析视觉模型输出。
+
+    Raises:
+        pydantic.ValidationError: 不是合法 JSON 或状态代码无效
+    """
+    text = _CODE_FENCE_RE.sub("", text.strip())
+    start, end = text.find("{"), text.rfind("}")
+    if start != -1 and end > start:
+        text = text[start : end + 1]
+    return SignCheckResult.model_validate_json(text)
+
+
+async def _aiter(
+    documents: Iterable[Path | RasterPage] | AsyncIterable[Path | RasterPage],
+) -> AsyncIterator[Path | RasterPage]:
+    if isinstance(documents, AsyncIterable):
+        async for document in documents:
+            yield document
+    else:
+        for document in documents:
+            yield document
+
+
+# ============================================================================
+# 引擎
+# ============================================================================
+
+
+class SignCheckEngine:
+    """
+    批量签名检查引擎。
+
+    Args:
+        output_path: JSONL 结果文件，已存在时追加并跳过其中已成功的文档
+        model: 视觉模型，默认使用 `VL_MODEL_NAME`
+        concurrency: 同时在途的模型调用数
+        max_attempts: 单个文档的最大模型调用次数（含重试）
+        progress_every: 每处理多少个文档输出一次进度日志
+        predetect: 是否做签名区域预检测，未安装 numpy / Pillow 时自动关闭
+        decide_missing: 候选区域全部空白时是否不调用模型直接判定为 missing
+    """
+
+    def __init__(
+        self,
+        output_path: str | Path,
+        model: "BaseChatModel | None" = None,
+        concurrency: int = settings.SIGN_CHECK_CONCURRENCY,
+        max_attempts: int = settings.SIGN_CHECK_MAX_ATTEMPTS,
+        progress_every: int = 50,
+        predetect: bool = settings.SIGN_CHECK_PREDETECT,
+        decide_missing: bool = settings.SIGN_CHECK_PREDETECT_DECIDE_MISSING,
+    ) -> None:
+        self.output_path = Path(output_path)
+        if model is None:
+            from app.agents.models import get_chat_model
+
+            model = get_chat_model(ModelRole.VISION)
+        self.model = model
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.progress_every = progress_every
+        self.predetect = predetect and predetect_available()
+        self.decide_missing = decide_missing
+        if predetect and not self.predetect:
+            logger.warning("sign_check_predetect_unavailable", reason="numpy or Pillow is not installed")
+        self.stats = SignCheckStats()
+        self._completed: set[str] = set()
+        self._output: TextIO | None = None
+
+    async def run(self, documents: Iterable[Path | RasterPage] | AsyncIterable[Path | RasterPage]) -> SignCheckStats:
+        """处理所有文档（图片或 PDF 栅格化后的页面），返回统计"""
+        self.stats = SignCheckStats()
+        self._completed = await asyncio.to_thread(load_completed, self.output_path)
+        self.output_path.parent.mkdir(parents=True, exist_ok=True)
+        await asyncio.to_thread(_terminate_partial_line, self.output_path)
+        logger.info(
+            "sign_check_started",
+            output=str(self.output_path),
+            completed=len(self._completed),
+            concurrency=self.concurrency,
+        )
+
+        queue: asyncio.Queue[Path | RasterPage | None] = asyncio.Queue(maxsize=self.concurrency * 2)
+        with self.output_path.open("a", encoding="utf-8") as self._output:
+            workers = [asyncio.create_task(self._worker(queue)) for _ in range(self.concurrency)]
+            try:
+                async for document in _aiter(documents):
+                    self.stats.total += 1
+                    await queue.put(document)
+                for _ in workers:
+                    await queue.put(None)
+                await asyncio.gather(*workers)
+            finally:
+                for worker in workers:
+                    worker.cancel()
+                self._output = None
+
+        self.stats.finished_at = time.perf_counter()
+        logger.info("sign_check_finished", **self.stats.summary())
+        return self.stats
+
+    async def _worker(self, queue: "asyncio.Queue[Path | RasterPage | None]") -> None:
+        while (document := await queue.get()) is not None:
+            record = await self.check_document(document)
+            if record is not None:
+                self._write(record)
+
+    def _write(self, record: SignCheckRecord) -> None:
+        stats = self.stats
+        if record.ok:
+            stats.succeeded += 1
+            stats.status_counts[str(record.worst_status or "none")] += 1
+        else:
+            stats.failed += 1
+        stats.latencies_ms.append(record.latency_ms)
+
+        if self._output is not None:
+            self._output.write(record.model_dump_json() + "\n")
+            self._output.flush()
+
+        processed = stats.succeeded + stats.failed
+        if processed % self.progress_every == 0:
+            logger.info("sign_check_progress", **stats.summary())
+
+    async def check_document(self, document: Path | RasterPage) -> SignCheckRecord | None:
+        """检查单个文档；此前已成功处理时返回 None"""
+        path, name = (document.path, document.name) if isinstance(document, RasterPage) else (document, str(document))
+        try:
+            data = await asyncio.to_thread(path.read_bytes)
+        except OSError as e:
+            logger.warning("sign_check_read_failed", document=name, error=str(e))
+            return SignCheckRecord(
+                document=name,
+                document_id=hashlib.sha256(name.encode()).hexdigest(),
+                ok=False,
+                error=f"{type(e).__name__}: {e}",
+            )
+        document_id = hashlib.sha256(data).hexdigest()
+        if document_id in self._completed:
+            self.stats.skipped += 1
+            return None
+
+        started = time.perf_counter()
+        attempts = 0
+        record = SignCheckRecord(document=name, document_id=document_id, ok=False, model=_model_name(self.model))
+        prepared = await self._prepare(data, name)
+        self.stats.original_bytes += len(data)
+        record.regions = [region.to_dict() for region in prepared.regions] if prepared else []
+
+        if prepared is not None and self.decide_missing and prepared.all_blank:
+            record.ok = True
+            record.decided_by = "predetect"
+            record.positions = {
+                f"区域{index}": SignaturePosition(
+                    status=SignatureStatus.MISSING, description="预检测：候选签名区域无墨迹"
+                )
+                for index in range(1, len(prepared.regions) + 1)
+            }
+            record.worst_status = SignatureStatus.MISSING
+            record.latency_ms = round((time.perf_counter() - started) * 1000, 1)
+            self.stats.predetect_decided += 1
+            return record
+
+        if prepared is not None:
+            image, mime_type, hint = prepared.data, prepared.mime_type, prepared.prompt_hint()
+        else:
+            image, mime_type, hint = data, mimetypes.guess_type(path.name)[0] or "image/png", ""
+        record.input_bytes = len(image)
+        self.stats.input_bytes += len(image)
+        try:
+            async for attempt in AsyncRetrying(
+                stop=stop_after_attempt(self.max_attempts),
+                wait=wait_random_exponential(multiplier=0.5, max=20),
+                reraise=True,
+            ):
+                with attempt:
+                    attempts += 1
+                    result = await self._call_model(image, mime_type, hint)
+            record.ok = True
+            record.positions = result.root
+            record.worst_status = result.worst_status
+        except Exception as e:
+            record.error = f"{type(e).__name__}: {e}"[:500]
+            logger.warning("sign_check_failed", document=name, attempts=attempts, error=record.error)
+
+        self.stats.retries += max(attempts - 1, 0)
+        record.attempts = attempts
+        record.latency_ms = round((time.perf_counter() - started) * 1000, 1)
+        return record
+
+    async def _prepare(self, data: bytes, name: str) -> PreparedImage | None:
+        """预检测候选签名区域（CPU 密集，放到线程中执行）；未开启或图片无法解析时返回 None，发送原图"""
+        if not self.predetect:
+            return None
+        try:
+            return await asyncio.to_thread(prepare_for_model, data, settings.SIGN_CHECK_MAX_IMAGE_SIDE)
+        except Exception as e:
+            logger.warning("sign_check_predetect_failed", document=name, error=f"{type(e).__name__}: {e}")
+            return None
+
+    async def _call_model(self, image: bytes, mime_type: str, hint: str = "") -> SignCheckResult:
+        from langchain_core.messages import HumanMessage
+
+        image_url = f"data:{mime_type};base64,{base64.b64encode(image).decode()}"
+        prompt = f"{CHECK_IMAGE_SIGN_PROMPT}\n\n{hint}" if hint else CHECK_IMAGE_SIGN_PROMPT
+        message = HumanMessage(
+            content=[
+                {"type": "text", "text": prompt},
+                {"type": "image_url", "image_url": {"url": image_url}},
+            ]
+        )
+        response = await self.model.ainvoke([message])
+        return parse_model_output(response.text)
+
+
+def _model_name(model: "BaseChatModel") -> str | None:
+    return getattr(model, "model_name", None) or getattr(model, "model", None)
+
+
+# ============================================================================
+# 命令行
+# ============================================================================
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="批量检查表格扫描件中的签名")
+    parser.add_argument("--input", default=settings.UPLOAD_DIR, help="扫描件目录（递归查找图片和 PDF）")
+    parser.add_argument(
+        "--output", default=str(Path(settings.SIGN_CHECK_OUTPUT_DIR) / "result.jsonl"), help="JSONL 结果文件"
+    )
+    parser.add_argument("--concurrency", type=int, default=settings.SIGN_CHECK_CONCURRENCY, help="并发模型调用数")
+    parser.add_argument("--max-attempts", type=int, default=settings.SIGN_CHECK_MAX_ATTEMPTS, help="最大调用次数")
+    args = parser.parse_args()
+
+    setup_logging()
+    engine = SignCheckEngine(args.output, concurrency=args.concurrency, max_attempts=args.max_attempts)
+    stats = asyncio.run(engine.run(iter_document_pages(iter_documents(args.input))))
+    print(json.dumps(stats.summary(), ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
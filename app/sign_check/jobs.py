@@ -0,0 +1,154 @@
+"""
+签名检查批处理任务管理与 HTTP 接口。
+
+接口（挂载到 LangGraph Server 的自定义路由，见 `app/api.py`）：
+- `POST /sign-check/jobs`: 提交批处理任务，body 可选 `{"input_dir": "...", "name": "..."}`，
+  `input_dir` 必须位于 `UPLOAD_DIR` 之内；同名任务仍在运行时返回 409
+- `GET /sign-check/jobs`: 列出任务及实时统计
+- `GET /sign-check/jobs/{job_id}`: 查询单个任务的实时统计
+"""
+
+import asyncio
+import re
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any
+
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+from structlog.stdlib import get_logger
+
+from app.core.config import settings
+from app.documents.rasterize import iter_document_pages
+from app.sign_check.engine import SignCheckEngine, iter_documents
+
+logger = get_logger(__name__)
+
+_JOB_NAME_RE = re.compile(r"^[\w.-]{1,64}$")
+
+
+@dataclass(slots=True)
+class SignCheckJob:
+    job_id: str
+    name: str
+    input_dir: Path
+    engine: SignCheckEngine
+    created_at: datetime = field(default_factory=datetime.now)
+    task: asyncio.Task | None = None
+    error: str | None = None
+
+    @property
+    def state(self) -> str:
+        if self.task is None or not self.task.done():
+            return "running"
+        return "failed" if self.error else "finished"
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "job_id": self.job_id,
+            "name": self.name,
+            "state": self.state,
+            "input_dir": str(self.input_dir),
+            "output": str(self.engine.output_path),
+            "created_at": self.created_at.isoformat(),
+            "error": self.error,
+            "stats": self.engine.stats.summary(),
+        }
+
+
+_jobs: dict[str, SignCheckJob] = {}
+
+
+async def _run_job(job: SignCheckJob) -> None:
+    try:
+        documents = await asyncio.to_thread(iter_documents, job.input_dir)
+        await job.engine.run(iter_document_pages(documents))
+    except Exception as e:
+        job.error = f"{type(e).__name__}: {e}"
+        logger.exception("sign_check_job_failed", job_id=job.job_id)
+
+
+class JobConflictError(Exception):
+    """同名任务仍在运行（两个任务同时追加同一个结果文件会重复处理文档）"""
+
+
+def _evict_finished_jobs() -> None:
+    """已结束的任务超过 `SIGN_CHECK_MAX_FINISHED_JOBS` 时移除最早提交的"""
+    finished = [job_id for job_id, job in _jobs.items() if job.state != "running"]
+    for job_id in finished[: max(len(finished) - settings.SIGN_CHECK_MAX_FINISHED_JOBS, 0)]:
+        del _jobs[job_id]
+
+
+def submit_job(input_dir: Path, name: str | None = None) -> SignCheckJob:
+    """
+    提交批处理任务。
+
+    同名任务写入同一个结果文件，重复提交即断点续跑。
+
+    Raises:
+        JobConflictError: 同名任务仍在运行
+    """
+    job_id = uuid.uuid4().hex[:12]
+    name = name or job_id
+    if any(job.name == name and job.state == "running" for job in _jobs.values()):
+        raise JobConflictError(f"job {name!r} is still running")
+    _evict_finished_jobs()
+
+    output_path = Path(settings.SIGN_CHECK_OUTPUT_DIR) / f"{name}.jsonl"
+    job = SignCheckJob(job_id=job_id, name=name, input_dir=input_dir, engine=SignCheckEngine(output_path))
+    job.task = asyncio.create_task(_run_job(job), name=f"sign-check-{job_id}")
+    _jobs[job_id] = job
+    logger.info("sign_check_job_submitted", job_id=job_id, input_dir=str(input_dir), output=str(output_path))
+    return job
+
+
+# ============================================================================
+# HTTP 接口
+# ============================================================================
+
+
+async def create_job(request: Request) -> JSONResponse:
+    try:
+        body = await request.json() if await request.body() else {}
+    except ValueError as e:
+        return JSONResponse({"error": f"invalid JSON body: {e}"}, status_code=400)
+    if not isinstance(body, dict):
+        return JSONResponse({"error": "body must be a JSON object"}, status_code=400)
+
+    upload_dir = Path(settings.UPLOAD_DIR).resolve()
+    input_dir = body.get("input_dir", ".")
+    if isinstance(input_dir, str):
+        input_dir = (upload_dir / input_dir).resolve()
+    if not isinstance(input_dir, Path) or not input_dir.is_relative_to(upload_dir) or not input_dir.is_dir():
+        return JSONResponse({"error": "input_dir must be an existing directory inside UPLOAD_DIR"}, status_code=400)
+
+    name = body.get("name")
+    if name is not None and not (isinstance(name, str) and _JOB_NAME_RE.match(name)):
+        return JSONResponse({"error": "name may only contain letters, digits, '_', '-' and '.'"}, status_code=400)
+
+    try:
+        job = submit_job(input_dir, name)
+    except JobConflictError as e:
+        return JSONResponse({"error": str(e)}, status_code=409)
+    return JSONResponse(job.to_dict(), status_code=202)
+
+
+async def list_jobs(_request: Request) -> JSONResponse:
+    return JSONResponse([job.to_dict() for job in _jobs.values()])
+
+
+async def get_job(request: Request) -> JSONResponse:
+    job = _jobs.get(request.path_params["job_id"])
+    if job is None:
+        return JSONResponse({"error": "job not found"}, status_code=404)
+    return JSONResponse(job.to_dict())
+
+
+routes = [
+    Route("/sign-check/jobs", create_job, methods=["POST"]),
+    Route("/sign-check/jobs", list_jobs, methods=["GET"]),
+    Route("/sign-check/jobs/{job_id}", get_job, methods=["GET"]),
+]
@@ -0,0 +1,331 @@
+"""
+签名区域预检测 (Signature Region Pre-detection)
+
+在调用视觉模型之前，用 NumPy 在 CPU 上对扫描件做轻量分析，缩小模型输入：
+- 检测表格线和下划线，找出候选签名区域：下划线上方、底部审批栏中标签右侧的单元格、无表格线的底部行
+- 计算每个区域的墨迹密度和对比度（排除表格线本身），预标记疑似 missing（空白）和 faint（过淡）
+- 只把候选区域所在的整行（包含左侧的角色标签）裁剪、拼接并缩小后发送给模型，预检测结果作为提示附加到提示词
+- 所有候选区域均为空白时，可以不调用模型直接判定为 missing（由配置开启）
+
+依赖可选的 numpy 和 Pillow，均延迟导入；未安装时 `predetect_available()` 返回 False，引擎直接发送原图。
+"""
+
+import importlib.util
+import io
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any
+
+from app.enums import SignatureStatus
+
+if TYPE_CHECKING:
+    import numpy as np
+    from PIL import Image
+
+# 分析用的最大边长，更大的扫描件先缩小再分析
+_ANALYSIS_MAX_SIDE = 2000
+# 墨迹密度低于该值视为空白
+_BLANK_DENSITY = 0.003
+# 墨迹与纸张的灰度差（0~1）低于该值视为笔迹过淡
+_FAINT_CONTRAST = 0.35
+# 与纸张灰度相差超过该值的像素视为浅色墨迹
+_SOFT_INK_DELTA = 25
+# 最多保留的候选区域数量（优先保留靠下的区域）
+_MAX_REGIONS = 12
+# 纯色图片无法用 Otsu 分出前景与背景时使用的固定阈值
+_FALLBACK_THRESHOLD = 128
+
+
+def predetect_available() -> bool:
+    """是否安装了预检测所需的可选依赖（numpy、Pillow）"""
+    return importlib.util.find_spec("numpy") is not None and importlib.util.find_spec("PIL") is not None
+
+
+@dataclass(slots=True)
+class SignatureRegion:
+    """候选签名区域"""
+
+    box: tuple[int, int, int, int]
+    """原图坐标 (x0, y0, x1, y1)"""
+
+    kind: str
+    """来源：underline（下划线上方）、cell（标签右侧单元格）、row（底部行）、bottom_band（兜底的底部区域）"""
+
+    ink_density: float = 0.0
+    """深色墨迹像素占比（不含表格线）"""
+
+    soft_ink_density: float = 0.0
+    """包含浅色笔迹在内的墨迹像素占比"""
+
+    contrast: float = 0.0
+    """笔画与纸张的灰度差（0~1）"""
+
+    flag: SignatureStatus | None = None
+    """预标记的疑似状态"""
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "box": list(self.box),
+            "kind": self.kind,
+            "ink_density": round(self.ink_density, 4),
+            "contrast": round(self.contrast, 3),
+            "flag": self.flag,
+        }
+
+
+@dataclass(slots=True)
+class PreparedImage:
+    """预处理后发送给模型的图片"""
+
+    data: bytes
+    mime_type: str
+    original_bytes: int
+    regions: list[SignatureRegion] = field(default_factory=list)
+
+    @property
+    def all_blank(self) -> bool:
+        """检测到了候选区域且全部为空白"""
+        return bool(self.regions) and all(r.flag == SignatureStatus.MISSING for r in self.regions)
+
+    def prompt_hint(self) -> str:
+        """附加到提示词末尾的预检测说明"""
+        if not self.regions:
+            return ""
+        kinds = {"underline": "下划线", "cell": "标签右侧单元格", "row": "底部行", "bottom_band": "底部区域"}
+        lines = [
+            "<preprocessing>",
+            "图片是从原扫描件中裁剪出的候选签名行，按原文档自上而下拼接并已缩小。",
+            "预检测指标（墨迹密度越低越可能空白；对比度低可能是笔迹过淡），仅供参考，以图片为准：",
+        ]
+        for index, region in enumerate(self.regions, start=1):
+            flag = f" → 疑似 {region.flag}" if region.flag else ""
+            lines.append(
+                f"- 区域{index}（{kinds.get(region.kind, region.kind)}）："
+                f"墨迹密度 {region.ink_density:.2%}，对比度 {region.contrast:.2f}{flag}"
+            )
+        lines.append("</preprocessing>")
+        return "\n".join(lines)
+
+
+# ============================================================================
+# 检测
+# ============================================================================
+
+
+def _otsu_threshold(gray: "np.ndarray") -> int:
+    """Otsu 阈值，灰度小于返回值的像素为前景"""
+    import numpy as np
+
+    hist = np.bincount(gray.ravel(), minlength=256).astype(np.float64)
+    if np.count_nonzero(hist) < 2:
+        return _FALLBACK_THRESHOLD
+    total = hist.sum()
+    weights = np.cumsum(hist)
+    means = np.cumsum(hist * np.arange(256))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        between = (means[-1] * weights / total - means) ** 2 / (weights * (total - weights))
+    finite = np.isfinite(between)
+    if not finite.any():
+        return _FALLBACK_THRESHOLD
+    # between[t] 对应前景为 [0, t] 的划分
+    return int(np.argmax(np.where(finite, between, -1.0))) + 1
+
+
+def _run_mask(mask: "np.ndarray", length: int) -> "np.ndarray":
+    """保留沿行方向连续长度不小于 `length` 的像素（用于检测水平线）"""
+    import numpy as np
+
+    width = mask.shape[1]
+    if width < length:
+        return np.zeros_like(mask)
+    cumsum = np.pad(np.cumsum(mask, axis=1, dtype=np.int32), ((0, 0), (1, 0)))
+    full = ((cumsum[:, length:] - cumsum[:, :-length]) == length).astype(np.int32)
+    # 把满足长度的窗口起点展开回窗口覆盖的所有像素
+    starts = np.cumsum(np.pad(full, ((0, 0), (0, length - 1))), axis=1)
+    covered = starts - np.pad(starts, ((0, 0), (length, 0)))[:, :width]
+    return covered > 0
+
+
+def _group(indices: "np.ndarray", gap: int = 2) -> list[tuple[int, int]]:
+    """把有序索引按间隔分组为 [start, end] 区间"""
+    groups: list[tuple[int, int]] = []
+    for index in indices.tolist():
+        if groups and index - groups[-1][1] <= gap:
+            groups[-1] = (groups[-1][0], index)
+        else:
+            groups.append((index, index))
+    return groups
+
+
+def _measure(region: SignatureRegion, gray: "np.ndarray", ink: "np.ndarray", lines: "np.ndarray", paper: float) -> None:
+    import numpy as np
+
+    x0, y0, x1, y1 = region.box
+    # 向内收缩，避开边框线的抗锯齿边缘
+    inset = 2
+    window = (slice(y0 + inset, max(y1 - inset, y0 + inset + 1)), slice(x0 + inset, max(x1 - inset, x0 + inset + 1)))
+    area_gray = gray[window]
+    area_lines = lines[window]
+    if area_gray.size == 0:
+        return
+
+    strong = ink[window] & ~area_lines
+    soft = (area_gray < paper - _SOFT_INK_DELTA) & ~area_lines
+    region.ink_density = float(strong.mean())
+    region.soft_ink_density = float(soft.mean())
+    # 用最深的 10% 墨迹估计笔画颜色，避免缩放产生的灰色边缘拉低对比度
+    region.contrast = float((paper - np.percentile(area_gray[soft], 10)) / 255) if soft.any() else 0.0
+
+    if region.soft_ink_density < _BLANK_DENSITY:
+        region.flag = SignatureStatus.MISSING
+    elif region.ink_density < _BLANK_DENSITY or region.contrast < _FAINT_CONTRAST:
+        region.flag = SignatureStatus.FAINT
+
+
+def _overlaps(a: tuple[int, int, int, int], b: tuple[int, int, int, int]) -> bool:
+    ix = max(0, min(a[2], b[2]) - max(a[0], b[0]))
+    iy = max(0, min(a[3], b[3]) - max(a[1], b[1]))
+    smaller = min((a[2] - a[0]) * (a[3] - a[1]), (b[2] - b[0]) * (b[3] - b[1])) or 1
+    return ix * iy / smaller > 0.5
+
+
+def detect_regions(gray: "np.ndarray") -> list[SignatureRegion]:
+    """
+    在灰度图中检测候选签名区域并计算指标。
+
+    Args:
+        gray: uint8 灰度图，形状 (高, 宽)
+
+    Returns:
+        候选区域（坐标为输入图坐标），按自上而下排序
+    """
+    import numpy as np
+
+    height, width = gray.shape
+    paper = float(np.percentile(gray, 90))
+    ink = gray < min(_otsu_threshold(gray), paper - _SOFT_INK_DELTA)
+
+    horizontal = _run_mask(ink, max(20, width // 25))
+    vertical = _run_mask(ink.T, max(20, height // 25)).T
+    lines = horizontal | vertical
+
+    candidates: list[SignatureRegion] = []
+    rules: list[int] = []
+    band_height = max(int(height * 0.045), 12)
+
+    # 水平线：贯穿表格的横线作为行分隔，较短的作为签名下划线；过粗的是色块而不是线
+    max_thickness = max(4, height // 200)
+    for y0, y1 in _group(np.flatnonzero(horizontal.any(axis=1))):
+        if y1 - y0 + 1 > max_thickness:
+            continue
+        columns = np.flatnonzero(horizontal[y0 : y1 + 1].any(axis=0))
+        for x0, x1 in _group(columns, gap=max(3, width // 200)):
+            length = x1 - x0
+            if length > width * 0.6:
+                rules.append((y0 + y1) // 2)
+            elif length > width * 0.04:
+                candidates.append(SignatureRegion((x0, max(0, y0 - band_height), x1 + 1, y0), "underline"))
+
+    # 底部审批栏：相邻横线之间的行，按竖线切分单元格，有文字的单元格右侧单元格为候选签名位置
+    bottom = height * 0.65
+    vertical_columns = np.flatnonzero(vertical.any(axis=0))
+    for top, bottom_rule in zip(rules, rules[1:], strict=False):
+        row_height = bottom_rule - top
+        if top < bottom or not height * 0.015 < row_height < height * 0.12:
+            continue
+        row_vertical = vertical[top + 2 : bottom_rule - 1]
+        edges = [(a + b) // 2 for a, b in _group(vertical_columns[row_vertical[:, vertical_columns].any(axis=0)])]
+        if len(edges) < 2:
+            candidates.append(SignatureRegion((0, top, width, bottom_rule), "row"))
+            continue
+        cells = list(zip(edges, edges[1:], strict=False))
+        index = 0
+        while index < len(cells) - 1:
+            lx0, lx1 = cells[index]
+            window = (slice(top + 2, bottom_rule - 1), slice(lx0 + 2, lx1 - 1))
+            label = ink[window] & ~lines[window]
+            if label.sum() > max(20, label.size * 0.001):
+                # 标签与填写栏成对出现，填写栏本身不再作为标签
+                candidates.append(SignatureRegion((cells[index + 1][0], top, cells[index + 1][1], bottom_rule), "cell"))
+                index += 2
+            else:
+                index += 1
+
+    if not candidates:
+        candidates.append(SignatureRegion((0, int(height * 0.8), width, height), "bottom_band"))
+
+    # 去重，优先保留靠下的区域
+    regions: list[SignatureRegion] = []
+    for region in sorted(candidates, key=lambda r: r.box[3], reverse=True):
+        if len(regions) >= _MAX_REGIONS:
+            break
+        if not any(_overlaps(region.box, kept.box) for kept in regions):
+            regions.append(region)
+    for region in regions:
+        _measure(region, gray, ink, lines, paper)
+    return sorted(regions, key=lambda r: (r.box[1], r.box[0]))
+
+
+# ============================================================================
+# 模型输入
+# ============================================================================
+
+
+def _mosaic(image: "Image.Image", regions: list[SignatureRegion], scale: float, max_side: int) -> "Image.Image":
+    """把候选区域所在的整行裁剪出来，合并重叠行后自上而下拼接"""
+    from PIL import Image
+
+    width, height = image.size
+    pad = int(height * 0.01)
+    bands: list[tuple[int, int]] = []
+    for region in regions:
+        y0 = max(0, int(region.box[1] / scale) - pad)
+        y1 = min(height, int(region.box[3] / scale) + pad)
+        if bands and y0 <= bands[-1][1]:
+            bands[-1] = (bands[-1][0], max(bands[-1][1], y1))
+        else:
+            bands.append((y0, y1))
+
+    gap = 6
+    mosaic = Image.new("L", (width, sum(y1 - y0 for y0, y1 in bands) + gap * (len(bands) - 1)), 255)
+    offset = 0
+    for y0, y1 in bands:
+        mosaic.paste(image.crop((0, y0, width, y1)), (0, offset))
+        offset += y1 - y0 + gap
+
+    mosaic.thumbnail((max_side, max_side))
+    return mosaic
+
+
+def prepare_for_model(data: bytes, max_side: int = 1280) -> PreparedImage:
+    """
+    预检测并生成发送给模型的图片。
+
+    Args:
+        data: 扫描件图片字节
+        max_side: 发送给模型的图片最大边长
+
+    Returns:
+        候选区域拼接图（PNG 灰度）及区域指标；未检测到表格结构时为缩小后的整页
+    """
+    import numpy as np
+    from PIL import Image, ImageOps
+
+    with Image.open(io.BytesIO(data)) as source:
+        image = ImageOps.exif_transpose(source).convert("L")
+
+    analysis = image.copy()
+    analysis.thumbnail((_ANALYSIS_MAX_SIDE, _ANALYSIS_MAX_SIDE))
+    scale = analysis.width / image.width
+    regions = detect_regions(np.asarray(analysis, dtype=np.uint8))
+    for region in regions:
+        region.box = tuple(int(v / scale) for v in region.box)  # type: ignore[assignment]
+
+    if regions and regions[0].kind != "bottom_band":
+        output = _mosaic(image, regions, 1.0, max_side)
+    else:
+        output = image
+        output.thumbnail((max_side, max_side))
+
+    buffer = io.BytesIO()
+    output.save(buffer, format="PNG", optimize=True)
+    return PreparedImage(data=buffer.getvalue(), mime_type="image/png", original_bytes=len(data), regions=regions)
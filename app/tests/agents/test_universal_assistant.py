@@ -0,0 +1,31 @@
+import pytest
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+
+from app.agents import universal_assistant
+from app.core.config import settings
+from app.enums import ModelRole
+from app.middlewares import ComplexityRoutingMiddleware
+
+
+def _routing(middleware: list) -> list[ComplexityRoutingMiddleware]:
+    return [m for m in middleware if isinstance(m, ComplexityRoutingMiddleware)]
+
+
+def test_routing_skipped_without_fast_model(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(settings, "QA_FAST_MODEL", None)
+
+    middleware = universal_assistant._qa_middleware(GenericFakeChatModel(messages=iter([])))
+
+    assert _routing(middleware) == []
+
+
+def test_routing_enabled_with_fast_model(monkeypatch: pytest.MonkeyPatch) -> None:
+    fast_model = GenericFakeChatModel(messages=iter([]))
+    roles: list[ModelRole] = []
+    monkeypatch.setattr(settings, "QA_FAST_MODEL", "openai:small")
+    monkeypatch.setattr(universal_assistant, "get_chat_model", lambda role: roles.append(role) or fast_model)
+
+    (routing,) = _routing(universal_assistant._qa_middleware(GenericFakeChatModel(messages=iter([]))))
+
+    assert roles == [ModelRole.QA_FAST]
+    assert routing.fast_model is fast_model
@@ -0,0 +1,63 @@
+from pathlib import Path
+from typing import Any
+
+from langgraph.checkpoint.base import empty_checkpoint
+
+from app.backends.checkpointer import SQLiteCheckpointSaver
+
+
+def _put_steps(saver: SQLiteCheckpointSaver, steps: int) -> dict[str, Any]:
+    """写入 `steps` 个 checkpoint：messages 每步追加一条，topic 只在第一步写入"""
+    config: dict[str, Any] = {"configurable": {"thread_id": "t1", "checkpoint_ns": ""}}
+    messages: list[str] = []
+    versions: dict[str, str] = {}
+    for step in range(steps):
+        messages = [*messages, f"message {step}"]
+        new_versions = {"messages": saver.get_next_version(versions.get("messages"), None)}
+        if step == 0:
+            new_versions["topic"] = saver.get_next_version(None, None)
+        versions.update(new_versions)
+        checkpoint = empty_checkpoint()
+        checkpoint["channel_values"] = {"messages": messages, "topic": "预算" * 1000}
+        checkpoint["channel_versions"] = dict(versions)
+        config = saver.put(config, checkpoint, {"step": step}, new_versions)
+    return config
+
+
+def test_put_get_round_trip_with_compaction(tmp_path: Path) -> None:
+    saver = SQLiteCheckpointSaver(tmp_path / "checkpoints.db", keep_last=2, compress_min_bytes=1024)
+    config = _put_steps(saver, 4)
+    saver.put_writes(config, [("messages", "pending")], task_id="task-1")
+
+    latest = saver.get_tuple({"configurable": {"thread_id": "t1"}})
+    assert latest is not None
+    assert latest.checkpoint["channel_values"] == {
+        "messages": [f"message {step}" for step in range(4)],
+        "topic": "预算" * 1000,
+    }
+    assert latest.metadata["step"] == 3
+    assert latest.pending_writes == [("task-1", "messages", "pending")]
+
+    # 只保留最近 2 个 checkpoint；较早写入且未变化的通道（topic）仍可读取
+    history = list(saver.list({"configurable": {"thread_id": "t1"}}))
+    assert [item.metadata["step"] for item in history] == [3, 2]
+    assert history[1].checkpoint["channel_values"]["topic"] == "预算" * 1000
+
+    stats = saver.stats()
+    # 每条消息只存一份，追加消息不重复写入已有元素
+    assert stats["blobs"] == 4 + 1 + 1
+    assert stats["blob_stored_bytes"] < stats["blob_bytes"]
+    saver.close()
+
+
+def test_gc_removes_expired_threads_and_orphan_blobs(tmp_path: Path) -> None:
+    saver = SQLiteCheckpointSaver(tmp_path / "checkpoints.db", keep_last=2, retention_seconds=3600)
+    _put_steps(saver, 3)
+
+    assert saver.gc() == {"expired_threads": 0, "deleted_blobs": 0}
+
+    saver.retention_seconds = -1
+    assert saver.gc()["expired_threads"] == 1
+    assert saver.get_tuple({"configurable": {"thread_id": "t1"}}) is None
+    assert saver.stats() == {"threads": 0, "checkpoints": 0, "blobs": 0, "blob_bytes": 0, "blob_stored_bytes": 0}
+    saver.close()
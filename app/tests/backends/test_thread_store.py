@@ -0,0 +1,89 @@
+import asyncio
+import threading
+from pathlib import Path
+
+from deepagents.backends.utils import create_file_data
+
+from app.backends.thread_store import ThreadFileStore
+
+
+def _store(tmp_path: Path, **kwargs: float) -> ThreadFileStore:
+    return ThreadFileStore(tmp_path / "threads.db", flush_interval=3600, **kwargs)
+
+
+def test_files_survive_eviction_and_restart(tmp_path: Path) -> None:
+    store = _store(tmp_path, idle_seconds=0)
+    backend = store.backend("t1")
+    backend.write("/final_report.md", "# Report\n\nbody")
+    backend.edit("/final_report.md", "body", "new body")
+
+    store.flush()
+    store.gc()
+    assert "t1" not in store._threads
+    assert backend.read_text("/final_report.md") == "# Report\n\nnew body"
+    store.close()
+
+    reopened = _store(tmp_path)
+    assert reopened.backend("t1").read_text("/final_report.md") == "# Report\n\nnew body"
+    assert reopened.backend("t2").read_text("/final_report.md") is None
+    reopened.close()
+
+
+def test_expired_threads_are_deleted(tmp_path: Path) -> None:
+    store = _store(tmp_path, idle_seconds=0, retention_seconds=0)
+    store.put_file("t1", "/a.txt", create_file_data("a"))
+    store.flush()
+    store.gc()
+    store.gc()
+
+    assert store.backend("t1").read_text("/a.txt") is None
+    store.close()
+
+
+def test_cold_loads_racing_gc_do_not_deadlock(tmp_path: Path) -> None:
+    store = _store(tmp_path, idle_seconds=0)
+    for index in range(20):
+        store.put_file(f"t{index}", "/a.txt", create_file_data(str(index)))
+    store.flush()
+
+    stop = threading.Event()
+    errors: list[BaseException] = []
+
+    def collect() -> None:
+        while not stop.is_set():
+            store.gc()
+
+    def load(offset: int) -> None:
+        try:
+            for round_ in range(200):
+                thread_id = f"t{(round_ + offset) % 20}"
+                assert store.backend(thread_id).read_text("/a.txt") == thread_id[1:]
+        except BaseException as e:  # noqa: BLE001
+            errors.append(e)
+
+    collector = threading.Thread(target=collect, daemon=True)
+    loaders = [threading.Thread(target=load, args=(offset,), daemon=True) for offset in range(4)]
+    collector.start()
+    for loader in loaders:
+        loader.start()
+    for loader in loaders:
+        loader.join(timeout=30)
+    stop.set()
+    collector.join(timeout=30)
+
+    assert not any(loader.is_alive() for loader in loaders) and not collector.is_alive()
+    assert errors == []
+    store.close()
+
+
+def test_preload_loads_cold_thread_off_loop(tmp_path: Path) -> None:
+    store = _store(tmp_path, idle_seconds=0)
+    store.put_file("t1", "/a.txt", create_file_data("a"))
+    store.flush()
+    store.gc()
+    assert "t1" not in store._threads
+
+    asyncio.run(store.preload("t1"))
+
+    assert "t1" in store._threads
+    store.close()
@@ -0,0 +1,62 @@
+import asyncio
+import threading
+
+import httpx
+
+from app.core.llm_pool import _BoundedAsyncTransport, _BoundedSyncTransport, _ProviderLimiter
+
+
+def _handler(_request: httpx.Request) -> httpx.Response:
+    return httpx.Response(200, text="ok")
+
+
+def test_async_transport_is_created_per_event_loop() -> None:
+    created: list[httpx.AsyncBaseTransport] = []
+
+    def factory() -> httpx.AsyncBaseTransport:
+        created.append(httpx.MockTransport(_handler))
+        return created[-1]
+
+    limiter = _ProviderLimiter("test", max_concurrency=2, log_wait_seconds=60)
+    client = httpx.AsyncClient(transport=_BoundedAsyncTransport(factory, limiter))
+
+    async def call() -> int:
+        responses = await asyncio.gather(*(client.get("http://llm/") for _ in range(3)))
+        return sum(response.status_code == 200 for response in responses)
+
+    # 共享客户端在多个事件循环中使用（如多次 asyncio.run）
+    assert asyncio.run(call()) == 3
+    assert asyncio.run(call()) == 3
+    assert len(created) == 2
+    assert limiter.stats.requests == 6
+    assert limiter.stats.in_flight == 0
+
+
+def test_sync_transport_bounds_concurrency() -> None:
+    active = 0
+    peak = 0
+    lock = threading.Lock()
+    release = threading.Event()
+
+    def handler(_request: httpx.Request) -> httpx.Response:
+        nonlocal active, peak
+        with lock:
+            active += 1
+            peak = max(peak, active)
+        release.wait(0.2)
+        with lock:
+            active -= 1
+        return httpx.Response(200)
+
+    limiter = _ProviderLimiter("test", max_concurrency=2, log_wait_seconds=60)
+    client = httpx.Client(transport=_BoundedSyncTransport(httpx.MockTransport(handler), limiter))
+    threads = [threading.Thread(target=client.get, args=("http://llm/",)) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert peak == 2
+    assert limiter.stats.requests == 5
+    assert limiter.stats.queued_requests >= 3
+    assert limiter.stats.in_flight == 0
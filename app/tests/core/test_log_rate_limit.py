@@ -0,0 +1,62 @@
+import logging
+import time
+
+import pytest
+import structlog
+
+from app.core.log_adapter import EventRateLimiter
+
+
+def _call(limiter: EventRateLimiter, event: str) -> bool:
+    """返回事件是否被保留"""
+    try:
+        limiter(logging.getLogger("test"), "info", {"event": event})
+    except structlog.DropEvent:
+        return False
+    return True
+
+
+def _summaries(caplog: pytest.LogCaptureFixture) -> list[dict[str, int]]:
+    return [record.suppressed for record in caplog.records if record.getMessage() == "log_events_suppressed"]
+
+
+def test_rate_limit_drops_and_reports_on_next_output() -> None:
+    limiter = EventRateLimiter(rate_limits={"noisy": 1000.0}, sample_rates={}, summary_interval=60)
+    assert _call(limiter, "noisy")
+    assert not _call(limiter, "noisy")
+    time.sleep(0.01)
+
+    event_dict = {"event": "noisy"}
+    assert limiter(logging.getLogger("test"), "info", event_dict)["suppressed"] == 1
+    assert _call(limiter, "other")
+
+
+def test_warnings_are_never_suppressed() -> None:
+    limiter = EventRateLimiter(rate_limits={"noisy": 0.001}, sample_rates={}, summary_interval=60)
+    assert _call(limiter, "noisy")
+    limiter(logging.getLogger("test"), "warning", {"event": "noisy"})
+
+
+def test_summary_flushed_after_burst_stops(caplog: pytest.LogCaptureFixture) -> None:
+    caplog.set_level(logging.INFO, logger="app.core.log_adapter")
+    limiter = EventRateLimiter(rate_limits={"noisy": 0.001}, sample_rates={}, summary_interval=0.1)
+    assert _call(limiter, "noisy")
+    for _ in range(5):
+        assert not _call(limiter, "noisy")
+
+    # 突发之后没有新的事件，汇总仍由定时器输出
+    deadline = time.monotonic() + 2
+    while not _summaries(caplog) and time.monotonic() < deadline:
+        time.sleep(0.02)
+    assert _summaries(caplog) == [{"noisy": 5}]
+
+
+def test_flush_reports_pending_summary(caplog: pytest.LogCaptureFixture) -> None:
+    caplog.set_level(logging.INFO, logger="app.core.log_adapter")
+    limiter = EventRateLimiter(rate_limits={}, sample_rates={"sampled": 0.0}, summary_interval=60)
+    assert not _call(limiter, "sampled")
+    assert not _call(limiter, "sampled")
+
+    limiter.flush()
+    limiter.flush()
+    assert _summaries(caplog) == [{"sampled": 2}]
@@ -0,0 +1,170 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from app.core.rate_limit import AdaptiveRateLimiter, mcp_throttle_delay
+
+
+def _limiter(**kwargs) -> AdaptiveRateLimiter:
+    # 令牌充足，测试只关注并发上限的调整
+    options = {"rate": 1000.0, "burst": 1000, "default_retry_after": 0.01, **kwargs}
+    return AdaptiveRateLimiter("test", **options)
+
+
+def _tool_result(text: str, is_error: bool = True) -> SimpleNamespace:
+    return SimpleNamespace(isError=is_error, content=[SimpleNamespace(text=text)])
+
+
+# ============================================================================
+# 限流错误识别
+# ============================================================================
+
+
+@pytest.mark.parametrize(
+    ("text", "expected"),
+    [
+        ("429 Client Error: Too Many Requests for url: https://wiki/rest/api/search", 0.0),
+        ("HTTP error during API call: 429 Client Error: Too Many Requests. Retry-After: 7", 7.0),
+        ("HTTP 429: rate limited", 0.0),
+        ("HTTP/1.1 429 Too Many Requests", 0.0),
+        ("Request failed with status code 429, retry after 2.5", 2.5),
+    ],
+)
+def test_mcp_throttle_delay_matches_http_status(text: str, expected: float) -> None:
+    assert mcp_throttle_delay(_tool_result(text)) == expected
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "Page 429 not found",
+        "Search returned 429 results before the error",
+        "404 Client Error: Not Found for url: https://wiki/rest/api/content/429",
+        "Error: rate limit configuration is invalid",
+    ],
+)
+def test_mcp_throttle_delay_ignores_other_errors(text: str) -> None:
+    assert mcp_throttle_delay(_tool_result(text)) is None
+
+
+def test_mcp_throttle_delay_ignores_successful_results() -> None:
+    assert mcp_throttle_delay(_tool_result("429 Client Error", is_error=False)) is None
+
+
+# ============================================================================
+# AIMD
+# ============================================================================
+
+
+def test_throttle_halves_limit_once_per_batch_and_pauses() -> None:
+    limiter = _limiter(initial_concurrency=8, max_concurrency=8)
+
+    async def scenario() -> None:
+        started = asyncio.Event()
+
+        async def throttled() -> None:
+            async with limiter.slot() as permit:
+                await started.wait()
+                permit.throttle(0.05)
+
+        tasks = [asyncio.create_task(throttled()) for _ in range(4)]
+        await asyncio.sleep(0)
+        started.set()
+        await asyncio.gather(*tasks)
+
+    asyncio.run(scenario())
+    # 同一时刻发出的 4 个请求都被限流，只下降一次
+    assert limiter.stats.concurrency_limit == 4
+    assert limiter.stats.throttled == 4
+    assert limiter.stats.paused_until > time.monotonic()
+
+
+def test_limit_never_drops_below_minimum() -> None:
+    limiter = _limiter(initial_concurrency=2, min_concurrency=2)
+
+    async def scenario() -> None:
+        async with limiter.slot() as permit:
+            permit.throttle(0.001)
+
+    asyncio.run(scenario())
+    assert limiter.stats.concurrency_limit == 2
+
+
+def test_success_at_full_utilization_increases_additively() -> None:
+    limiter = _limiter(initial_concurrency=1, max_concurrency=3, latency_tolerance=1e9)
+
+    async def request(barrier: asyncio.Barrier | None = None) -> None:
+        async with limiter.slot():
+            if barrier:
+                await barrier.wait()
+
+    async def scenario() -> None:
+        # 第一次请求只建立延迟基线，第二次用满上限 1，增加 1 / 1
+        await request()
+        await request()
+        assert limiter.stats.concurrency_limit == 2
+        # 两个并发请求用满上限 2，增加 1 / 2
+        barrier = asyncio.Barrier(2)
+        await asyncio.gather(request(barrier), request(barrier))
+
+    asyncio.run(scenario())
+    assert limiter.stats.concurrency_limit == pytest.approx(2.5)
+
+
+def test_success_below_limit_does_not_inflate() -> None:
+    limiter = _limiter(initial_concurrency=4, latency_tolerance=1e9)
+
+    async def scenario() -> None:
+        for _ in range(5):
+            async with limiter.slot():
+                pass
+
+    asyncio.run(scenario())
+    assert limiter.stats.concurrency_limit == 4
+
+
+def test_latency_rise_decreases_limit() -> None:
+    limiter = _limiter(initial_concurrency=8)
+
+    async def scenario() -> None:
+        async with limiter.slot() as permit:
+            permit.sent_at = time.monotonic() - 0.01
+        async with limiter.slot() as permit:
+            # 模拟一次远慢于基线的请求
+            permit.sent_at = time.monotonic() - 1.0
+
+    asyncio.run(scenario())
+    assert limiter.stats.concurrency_limit == 4
+    assert limiter.stats.latency_backoffs == 1
+
+
+def test_run_retries_after_retry_after() -> None:
+    limiter = _limiter()
+    results = [_tool_result("429 Client Error: Too Many Requests. Retry-After: 0.05"), _tool_result("ok", False)]
+    calls: list[float] = []
+
+    async def call() -> SimpleNamespace:
+        calls.append(time.monotonic())
+        return results[len(calls) - 1]
+
+    result = asyncio.run(limiter.run(call, mcp_throttle_delay))
+    assert result.isError is False
+    assert len(calls) == 2
+    assert calls[1] - calls[0] >= 0.05
+    assert limiter.stats.throttled == 1
+
+
+def test_run_gives_up_after_max_retries() -> None:
+    limiter = _limiter(max_retries=2)
+    calls = 0
+
+    async def call() -> SimpleNamespace:
+        nonlocal calls
+        calls += 1
+        return _tool_result("HTTP 429")
+
+    result = asyncio.run(limiter.run(call, mcp_throttle_delay))
+    assert result.isError is True
+    assert calls == 3
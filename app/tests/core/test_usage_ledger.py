@@ -0,0 +1,77 @@
+import sqlite3
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from app.core.usage_ledger import LLMCallRecord, UsageLedger, print_report
+
+# first_token_ms 列加入之前的 llm_calls 表结构
+_OLD_SCHEMA = """
+CREATE TABLE llm_calls (
+    ts REAL NOT NULL,
+    run_id TEXT NOT NULL,
+    thread_id TEXT,
+    agent TEXT NOT NULL,
+    model TEXT,
+    prompt_tokens INTEGER NOT NULL,
+    completion_tokens INTEGER NOT NULL,
+    cached_tokens INTEGER NOT NULL,
+    prompt_chars INTEGER NOT NULL,
+    latency_ms REAL NOT NULL,
+    prompt_preview TEXT NOT NULL
+);
+INSERT INTO llm_calls VALUES (1.0, 'old-run', NULL, 'qa', 'm', 100, 10, 50, 400, 900.0, 'old prompt');
+"""
+
+
+def _record(**kwargs: Any) -> LLMCallRecord:
+    options = {
+        "ts": 2.0,
+        "run_id": "new-run",
+        "thread_id": "t1",
+        "agent": "qa",
+        "model": "m",
+        "prompt_tokens": 200,
+        "completion_tokens": 20,
+        "cached_tokens": 150,
+        "prompt_chars": 800,
+        "latency_ms": 1200.0,
+        "prompt_preview": "new prompt",
+        "first_token_ms": 350.0,
+        **kwargs,
+    }
+    return LLMCallRecord(**options)
+
+
+def test_ledger_created_before_first_token_column_is_migrated(tmp_path: Path) -> None:
+    db_path = tmp_path / "usage.db"
+    with sqlite3.connect(db_path) as conn:
+        conn.executescript(_OLD_SCHEMA)
+    conn.close()
+
+    ledger = UsageLedger(db_path)
+    ledger.record_llm_call(_record())
+    ledger.flush()
+
+    conn = sqlite3.connect(db_path)
+    try:
+        rows = conn.execute("SELECT run_id, first_token_ms FROM llm_calls ORDER BY ts").fetchall()
+    finally:
+        conn.close()
+    assert rows == [("old-run", None), ("new-run", 350.0)]
+    # 再次打开已迁移的账本不会重复添加列
+    ledger.record_llm_call(_record(ts=3.0, run_id="third", first_token_ms=None))
+    ledger.flush()
+
+
+def test_report_reads_migrated_ledger(tmp_path: Path, capsys: pytest.CaptureFixture[str]) -> None:
+    db_path = tmp_path / "usage.db"
+    with sqlite3.connect(db_path) as conn:
+        conn.executescript(_OLD_SCHEMA)
+    conn.close()
+
+    print_report(db_path)
+
+    output = capsys.readouterr().out
+    assert "Usage by agent" in output and "old prompt" in output
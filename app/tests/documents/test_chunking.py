@@ -0,0 +1,131 @@
+from pathlib import Path
+
+import pytest
+
+from app.documents.chunking import (
+    PageText,
+    TokenCounter,
+    diff_chunks,
+    estimate_tokens,
+    iter_chunks,
+    rechunk_pages,
+)
+
+
+@pytest.fixture
+def counter(tmp_path: Path) -> TokenCounter:
+    # 目录中没有分词器：按字符估算，结果与环境无关
+    return TokenCounter(model_path=tmp_path)
+
+
+def _paragraphs(prefix: str, count: int) -> str:
+    return "\n\n".join(f"{prefix} paragraph {i} " + "word " * 30 for i in range(count))
+
+
+PAGE = f"""# Guide
+
+## Setup
+
+{_paragraphs("setup", 6)}
+
+```
+# not a heading
+```
+
+## Usage
+
+{_paragraphs("usage", 6)}
+"""
+
+
+def test_estimate_tokens_counts_cjk_per_character() -> None:
+    assert estimate_tokens("中文") == 2
+    assert estimate_tokens("abcdefgh") == 2
+    assert estimate_tokens("中文abcd") == 3
+
+
+def test_chunks_fit_budget_and_stay_in_sections(counter: TokenCounter) -> None:
+    chunks = list(iter_chunks(PAGE, "p1", 3, max_tokens=120, overlap_tokens=20, counter=counter))
+
+    assert not counter.exact
+    assert len(chunks) > 2
+    assert all(chunk.token_count <= 120 for chunk in chunks)
+    assert [chunk.offset for chunk in chunks] == sorted(chunk.offset for chunk in chunks)
+    for chunk in chunks:
+        assert PAGE[chunk.offset :].startswith(chunk.text)
+        # 块不跨章节，代码块中的 `#` 行不算标题
+        assert chunk.heading in ("## Setup", "## Usage")
+        other = "## Usage" if chunk.heading == "## Setup" else "## Setup"
+        assert other not in chunk.text
+    assert any("# not a heading" in chunk.text for chunk in chunks if chunk.heading == "## Setup")
+    # 空的一级标题并入第一个章节
+    assert chunks[0].text.startswith("# Guide\n\n## Setup")
+
+
+def test_adjacent_chunks_overlap_within_section(counter: TokenCounter) -> None:
+    text = "## Notes\n\n" + "\n\n".join(f"note {i} word word word" for i in range(40))
+
+    chunks = list(iter_chunks(text, max_tokens=120, overlap_tokens=40, counter=counter))
+
+    assert len(chunks) > 1
+    for first, second in zip(chunks, chunks[1:], strict=False):
+        overlap = first.offset + len(first.text) - second.offset
+        # 重叠为上一块末尾的几个段落，不超过 overlap_tokens（上限为预算的 1/4）
+        assert overlap > 0
+        assert estimate_tokens(text[second.offset : second.offset + overlap]) <= 30
+
+
+def test_text_without_boundaries_is_hard_cut(counter: TokenCounter) -> None:
+    text = "x" * 2000
+
+    chunks = list(iter_chunks(text, max_tokens=100, overlap_tokens=0, counter=counter))
+
+    assert len(chunks) > 1
+    assert "".join(chunk.text for chunk in chunks) == text
+    assert all(chunk.token_count <= 100 for chunk in chunks)
+
+
+def test_chunk_ids_are_stable_and_versioned(counter: TokenCounter) -> None:
+    first = [c.chunk_id for c in iter_chunks(PAGE, "p1", 3, max_tokens=120, counter=counter)]
+    again = [c.chunk_id for c in iter_chunks(PAGE, "p1", 3, max_tokens=120, counter=counter)]
+    next_version = [c.chunk_id for c in iter_chunks(PAGE, "p1", 4, max_tokens=120, counter=counter)]
+
+    assert first == again
+    assert len(set(first)) == len(first)
+    assert not set(first) & set(next_version)
+
+
+def test_rechunk_only_changes_edited_section(counter: TokenCounter) -> None:
+    old = list(iter_chunks(PAGE, "p1", 3, max_tokens=120, overlap_tokens=20, counter=counter))
+    stored = [(chunk.chunk_id, chunk.content_hash) for chunk in old]
+    edited = PAGE.replace("usage paragraph 2 ", "usage paragraph 2 (revised) ")
+
+    [diff] = rechunk_pages(
+        [PageText("p1", 4, edited)], lambda _page_id: stored, max_tokens=120, overlap_tokens=20, counter=counter
+    )
+
+    assert diff.changed
+    assert diff.added and all(chunk.heading == "## Usage" for chunk in diff.added)
+    setup_ids = {chunk.chunk_id for chunk in old if chunk.heading == "## Setup"}
+    assert setup_ids <= set(diff.kept)
+    assert set(diff.removed) <= {chunk.chunk_id for chunk in old if chunk.heading == "## Usage"}
+    assert len(diff.kept) + len(diff.removed) == len(stored)
+
+
+def test_diff_chunks_unchanged_page(counter: TokenCounter) -> None:
+    page = PageText("p1", 3, PAGE)
+    chunks = list(iter_chunks(page.text, page.page_id, page.version, max_tokens=120, counter=counter))
+
+    diff = diff_chunks(page, chunks, [(chunk.chunk_id, chunk.content_hash) for chunk in chunks])
+
+    assert not diff.changed
+    assert diff.kept == [chunk.chunk_id for chunk in chunks]
+
+
+def test_token_counter_caches_by_text(counter: TokenCounter) -> None:
+    assert counter.count_batch(["alpha", "beta", "alpha"]) == [2, 1, 2]
+    assert counter.misses == 2
+
+    counter.count("beta")
+    assert counter.hits == 2
+    assert counter.misses == 2
@@ -0,0 +1,57 @@
+import sqlite3
+from pathlib import Path
+
+from app.documents.index import IndexedAttachment, LocalIndex
+
+
+def _attachment(attachment_id: str = "att-1", **kwargs: str) -> IndexedAttachment:
+    fields = {"title": "合同.pdf", "page_id": "100", "page_title": "采购合同", "page_url": "https://wiki/100"}
+    return IndexedAttachment(attachment_id=attachment_id, version=1, **{**fields, **kwargs})
+
+
+def test_replace_and_search(tmp_path: Path) -> None:
+    index = LocalIndex(tmp_path / "index.db")
+    index.replace(_attachment(), "sha-1", ["付款条款约定分三期支付", "违约责任条款"])
+    index.replace(_attachment("att-2"), "sha-2", ["交付验收标准"])
+
+    results = index.search("付款条款")
+    assert [r["attachment"]["chunk"] for r in results] == [0]
+    assert results[0]["id"] == "100"
+    assert results[0]["content"] == "付款条款约定分三期支付"
+
+    # 重新索引替换旧文本块，其他附件不受影响
+    index.replace(_attachment(), "sha-3", ["修订后的付款安排"])
+    assert index.search("分三期") == []
+    assert [r["content"] for r in index.search("付款安排")] == ["修订后的付款安排"]
+    assert index.stats() == {"attachments": 2, "chunks": 2, "vectors": 0}
+
+    assert index.remove_missing("100", keep={"att-2"}) == 1
+    assert index.search("付款安排") == []
+    assert len(index.search("验收标准")) == 1
+
+
+def test_touch_updates_page_and_attachment_title(tmp_path: Path) -> None:
+    index = LocalIndex(tmp_path / "index.db")
+    index.replace(_attachment(), "sha-1", ["付款条款约定分三期支付"])
+
+    index.touch(_attachment(title="补充协议.pdf", page_title="采购合同（归档）", page_url="https://wiki/archive/100"))
+    [result] = index.search("付款条款")
+    assert result["title"] == "采购合同（归档）"
+    assert result["url"] == "https://wiki/archive/100"
+    assert result["attachment"]["name"] == "补充协议.pdf"
+    assert len(index.search("补充协议")) == 1
+
+
+def test_backfills_chunk_rows_of_legacy_index(tmp_path: Path) -> None:
+    db_path = tmp_path / "index.db"
+    index = LocalIndex(db_path)
+    index.replace(_attachment(), "sha-1", ["付款条款约定分三期支付"])
+    index.close()
+    # 模拟旧版本建立的索引：没有映射表数据
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("DELETE FROM chunk_rows")
+
+    index = LocalIndex(db_path)
+    assert len(index.search("付款条款")) == 1
+    index.replace(_attachment(), "sha-2", ["交付验收标准"])
+    assert index.search("付款条款") == []
@@ -0,0 +1,88 @@
+import asyncio
+from typing import Any
+
+from langchain.agents.middleware.types import ToolCallRequest
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from langgraph.types import Command
+
+from app.middlewares.critique import CritiqueBudgetMiddleware
+
+
+class _Backend:
+    def __init__(self, text: str) -> None:
+        self.text = text
+
+    def read_text(self, path: str) -> str:  # noqa: ARG002
+        return self.text
+
+
+def _critique_call(call_id: str) -> dict[str, Any]:
+    return {"name": "task", "args": {"subagent_type": "critique-agent", "description": "review"}, "id": call_id}
+
+
+def _request(call: dict[str, Any], state: dict[str, Any]) -> ToolCallRequest:
+    return ToolCallRequest(tool_call=call, tool=None, state=state, runtime=None)  # type: ignore[arg-type]
+
+
+def _run(
+    middleware: CritiqueBudgetMiddleware, requests: list[ToolCallRequest]
+) -> tuple[list[ToolMessage | Command], list[str]]:
+    """并发执行多个工具调用（与 ToolNode 并行执行同一轮调用一致），返回结果和实际执行的调用 id"""
+    calls: list[str] = []
+
+    async def handler(request: ToolCallRequest) -> ToolMessage:
+        calls.append(request.tool_call["id"])
+        await asyncio.sleep(0)
+        return ToolMessage(content="looks good", tool_call_id=request.tool_call["id"])
+
+    async def main() -> list[ToolMessage | Command]:
+        return list(await asyncio.gather(*(middleware.awrap_tool_call(r, handler) for r in requests)))
+
+    return asyncio.run(main()), calls
+
+
+def test_parallel_critique_calls_run_once() -> None:
+    middleware = CritiqueBudgetMiddleware("critique-agent", backend=_Backend("## A\n\ntext\n"))
+    calls = [_critique_call("c1"), {"name": "ls", "args": {}, "id": "x"}, _critique_call("c2")]
+    state = {"messages": [HumanMessage("q"), AIMessage(content="", tool_calls=calls)]}
+
+    (first, second), executed = _run(middleware, [_request(calls[0], state), _request(calls[2], state)])
+
+    assert executed == ["c1"]
+    assert isinstance(first, Command) and first.update["critique_count"] == 1
+    assert isinstance(second, ToolMessage) and second.tool_call_id == "c2"
+
+
+def test_budget_exhausted_after_max_iterations() -> None:
+    middleware = CritiqueBudgetMiddleware("critique-agent", backend=_Backend("## A\n\ntext\n"), max_iterations=1)
+    call = _critique_call("c3")
+    state = {"messages": [AIMessage(content="", tool_calls=[call])], "critique_count": 1}
+
+    (result,), executed = _run(middleware, [_request(call, state)])
+
+    assert isinstance(result, ToolMessage) and "上限" in result.content
+    assert executed == []
+
+
+def test_incremental_review_lists_changed_sections_only() -> None:
+    backend = _Backend("## A\n\nsame\n\n## B\n\nold\n")
+    middleware = CritiqueBudgetMiddleware("critique-agent", backend=backend, min_change_ratio=0.0)
+    first_call = _critique_call("c4")
+    (first,), _ = _run(
+        middleware, [_request(first_call, {"messages": [AIMessage(content="", tool_calls=[first_call])]})]
+    )
+    assert isinstance(first, Command)
+
+    backend.text = "## A\n\nsame\n\n## B\n\nnew text\n"
+    seen: list[str] = []
+
+    async def handler(request: ToolCallRequest) -> ToolMessage:
+        seen.append(request.tool_call["args"]["description"])
+        return ToolMessage(content="ok", tool_call_id=request.tool_call["id"])
+
+    call = _critique_call("c5")
+    state = {"messages": [AIMessage(content="", tool_calls=[call])], **first.update}
+    asyncio.run(middleware.awrap_tool_call(_request(call, state), handler))
+
+    assert "## B\n\nnew text" in seen[0]
+    assert "## A" not in seen[0].split("---", 1)[1]
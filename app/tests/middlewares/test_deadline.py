@@ -0,0 +1,143 @@
+import asyncio
+import time
+from typing import Any
+
+from langchain.agents.middleware import ModelRequest, ModelResponse
+from langchain.agents.middleware.types import ToolCallRequest
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+from app.middlewares.deadline import (
+    FORCE_ANSWER_PROMPT,
+    MODEL_TIMEOUT_ANSWER,
+    PARTIAL_ANSWER_NOTICE,
+    DeadlineMiddleware,
+)
+
+RESERVE = 1.0
+
+
+def _state(remaining: float | None) -> dict[str, Any]:
+    """距截止时间还剩 `remaining` 秒的状态（含作答预留）"""
+    state: dict[str, Any] = {"messages": [HumanMessage("q")]}
+    if remaining is not None:
+        state["deadline_at"] = time.time() + remaining
+    return state
+
+
+def _model_request(state: dict[str, Any]) -> ModelRequest:
+    return ModelRequest(
+        model=None,  # type: ignore[arg-type]
+        system_prompt="system",
+        messages=state["messages"],
+        tool_choice=None,
+        tools=[{"name": "search"}],
+        response_format=None,
+        state=state,  # type: ignore[arg-type]
+        runtime=None,  # type: ignore[arg-type]
+    )
+
+
+def _model_call(state: dict[str, Any], content: str = "answer", delay: float = 0.0) -> tuple[Any, list[ModelRequest]]:
+    seen: list[ModelRequest] = []
+
+    async def handler(request: ModelRequest) -> ModelResponse:
+        seen.append(request)
+        await asyncio.sleep(delay)
+        return ModelResponse(result=[AIMessage(content)])
+
+    middleware = DeadlineMiddleware(budget_seconds=60, answer_reserve_seconds=RESERVE)
+    return asyncio.run(middleware.awrap_model_call(_model_request(state), handler)), seen
+
+
+def _tool_call(state: dict[str, Any], delay: float) -> tuple[ToolMessage, list[str]]:
+    executed: list[str] = []
+
+    async def handler(request: ToolCallRequest) -> ToolMessage:
+        executed.append(request.tool_call["id"])
+        await asyncio.sleep(delay)
+        return ToolMessage(content="result", tool_call_id=request.tool_call["id"])
+
+    middleware = DeadlineMiddleware(budget_seconds=60, answer_reserve_seconds=RESERVE)
+    request = ToolCallRequest(
+        tool_call={"name": "search", "args": {}, "id": "t1"},
+        tool=None,
+        state=state,
+        runtime=None,  # type: ignore[arg-type]
+    )
+    return asyncio.run(middleware.awrap_tool_call(request, handler)), executed
+
+
+# ============================================================================
+# 工具调用
+# ============================================================================
+
+
+def test_tool_call_cancelled_after_remaining_budget() -> None:
+    started = time.monotonic()
+
+    # 扣除作答预留后只剩 0.2 秒
+    result, executed = _tool_call(_state(RESERVE + 0.2), delay=5)
+
+    assert executed == ["t1"]
+    assert time.monotonic() - started < 2
+    assert result.status == "error" and "已被取消" in result.content
+
+
+def test_tool_call_skipped_within_answer_reserve() -> None:
+    result, executed = _tool_call(_state(RESERVE / 2), delay=0)
+
+    assert executed == []
+    assert result.status == "error" and "时间预算已用尽" in result.content
+
+
+def test_tool_call_without_deadline_passes_through() -> None:
+    result, executed = _tool_call(_state(None), delay=0)
+
+    assert executed == ["t1"] and result.content == "result"
+
+
+# ============================================================================
+# 模型调用
+# ============================================================================
+
+
+def test_model_call_within_budget_is_unchanged() -> None:
+    response, (request,) = _model_call(_state(30))
+
+    assert request.tools and request.system_prompt == "system"
+    assert response.result[0].content == "answer"
+
+
+def test_forced_answer_disables_tools_and_marks_partial() -> None:
+    response, (request,) = _model_call(_state(RESERVE / 2))
+
+    assert request.tools == []
+    assert request.system_prompt.endswith(FORCE_ANSWER_PROMPT)
+    (message,) = response.result
+    assert message.content == f"{PARTIAL_ANSWER_NOTICE}\n\nanswer"
+    assert message.response_metadata["partial_answer"] is True
+
+
+def test_forced_answer_keeps_notice_written_by_model() -> None:
+    response, _ = _model_call(_state(RESERVE / 2), content=f"{PARTIAL_ANSWER_NOTICE}\n\nanswer")
+
+    assert response.result[0].content.count(PARTIAL_ANSWER_NOTICE) == 1
+
+
+def test_model_call_cancelled_at_deadline() -> None:
+    started = time.monotonic()
+
+    response, seen = _model_call(_state(0.3), delay=5)
+
+    assert len(seen) == 1
+    assert time.monotonic() - started < 2
+    (message,) = response.result
+    assert message.content == MODEL_TIMEOUT_ANSWER
+    assert message.response_metadata["partial_answer"] is True
+
+
+def test_model_not_called_after_deadline() -> None:
+    response, seen = _model_call(_state(-1))
+
+    assert seen == []
+    assert response.result[0].content.startswith(PARTIAL_ANSWER_NOTICE)
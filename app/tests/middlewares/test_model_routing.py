@@ -0,0 +1,80 @@
+import asyncio
+from typing import Any
+
+import pytest
+from langchain.agents.middleware import ModelRequest, ModelResponse
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage, HumanMessage
+
+from app.enums import QuestionComplexity
+from app.middlewares.model_routing import ComplexityRoutingMiddleware, classify_question
+
+DEFAULT_MODEL = GenericFakeChatModel(messages=iter([]))
+FAST_MODEL = GenericFakeChatModel(messages=iter([]))
+
+
+@pytest.mark.parametrize(
+    ("question", "complexity", "reason"),
+    [
+        ("Jenkins 的地址是什么？", QuestionComplexity.SIMPLE, "short_single_question"),
+        ("  Who owns the billing service?  ", QuestionComplexity.SIMPLE, "short_single_question"),
+        ("部署流程" + "很长的描述" * 20, QuestionComplexity.COMPLEX, "length"),
+        ("背景\n需求 A\n需求 B", QuestionComplexity.COMPLEX, "multi_line"),
+        ("谁负责？什么时候上线？", QuestionComplexity.COMPLEX, "multi_question"),
+        ("对比 A 和 B 两个版本", QuestionComplexity.COMPLEX, "keyword:对比"),
+        ("Why did the deploy fail?", QuestionComplexity.COMPLEX, "keyword:why"),
+        ("Summarize the Q3 plan", QuestionComplexity.COMPLEX, "keyword:summar"),
+    ],
+)
+def test_classify_question(question: str, complexity: QuestionComplexity, reason: str) -> None:
+    assert classify_question(question) == (complexity, reason)
+
+
+def test_classify_question_respects_max_chars() -> None:
+    assert classify_question("Jenkins 的地址是什么？", simple_max_chars=5)[0] == QuestionComplexity.COMPLEX
+
+
+def _route(question: str, **kwargs: Any) -> tuple[dict[str, Any], Any]:
+    """对最后一条用户消息分类，再执行一次模型调用，返回 (状态更新, 实际使用的模型)"""
+    middleware = ComplexityRoutingMiddleware(fast_model=FAST_MODEL, **kwargs)
+    state: dict[str, Any] = {"messages": [HumanMessage("earlier question"), AIMessage("a"), HumanMessage(question)]}
+    update = asyncio.run(middleware.abefore_agent(state, None))  # type: ignore[arg-type]
+    request = ModelRequest(
+        model=DEFAULT_MODEL,
+        system_prompt=None,
+        messages=state["messages"],
+        tool_choice=None,
+        tools=[],
+        response_format=None,
+        state={**state, **update},  # type: ignore[arg-type]
+        runtime=None,  # type: ignore[arg-type]
+    )
+    used = []
+
+    async def handler(request: ModelRequest) -> ModelResponse:
+        used.append(request.model)
+        return ModelResponse(result=[AIMessage("answer")])
+
+    asyncio.run(middleware.awrap_model_call(request, handler))
+    return update, used[0]
+
+
+@pytest.mark.parametrize(
+    ("question", "complexity", "model"),
+    [
+        ("Jenkins 的地址是什么？", QuestionComplexity.SIMPLE, FAST_MODEL),
+        ("对比 A 和 B 两个版本的发布流程", QuestionComplexity.COMPLEX, DEFAULT_MODEL),
+    ],
+)
+def test_routes_simple_questions_to_fast_model(question: str, complexity: QuestionComplexity, model: Any) -> None:
+    update, used = _route(question)
+
+    assert update == {"question_complexity": str(complexity)}
+    assert used is model
+
+
+def test_custom_classifier() -> None:
+    update, used = _route("anything", classifier=lambda _question: (QuestionComplexity.COMPLEX, "custom"))
+
+    assert update["question_complexity"] == QuestionComplexity.COMPLEX
+    assert used is DEFAULT_MODEL
@@ -0,0 +1,74 @@
+import asyncio
+from datetime import UTC, datetime
+from typing import Any
+
+import pytest
+from langchain.agents.middleware import ModelRequest, ModelResponse
+from langchain_core.messages import AIMessage, HumanMessage
+
+from app.middlewares import prompt_context
+from app.middlewares.prompt_context import VolatileContextMiddleware
+
+STATIC_PROMPT = "You are a helpful assistant.\n\n## Rules\n\n- Cite sources."
+
+
+def _freeze(monkeypatch: pytest.MonkeyPatch, day: datetime) -> None:
+    class _FrozenDatetime(datetime):
+        @classmethod
+        def now(cls, tz: Any = None) -> datetime:  # noqa: ARG003
+            return day
+
+    monkeypatch.setattr(prompt_context, "datetime", _FrozenDatetime)
+
+
+def _system_prompt(middleware: VolatileContextMiddleware, messages: list[Any]) -> str | None:
+    seen: list[str | None] = []
+
+    async def handler(request: ModelRequest) -> ModelResponse:
+        seen.append(request.system_prompt)
+        return ModelResponse(result=[AIMessage("answer")])
+
+    request = ModelRequest(
+        model=None,  # type: ignore[arg-type]
+        system_prompt=STATIC_PROMPT,
+        messages=messages,
+        tool_choice=None,
+        tools=[],
+        response_format=None,
+        state={"messages": messages},  # type: ignore[arg-type]
+        runtime=None,  # type: ignore[arg-type]
+    )
+    asyncio.run(middleware.awrap_model_call(request, handler))
+    return seen[0]
+
+
+def test_static_prompt_is_stable_prefix_across_turns_and_dates(monkeypatch: pytest.MonkeyPatch) -> None:
+    middleware = VolatileContextMiddleware()
+    turns = [[HumanMessage("first")], [HumanMessage("first"), AIMessage("a"), HumanMessage("second")]]
+
+    prompts = []
+    for day in (
+        datetime(2025, 1, 1, 8, tzinfo=UTC),
+        datetime(2025, 1, 1, 23, tzinfo=UTC),
+        datetime(2025, 1, 2, tzinfo=UTC),
+    ):
+        _freeze(monkeypatch, day)
+        prompts.extend(_system_prompt(middleware, messages) for messages in turns)
+
+    for prompt in prompts:
+        assert prompt.encode().startswith(STATIC_PROMPT.encode() + b"\n\n---\n\n")
+    # 同一天内完全相同，跨天只有末尾的日期不同
+    assert len(set(prompts[:4])) == 1
+    assert prompts[0].endswith("2025-01-01.") and prompts[-1].endswith("2025-01-02.")
+
+
+def test_custom_sections_appended_in_order() -> None:
+    middleware = VolatileContextMiddleware(sections=[lambda _r: "A", lambda _r: None, lambda _r: "B"])
+
+    assert _system_prompt(middleware, [HumanMessage("q")]) == STATIC_PROMPT + "\n\n---\n\nA\nB"
+
+
+def test_no_sections_leaves_prompt_unchanged() -> None:
+    middleware = VolatileContextMiddleware(sections=[lambda _r: None])
+
+    assert _system_prompt(middleware, [HumanMessage("q")]) == STATIC_PROMPT
@@ -0,0 +1,94 @@
+import asyncio
+from types import SimpleNamespace
+from typing import Any
+
+from langchain.agents.middleware.types import ToolCallRequest
+from langchain_core.messages import ToolMessage
+
+from app.middlewares.report_editing import ReportEditingMiddleware, report_revision
+
+
+class _Backend:
+    def __init__(self, text: str | None = None) -> None:
+        self.text = text
+
+    def read_text(self, path: str) -> str | None:  # noqa: ARG002
+        return self.text
+
+    def write_text(self, path: str, content: str) -> None:  # noqa: ARG002
+        self.text = content
+
+
+def _setup(text: str | None = None) -> tuple[ReportEditingMiddleware, _Backend, Any, list[dict[str, Any]]]:
+    backend = _Backend(text)
+    events: list[dict[str, Any]] = []
+    runtime = SimpleNamespace(stream_writer=events.append, config={})
+    return ReportEditingMiddleware(backend=backend), backend, runtime, events
+
+
+def _call(middleware: ReportEditingMiddleware, name: str, runtime: Any, **kwargs: Any) -> str:
+    tool = next(tool for tool in middleware.tools if tool.name == name)
+    return tool.func(runtime=runtime, **kwargs)
+
+
+def _splice(content: str, event: dict[str, Any]) -> str:
+    """与前端 applyReportSection 相同的按行范围拼接"""
+    lines = content.rstrip("\n").split("\n") if content.rstrip("\n") else []
+    lines[event["start_line"] : event["end_line"]] = event["text"].split("\n")
+    return "\n".join(lines) + "\n"
+
+
+def test_section_events_chain_revisions_and_splice_to_content() -> None:
+    middleware, backend, runtime, events = _setup()
+
+    _call(middleware, "upsert_report_section", runtime, heading="Report", content="Intro.", level=1)
+    _call(middleware, "upsert_report_section", runtime, heading="Findings", content="Alpha grew.")
+    _call(middleware, "upsert_report_section", runtime, heading="Overview", content="Summary.", after="Report")
+    _call(middleware, "append_report_section", runtime, heading="Findings", content="Beta shrank.")
+    _call(middleware, "patch_report_section", runtime, heading="Findings", old_string="grew", new_string="doubled")
+
+    assert [event["op"] for event in events] == ["upsert", "upsert", "upsert", "append", "patch"]
+    assert events[0]["base_revision"] is None and events[0]["created"]
+    report = ""
+    for previous, event in zip([None, *events], events, strict=False):
+        assert event["base_revision"] == (previous["revision"] if previous else None)
+        # 章节事件不附带报告全文，按行范围拼接后的版本与事件一致
+        assert "content" not in event
+        report = _splice(report, event)
+        assert event["revision"] == report_revision(report)
+    assert report == backend.text
+    assert "## Overview" in report and "Alpha doubled." in report and "Beta shrank." in report
+
+
+def test_failed_edit_emits_no_event() -> None:
+    middleware, _, runtime, events = _setup("## A\n\ntext\n")
+
+    result = _call(middleware, "patch_report_section", runtime, heading="A", old_string="missing", new_string="x")
+
+    assert result.startswith("Error")
+    assert events == []
+
+
+def test_file_tool_rewrite_emits_full_report() -> None:
+    middleware, backend, runtime, events = _setup("## A\n\nold\n")
+
+    async def handler(request: ToolCallRequest) -> ToolMessage:
+        args = request.tool_call["args"]
+        if args["file_path"].lstrip("/") == "final_report.md":
+            backend.text = args["content"]
+        return ToolMessage(content="ok", tool_call_id=request.tool_call["id"])
+
+    def request(name: str, path: str) -> ToolCallRequest:
+        call = {"name": name, "args": {"file_path": path, "content": "# New\n\nbody\n"}, "id": "c1"}
+        return ToolCallRequest(tool_call=call, tool=None, state={}, runtime=runtime)
+
+    asyncio.run(middleware.awrap_tool_call(request("write_file", "/notes.md"), handler))
+    assert events == []
+
+    asyncio.run(middleware.awrap_tool_call(request("write_file", "final_report.md"), handler))
+    (event,) = events
+    assert event["op"] == "write"
+    assert (event["start_line"], event["end_line"]) == (0, 3)
+    assert event["base_revision"] == report_revision("## A\n\nold\n")
+    assert event["content"] == "# New\n\nbody\n"
+    assert _splice("## A\n\nold\n", event) == event["content"]
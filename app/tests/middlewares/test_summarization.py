@@ -0,0 +1,74 @@
+import asyncio
+import json
+from typing import Any
+
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage, AnyMessage, HumanMessage, RemoveMessage, ToolMessage
+
+from app.middlewares.summarization import HistorySummarizationMiddleware
+from app.utils.citations import CITATION_SOURCES_KEY, collect_sources
+
+
+class _FailingModel(GenericFakeChatModel):
+    async def ainvoke(self, *_args: Any, **_kwargs: Any) -> AIMessage:
+        raise RuntimeError("summary model unavailable")
+
+
+def _search(call_id: str, *page_ids: str) -> list[AnyMessage]:
+    results = [
+        {"id": page_id, "title": f"Page {page_id}", "url": f"https://wiki/pages/{page_id}", "excerpt": "word " * 100}
+        for page_id in page_ids
+    ]
+    return [
+        AIMessage("", tool_calls=[{"name": "confluence_search", "args": {}, "id": call_id}]),
+        ToolMessage(json.dumps(results), tool_call_id=call_id, name="confluence_search"),
+    ]
+
+
+def _history() -> list[AnyMessage]:
+    return [
+        HumanMessage("first question"),
+        *_search("s1", "101", "102"),
+        AIMessage("first answer [1] [2]"),
+        HumanMessage("second question"),
+        *_search("s2", "102", "103"),
+    ]
+
+
+def _summarize(messages: list[AnyMessage], model: GenericFakeChatModel | None = None, **kwargs: Any) -> Any:
+    model = model or GenericFakeChatModel(messages=iter([AIMessage("  the summary  ")]))
+    middleware = HistorySummarizationMiddleware(model, **{"trigger_tokens": 100, "messages_to_keep": 2, **kwargs})
+    return asyncio.run(middleware.abefore_model({"messages": messages}, None))  # type: ignore[arg-type]
+
+
+def test_short_history_is_not_summarized() -> None:
+    assert _summarize(_history(), trigger_tokens=100_000) is None
+
+
+def test_summary_carries_sources_of_replaced_messages() -> None:
+    messages = _history()
+
+    update = _summarize(messages)
+
+    remove, summary, *preserved = update["messages"]
+    assert isinstance(remove, RemoveMessage)
+    assert summary.content.endswith("the summary")
+    assert [source["page_id"] for source in summary.additional_kwargs[CITATION_SOURCES_KEY]] == ["101", "102"]
+    # 工具调用与其结果不被拆开
+    assert preserved == messages[-2:]
+    # 摘要前后模型看到的引用编号一致
+    assert collect_sources([summary, *preserved]) == collect_sources(messages)
+
+
+def test_resummarizing_keeps_earlier_summary_sources() -> None:
+    first = _summarize(_history())["messages"][1]
+    messages = [first, *_history()[-2:], AIMessage("second answer"), HumanMessage("third"), *_search("s3", "104")]
+
+    summary = _summarize(messages)["messages"][1]
+
+    sources = [source["page_id"] for source in summary.additional_kwargs[CITATION_SOURCES_KEY]]
+    assert sources == ["101", "102", "103"]
+
+
+def test_summary_failure_keeps_history() -> None:
+    assert _summarize(_history(), model=_FailingModel(messages=iter([]))) is None
@@ -0,0 +1,104 @@
+import json
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any
+
+import pytest
+from langchain_core.messages import AIMessage, AnyMessage, HumanMessage, ToolMessage
+
+from app.backends import ThreadFileStore
+from app.middlewares import tool_offload
+from app.middlewares.tool_offload import READ_TOOL_OUTPUT_TOOL, ToolOutputOffloadMiddleware, read_tool_output
+from app.utils.citations import collect_sources
+
+THREAD_ID = "offload-thread"
+
+
+@pytest.fixture(autouse=True)
+def store(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> ThreadFileStore:
+    store = ThreadFileStore(tmp_path / "files.db", flush_interval=3600)
+    monkeypatch.setattr(tool_offload, "get_thread_file_store", lambda: store)
+    monkeypatch.setattr(tool_offload, "get_config", lambda: {"configurable": {"thread_id": THREAD_ID}})
+    return store
+
+
+def _page(page_id: str, words: int = 2000) -> str:
+    """`confluence_get_page` 风格的输出"""
+    metadata = {"id": page_id, "title": f"Page {page_id}", "url": f"https://wiki/pages/{page_id}"}
+    return json.dumps({"metadata": metadata, "content": f"Body of {page_id}. " + "word " * words})
+
+
+def _call(call_id: str, name: str = "confluence_get_page") -> dict[str, Any]:
+    return {"name": name, "args": {}, "id": call_id}
+
+
+def _tool(call_id: str, content: str, name: str = "confluence_get_page", **kwargs: Any) -> ToolMessage:
+    return ToolMessage(content=content, tool_call_id=call_id, name=name, id=f"m-{call_id}", **kwargs)
+
+
+def _history() -> list[AnyMessage]:
+    return [
+        HumanMessage("q", id="m-q"),
+        AIMessage("", tool_calls=[_call("t1"), _call("t2"), _call("t3"), _call("t4", READ_TOOL_OUTPUT_TOOL)], id="a1"),
+        _tool("t1", _page("101")),
+        _tool("t2", _page("102", words=5)),
+        _tool("t3", _page("103"), status="error"),
+        _tool("t4", "x " * 4000, name=READ_TOOL_OUTPUT_TOOL),
+        AIMessage("", tool_calls=[_call("t5"), _call("t6")], id="a2"),
+        _tool("t5", _page("105")),
+        # 最后一条模型回复之后的输出模型还没读过
+        AIMessage("", tool_calls=[_call("t7")], id="a3"),
+        _tool("t7", _page("107")),
+    ]
+
+
+def _apply(messages: list[AnyMessage], update: dict[str, Any] | None) -> list[AnyMessage]:
+    replaced = {message.id: message for message in (update or {}).get("messages", [])}
+    return [replaced.get(message.id, message) for message in messages]
+
+
+def _offload(messages: list[AnyMessage], **kwargs: Any) -> dict[str, Any] | None:
+    middleware = ToolOutputOffloadMiddleware(**{"min_tokens": 200, "trigger_tokens": 1000, **kwargs})
+    return middleware.before_model({"messages": messages}, None)  # type: ignore[arg-type]
+
+
+def test_offloads_only_consumed_large_outputs_above_trigger() -> None:
+    messages = _history()
+
+    assert _offload(messages, trigger_tokens=100_000) is None
+
+    update = _offload(messages)
+    assert update is not None
+    assert [message.tool_call_id for message in update["messages"]] == ["t1", "t5"]
+    for message in update["messages"]:
+        stub = json.loads(message.content)
+        assert stub["offloaded_tool_output"] == message.tool_call_id
+        assert stub["preview"].startswith("Body of")
+        assert len(message.content) < 1000
+
+    # 已卸载的输出不再计入，下一次调用模型前不重复卸载
+    assert _offload(_apply(messages, update)) is None
+
+
+def test_stub_keeps_sources_so_citation_numbering_is_stable() -> None:
+    messages = _history()
+
+    offloaded = _apply(messages, _offload(messages))
+
+    assert collect_sources(offloaded) == collect_sources(messages)
+    assert [source.page_id for source in collect_sources(offloaded)] == ["101", "102", "103", "105", "107"]
+
+
+def test_read_tool_output_round_trips_offloaded_text() -> None:
+    messages = _history()
+    _offload(messages)
+    runtime = SimpleNamespace(config={"configurable": {"thread_id": THREAD_ID}})
+    original = _page("101")
+
+    assert read_tool_output.func(ref="t1", runtime=runtime, limit=len(original)) == original
+
+    first = read_tool_output.func(ref="t1", runtime=runtime, limit=100)
+    assert first.startswith(original[:100])
+    assert "call again with offset=100" in first
+    assert read_tool_output.func(ref="t1", runtime=runtime, offset=100, limit=len(original)) == original[100:]
+    assert read_tool_output.func(ref="missing", runtime=runtime).startswith("Error")
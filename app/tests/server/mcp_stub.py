@@ -0,0 +1,65 @@
+"""
+故障注入用的 MCP 桩服务器（stdio），供监管器测试启动为子进程。
+
+工具：
+- `pid`：返回进程号（测试据此判断调用落在哪个进程上，或从外部杀死该进程）
+- `slow_pid`：等待 `seconds` 秒后返回进程号（用于在调用途中注入故障）
+- `hang`：阻塞事件循环，之后 ping 不再有响应，模拟卡死
+
+启动参数 `--state FILE --fail-starts N,M,...`：每次启动在 FILE 中记一次，第 N、M... 次启动直接退出，模拟启动失败。
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+from pathlib import Path
+
+from mcp.server.fastmcp import FastMCP
+
+server = FastMCP("stub")
+
+
+@server.tool()
+def pid() -> str:
+    return str(os.getpid())
+
+
+@server.tool()
+async def slow_pid(seconds: float) -> str:
+    await asyncio.sleep(seconds)
+    return str(os.getpid())
+
+
+@server.tool()
+def hang() -> str:
+    # 同步阻塞整个事件循环，ping 也无法响应
+    time.sleep(3600)
+    return "unreachable"
+
+
+def connection(state: Path | None = None, fail_starts: list[int] | None = None) -> dict:
+    """启动桩服务器的 langchain-mcp-adapters 连接配置"""
+    args = [__file__]
+    if state is not None:
+        args += ["--state", str(state), "--fail-starts", ",".join(map(str, fail_starts or []))]
+    return {"transport": "stdio", "command": sys.executable, "args": args}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--state", type=Path)
+    parser.add_argument("--fail-starts", default="")
+    args = parser.parse_args()
+    if args.state is not None:
+        with args.state.open("a") as f:
+            f.write("start\n")
+        starts = len(args.state.read_text().splitlines())
+        if str(starts) in args.fail_starts.split(","):
+            sys.exit(1)
+    server.run("stdio")
+
+
+if __name__ == "__main__":
+    main()
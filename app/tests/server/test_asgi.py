@@ -0,0 +1,16 @@
+from starlette.testclient import TestClient
+
+from app.core.llm_pool import get_shared_http_clients
+from app.server.asgi import app
+
+
+def test_llm_pool_metrics_lists_providers() -> None:
+    get_shared_http_clients("http://llm-pool-metrics.test/v1")
+
+    # 不进入 lifespan，避免预热 Agent 图
+    response = TestClient(app).get("/metrics/llm-pool")
+
+    assert response.status_code == 200
+    (stats,) = [s for s in response.json()["worker"] if s["provider"] == "http://llm-pool-metrics.test/v1"]
+    assert stats["in_flight"] == 0 and stats["requests"] == 0
+    assert "avg_wait_seconds" in stats
@@ -0,0 +1,32 @@
+import asyncio
+import json
+from pathlib import Path
+
+from app.server.graphs import GRAPH_FACTORIES, GraphPool, load_graph_factories
+
+_calls = 0
+
+
+async def _flaky_factory() -> str:
+    global _calls
+    _calls += 1
+    if _calls < 3:
+        raise ConnectionError("model endpoint unavailable")
+    return "graph"
+
+
+def test_load_graph_factories_from_langgraph_json(tmp_path: Path) -> None:
+    config = tmp_path / "langgraph.json"
+    config.write_text(json.dumps({"graphs": {"agent": "./main.py:create_confluence_research_agent_async"}}))
+
+    assert load_graph_factories(config) == {"agent": "main:create_confluence_research_agent_async"}
+    assert load_graph_factories(tmp_path / "missing.json") == GRAPH_FACTORIES
+
+
+def test_warmup_retries_until_ready() -> None:
+    pool = GraphPool({"agent": f"{__name__}:_flaky_factory"})
+
+    asyncio.run(asyncio.wait_for(pool.warm(retry_seconds=0.01), 5))
+
+    assert pool.ready
+    assert _calls == 3
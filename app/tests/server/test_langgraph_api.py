@@ -0,0 +1,140 @@
+import json
+from collections.abc import Iterator
+from pathlib import Path
+from typing import Any
+
+import pytest
+from deepagents.backends.utils import create_file_data
+from langchain.agents import create_agent
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGenerationChunk
+from langchain_core.tools import tool
+from langgraph.checkpoint.memory import InMemorySaver
+from starlette.applications import Starlette
+from starlette.testclient import TestClient
+
+import app.backends
+from app.backends import ThreadFileStore
+from app.middlewares.citations import CitationMiddleware
+from app.server import langgraph_api
+from app.server.graphs import GraphPool
+from app.server.threads import ThreadRegistry
+from app.utils.citations import SOURCES_HEADING
+
+
+class _StreamingFakeModel(GenericFakeChatModel):
+    """按词流式输出文本；带工具调用的消息整条输出"""
+
+    def bind_tools(self, tools: Any, **kwargs: Any) -> "_StreamingFakeModel":
+        return self
+
+    def _stream(
+        self, messages: list[BaseMessage], stop: Any = None, run_manager: Any = None, **kwargs: Any
+    ) -> Iterator[ChatGenerationChunk]:
+        message = next(self.messages)
+        if message.tool_calls:
+            chunk = AIMessageChunk(
+                content="",
+                tool_call_chunks=[
+                    {"name": call["name"], "args": json.dumps(call["args"]), "id": call["id"], "index": i}
+                    for i, call in enumerate(message.tool_calls)
+                ],
+            )
+            yield ChatGenerationChunk(message=chunk)
+            return
+        for word in message.content.split(" "):
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=word + " "))
+            if run_manager:
+                run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+
+
+@tool
+def search(query: str) -> str:
+    """Search Confluence."""
+    return json.dumps([{"id": "7", "title": f"Alpha ({query})", "url": "https://wiki/7"}])
+
+
+class _Pool(GraphPool):
+    def __init__(self, graph: Any) -> None:
+        super().__init__({"agent": "unused:unused"})
+        self._graphs["agent"] = graph
+
+
+@pytest.fixture
+def client(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Iterator[TestClient]:
+    model = _StreamingFakeModel(
+        messages=iter(
+            [
+                AIMessage("", tool_calls=[{"name": "search", "args": {"query": "q"}, "id": "call-1"}]),
+                AIMessage("Alpha grew in [2024] [1]"),
+            ]
+        )
+    )
+    graph = create_agent(model, tools=[search], middleware=[CitationMiddleware()], checkpointer=InMemorySaver())
+    registry = ThreadRegistry(tmp_path / "threads.db")
+    store = ThreadFileStore(tmp_path / "files.db")
+    monkeypatch.setattr(langgraph_api, "graphs", _Pool(graph))
+    monkeypatch.setattr(langgraph_api, "get_thread_registry", lambda: registry)
+    monkeypatch.setattr(app.backends, "get_thread_file_store", lambda: store)
+    with TestClient(Starlette(routes=langgraph_api.routes)) as test_client:
+        yield test_client
+    registry.close()
+    store.close()
+
+
+def _events(body: str) -> list[tuple[str, Any]]:
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+def test_thread_run_stream_state_and_search(client: TestClient) -> None:
+    assert [a["assistant_id"] for a in client.post("/assistants/search", json={}).json()] == ["agent"]
+    thread_id = client.post("/threads", json={"metadata": {"user": "u1"}}).json()["thread_id"]
+
+    response = client.post(
+        f"/threads/{thread_id}/runs/stream",
+        json={
+            "assistant_id": "agent",
+            "input": {"messages": [{"type": "human", "content": "How did Alpha do?"}]},
+            "stream_mode": ["values", "messages-tuple", "custom", "updates"],
+        },
+    )
+    events = _events(response.text)
+    assert events[0][0] == "metadata"
+    assert {"values", "messages", "updates", "custom"} <= {event for event, _ in events}
+
+    # 流式消息块的引用编号与最终回答一致，[2024] 原样保留
+    final = events[[event for event, _ in events].index("values", len(events) - 3)][1]["messages"][-1]
+    streamed = "".join(
+        data[0]["content"] for event, data in events if event == "messages" and data[0]["id"] == final["id"]
+    )
+    assert streamed == final["content"]
+    assert final["content"].startswith("Alpha grew in [2024] [1]")
+    assert SOURCES_HEADING in final["content"]
+
+    # 报告在线程文件存储中，随状态一起返回
+    app.backends.get_thread_file_store().put_file(thread_id, "/final_report.md", create_file_data("# Report\n"))
+    state = client.get(f"/threads/{thread_id}/state").json()
+    assert state["values"]["messages"][-1]["content"] == final["content"]
+    assert state["values"]["files"] == {"/final_report.md": "# Report\n"}
+    assert state["checkpoint"]["thread_id"] == thread_id
+    assert (
+        client.post(f"/threads/{thread_id}/history", json={"limit": 2}).json()[0]["checkpoint"] == state["checkpoint"]
+    )
+
+    [thread] = client.post("/threads/search", json={"limit": 30, "metadata": {"user": "u1"}}).json()
+    assert thread["status"] == "idle"
+    assert thread["metadata"]["graph_id"] == "agent"
+    assert thread["values"]["messages"][0]["content"] == "How did Alpha do?"
+
+
+def test_unknown_thread_and_assistant(client: TestClient) -> None:
+    assert client.get("/threads/missing").status_code == 404
+    assert client.get("/assistants/other").status_code == 404
+    response = client.post("/threads/t1/runs/stream", json={"assistant_id": "other", "input": {}})
+    assert response.status_code == 404
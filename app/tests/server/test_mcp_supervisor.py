@@ -0,0 +1,109 @@
+import asyncio
+import os
+import signal
+import time
+from collections.abc import Awaitable, Callable
+from pathlib import Path
+
+import pytest
+
+from app.server import mcp_supervisor
+from app.server.mcp_supervisor import McpServerSupervisor, ServerUnavailableError, tool_result_content
+from app.tests.server import mcp_stub
+
+
+def _supervisor(connection: dict | None = None, **kwargs) -> McpServerSupervisor:
+    options = {"ping_interval": 60.0, "hang_threshold": 1.0, "warm_standby": True, "start_timeout": 20.0, **kwargs}
+    return McpServerSupervisor("stub", connection or mcp_stub.connection(), **options)
+
+
+async def _pid(supervisor: McpServerSupervisor, tool: str = "pid", **arguments) -> int:
+    return int(tool_result_content(await supervisor.call_tool(tool, arguments)))
+
+
+async def _until(condition: Callable[[], bool], timeout: float = 20.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "condition not reached"
+        await asyncio.sleep(0.05)
+
+
+def _run(scenario: Callable[[McpServerSupervisor], Awaitable[None]], supervisor: McpServerSupervisor) -> None:
+    async def main() -> None:
+        await supervisor.start()
+        try:
+            await scenario(supervisor)
+        finally:
+            await supervisor.aclose()
+
+    asyncio.run(asyncio.wait_for(main(), 60))
+
+
+def test_calls_tools_and_keeps_warm_standby() -> None:
+    async def scenario(supervisor: McpServerSupervisor) -> None:
+        assert {tool.name for tool in await supervisor.get_tools()} == {"pid", "slow_pid", "hang"}
+        assert await _pid(supervisor) != os.getpid()
+        await _until(lambda: supervisor.stats.standby_ready)
+
+    _run(scenario, _supervisor())
+
+
+def test_fails_over_to_standby_when_process_exits() -> None:
+    async def scenario(supervisor: McpServerSupervisor) -> None:
+        await _until(lambda: supervisor.stats.standby_ready)
+        first = await _pid(supervisor)
+        os.kill(first, signal.SIGKILL)
+
+        assert await _pid(supervisor) != first
+        assert supervisor.stats.failovers == 1
+        # 后台补齐新的热备进程
+        await _until(lambda: supervisor.stats.standby_ready)
+
+    _run(scenario, _supervisor())
+
+
+def test_in_flight_call_retried_after_exit() -> None:
+    async def scenario(supervisor: McpServerSupervisor) -> None:
+        await _until(lambda: supervisor.stats.standby_ready)
+        first = await _pid(supervisor)
+        call = asyncio.create_task(_pid(supervisor, "slow_pid", seconds=0.5))
+        await asyncio.sleep(0.2)
+        os.kill(first, signal.SIGKILL)
+
+        # 调用转到热备进程重试一次
+        assert await call != first
+        assert supervisor.stats.failovers == 1
+
+    _run(scenario, _supervisor())
+
+
+def test_hung_process_detected_by_ping() -> None:
+    async def scenario(supervisor: McpServerSupervisor) -> None:
+        await _until(lambda: supervisor.stats.standby_ready)
+        first = await _pid(supervisor)
+
+        # 卡死进程上的在途调用直接失败，不在热备进程上重试
+        with pytest.raises(ServerUnavailableError, match="stopped responding"):
+            await supervisor.call_tool("hang", {})
+        assert "ping timed out" in supervisor.stats.last_failure
+        assert supervisor.stats.failovers == 1
+        assert await _pid(supervisor) != first
+
+    _run(scenario, _supervisor(ping_interval=0.1, hang_threshold=0.3))
+
+
+def test_restart_backs_off_after_start_failures(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(mcp_supervisor, "_RESTART_BACKOFF_BASE", 0.2)
+    # 第 2、3、4 次启动（热备进程）失败，第 5 次成功
+    connection = mcp_stub.connection(tmp_path / "starts", fail_starts=[2, 3, 4])
+
+    async def scenario(supervisor: McpServerSupervisor) -> None:
+        started = time.monotonic()
+        await _until(lambda: supervisor.stats.standby_ready)
+
+        assert supervisor.stats.start_failures == 3
+        # 等待 0.2s、0.4s 后再次启动，第三次等待被 restart_backoff_max 限制为 0.5s
+        assert time.monotonic() - started >= 0.2 + 0.4 + 0.5
+        assert len((tmp_path / "starts").read_text().splitlines()) == 5
+
+    _run(scenario, _supervisor(connection, restart_backoff_max=0.5))
@@ -0,0 +1,121 @@
+import asyncio
+import hashlib
+import json
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any
+
+import pytest
+from PIL import Image
+from tenacity import wait_none
+
+from app.enums import SignatureStatus
+from app.sign_check import engine as engine_module
+from app.sign_check.engine import SignCheckEngine, load_completed
+
+SIGNED = '{"签名": {"status": "ok"}}'
+
+
+class _Model:
+    """按顺序返回预设输出的视觉模型"""
+
+    model_name = "fake-vl"
+
+    def __init__(self, *outputs: str) -> None:
+        self.outputs = list(outputs)
+        self.calls = 0
+
+    async def ainvoke(self, _messages: list[Any]) -> SimpleNamespace:
+        self.calls += 1
+        return SimpleNamespace(text=self.outputs.pop(0))
+
+
+def _blank_page(path: Path) -> Path:
+    Image.new("L", (600, 800), 255).save(path)
+    return path
+
+
+def _documents(tmp_path: Path, count: int) -> list[Path]:
+    paths = []
+    for i in range(count):
+        path = tmp_path / f"doc{i}.png"
+        path.write_bytes(f"image {i}".encode())
+        paths.append(path)
+    return paths
+
+
+def _rows(path: Path) -> list[dict[str, Any]]:
+    return [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+
+
+@pytest.fixture(autouse=True)
+def _no_retry_wait(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(engine_module, "wait_random_exponential", lambda **_kwargs: wait_none())
+
+
+def test_invalid_output_retried_until_valid(tmp_path: Path) -> None:
+    model = _Model("not json", '{"签名": {"status": "unknown"}}', SIGNED)
+    engine = SignCheckEngine(tmp_path / "out.jsonl", model=model, max_attempts=3, predetect=False)
+
+    stats = asyncio.run(engine.run(_documents(tmp_path, 1)))
+
+    assert model.calls == 3
+    assert (stats.succeeded, stats.failed, stats.retries) == (1, 0, 2)
+    (row,) = _rows(tmp_path / "out.jsonl")
+    assert row["ok"] and row["attempts"] == 3
+    assert row["positions"]["签名"]["status"] == "ok"
+
+
+def test_schema_validation_failure_recorded_after_max_attempts(tmp_path: Path) -> None:
+    model = _Model(*['{"签名": {"status": "unknown"}}'] * 2)
+    engine = SignCheckEngine(tmp_path / "out.jsonl", model=model, max_attempts=2, predetect=False)
+
+    stats = asyncio.run(engine.run(_documents(tmp_path, 1)))
+
+    assert (stats.succeeded, stats.failed) == (0, 1)
+    (row,) = _rows(tmp_path / "out.jsonl")
+    assert not row["ok"] and row["attempts"] == 2
+    assert row["error"].startswith("ValidationError")
+    # 失败的文档不计入已完成，下次运行重新处理
+    assert load_completed(tmp_path / "out.jsonl") == set()
+
+
+def test_resume_skips_completed_and_tolerates_partial_line(tmp_path: Path) -> None:
+    documents = _documents(tmp_path, 3)
+    done = hashlib.sha256(documents[0].read_bytes()).hexdigest()
+    output = tmp_path / "out.jsonl"
+    # 上次运行：第一个文档成功，第二个文档的记录只写了一半就中断
+    output.write_text(
+        json.dumps({"document": "doc0", "document_id": done, "ok": True}) + "\n" + '{"document": "doc1", "docu',
+        encoding="utf-8",
+    )
+    model = _Model(SIGNED, SIGNED)
+
+    stats = asyncio.run(SignCheckEngine(output, model=model, predetect=False).run(documents))
+
+    assert model.calls == 2
+    assert (stats.total, stats.skipped, stats.succeeded) == (3, 1, 2)
+    assert len(load_completed(output)) == 3
+    # 再次运行时全部跳过
+    again = asyncio.run(SignCheckEngine(output, model=_Model(), predetect=False).run(documents))
+    assert again.skipped == 3
+
+
+@pytest.mark.parametrize("decide_missing", [True, False])
+def test_all_blank_page_decided_without_model(tmp_path: Path, decide_missing: bool) -> None:
+    model = _Model('{"签名": {"status": "faint"}}')
+    engine = SignCheckEngine(tmp_path / "out.jsonl", model=model, predetect=True, decide_missing=decide_missing)
+
+    record = asyncio.run(engine.check_document(_blank_page(tmp_path / "blank.png")))
+
+    assert record is not None and record.ok
+    assert record.regions and record.regions[0]["flag"] == SignatureStatus.MISSING
+    if decide_missing:
+        assert model.calls == 0
+        assert record.decided_by == "predetect"
+        assert record.worst_status == SignatureStatus.MISSING
+        assert engine.stats.predetect_decided == 1
+    else:
+        assert model.calls == 1
+        assert record.decided_by == "model"
+        assert record.worst_status == SignatureStatus.FAINT
@@ -0,0 +1,95 @@
+import asyncio
+import threading
+from functools import partial
+from pathlib import Path
+
+import pytest
+from starlette.applications import Starlette
+from starlette.testclient import TestClient
+
+from app.core.config import settings
+from app.sign_check import jobs
+from app.sign_check.engine import SignCheckEngine
+from app.sign_check.jobs import JobConflictError, SignCheckJob, submit_job
+
+
+@pytest.fixture(autouse=True)
+def upload_dir(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    uploads = tmp_path / "uploads"
+    (uploads / "batch").mkdir(parents=True)
+    monkeypatch.setattr(settings, "UPLOAD_DIR", str(uploads))
+    monkeypatch.setattr(settings, "SIGN_CHECK_OUTPUT_DIR", str(tmp_path / "results"))
+    monkeypatch.setattr(jobs, "_jobs", {})
+    monkeypatch.setattr(jobs, "SignCheckEngine", partial(SignCheckEngine, model=object(), predetect=False))
+    return uploads
+
+
+@pytest.fixture
+def release(monkeypatch: pytest.MonkeyPatch) -> threading.Event:
+    """任务一直运行，直到测试设置返回的事件"""
+    event = threading.Event()
+
+    async def run_job(_job: SignCheckJob) -> None:
+        await asyncio.to_thread(event.wait, 10)
+
+    monkeypatch.setattr(jobs, "_run_job", run_job)
+    return event
+
+
+@pytest.mark.parametrize(
+    ("body", "error"),
+    [
+        ("{not json", "invalid JSON body"),
+        ("[]", "JSON object"),
+        ('{"name": 123}', "name may only contain"),
+        ('{"name": "a/b"}', "name may only contain"),
+        ('{"input_dir": 5}', "input_dir"),
+        ('{"input_dir": "../.."}', "input_dir"),
+        ('{"input_dir": "missing"}', "input_dir"),
+    ],
+)
+def test_create_job_rejects_invalid_body(body: str, error: str) -> None:
+    client = TestClient(Starlette(routes=jobs.routes))
+
+    response = client.post("/sign-check/jobs", content=body)
+
+    assert response.status_code == 400
+    assert error in response.json()["error"]
+    assert jobs._jobs == {}
+
+
+def test_running_job_name_conflicts(release: threading.Event) -> None:
+    with TestClient(Starlette(routes=jobs.routes)) as client:
+        first = client.post("/sign-check/jobs", json={"input_dir": "batch", "name": "daily"})
+        conflict = client.post("/sign-check/jobs", json={"name": "daily"})
+        other = client.post("/sign-check/jobs", json={"name": "weekly"})
+        release.set()
+
+    assert first.status_code == 202
+    assert first.json()["name"] == "daily" and first.json()["state"] == "running"
+    assert first.json()["output"].endswith("daily.jsonl")
+    assert conflict.status_code == 409
+    assert other.status_code == 202
+
+
+def test_finished_jobs_evicted_beyond_limit(monkeypatch: pytest.MonkeyPatch, upload_dir: Path) -> None:
+    monkeypatch.setattr(settings, "SIGN_CHECK_MAX_FINISHED_JOBS", 2)
+
+    async def scenario() -> list[str]:
+        submitted = []
+        for name in ("a", "b", "c", "d"):
+            job = submit_job(upload_dir / "batch", name)
+            await job.task
+            submitted.append(job.job_id)
+        # 同名任务结束后可以再次提交（断点续跑）
+        job = submit_job(upload_dir / "batch", "d")
+        with pytest.raises(JobConflictError):
+            submit_job(upload_dir / "batch", "d")
+        await job.task
+        return [*submitted, job.job_id]
+
+    submitted = asyncio.run(scenario())
+
+    # 提交时最多保留 2 个已结束的任务
+    assert list(jobs._jobs) == submitted[-3:]
+    assert all(job.state == "finished" for job in jobs._jobs.values())
@@ -0,0 +1,104 @@
+import io
+
+import numpy as np
+import pytest
+from PIL import Image, ImageDraw
+
+from app.enums import SignatureStatus
+from app.sign_check.predetect import _otsu_threshold, detect_regions, prepare_for_model
+
+WIDTH, HEIGHT = 600, 800
+
+
+def _page() -> tuple[Image.Image, ImageDraw.ImageDraw]:
+    image = Image.new("L", (WIDTH, HEIGHT), 255)
+    return image, ImageDraw.Draw(image)
+
+
+def _scribble(draw: ImageDraw.ImageDraw, x0: int, y0: int, x1: int, y1: int) -> None:
+    """在方框内画一段折线笔迹（没有足以被识别为表格线的长直线）"""
+    step = (x1 - x0) // 8
+    points = [(x0 + i * step, y1 if i % 2 else y0) for i in range(9)]
+    draw.line(points, fill=30, width=2)
+
+
+def _underline_page(signed: bool) -> Image.Image:
+    image, draw = _page()
+    draw.rectangle((100, 600, 300, 601), fill=0)
+    if signed:
+        _scribble(draw, 120, 570, 280, 595)
+    return image
+
+
+def _table_page(signed: bool) -> Image.Image:
+    """底部审批栏：两条贯穿横线之间三个单元格，第一个单元格是标签，第二个是签名栏"""
+    image, draw = _page()
+    for y in (600, 660):
+        draw.rectangle((50, y, 550, y + 1), fill=0)
+    for x in (50, 250, 550):
+        draw.rectangle((x, 600, x + 1, 661), fill=0)
+    for x in range(70, 200, 14):
+        draw.rectangle((x, 622, x + 7, 636), fill=0)
+    if signed:
+        _scribble(draw, 280, 612, 520, 650)
+    return image
+
+
+def _png(image: Image.Image) -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+@pytest.mark.parametrize("value", [0, 128, 255])
+def test_otsu_threshold_on_uniform_image(value: int) -> None:
+    gray = np.full((50, 40), value, dtype=np.uint8)
+    assert 0 <= _otsu_threshold(gray) <= 255
+
+
+def test_otsu_threshold_separates_two_levels() -> None:
+    gray = np.full((50, 40), 240, dtype=np.uint8)
+    gray[:10] = 20
+    assert 20 <= _otsu_threshold(gray) < 240
+
+
+@pytest.mark.parametrize("value", [0, 255])
+def test_blank_page_falls_back_to_missing_bottom_band(value: int) -> None:
+    regions = detect_regions(np.full((HEIGHT, WIDTH), value, dtype=np.uint8))
+
+    (region,) = regions
+    assert region.kind == "bottom_band"
+    assert region.flag == SignatureStatus.MISSING
+
+
+@pytest.mark.parametrize(("signed", "flag"), [(False, SignatureStatus.MISSING), (True, None)])
+def test_underline_region(signed: bool, flag: SignatureStatus | None) -> None:
+    regions = detect_regions(np.asarray(_underline_page(signed)))
+
+    (region,) = regions
+    assert region.kind == "underline"
+    x0, y0, x1, y1 = region.box
+    assert (x0, y1) == (100, 600) and x1 >= 300 and y0 < 570
+    assert region.flag == flag
+
+
+@pytest.mark.parametrize(("signed", "flag"), [(False, SignatureStatus.MISSING), (True, None)])
+def test_table_cell_right_of_label(signed: bool, flag: SignatureStatus | None) -> None:
+    regions = detect_regions(np.asarray(_table_page(signed)))
+
+    (region,) = regions
+    assert region.kind == "cell"
+    x0, y0, x1, y1 = region.box
+    assert abs(x0 - 250) <= 1 and abs(x1 - 550) <= 1 and abs(y0 - 600) <= 1 and abs(y1 - 660) <= 1
+    assert region.flag == flag
+
+
+def test_prepare_for_model_marks_all_blank() -> None:
+    blank = prepare_for_model(_png(_page()[0]))
+    unsigned = prepare_for_model(_png(_table_page(signed=False)))
+    signed = prepare_for_model(_png(_table_page(signed=True)))
+
+    assert blank.all_blank and unsigned.all_blank
+    assert not signed.all_blank
+    # 检测到表格结构时只发送候选区域所在的行
+    assert Image.open(io.BytesIO(unsigned.data)).height < HEIGHT
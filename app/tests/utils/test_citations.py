@@ -0,0 +1,121 @@
+import asyncio
+import json
+from typing import Any
+
+from langchain_core.messages import AIMessageChunk, HumanMessage, ToolMessage
+
+from app.utils.citations import (
+    CITATION_SOURCES_EVENT,
+    SOURCES_HEADING,
+    CitationResolver,
+    CitationSource,
+    astream_with_citations,
+    collect_sources,
+    extract_sources,
+)
+
+SOURCES = [
+    CitationSource("1", "Alpha", "https://wiki/1"),
+    CitationSource("2", "Beta", "https://wiki/2"),
+    CitationSource("3", "Gamma"),
+]
+
+
+def test_extract_sources_from_search_and_page_results() -> None:
+    search = json.dumps([{"id": "1", "title": "Alpha", "url": "u1", "ancestors": [{"id": "9", "title": "Root"}]}])
+    page = json.dumps({"metadata": {"id": "2", "title": "Beta"}, "content": "..."})
+
+    assert extract_sources(search) == [CitationSource("1", "Alpha", "u1")]
+    assert extract_sources(page) == [CitationSource("2", "Beta")]
+    assert extract_sources("plain text") == []
+
+
+def test_collect_sources_deduplicates_in_first_seen_order() -> None:
+    messages = [
+        ToolMessage(json.dumps({"id": "2", "title": "Beta"}), tool_call_id="a"),
+        ToolMessage(json.dumps([{"id": "1", "title": "Alpha"}, {"id": "2", "title": "Beta"}]), tool_call_id="b"),
+    ]
+
+    assert [source.page_id for source in collect_sources(messages)] == ["2", "1"]
+
+
+def test_resolve_renumbers_by_first_citation() -> None:
+    resolver = CitationResolver(SOURCES)
+
+    answer = resolver.resolve("Gamma first [3], then alpha [1, 3].")
+
+    body, sources = answer.split(SOURCES_HEADING)
+    assert body.strip() == "Gamma first [1], then alpha [2][1]."
+    assert sources.strip().splitlines() == ["1. Gamma", "2. [Alpha](https://wiki/1)"]
+
+
+def test_non_citation_brackets_are_kept() -> None:
+    resolver = CitationResolver(SOURCES)
+
+    assert resolver.resolve("In [2024] the budget grew [2].").startswith("In [2024] the budget grew [1].")
+
+
+def test_unknown_numbers_inside_a_citation_are_dropped() -> None:
+    assert CitationResolver(SOURCES).resolve("Fact [2, 9].").startswith("Fact [1].")
+
+
+def test_code_is_not_rewritten() -> None:
+    resolver = CitationResolver(SOURCES)
+
+    assert resolver.resolve("Use `items[1]` and\n```\nx[2]\n```\nsee [3]").startswith(
+        "Use `items[1]` and\n```\nx[2]\n```\nsee [1]"
+    )
+
+
+def test_streaming_handles_split_markers() -> None:
+    resolver = CitationResolver(SOURCES)
+    chunks = ["Alpha [", "1", "] and beta [2", "]", " done"]
+
+    streamed = "".join(resolver.feed(chunk) for chunk in chunks) + resolver.finish()
+
+    assert streamed == CitationResolver(SOURCES).resolve("".join(chunks))
+
+
+class _FakeAgent:
+    """按给定的 (mode, chunk) 序列模拟 `astream` 输出"""
+
+    def __init__(self, items: list[tuple[str, Any]]) -> None:
+        self.items = items
+
+    async def astream(self, *_args: Any, **_kwargs: Any):
+        for item in self.items:
+            yield item
+
+
+def _collect(agent: _FakeAgent, custom_events: bool = False) -> list[Any]:
+    async def main() -> list[Any]:
+        input = {"messages": [HumanMessage("q")]}
+        return [item async for item in astream_with_citations(agent, input, custom_events=custom_events)]
+
+    return asyncio.run(main())
+
+
+def test_stream_uses_numbering_from_the_middleware() -> None:
+    main_ns = {"langgraph_checkpoint_ns": "model:1"}
+    sources_event = {"type": CITATION_SOURCES_EVENT, "sources": [s.to_dict() for s in SOURCES]}
+    agent = _FakeAgent(
+        [
+            ("custom", {"type": CITATION_SOURCES_EVENT, "sources": []}),
+            ("messages", (AIMessageChunk(content="Searching [1]"), main_ns)),
+            ("messages", (ToolMessage(json.dumps({"id": "9", "title": "Other"}), tool_call_id="t"), main_ns)),
+            ("custom", sources_event),
+            ("messages", (AIMessageChunk(content="Beta [2] in [2024]"), main_ns)),
+            ("messages", (AIMessageChunk(content="sub [1]"), {"langgraph_checkpoint_ns": "tools:1|model:2"})),
+            ("custom", {"type": "report_section", "heading": "A"}),
+        ]
+    )
+
+    items = _collect(agent, custom_events=True)
+    text = "".join(item for item in items if isinstance(item, str))
+
+    # 每次模型调用重新开始解析：最终回答的编号与 after_agent 对同一条消息的处理一致
+    body, sources = text.split(SOURCES_HEADING)
+    assert body.strip() == "Searching [1]Beta [1] in [2024]"
+    assert sources.strip() == "1. [Beta](https://wiki/2)"
+    assert {"type": "report_section", "heading": "A"} in items
+    assert not any(isinstance(item, dict) and item.get("type") == CITATION_SOURCES_EVENT for item in items)
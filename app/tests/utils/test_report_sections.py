@@ -0,0 +1,106 @@
+from app.utils.report_sections import (
+    diff_sections,
+    find_section,
+    report_lines,
+    section_fingerprints,
+    section_headings,
+    split_sections,
+    strip_line_numbers,
+)
+
+REPORT = """# Title
+
+Intro.
+
+## Overview
+
+Text.
+
+### Detail
+
+```
+## not a heading
+```
+
+## Findings
+
+More.
+"""
+
+
+def test_split_sections_by_level_two() -> None:
+    sections = split_sections(REPORT)
+
+    assert [section.key for section in sections] == ["# Title", "## Overview", "## Findings"]
+    assert "### Detail" in sections[1].text
+    assert "## not a heading" in sections[1].text
+
+
+def test_split_sections_keeps_preamble() -> None:
+    sections = split_sections("preface\n\n## A\n\nbody")
+
+    assert sections[0].heading == "" and sections[0].level == 0
+    assert sections[1].key == "## A"
+
+
+def test_fingerprints_disambiguate_duplicate_headings() -> None:
+    fingerprints = section_fingerprints(split_sections("## A\n\none\n\n## A\n\ntwo\n"))
+
+    assert list(fingerprints) == ["## A", "## A (2)"]
+
+
+def test_diff_sections_reports_changed_and_removed() -> None:
+    previous = section_fingerprints(split_sections(REPORT))
+    updated = REPORT.replace("More.", "Much more.").replace("# Title\n\nIntro.\n\n", "")
+
+    changed, removed, ratio = diff_sections(previous, split_sections(updated))
+
+    assert [section.key for section in changed] == ["## Findings"]
+    assert removed == ["# Title"]
+    assert 0 < ratio <= 1
+
+
+def test_diff_sections_unchanged_report() -> None:
+    sections = split_sections(REPORT)
+
+    assert diff_sections(section_fingerprints(sections), sections) == ([], [], 0.0)
+
+
+def test_strip_line_numbers_joins_continuation_lines() -> None:
+    numbered = "     1\tfirst\n     2\tsecond part\n   2.1\t continued\n"
+
+    assert strip_line_numbers(numbered) == "first\nsecond part continued"
+
+
+def test_find_section_includes_subsections_and_skips_fences() -> None:
+    lines = report_lines(REPORT)
+
+    start, end, level = find_section(lines, "overview")
+    assert (lines[start], level) == ("## Overview", 2)
+    assert lines[end] == "## Findings"
+    assert "### Detail" in lines[start:end]
+    assert find_section(lines, "not a heading") is None
+
+
+def test_find_section_title_covers_only_preamble() -> None:
+    lines = report_lines(REPORT)
+
+    start, end, level = find_section(lines, "# Title")
+    assert (start, level) == (0, 1)
+    assert lines[end] == "## Overview"
+
+
+def test_find_section_subsection_and_last_section() -> None:
+    lines = report_lines(REPORT)
+
+    start, end, level = find_section(lines, "  DETAIL ")
+    assert (lines[start], level) == ("### Detail", 3)
+    assert lines[end] == "## Findings"
+    assert find_section(lines, "Findings")[1] == len(lines)
+
+
+def test_find_section_returns_first_duplicate() -> None:
+    lines = report_lines("## A\n\none\n\n## A\n\ntwo\n")
+
+    assert find_section(lines, "A") == (0, 4, 2)
+    assert section_headings(lines) == ["## A", "## A"]
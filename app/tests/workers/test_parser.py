@@ -0,0 +1,206 @@
+import asyncio
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any
+
+import pytest
+
+from app.enums import ParseJobKind
+from app.schemas.parse_job import ParseJob
+from app.workers.parser import ParserWorker
+from app.workers.queue import KafkaJobQueue, QueueMessage, SQLiteJobQueue
+
+
+def _page_job(page_id: str) -> ParseJob:
+    return ParseJob(kind=ParseJobKind.PAGE_UPDATE, page_id=page_id)
+
+
+async def _publish(queue: SQLiteJobQueue, *page_ids: str) -> None:
+    for page_id in page_ids:
+        await queue.publish(_page_job(page_id))
+
+
+def test_batch_coalesces_jobs_for_same_target(tmp_path: Path) -> None:
+    handled: list[str] = []
+
+    async def handler(job: ParseJob) -> None:
+        handled.append(job.key)
+
+    async def run() -> ParserWorker:
+        queue = SQLiteJobQueue(tmp_path / "queue.db")
+        await _publish(queue, "1", "2", "1", "1")
+        worker = ParserWorker(queue, handler, batch_size=10)
+        await worker.process_batch(await queue.poll(10, 0))
+        assert queue.pending() == {}
+        await queue.close()
+        return worker
+
+    worker = asyncio.run(run())
+    assert sorted(handled) == ["page:1", "page:2"]
+    assert worker.stats.received == 4
+    assert worker.stats.coalesced == 2
+    assert worker.stats.succeeded == 4
+
+
+def test_failing_job_is_retried_then_dead_lettered(tmp_path: Path) -> None:
+    attempts = 0
+
+    async def handler(_job: ParseJob) -> None:
+        nonlocal attempts
+        attempts += 1
+        raise RuntimeError("parse failed")
+
+    async def run() -> tuple[ParserWorker, dict[str, int]]:
+        queue = SQLiteJobQueue(tmp_path / "queue.db")
+        await _publish(queue, "1")
+        worker = ParserWorker(queue, handler, max_attempts=3, backoff=0.001)
+        await worker.process_batch(await queue.poll(10, 0))
+        pending = queue.pending()
+        await queue.close()
+        return worker, pending
+
+    worker, pending = asyncio.run(run())
+    assert attempts == 3
+    assert worker.stats.retries == 2
+    assert worker.stats.dead_lettered == 1
+    assert pending == {"dead": 1}
+
+
+def test_redelivered_job_is_dead_lettered_without_processing(tmp_path: Path) -> None:
+    async def handler(_job: ParseJob) -> None:
+        raise AssertionError("should not be called")
+
+    async def run() -> dict[str, int]:
+        # 租约立即到期：未提交的任务每次拉取都会被重新投递
+        queue = SQLiteJobQueue(tmp_path / "queue.db", lease_seconds=0)
+        await _publish(queue, "1")
+        messages: list[QueueMessage] = []
+        for _ in range(3):
+            messages = await queue.poll(10, 0)
+        assert messages[0].deliveries == 3
+        await ParserWorker(queue, handler, max_attempts=2).process_batch(messages)
+        pending = queue.pending()
+        await queue.close()
+        return pending
+
+    assert asyncio.run(run()) == {"dead": 1}
+
+
+def test_commit_happens_after_processing(tmp_path: Path) -> None:
+    async def run() -> None:
+        queue = SQLiteJobQueue(tmp_path / "queue.db", lease_seconds=0)
+        await _publish(queue, "1")
+        seen: list[dict[str, int]] = []
+
+        async def handler(_job: ParseJob) -> None:
+            seen.append(queue.pending())
+
+        await ParserWorker(queue, handler).process_batch(await queue.poll(10, 0))
+        assert seen == [{"leased": 1}]
+        assert queue.pending() == {}
+
+        # 处理过程中被中断（worker 崩溃）：任务未提交，之后重新投递
+        await _publish(queue, "2")
+
+        async def crashing(_job: ParseJob) -> None:
+            raise asyncio.CancelledError
+
+        with pytest.raises(asyncio.CancelledError):
+            await ParserWorker(queue, crashing).process_batch(await queue.poll(10, 0))
+        [message] = await queue.poll(10, 0)
+        assert message.job.page_id == "2"
+        assert message.deliveries == 2
+        await queue.close()
+
+    asyncio.run(run())
+
+
+def test_run_backs_off_on_queue_errors(tmp_path: Path) -> None:
+    class FlakyQueue(SQLiteJobQueue):
+        failures = 2
+
+        async def poll(self, max_records: int, timeout: float) -> list[QueueMessage]:
+            if self.failures:
+                self.failures -= 1
+                raise OSError("queue unavailable")
+            return await super().poll(max_records, timeout)
+
+    async def run() -> list[str]:
+        queue = FlakyQueue(tmp_path / "queue.db")
+        await _publish(queue, "1")
+        stop = asyncio.Event()
+        handled: list[str] = []
+
+        async def handler(job: ParseJob) -> None:
+            handled.append(job.key)
+            stop.set()
+
+        await asyncio.wait_for(ParserWorker(queue, handler, poll_timeout=0, backoff=0.001).run(stop), 5)
+        assert queue.pending() == {}
+        await queue.close()
+        return handled
+
+    assert asyncio.run(run()) == ["page:1"]
+
+
+class _FakeConsumer:
+    """单分区的 Kafka 消费者：按消费位置拉取，`seek` 移动位置，`commit` 记录已提交的偏移量"""
+
+    def __init__(self, values: list[bytes]) -> None:
+        self.records = [SimpleNamespace(offset=i, value=v, key=None) for i, v in enumerate(values)]
+        self.position = 0
+        self.committed_offset: int | None = None
+
+    async def getmany(self, timeout_ms: int, max_records: int) -> dict[str, list[Any]]:  # noqa: ARG002
+        await asyncio.sleep(0)
+        batch = self.records[self.position : self.position + max_records]
+        self.position += len(batch)
+        return {"tp0": batch} if batch else {}
+
+    async def commit(self, offsets: dict[str, int]) -> None:
+        self.committed_offset = offsets["tp0"]
+
+    async def committed(self, _partition: str) -> int | None:
+        return self.committed_offset
+
+    def seek(self, _partition: str, offset: int) -> None:
+        self.position = offset
+
+
+class _FlakyProducer:
+    """死信写入第一次失败"""
+
+    def __init__(self) -> None:
+        self.failures = 1
+        self.sent: list[bytes] = []
+
+    async def send_and_wait(self, _topic: str, value: bytes, **_kwargs: Any) -> None:
+        if self.failures:
+            self.failures -= 1
+            raise OSError("broker unavailable")
+        self.sent.append(value)
+
+
+def test_kafka_batch_failure_rewinds_to_committed_offset() -> None:
+    async def handler(job: ParseJob) -> None:
+        if job.page_id == "2":
+            raise RuntimeError("parse failed")
+
+    async def run() -> tuple[_FakeConsumer, _FlakyProducer]:
+        queue = KafkaJobQueue()
+        consumer = _FakeConsumer([_page_job(page_id).model_dump_json().encode() for page_id in "123"])
+        producer = _FlakyProducer()
+        queue._consumer, queue._producer = consumer, producer
+        worker = ParserWorker(queue, handler, batch_size=2, max_attempts=1, poll_timeout=0, backoff=0.001)
+        stop = asyncio.Event()
+        task = asyncio.create_task(worker.run(stop))
+        while consumer.committed_offset != 3:
+            await asyncio.sleep(0.01)
+        stop.set()
+        await asyncio.wait_for(task, 5)
+        return consumer, producer
+
+    consumer, producer = asyncio.run(asyncio.wait_for(run(), 10))
+    # 死信写入失败的批次被重新拉取，页面 2 最终进入死信，而不是被之后的提交跳过
+    assert [ParseJob.model_validate_json(value).page_id for value in producer.sent] == ["2"]
+    assert consumer.committed_offset == 3
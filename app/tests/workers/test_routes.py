@@ -0,0 +1,32 @@
+import importlib
+from pathlib import Path
+
+import pytest
+from starlette.applications import Starlette
+from starlette.testclient import TestClient
+
+from app.workers.queue import SQLiteJobQueue
+
+# `app.workers.routes` 在包中被同名的路由列表遮住
+routes = importlib.import_module("app.workers.routes")
+
+
+@pytest.fixture
+def client(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> TestClient:
+    monkeypatch.setattr(routes, "_queue", SQLiteJobQueue(tmp_path / "queue.db"))
+    return TestClient(Starlette(routes=routes.routes))
+
+
+def test_publish_jobs(client: TestClient) -> None:
+    response = client.post("/parse-jobs", json=[{"kind": "page_update", "page_id": "1"}])
+
+    assert response.status_code == 202
+    assert routes._queue.pending() == {"ready": 1}
+
+
+@pytest.mark.parametrize("body", [b"{not json", b'{"kind": "page_update"}', b'"text"'])
+def test_publish_jobs_rejects_bad_bodies(client: TestClient, body: bytes) -> None:
+    response = client.post("/parse-jobs", content=body, headers={"content-type": "application/json"})
+
+    assert response.status_code == 400
+    assert routes._queue.pending() == {}
@@ -9,11 +9,30 @@
    - format_mcp_tools_list: 工具列表格式化
    - merge_mcp_configs: 合并配置字典
 
+2. **report_sections** - Markdown 报告章节工具
+   - split_sections: 按标题拆分章节
+   - section_fingerprints / diff_sections: 章节指纹与变化对比
+   - report_lines / find_section / section_headings: 按标题定位章节行范围
+   - read_backend_text / write_backend_text: 从文件后端读取 / 写入原文
+
+3. **citations** - 引用解析
+   - extract_sources / collect_sources / message_sources: 从工具结果（及历史摘要）中提取页面来源
+   - CitationResolver: 流式重编号 `[n]` 引用并生成「参考来源」列表
+   - astream_with_citations: 流式运行 Agent 并实时解析引用
+
 """
 
 # ============================================================================
 # MCP 工具导出
 # ============================================================================
+from app.utils.citations import (
+    CitationResolver,
+    CitationSource,
+    astream_with_citations,
+    collect_sources,
+    extract_sources,
+    message_sources,
+)
 from app.utils.mcp_utils import (
     convert_claude_mcp_config_to_langchain,
     format_mcp_tools_list,
@@ -21,6 +40,17 @@ from app.utils.mcp_utils import (
     merge_mcp_configs,
     validate_mcp_server_config,
 )
+from app.utils.report_sections import (
+    ReportSection,
+    diff_sections,
+    find_section,
+    read_backend_text,
+    report_lines,
+    section_fingerprints,
+    section_headings,
+    split_sections,
+    write_backend_text,
+)
 
 # ============================================================================
 # 导出列表 - 定义公共 API
@@ -33,4 +63,21 @@ __all__ = [
     "format_mcp_tools_list",
     "get_mcp_tool_names",
     "merge_mcp_configs",
+    # 报告章节
+    "ReportSection",
+    "split_sections",
+    "section_fingerprints",
+    "diff_sections",
+    "report_lines",
+    "find_section",
+    "section_headings",
+    "read_backend_text",
+    "write_backend_text",
+    # 引用解析
+    "CitationSource",
+    "CitationResolver",
+    "extract_sources",
+    "collect_sources",
+    "message_sources",
+    "astream_with_citations",
 ]
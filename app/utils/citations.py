@@ -0,0 +1,291 @@
+"""
+引用解析工具函数。
+
+模型只输出 `[n]` 形式的引用编号，来源列表由服务端生成：
+- 从 Confluence 工具返回的 JSON 中提取页面 id、标题和 URL，按首次出现顺序编号
+- 流式解析回答中的 `[n]` 标记：按在回答中首次被引用的顺序重新连续编号；
+  只改写能对应来源的编号，`[2024]` 这类不是引用的方括号数字原样保留
+- 回答结束后追加去重、连续编号的「参考来源」列表
+
+流式输出与运行结束时重写的最终回答使用同一套编号：引用中间件在每次调用模型前通过 custom 流
+推送模型看到的来源列表，流式解析器据此为每条模型消息重新开始解析，与 `after_agent` 对最终回答的处理一致。
+"""
+
+import json
+import re
+from collections.abc import AsyncIterator, Iterable, Sequence
+from dataclasses import asdict, dataclass
+from typing import Any
+
+from langchain_core.messages import AIMessageChunk, BaseMessage, ToolMessage
+
+# 单个或逗号分隔的多个引用编号：[1]、[1, 2]
+_MARKER_RE = re.compile(r"\[(\d{1,4}(?:\s*[,，]\s*\d{1,4})*)\]")
+# 块末尾可能被截断的引用标记或反引号，需要等待下一个块
+_PARTIAL_MARKER_RE = re.compile(r"(?:\[[\d,，\s]*|`{1,2})$")
+# 代码块和行内代码的边界，其中的 `[n]`（如 `items[0]`）不做替换
+_CODE_RE = re.compile(r"```|`")
+
+SOURCES_HEADING = "## 参考来源"
+
+# 非工具消息上保存来源列表的 additional_kwargs 键
+CITATION_SOURCES_KEY = "citation_sources"
+
+# 引用中间件在调用模型前推送的 custom 流事件类型，携带模型看到的来源列表（编号 = 下标 + 1）
+CITATION_SOURCES_EVENT = "citation_sources"
+
+
+@dataclass(frozen=True, slots=True)
+class CitationSource:
+    """工具返回的一个可引用来源"""
+
+    page_id: str
+    """Confluence 页面 id（缺失时使用 URL 或标题作为去重键）"""
+
+    title: str
+    """页面标题"""
+
+    url: str | None = None
+    """页面链接"""
+
+    def to_dict(self) -> dict[str, Any]:
+        return asdict(self)
+
+
+def message_text(content: Any) -> str:
+    """提取消息内容中的文本（兼容字符串和内容块列表）"""
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        parts = []
+        for block in content:
+            if isinstance(block, str):
+                parts.append(block)
+            elif isinstance(block, dict) and block.get("type") == "text":
+                parts.append(block.get("text", ""))
+        return "".join(parts)
+    return ""
+
+
+def extract_sources(content: Any) -> list[CitationSource]:
+    """
+    从工具返回内容中提取页面来源。
+
+    兼容 `confluence_search` 返回的页面列表和 `confluence_get_page` 返回的 `{"metadata": {...}}` 结构：
+    递归查找同时带有标题和 id/URL 的对象，命中后不再深入其子节点（避免把祖先页面当作来源）。
+
+    Returns:
+        按出现顺序排列的来源列表；内容不是 JSON 时返回空列表
+    """
+    try:
+        data = json.loads(message_text(content))
+    except (TypeError, ValueError):
+        return []
+
+    sources: list[CitationSource] = []
+    stack = [data]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, list):
+            stack.extend(reversed(node))
+        elif isinstance(node, dict):
+            title, page_id, url = node.get("title"), node.get("id"), node.get("url")
+            if isinstance(title, str) and title and (page_id or url):
+                sources.append(CitationSource(str(page_id or url), title, url if isinstance(url, str) else None))
+            else:
+                stack.extend(reversed([v for v in node.values() if isinstance(v, dict | list)]))
+    return sources
+
+
+def message_sources(message: BaseMessage) -> list[CitationSource]:
+    """
+    消息携带的来源：工具结果从内容中提取；其他消息（如历史摘要）读取
+    `additional_kwargs["citation_sources"]`，被摘要替换的工具结果的来源由此保留
+    """
+    if isinstance(message, ToolMessage):
+        return extract_sources(message.content)
+    return [CitationSource(**source) for source in message.additional_kwargs.get(CITATION_SOURCES_KEY, [])]
+
+
+def collect_sources(messages: Iterable[BaseMessage]) -> list[CitationSource]:
+    """按首次出现顺序收集对话中所有消息携带的来源（去重），列表下标 + 1 即模型看到的引用编号"""
+    seen: dict[str, CitationSource] = {}
+    for message in messages:
+        for source in message_sources(message):
+            seen.setdefault(source.page_id, source)
+    return list(seen.values())
+
+
+def format_source_labels(sources: Sequence[CitationSource], numbering: dict[str, int]) -> str:
+    """生成附加在工具结果前的来源编号说明，供模型引用"""
+    lines = ["可引用来源（回答中只使用以下 [编号] 引用，不要输出 URL）："]
+    lines += [f"[{numbering[source.page_id]}] 《{source.title}》" for source in sources]
+    return "\n".join(lines)
+
+
+class CitationResolver:
+    """
+    流式引用解析器。
+
+    Args:
+        sources: 模型可见的来源列表，`sources[i]` 对应引用编号 `[i + 1]`
+
+    用法::
+
+        resolver = CitationResolver(sources)
+        for chunk in stream:
+            yield resolver.feed(chunk)
+        yield resolver.finish()
+    """
+
+    def __init__(self, sources: Sequence[CitationSource]) -> None:
+        self._sources = dict(enumerate(sources, start=1))
+        self._renumbered: dict[str, int] = {}
+        self._cited: list[CitationSource] = []
+        self._pending = ""
+        self._in_fence = False
+        self._in_code = False
+
+    @property
+    def cited_sources(self) -> list[CitationSource]:
+        """回答中实际引用的来源，按输出编号排列"""
+        return list(self._cited)
+
+    def update_sources(self, sources: Sequence[CitationSource]) -> None:
+        """流式过程中有新的工具结果时更新来源列表（编号只追加不变动）"""
+        self._sources = dict(enumerate(sources, start=1))
+
+    def feed(self, text: str) -> str:
+        """输入一个文本块，返回可以立即输出的已解析文本"""
+        text = self._pending + text
+        partial = _PARTIAL_MARKER_RE.search(text)
+        if partial is not None:
+            text, self._pending = text[: partial.start()], text[partial.start() :]
+        else:
+            self._pending = ""
+        return self._resolve(text)
+
+    def drain(self) -> str:
+        """返回缓存中剩余的已解析文本（不追加「参考来源」列表）"""
+        tail, self._pending = self._resolve(self._pending), ""
+        return tail
+
+    def finish(self) -> str:
+        """结束流，返回剩余文本和「参考来源」列表"""
+        return self.drain() + self.sources_section()
+
+    def resolve(self, text: str) -> str:
+        """一次性解析完整回答（含来源列表）"""
+        return self.feed(text) + self.finish()
+
+    def sources_section(self) -> str:
+        if not self._cited:
+            return ""
+        lines = ["", "", SOURCES_HEADING, ""]
+        for number, source in enumerate(self._cited, start=1):
+            title = source.title.replace("[", "\\[").replace("]", "\\]")
+            lines.append(f"{number}. [{title}]({source.url})" if source.url else f"{number}. {title}")
+        return "\n".join(lines)
+
+    def _resolve(self, text: str) -> str:
+        parts: list[str] = []
+        position = 0
+        for match in _CODE_RE.finditer(text):
+            parts.append(self._resolve_segment(text[position : match.start()]))
+            parts.append(match.group())
+            if match.group() == "```":
+                self._in_fence = self._in_fence != (not self._in_code)
+            elif not self._in_fence:
+                self._in_code = not self._in_code
+            position = match.end()
+        parts.append(self._resolve_segment(text[position:]))
+        return "".join(parts)
+
+    def _resolve_segment(self, text: str) -> str:
+        if not text or self._in_fence or self._in_code:
+            return text
+        return _MARKER_RE.sub(self._replace, text)
+
+    def _replace(self, match: re.Match[str]) -> str:
+        numbers = [int(raw) for raw in re.split(r"\s*[,，]\s*", match.group(1))]
+        if not any(number in self._sources for number in numbers):
+            # 没有任何编号对应来源：不是引用（如 `[2024]`），原样保留
+            return match.group()
+        markers = []
+        for number in numbers:
+            source = self._sources.get(number)
+            if source is None:
+                # 引用标记中无法对应来源的编号丢弃，保证输出的引用都真实存在
+                continue
+            if source.page_id not in self._renumbered:
+                self._cited.append(source)
+                self._renumbered[source.page_id] = len(self._cited)
+            marker = f"[{self._renumbered[source.page_id]}]"
+            if marker not in markers:
+                markers.append(marker)
+        return "".join(markers)
+
+
+async def astream_with_citations(
+    agent: Any,
+    input: Any,
+    config: dict[str, Any] | None = None,
+    custom_events: bool = False,
+) -> AsyncIterator[str | dict[str, Any]]:
+    """
+    流式运行 Agent，实时解析回答中的引用编号，并在结束时追加「参考来源」列表。
+
+    只输出主图模型节点的文本，子代理内部的模型输出不转发。挂载了引用中间件时，
+    每次模型调用都按中间件推送的来源列表重新开始解析，最终回答的编号与运行结束后状态中的回答一致；
+    未挂载时按流中出现的工具结果累积来源。
+
+    Args:
+        custom_events: 是否同时转发工具通过 stream writer 发出的 custom 事件（如报告章节写入）
+
+    Yields:
+        解析后的回答文本块；`custom_events` 为 True 时还会产出 custom 事件（dict）
+    """
+    history: list[BaseMessage] = []
+    if config and config.get("configurable", {}).get("thread_id"):
+        # 多轮对话：引用编号包含此前轮次工具返回的来源
+        try:
+            snapshot = await agent.aget_state(config)
+            history = list(snapshot.values.get("messages", []))
+        except ValueError:
+            # 未配置 checkpointer
+            history = []
+    if isinstance(input, dict):
+        history += input.get("messages", [])
+    sources = {s.page_id: s for s in collect_sources(history)}
+    resolver = CitationResolver(list(sources.values()))
+    # 收到中间件推送的来源列表后，以其为准，不再按流中的工具结果累积
+    middleware_sources = False
+
+    async for mode, chunk in agent.astream(input, config, stream_mode=["messages", "custom"]):
+        if mode == "custom":
+            if isinstance(chunk, dict) and chunk.get("type") == CITATION_SOURCES_EVENT:
+                # 新的模型调用：输出上一条消息的剩余文本，按模型看到的来源列表重新开始解析
+                tail = resolver.drain()
+                if tail:
+                    yield tail
+                resolver = CitationResolver([CitationSource(**source) for source in chunk.get("sources", [])])
+                middleware_sources = True
+            elif custom_events and isinstance(chunk, dict):
+                yield chunk
+            continue
+        message, metadata = chunk
+        # 子图（子代理）的命名空间形如 `tools:<id>|model:<id>`
+        if "|" in metadata.get("langgraph_checkpoint_ns", ""):
+            continue
+        if isinstance(message, ToolMessage) and not middleware_sources:
+            for source in extract_sources(message.content):
+                sources.setdefault(source.page_id, source)
+            resolver.update_sources(list(sources.values()))
+        elif isinstance(message, AIMessageChunk) and not message.tool_call_chunks:
+            text = resolver.feed(message_text(message.content))
+            if text:
+                yield text
+
+    tail = resolver.finish()
+    if tail:
+        yield tail
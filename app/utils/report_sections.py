@@ -0,0 +1,234 @@
+"""
+Markdown 报告章节工具函数。
+
+研究报告以 Markdown 标题划分章节，此模块提供：
+- 按标题拆分章节，并计算章节指纹（哈希 + 长度）
+- 对比两次指纹，找出新增/修改/删除的章节及整体变化比例
+- 按标题定位章节所在的行范围，供按章节增量编辑报告
+- 从 deepagents 文件后端读取 / 写入文件原文（读取时去除 `read` 返回的行号）
+"""
+
+import hashlib
+import re
+from dataclasses import dataclass
+from typing import Any
+
+_HEADING_RE = re.compile(r"^(#{1,6})\s+(.*?)\s*#*\s*$")
+_FENCE_RE = re.compile(r"^\s*(```|~~~)")
+_NUMBERED_LINE_RE = re.compile(r"^\s*(\d+)(?:\.\d+)?\t(.*)$")
+
+SectionFingerprints = dict[str, tuple[str, int]]
+"""章节指纹 {章节键: (内容哈希, 内容长度)}"""
+
+
+@dataclass(frozen=True, slots=True)
+class ReportSection:
+    """报告中的一个章节"""
+
+    heading: str
+    """标题文本（不含 `#`），首个标题之前的前言为空串"""
+
+    level: int
+    """标题级别，前言为 0"""
+
+    text: str
+    """包含标题行在内的完整章节文本"""
+
+    @property
+    def key(self) -> str:
+        return f"{'#' * self.level} {self.heading}".strip()
+
+
+def split_sections(markdown: str, max_level: int = 2) -> list[ReportSection]:
+    """
+    按 Markdown 标题拆分章节。
+
+    只有级别不超过 `max_level` 的标题会开启新章节，更深的子标题归属于所在章节；
+    代码块中的 `#` 行不视为标题。
+
+    Args:
+        markdown: 报告全文
+        max_level: 开启新章节的最大标题级别，默认按 `##` 拆分
+
+    Returns:
+        按出现顺序排列的章节列表
+    """
+    sections: list[ReportSection] = []
+    heading, level, lines = "", 0, []
+    in_fence = False
+
+    for line in markdown.splitlines():
+        if _FENCE_RE.match(line):
+            in_fence = not in_fence
+        match = None if in_fence else _HEADING_RE.match(line)
+        if match and len(match.group(1)) <= max_level:
+            if lines:
+                sections.append(ReportSection(heading, level, "\n".join(lines)))
+            heading, level, lines = match.group(2), len(match.group(1)), [line]
+        else:
+            lines.append(line)
+
+    if lines and (level or any(line.strip() for line in lines)):
+        sections.append(ReportSection(heading, level, "\n".join(lines)))
+    return sections
+
+
+def section_fingerprints(sections: list[ReportSection]) -> SectionFingerprints:
+    """计算章节指纹，重名章节以出现序号区分"""
+    fingerprints: SectionFingerprints = {}
+    for section in sections:
+        key = section.key
+        index = 2
+        while key in fingerprints:
+            key = f"{section.key} ({index})"
+            index += 1
+        digest = hashlib.sha1(section.text.strip().encode()).hexdigest()
+        fingerprints[key] = (digest, len(section.text))
+    return fingerprints
+
+
+def diff_sections(
+    previous: SectionFingerprints, sections: list[ReportSection]
+) -> tuple[list[ReportSection], list[str], float]:
+    """
+    对比章节指纹。
+
+    Args:
+        previous: 上一次的章节指纹
+        sections: 当前章节列表
+
+    Returns:
+        (新增或修改的章节, 被删除的章节键, 变化比例)。变化比例为变化内容长度占当前报告长度的比例
+    """
+    current = section_fingerprints(sections)
+    changed = [
+        section
+        for section, (key, (digest, _)) in zip(sections, current.items(), strict=True)
+        if previous.get(key, ("", 0))[0] != digest
+    ]
+    removed = [key for key in previous if key not in current]
+
+    changed_chars = sum(len(section.text) for section in changed) + sum(previous[key][1] for key in removed)
+    total_chars = max(sum(length for _, length in current.values()), 1)
+    return changed, removed, min(changed_chars / total_chars, 1.0)
+
+
+def report_lines(markdown: str | None) -> list[str]:
+    """报告原文按行拆分（忽略末尾换行），空报告返回空列表"""
+    markdown = (markdown or "").rstrip("\n")
+    return markdown.split("\n") if markdown else []
+
+
+def _headings(lines: list[str]) -> list[tuple[int, int, str]]:
+    """报告中的全部标题 (行号, 级别, 标题文本)，代码块中的 `#` 行不视为标题"""
+    headings: list[tuple[int, int, str]] = []
+    in_fence = False
+    for index, line in enumerate(lines):
+        if _FENCE_RE.match(line):
+            in_fence = not in_fence
+        match = None if in_fence else _HEADING_RE.match(line)
+        if match:
+            headings.append((index, len(match.group(1)), match.group(2)))
+    return headings
+
+
+def normalize_heading(heading: str) -> str:
+    """标题比较用的规范形式：去掉 `#` 前缀、合并空白、忽略大小写"""
+    return " ".join(heading.strip().lstrip("#").split()).casefold()
+
+
+def section_headings(lines: list[str]) -> list[str]:
+    """报告大纲，每项形如 `## 标题`"""
+    return [f"{'#' * level} {text}" for _, level, text in _headings(lines)]
+
+
+def find_section(lines: list[str], heading: str, max_level: int = 2) -> tuple[int, int, int] | None:
+    """
+    按标题查找章节。
+
+    章节从标题行开始，延续到下一个同级或更高级标题之前（包含其下的子章节）；重名时取第一个。
+    与 `split_sections` 一致，级别不超过 `max_level` 的标题都会结束章节，
+    因此 `#` 报告标题只包含标题下的前言，而不是整份报告。
+
+    Args:
+        lines: 报告行列表（见 `report_lines`）
+        heading: 标题文本，可带 `#` 前缀，比较时忽略大小写和多余空白
+        max_level: 总是结束章节的最大标题级别，默认 `##`
+
+    Returns:
+        (起始行, 结束行（不含）, 标题级别)；找不到时返回 None
+    """
+    target = normalize_heading(heading)
+    headings = _headings(lines)
+    for position, (start, level, text) in enumerate(headings):
+        if normalize_heading(text) != target:
+            continue
+        boundary = max(level, max_level)
+        end = next((index for index, other, _ in headings[position + 1 :] if other <= boundary), len(lines))
+        return start, end, level
+    return None
+
+
+def strip_line_numbers(numbered: str) -> str:
+    """还原 `cat -n` 风格输出（含超长行的 `5.1` 续行标记）为原文"""
+    lines: list[str] = []
+    last_number: str | None = None
+    for raw in numbered.splitlines():
+        match = _NUMBERED_LINE_RE.match(raw)
+        if match is None:
+            continue
+        number, text = match.groups()
+        if number == last_number:
+            # 续行：拼接到上一行
+            lines[-1] += text
+        else:
+            lines.append(text)
+        last_number = number
+    return "\n".join(lines)
+
+
+def read_backend_text(backend: Any, path: str) -> str | None:
+    """
+    从 deepagents 文件后端读取文件原文。
+
+    优先使用后端提供的 `read_text`，否则解析 `read` 返回的带行号内容。
+
+    Returns:
+        文件原文；文件不存在或读取失败时返回 None
+    """
+    read_text = getattr(backend, "read_text", None)
+    if callable(read_text):
+        return read_text(path)
+
+    result = backend.read(path, offset=0, limit=1_000_000)
+    if result.startswith("Error"):
+        return None
+    if result.startswith("System reminder"):
+        return ""
+    return strip_line_numbers(result)
+
+
+def write_backend_text(backend: Any, path: str, content: str, previous: str | None) -> str | None:
+    """
+    向 deepagents 文件后端写入文件全文。
+
+    优先使用后端提供的 `write_text`（直接覆盖），否则新文件调用 `write`、已有文件以 `edit` 整体替换。
+
+    Args:
+        previous: 文件当前原文（`read_backend_text` 的结果），文件不存在时为 None
+
+    Returns:
+        写入失败时返回错误信息，成功时返回 None
+    """
+    write_text = getattr(backend, "write_text", None)
+    if callable(write_text):
+        write_text(path, content)
+        return None
+
+    if previous is None:
+        result = backend.write(path, content)
+    elif not previous:
+        return f"Error: cannot overwrite empty file {path} with this backend"
+    else:
+        result = backend.edit(path, previous, content)
+    return result.error
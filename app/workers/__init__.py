@@ -0,0 +1,55 @@
+"""
+文档解析 worker 模块 - 消费解析队列，把页面附件和上传文件写入本地索引。
+
+此模块包含以下子模块：
+
+1. **queue** - 解析任务队列
+   - JobQueue / QueueMessage: 可替换的队列接口
+   - SQLiteJobQueue: 本地 SQLite 队列（按租约领取，多进程共享）
+   - KafkaJobQueue: Kafka 队列（可选依赖 aiokafka）
+   - create_job_queue: 按 PARSER_QUEUE_BACKEND 创建队列
+
+2. **parser** - 解析 worker
+   - ParserWorker / ParserWorkerStats: 微批次消费、合并重复任务、有界并发、重试与死信
+   - DocumentParseHandler: 默认任务处理（页面附件、上传文件）
+   - run_worker: 单进程入口
+
+3. **routes** - 任务提交接口
+   - routes: `/parse-jobs` 路由
+
+"""
+
+# ============================================================================
+# 解析 worker
+# ============================================================================
+from app.workers.parser import DocumentParseHandler, ParserWorker, ParserWorkerStats, run_worker
+
+# ============================================================================
+# 解析任务队列
+# ============================================================================
+from app.workers.queue import JobQueue, KafkaJobQueue, QueueMessage, SQLiteJobQueue, create_job_queue
+
+# ============================================================================
+# 任务提交接口
+# ============================================================================
+from app.workers.routes import routes
+
+# ============================================================================
+# 导出列表 - 定义公共 API
+# ============================================================================
+
+__all__ = [
+    # 解析任务队列
+    "JobQueue",
+    "QueueMessage",
+    "SQLiteJobQueue",
+    "KafkaJobQueue",
+    "create_job_queue",
+    # 解析 worker
+    "ParserWorker",
+    "ParserWorkerStats",
+    "DocumentParseHandler",
+    "run_worker",
+    # 任务提交接口
+    "routes",
+]
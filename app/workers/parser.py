@@ -0,0 +1,309 @@
+"""
+文档解析 worker (Document Parser Workers)
+
+从解析队列（`app.workers.queue`）按微批次消费任务：
+- 每批最多拉取 PARSER_BATCH_SIZE 条，批内同一目标（页面 / 文件）的重复任务合并为一次处理，应对编辑高峰时的重复事件
+- 批内最多 PARSER_MAX_IN_FLIGHT 个任务同时处理；整批处理完成后才提交并拉取下一批，下游变慢时自然形成背压
+- 单个任务失败时按指数退避重试，超过 PARSER_MAX_ATTEMPTS 次转入死信；被反复重新投递（处理中崩溃）的任务同样转入死信
+- 提交发生在处理之后（至少一次）；进程收到 SIGTERM / SIGINT 时处理完当前批次再退出
+- 拉取、处理或提交失败（队列不可用）时记录日志并指数退避，不会让 worker 退出；未提交的任务重新投递
+  （SQLite 在租约到期后；Kafka 由 `rollback` 把分区退回到已提交的偏移量）
+
+水平扩展：启动多个 worker 进程（`--processes` 或多个容器）。Kafka 后端按消费组分配分区，
+SQLite 后端通过租约领取任务，互不重复。多进程模式下父进程把 SIGTERM / SIGINT 转发给子进程并等待其退出。
+
+命令行用法::
+
+    python -m app.workers.parser --processes 4
+"""
+
+import argparse
+import asyncio
+import contextlib
+import multiprocessing
+import os
+import signal
+import sys
+import time
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+from structlog.stdlib import get_logger
+from tenacity import AsyncRetrying, stop_after_attempt, wait_random_exponential
+
+from app.core.config import settings
+from app.core.log_adapter import setup_logging
+from app.documents.attachments import AttachmentIndexer
+from app.documents.confluence import ConfluenceClient
+from app.documents.index import IndexedAttachment
+from app.documents.rasterize import file_digest
+from app.enums import ParseJobKind
+from app.schemas.parse_job import ParseJob
+from app.workers.queue import JobQueue, QueueMessage, create_job_queue
+
+logger = get_logger(__name__)
+
+ParseHandler = Callable[[ParseJob], Awaitable[None]]
+
+# 队列错误的最长退避时间（秒）
+_MAX_QUEUE_BACKOFF_SECONDS = 30.0
+
+
+# ============================================================================
+# 任务处理
+# ============================================================================
+
+
+class DocumentParseHandler:
+    """
+    默认的任务处理：
+    - page_update：重新索引页面附件（未变化的附件按版本号 / 哈希跳过）
+    - file：抽取 UPLOAD_DIR 中文件的文本写入本地索引（内容哈希未变时跳过）
+    """
+
+    def __init__(self) -> None:
+        self._client: ConfluenceClient | None = None
+        self._indexer: AttachmentIndexer | None = None
+
+    def _get_indexer(self) -> AttachmentIndexer:
+        if self._indexer is None:
+            from app.agents.models import get_embeddings
+
+            embeddings = get_embeddings() if settings.LOCAL_INDEX_EMBEDDINGS else None
+            self._indexer = AttachmentIndexer(None, embeddings=embeddings)
+        return self._indexer
+
+    async def __call__(self, job: ParseJob) -> None:
+        indexer = self._get_indexer()
+        if job.kind == ParseJobKind.PAGE_UPDATE:
+            # 只有页面任务需要 Confluence 凭据，首次处理时再创建客户端
+            if self._client is None:
+                self._client = indexer.client = ConfluenceClient()
+            page = await self._client.get_page(str(job.page_id))
+            failed = await indexer.index_page(page)
+            if failed:
+                raise RuntimeError(f"{failed} attachments of page {page.id} failed to index")
+            return
+
+        upload_dir = Path(settings.UPLOAD_DIR).resolve()
+        path = (upload_dir / str(job.path)).resolve()
+        if not path.is_relative_to(upload_dir):
+            raise ValueError(f"path must be inside UPLOAD_DIR: {job.path}")
+
+        relative = path.relative_to(upload_dir).as_posix()
+        attachment = IndexedAttachment(attachment_id=f"upload:{relative}", title=path.name)
+        sha256 = await asyncio.to_thread(file_digest, path)
+        state = await asyncio.to_thread(indexer.index.get_state, attachment.attachment_id)
+        if state is None or state.sha256 != sha256:
+            await indexer.index_file(path, attachment, sha256)
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+
+
+# ============================================================================
+# Worker
+# ============================================================================
+
+
+@dataclass(slots=True)
+class ParserWorkerStats:
+    batches: int = 0
+    received: int = 0
+    coalesced: int = 0
+    """与同批次其他任务目标相同、合并处理的任务数"""
+    succeeded: int = 0
+    dead_lettered: int = 0
+    retries: int = 0
+    started_at: float = field(default_factory=time.perf_counter)
+
+    def summary(self) -> dict[str, Any]:
+        elapsed = time.perf_counter() - self.started_at
+        return {
+            "batches": self.batches,
+            "received": self.received,
+            "coalesced": self.coalesced,
+            "succeeded": self.succeeded,
+            "dead_lettered": self.dead_lettered,
+            "retries": self.retries,
+            "jobs_per_second": round(self.received / elapsed, 2) if elapsed > 0 else 0.0,
+        }
+
+
+class ParserWorker:
+    """
+    解析 worker。
+
+    Args:
+        queue: 任务队列
+        handler: 任务处理函数，需要幂等（同一任务可能被处理多次）
+        batch_size: 每个微批次最多拉取的任务数
+        max_in_flight: 同时处理的任务数
+        max_attempts: 单个任务的最大处理次数（含重试）
+        poll_timeout: 队列为空时单次拉取的最长等待时间（秒）
+        backoff: 任务重试和队列错误退避的基准时间（秒），按指数增长
+    """
+
+    def __init__(
+        self,
+        queue: JobQueue,
+        handler: ParseHandler,
+        batch_size: int = settings.PARSER_BATCH_SIZE,
+        max_in_flight: int = settings.PARSER_MAX_IN_FLIGHT,
+        max_attempts: int = settings.PARSER_MAX_ATTEMPTS,
+        poll_timeout: float = 1.0,
+        backoff: float = 0.5,
+    ) -> None:
+        self.queue = queue
+        self.handler = handler
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.poll_timeout = poll_timeout
+        self.backoff = backoff
+        self.stats = ParserWorkerStats()
+        self._slots = asyncio.Semaphore(max_in_flight)
+
+    async def run(self, stop: asyncio.Event | None = None) -> ParserWorkerStats:
+        """持续消费直到 `stop` 被设置；当前批次处理并提交后才退出"""
+        stop = stop or asyncio.Event()
+        logger.info("parser_worker_started", batch_size=self.batch_size, max_attempts=self.max_attempts)
+        failures = 0
+        while not stop.is_set():
+            messages: list[QueueMessage] = []
+            try:
+                messages = await self.queue.poll(self.batch_size, self.poll_timeout)
+                if messages:
+                    await self.process_batch(messages)
+                failures = 0
+            except Exception as e:
+                # 队列暂时不可用：放弃本批次使其重新投递，退避后重试
+                if messages:
+                    try:
+                        await self.queue.rollback(messages)
+                    except Exception as rollback_error:
+                        logger.warning("parser_worker_rollback_failed", error=str(rollback_error))
+                failures += 1
+                delay = min(self.backoff * 2**failures, _MAX_QUEUE_BACKOFF_SECONDS)
+                logger.warning(
+                    "parser_worker_queue_error",
+                    error=f"{type(e).__name__}: {e}",
+                    failures=failures,
+                    retry_in_seconds=round(delay, 2),
+                )
+                with contextlib.suppress(TimeoutError):
+                    await asyncio.wait_for(stop.wait(), delay)
+        logger.info("parser_worker_stopped", **self.stats.summary())
+        return self.stats
+
+    async def process_batch(self, messages: list[QueueMessage]) -> None:
+        """处理一个微批次并提交"""
+        # 合并同一目标的任务：后到的任务覆盖先到的，处理结果对所有合并的消息生效
+        groups: dict[str, list[QueueMessage]] = {}
+        for message in messages:
+            groups.setdefault(message.job.key, []).append(message)
+
+        self.stats.batches += 1
+        self.stats.received += len(messages)
+        self.stats.coalesced += len(messages) - len(groups)
+
+        await asyncio.gather(*(self._process_group(group) for group in groups.values()))
+        await self.queue.commit(messages)
+
+    async def _process_group(self, group: list[QueueMessage]) -> None:
+        latest = group[-1]
+        error = None
+        if max(message.deliveries for message in group) > self.max_attempts:
+            # 反复被重新投递，说明处理过程中 worker 崩溃或超时，不再尝试
+            error = f"redelivered {max(m.deliveries for m in group)} times"
+        else:
+            async with self._slots:
+                attempts = 0
+                try:
+                    async for attempt in AsyncRetrying(
+                        stop=stop_after_attempt(self.max_attempts),
+                        wait=wait_random_exponential(multiplier=self.backoff, max=20),
+                        reraise=True,
+                    ):
+                        with attempt:
+                            attempts += 1
+                            await self.handler(latest.job)
+                except Exception as e:
+                    error = f"{type(e).__name__}: {e}"
+                self.stats.retries += max(attempts - 1, 0)
+
+        if error is None:
+            self.stats.succeeded += len(group)
+            return
+
+        logger.warning("parse_job_dead_lettered", job_id=latest.job.job_id, target=latest.job.key, error=error)
+        self.stats.dead_lettered += len(group)
+        for message in group:
+            await self.queue.dead_letter(message, error)
+
+
+# ============================================================================
+# 进程入口
+# ============================================================================
+
+
+async def run_worker(handler: ParseHandler | None = None) -> ParserWorkerStats:
+    """在当前进程运行一个 worker，收到 SIGTERM / SIGINT 时优雅退出"""
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stop.set)
+
+    queue = create_job_queue()
+    default_handler = DocumentParseHandler() if handler is None else None
+    try:
+        return await ParserWorker(queue, handler or default_handler).run(stop)  # type: ignore[arg-type]
+    finally:
+        await queue.close()
+        if default_handler is not None:
+            await default_handler.aclose()
+
+
+def _worker_process() -> None:
+    setup_logging()
+    asyncio.run(run_worker())
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="消费解析队列，把页面附件和上传文件写入本地索引")
+    parser.add_argument("--processes", type=int, default=1, help="worker 进程数")
+    args = parser.parse_args()
+
+    if args.processes <= 1:
+        _worker_process()
+        return
+
+    setup_logging()
+    context = multiprocessing.get_context("spawn")
+    processes = [context.Process(target=_worker_process, name=f"parser-{i}") for i in range(args.processes)]
+
+    def forward(signum: int, _frame: Any) -> None:
+        # 容器只向 PID 1 发送 SIGTERM：转发给子进程，子进程各自处理完当前批次后退出
+        logger.info("parser_workers_stopping", signal=signal.Signals(signum).name)
+        for process in processes:
+            if process.pid is not None and process.is_alive():
+                with contextlib.suppress(ProcessLookupError):
+                    os.kill(process.pid, signum)
+
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(sig, forward)
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+    failed = {process.name: process.exitcode for process in processes if process.exitcode != 0}
+    if failed:
+        logger.error("parser_worker_processes_failed", exit_codes=failed)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,340 @@
+"""
+解析任务队列 (Parse Job Queue)
+
+解析 worker 通过统一的 `JobQueue` 接口消费任务，后端可替换：
+- `SQLiteJobQueue`: 本地 SQLite 队列，任务按租约领取，多个 worker 进程可以共享同一个数据库文件
+- `KafkaJobQueue`: Kafka 队列，消费组 KAFKA_CONSUMER_PARSER_GROUP_ID，分区在 worker 进程间自动分配（可选依赖 aiokafka）
+
+两种后端都是“至少一次”语义：任务在 `commit` 之前 worker 崩溃或超时，会重新投递给其他 worker，
+处理逻辑需要幂等（附件索引按版本号和内容哈希跳过，天然幂等）。
+"""
+
+import asyncio
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections.abc import Sequence
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+from pydantic import ValidationError
+from structlog.stdlib import get_logger
+
+from app.core.config import settings
+from app.core.consts import KAFKA_CONSUMER_PARSER_GROUP_ID
+from app.enums import QueueBackend
+from app.schemas.parse_job import ParseJob
+
+logger = get_logger(__name__)
+
+# 队列为空时的轮询间隔（秒）
+_IDLE_POLL_INTERVAL = 0.5
+
+
+@dataclass(slots=True)
+class QueueMessage:
+    """从队列领取的一条任务"""
+
+    job: ParseJob
+    receipt: Any
+    """后端用于确认的凭据（SQLite 行 id / Kafka 分区和偏移量）"""
+    deliveries: int = 1
+    """投递次数（Kafka 不记录，恒为 1）"""
+
+
+class JobQueue(ABC):
+    """解析任务队列接口"""
+
+    @abstractmethod
+    async def publish(self, job: ParseJob) -> None:
+        """提交任务"""
+
+    @abstractmethod
+    async def poll(self, max_records: int, timeout: float) -> list[QueueMessage]:
+        """领取最多 `max_records` 条任务，队列为空时最多等待 `timeout` 秒，超时返回空列表"""
+
+    @abstractmethod
+    async def commit(self, messages: Sequence[QueueMessage]) -> None:
+        """确认任务处理完成（成功或已转入死信），确认前崩溃的任务会被重新投递"""
+
+    @abstractmethod
+    async def dead_letter(self, message: QueueMessage, error: str) -> None:
+        """把多次处理失败的任务转入死信，之后仍需 `commit`"""
+
+    async def rollback(self, messages: Sequence[QueueMessage]) -> None:  # noqa: B027
+        """
+        放弃一批未能提交的任务，使其重新投递。
+
+        默认什么也不做：未确认的任务在租约到期后自动重新投递（SQLite）。
+        """
+
+    @abstractmethod
+    async def close(self) -> None:
+        """释放连接"""
+
+
+# ============================================================================
+# SQLite
+# ============================================================================
+
+_SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS parse_jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    payload TEXT NOT NULL,
+    state TEXT NOT NULL DEFAULT 'ready',
+    lease_owner TEXT,
+    lease_until REAL,
+    deliveries INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_parse_jobs_state ON parse_jobs (state, lease_until);
+"""
+
+
+class SQLiteJobQueue(JobQueue):
+    """
+    SQLite 任务队列。
+
+    领取任务时在写事务中把任务标记为 leased 并设置租约到期时间，租约到期仍未确认的任务可被重新领取。
+    确认即删除；死信任务保留在表中（state = 'dead'），便于排查和手工重放。
+
+    Args:
+        db_path: 数据库路径
+        lease_seconds: 租约时长（秒），应大于一个微批次的最长处理时间
+    """
+
+    def __init__(self, db_path: str | Path, lease_seconds: float = settings.PARSER_LEASE_SECONDS) -> None:
+        self.db_path = Path(db_path)
+        self.lease_seconds = lease_seconds
+        self._owner = uuid.uuid4().hex
+        self._lock = threading.Lock()
+        self._conn: sqlite3.Connection | None = None
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            # isolation_level=None：显式 BEGIN IMMEDIATE，领取任务时立即获得写锁，避免多进程重复领取
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None, timeout=30)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(_SQLITE_SCHEMA)
+        return self._conn
+
+    def _execute(self, sql: str, params: Sequence[Any] = ()) -> None:
+        with self._lock:
+            self._connection().execute(sql, params)
+
+    async def publish(self, job: ParseJob) -> None:
+        await asyncio.to_thread(
+            self._execute,
+            "INSERT INTO parse_jobs (payload, created_at) VALUES (?, ?)",
+            (job.model_dump_json(), time.time()),
+        )
+
+    def _claim(self, max_records: int) -> list[QueueMessage]:
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = conn.execute(
+                    "SELECT id, payload, deliveries FROM parse_jobs"
+                    " WHERE state = 'ready' OR (state = 'leased' AND lease_until < ?) ORDER BY id LIMIT ?",
+                    (now, max_records),
+                ).fetchall()
+                conn.executemany(
+                    "UPDATE parse_jobs SET state = 'leased', lease_owner = ?, lease_until = ?,"
+                    " deliveries = deliveries + 1 WHERE id = ?",
+                    [(self._owner, now + self.lease_seconds, row[0]) for row in rows],
+                )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+        messages = []
+        for row_id, payload, deliveries in rows:
+            try:
+                messages.append(QueueMessage(ParseJob.model_validate_json(payload), row_id, deliveries + 1))
+            except ValidationError as e:
+                logger.warning("parse_job_invalid", receipt=row_id, error=str(e))
+                self._execute("UPDATE parse_jobs SET state = 'dead', error = ? WHERE id = ?", (str(e)[:500], row_id))
+        return messages
+
+    async def poll(self, max_records: int, timeout: float) -> list[QueueMessage]:
+        deadline = time.monotonic() + timeout
+        while True:
+            messages = await asyncio.to_thread(self._claim, max_records)
+            if messages or time.monotonic() >= deadline:
+                return messages
+            await asyncio.sleep(min(_IDLE_POLL_INTERVAL, max(deadline - time.monotonic(), 0)))
+
+    async def commit(self, messages: Sequence[QueueMessage]) -> None:
+        def delete() -> None:
+            with self._lock:
+                self._connection().executemany(
+                    "DELETE FROM parse_jobs WHERE id = ? AND state = 'leased'", [(m.receipt,) for m in messages]
+                )
+
+        await asyncio.to_thread(delete)
+
+    async def dead_letter(self, message: QueueMessage, error: str) -> None:
+        await asyncio.to_thread(
+            self._execute,
+            "UPDATE parse_jobs SET state = 'dead', error = ? WHERE id = ?",
+            (error[:500], message.receipt),
+        )
+
+    async def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def pending(self) -> dict[str, int]:
+        """各状态的任务数"""
+        with self._lock:
+            rows = self._connection().execute("SELECT state, COUNT(*) FROM parse_jobs GROUP BY state").fetchall()
+        return dict(rows)
+
+
+# ============================================================================
+# Kafka
+# ============================================================================
+
+
+class KafkaJobQueue(JobQueue):
+    """
+    Kafka 任务队列（可选依赖 aiokafka，首次使用时导入）。
+
+    关闭自动提交，worker 处理完一个微批次后按分区提交最大偏移量 + 1。
+    以任务目标（页面 id / 文件路径）作为消息 key，同一目标的任务落在同一分区、按顺序处理。
+    无法解析的消息直接写入死信主题，并随下一次 `commit` 一起提交。
+    Kafka 没有租约：一批任务处理或提交失败时 `rollback` 把涉及的分区退回到已提交的偏移量，
+    否则消费位置已越过这些消息，之后提交更大的偏移量会把它们跳过。
+
+    Args:
+        bootstrap_servers: Kafka 集群地址
+        topic: 任务主题
+        group_id: 消费组
+    """
+
+    def __init__(
+        self,
+        bootstrap_servers: str = settings.KAFKA_BOOTSTRAP_SERVERS,
+        topic: str = settings.KAFKA_PARSER_TOPIC,
+        group_id: str = KAFKA_CONSUMER_PARSER_GROUP_ID,
+    ) -> None:
+        self.bootstrap_servers = bootstrap_servers
+        self.topic = topic
+        self.group_id = group_id
+        self._producer: Any = None
+        self._consumer: Any = None
+        self._invalid_receipts: list[tuple[Any, int]] = []
+        self._start_lock = asyncio.Lock()
+
+    @property
+    def dead_letter_topic(self) -> str:
+        return f"{self.topic}.dlq"
+
+    async def _get_producer(self) -> Any:
+        async with self._start_lock:
+            if self._producer is None:
+                from aiokafka import AIOKafkaProducer
+
+                producer = AIOKafkaProducer(bootstrap_servers=self.bootstrap_servers, acks="all")
+                await producer.start()
+                self._producer = producer
+        return self._producer
+
+    async def _get_consumer(self, max_records: int) -> Any:
+        async with self._start_lock:
+            if self._consumer is None:
+                from aiokafka import AIOKafkaConsumer
+
+                consumer = AIOKafkaConsumer(
+                    self.topic,
+                    bootstrap_servers=self.bootstrap_servers,
+                    group_id=self.group_id,
+                    enable_auto_commit=False,
+                    auto_offset_reset="earliest",
+                    max_poll_records=max_records,
+                    max_poll_interval_ms=int(settings.PARSER_LEASE_SECONDS * 1000),
+                )
+                await consumer.start()
+                self._consumer = consumer
+                logger.info("kafka_consumer_started", topic=self.topic, group_id=self.group_id)
+        return self._consumer
+
+    async def publish(self, job: ParseJob) -> None:
+        producer = await self._get_producer()
+        await producer.send_and_wait(self.topic, job.model_dump_json().encode(), key=job.key.encode())
+
+    async def poll(self, max_records: int, timeout: float) -> list[QueueMessage]:
+        consumer = await self._get_consumer(max_records)
+        batches = await consumer.getmany(timeout_ms=int(timeout * 1000), max_records=max_records)
+        messages = []
+        for partition, records in batches.items():
+            for record in records:
+                receipt = (partition, record.offset)
+                try:
+                    messages.append(QueueMessage(ParseJob.model_validate_json(record.value), receipt))
+                except ValidationError as e:
+                    logger.warning("parse_job_invalid", receipt=str(receipt), error=str(e))
+                    producer = await self._get_producer()
+                    await producer.send_and_wait(self.dead_letter_topic, record.value, key=record.key)
+                    self._invalid_receipts.append(receipt)
+        return messages
+
+    async def commit(self, messages: Sequence[QueueMessage]) -> None:
+        offsets: dict[Any, int] = {}
+        for partition, offset in [*(m.receipt for m in messages), *self._invalid_receipts]:
+            offsets[partition] = max(offsets.get(partition, -1), offset + 1)
+        self._invalid_receipts.clear()
+        if offsets:
+            await self._consumer.commit(offsets)
+
+    async def rollback(self, messages: Sequence[QueueMessage]) -> None:
+        first: dict[Any, int] = {}
+        for partition, offset in [*(m.receipt for m in messages), *self._invalid_receipts]:
+            first[partition] = min(first.get(partition, offset), offset)
+        self._invalid_receipts.clear()
+        for partition, offset in first.items():
+            try:
+                committed = await self._consumer.committed(partition)
+            except Exception as e:
+                # 无法查询已提交的偏移量时退回到本批次的第一条消息
+                logger.warning("kafka_committed_offset_unavailable", partition=str(partition), error=str(e))
+                committed = None
+            self._consumer.seek(partition, offset if committed is None else committed)
+        if first:
+            logger.info("kafka_batch_rolled_back", partitions={str(p): o for p, o in first.items()})
+
+    async def dead_letter(self, message: QueueMessage, error: str) -> None:
+        producer = await self._get_producer()
+        await producer.send_and_wait(
+            self.dead_letter_topic,
+            message.job.model_dump_json().encode(),
+            key=message.job.key.encode(),
+            headers=[("error", error[:500].encode())],
+        )
+
+    async def close(self) -> None:
+        if self._consumer is not None:
+            await self._consumer.stop()
+            self._consumer = None
+        if self._producer is not None:
+            await self._producer.stop()
+            self._producer = None
+
+
+def create_job_queue(backend: QueueBackend | None = None) -> JobQueue:
+    """按 PARSER_QUEUE_BACKEND 创建任务队列（每个进程 / 每个 worker 各自创建）"""
+    backend = backend or settings.PARSER_QUEUE_BACKEND
+    if backend == QueueBackend.KAFKA:
+        return KafkaJobQueue()
+    return SQLiteJobQueue(settings.PARSER_QUEUE_DB_PATH)
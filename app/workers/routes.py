@@ -0,0 +1,45 @@
+"""
+解析任务提交接口。
+
+接口（挂载到 LangGraph Server 的自定义路由，见 `app/api.py`）：
+- `POST /parse-jobs`: 提交解析任务，body 为 `{"kind": "page_update", "page_id": "..."}`
+  或 `{"kind": "file", "path": "..."}`（`path` 相对 `UPLOAD_DIR`），也可以是任务列表
+"""
+
+from pydantic import TypeAdapter, ValidationError
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+from app.schemas.parse_job import ParseJob
+from app.workers.queue import JobQueue, create_job_queue
+
+_jobs_adapter = TypeAdapter(list[ParseJob])
+_queue: JobQueue | None = None
+
+
+def _get_queue() -> JobQueue:
+    global _queue
+
+    if _queue is None:
+        _queue = create_job_queue()
+    return _queue
+
+
+async def publish_jobs(request: Request) -> JSONResponse:
+    try:
+        body = await request.json()
+    except ValueError as e:
+        return JSONResponse({"error": f"invalid JSON body: {e}"}, status_code=400)
+    try:
+        jobs = _jobs_adapter.validate_python(body if isinstance(body, list) else [body])
+    except ValidationError as e:
+        return JSONResponse({"error": e.errors(include_url=False, include_context=False)}, status_code=400)
+
+    queue = _get_queue()
+    for job in jobs:
+        await queue.publish(job)
+    return JSONResponse([job.model_dump(mode="json") for job in jobs], status_code=202)
+
+
+routes = [Route("/parse-jobs", publish_jobs, methods=["POST"])]
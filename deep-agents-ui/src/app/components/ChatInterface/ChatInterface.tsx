@@ -13,7 +13,13 @@ import { Input } from "@/components/ui/input";
 import { Send, Bot, LoaderCircle, SquarePen, History, X } from "lucide-react";
 import { ChatMessage } from "../ChatMessage/ChatMessage";
 import { ThreadHistorySidebar } from "../ThreadHistorySidebar/ThreadHistorySidebar";
-import type { SubAgent, TodoItem, ToolCall, Source } from "../../types/types";
+import type {
+  SubAgent,
+  TodoItem,
+  ToolCall,
+  Source,
+  ReportSectionEvent,
+} from "../../types/types";
 import { useChat } from "../../hooks/useChat";
 import styles from "./ChatInterface.module.scss";
 import { Message } from "@langchain/langgraph-sdk";
@@ -28,6 +34,7 @@ interface ChatInterfaceProps {
   onSelectSubAgent: (subAgent: SubAgent) => void;
   onTodosUpdate: (todos: TodoItem[]) => void;
   onFilesUpdate: (files: Record<string, string>) => void;
+  onReportSection: (event: ReportSectionEvent) => void;
   onNewThread: () => void;
   isLoadingThreadState: boolean;
 }
@@ -40,6 +47,7 @@ export const ChatInterface = React.memo<ChatInterfaceProps>(
     onSelectSubAgent,
     onTodosUpdate,
     onFilesUpdate,
+    onReportSection,
     onNewThread,
     isLoadingThreadState,
   }) => {
@@ -52,6 +60,7 @@ export const ChatInterface = React.memo<ChatInterfaceProps>(
       setThreadId,
       onTodosUpdate,
       onFilesUpdate,
+      onReportSection,
     );
 
     useEffect(() => {
@@ -3,7 +3,7 @@ import { useStream } from "@langchain/langgraph-sdk/react";
 import { type Message } from "@langchain/langgraph-sdk";
 import { getDeployment } from "@/lib/environment/deployments";
 import { v4 as uuidv4 } from "uuid";
-import type { TodoItem } from "../types/types";
+import type { ReportSectionEvent, TodoItem } from "../types/types";
 import { createClient } from "@/lib/client";
 import { useAuthContext } from "@/providers/Auth";
 
@@ -20,6 +20,7 @@ export function useChat(
   ) => void,
   onTodosUpdate: (todos: TodoItem[]) => void,
   onFilesUpdate: (files: Record<string, string>) => void,
+  onReportSection: (event: ReportSectionEvent) => void,
 ) {
   const deployment = useMemo(() => getDeployment(), []);
   const { session } = useAuthContext();
@@ -46,12 +47,24 @@ export function useChat(
     [onTodosUpdate, onFilesUpdate],
   );
 
+  // 报告章节写入事件（custom 流），写入一节显示一节
+  const handleCustomEvent = useCallback(
+    (data: unknown) => {
+      const event = data as Partial<ReportSectionEvent> | null;
+      if (event?.type === "report_section") {
+        onReportSection(event as ReportSectionEvent);
+      }
+    },
+    [onReportSection],
+  );
+
   const stream = useStream<StateType>({
     assistantId: agentId,
     client: createClient(accessToken || ""),
     reconnectOnMount: true,
     threadId: threadId ?? null,
     onUpdateEvent: handleUpdateEvent,
+    onCustomEvent: handleCustomEvent,
     onThreadId: setThreadId,
     defaultHeaders: {
       "x-auth-scheme": "langsmith",
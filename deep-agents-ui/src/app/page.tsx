@@ -1,6 +1,12 @@
 "use client";
 
-import React, { useState, useCallback, useEffect, Suspense } from "react";
+import React, {
+  useState,
+  useCallback,
+  useEffect,
+  useRef,
+  Suspense,
+} from "react";
 import { useQueryState } from "nuqs";
 import { ChatInterface } from "./components/ChatInterface/ChatInterface";
 import { TasksFilesSidebar } from "./components/TasksFilesSidebar/TasksFilesSidebar";
@@ -8,7 +14,17 @@ import { SubAgentPanel } from "./components/SubAgentPanel/SubAgentPanel";
 import { FileViewDialog } from "./components/FileViewDialog/FileViewDialog";
 import { createClient } from "@/lib/client";
 import { useAuthContext } from "@/providers/Auth";
-import type { SubAgent, FileItem, TodoItem } from "./types/types";
+import type {
+  SubAgent,
+  FileItem,
+  TodoItem,
+  ReportSectionEvent,
+} from "./types/types";
+import {
+  applyReportSection,
+  canApplyReportSection,
+  fileRevisions,
+} from "./utils/utils";
 import styles from "./page.module.scss";
 
 function HomePageContent() {
@@ -22,6 +38,10 @@ function HomePageContent() {
   const [files, setFiles] = useState<Record<string, string>>({});
   const [sidebarCollapsed, setSidebarCollapsed] = useState(false);
   const [isLoadingThreadState, setIsLoadingThreadState] = useState(false);
+  // 各报告文件最后应用的 report_section 事件版本，与下一个事件的 base_revision 比对
+  const reportRevisions = useRef<Record<string, string>>({});
+  // 从线程状态重新获取报告：进行中再次请求时，结束后再获取一次
+  const resync = useRef({ running: false, again: false });
 
   const toggleSidebar = useCallback(() => {
     setSidebarCollapsed((prev) => !prev);
@@ -29,6 +49,10 @@ function HomePageContent() {
 
   const handleFilesUpdate = useCallback(
     (newFiles: Record<string, string>) => {
+      // 来自状态的文件可能落后于已收到的事件，下一个章节事件从线程状态重新获取报告
+      for (const path of Object.keys(newFiles)) {
+        delete reportRevisions.current[path];
+      }
       setFiles((prevFiles) => ({
         ...prevFiles,
         ...newFiles,
@@ -37,6 +61,54 @@ function HomePageContent() {
     [],
   );
 
+  const resyncFiles = useCallback(async () => {
+    if (!threadId || !session?.accessToken) {
+      return;
+    }
+    if (resync.current.running) {
+      resync.current.again = true;
+      return;
+    }
+    resync.current.running = true;
+    try {
+      const client = createClient(session.accessToken);
+      do {
+        resync.current.again = false;
+        const state = await client.threads.getState(threadId);
+        const stateFiles =
+          (state.values as { files?: Record<string, string> } | null)
+            ?.files || {};
+        reportRevisions.current = await fileRevisions(stateFiles);
+        setFiles((prevFiles) => ({ ...prevFiles, ...stateFiles }));
+      } while (resync.current.again);
+    } catch (error) {
+      console.error("Failed to resync thread files:", error);
+    } finally {
+      resync.current.running = false;
+    }
+  }, [threadId, session?.accessToken]);
+
+  const handleReportSection = useCallback(
+    (event: ReportSectionEvent) => {
+      const revision = reportRevisions.current[event.path];
+      if (!canApplyReportSection(revision, event)) {
+        // 漏收事件或本地版本未知，章节事件不带报告全文：从线程状态重新获取
+        void resyncFiles();
+        return;
+      }
+      reportRevisions.current[event.path] = event.revision;
+      setFiles((prevFiles) => ({
+        ...prevFiles,
+        [event.path]: applyReportSection(
+          prevFiles[event.path],
+          revision,
+          event,
+        ),
+      }));
+    },
+    [resyncFiles],
+  );
+
   // When the threadId changes, grab the thread state from the graph server
   useEffect(() => {
     const fetchThreadState = async () => {
@@ -57,6 +129,10 @@ function HomePageContent() {
             files?: Record<string, string>;
           };
           setTodos(currentState.todos || []);
+          // 按状态中的报告原文计算版本，运行中刷新页面后后续章节事件可以继续按行范围拼接
+          reportRevisions.current = await fileRevisions(
+            currentState.files || {},
+          );
           setFiles(currentState.files || {});
         }
       } catch (error) {
@@ -73,6 +149,7 @@ function HomePageContent() {
   const handleNewThread = useCallback(() => {
     setThreadId(null);
     setSelectedSubAgent(null);
+    reportRevisions.current = {};
     setTodos([]);
     setFiles({});
   }, [setThreadId]);
@@ -94,6 +171,7 @@ function HomePageContent() {
           onSelectSubAgent={setSelectedSubAgent}
           onTodosUpdate={setTodos}
           onFilesUpdate={handleFilesUpdate}
+          onReportSection={handleReportSection}
           onNewThread={handleNewThread}
           isLoadingThreadState={isLoadingThreadState}
         />
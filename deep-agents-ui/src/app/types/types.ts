@@ -20,6 +20,26 @@ export interface FileItem {
   content: string;
 }
 
+/**
+ * 报告章节写入事件 (custom 流)：用 text 的各行替换写入前报告中 [start_line, end_line) 范围的行。
+ * 只有 write / edit（整份报告被改写）附带 content（写入后的报告全文）；
+ * 本地报告版本与 base_revision 不一致且没有 content 时，从线程状态重新获取报告
+ */
+export interface ReportSectionEvent {
+  type: "report_section";
+  op: "upsert" | "append" | "patch" | "write" | "edit";
+  path: string;
+  heading: string;
+  created: boolean;
+  start_line: number;
+  end_line: number;
+  text: string;
+  line_count: number;
+  base_revision: string | null;
+  revision: string;
+  content?: string;
+}
+
 export interface TodoItem {
   id: string;
   content: string;
@@ -1,4 +1,5 @@
 import { Message } from "@langchain/langgraph-sdk";
+import type { ReportSectionEvent } from "../types/types";
 
 export function extractStringFromMessageContent(message: Message): string {
   return typeof message.content === "string"
@@ -10,3 +11,81 @@ export function extractStringFromMessageContent(message: Message): string {
           .join("")
       : "";
 }
+
+/**
+ * 报告章节写入事件能否应用到本地报告：本地报告的版本（上一个已应用事件的 revision，
+ * 本地没有该报告时视为 null）与事件的 base_revision 一致，或事件附带报告全文。
+ * 不能应用时（刷新页面、中途加入、漏收事件）需要从线程状态重新获取报告
+ */
+export function canApplyReportSection(
+  revision: string | undefined,
+  event: ReportSectionEvent,
+): boolean {
+  return (
+    (revision ?? null) === event.base_revision || event.content !== undefined
+  );
+}
+
+/**
+ * 把报告章节写入事件应用到报告原文上，返回新的报告原文。
+ * 版本一致时按行范围拼接，否则使用事件携带的报告全文（先用 canApplyReportSection 判断）
+ */
+export function applyReportSection(
+  content: string | undefined,
+  revision: string | undefined,
+  event: ReportSectionEvent,
+): string {
+  if (
+    (revision ?? null) !== event.base_revision &&
+    event.content !== undefined
+  ) {
+    return event.content;
+  }
+  // base_revision 为 null 表示写入前报告不存在
+  const trimmed =
+    event.base_revision === null ? "" : (content ?? "").replace(/\n+$/, "");
+  const lines = trimmed ? trimmed.split("\n") : [];
+  lines.splice(
+    event.start_line,
+    event.end_line - event.start_line,
+    ...event.text.split("\n"),
+  );
+  return lines.join("\n") + "\n";
+}
+
+/**
+ * 报告版本号，与后端 report_revision 一致（UTF-8 原文 SHA-1 的前 16 位十六进制）。
+ * 浏览器不支持 WebCrypto（非安全上下文）时返回 undefined，下一个章节事件会再次触发重新获取
+ */
+export async function reportRevision(
+  text: string,
+): Promise<string | undefined> {
+  if (!globalThis.crypto?.subtle) {
+    return undefined;
+  }
+  const digest = await crypto.subtle.digest(
+    "SHA-1",
+    new TextEncoder().encode(text),
+  );
+  return Array.from(new Uint8Array(digest), (byte) =>
+    byte.toString(16).padStart(2, "0"),
+  )
+    .join("")
+    .slice(0, 16);
+}
+
+/** 计算各文件的报告版本号，用于从线程状态恢复后继续按行范围拼接后续事件 */
+export async function fileRevisions(
+  files: Record<string, string>,
+): Promise<Record<string, string>> {
+  const revisions: Record<string, string> = {};
+  await Promise.all(
+    Object.entries(files).map(async ([path, text]) => {
+      const revision = await reportRevision(text);
+      if (revision !== undefined) {
+        revisions[path] = revision;
+      }
+    }),
+  );
+  return revisions;
+}
@@ -1,36 +1,44 @@
 """
 LangGraph 应用启动入口
 
-在 langgraph-cli 启动时执行一次初始化，所有 Agent 调用共享同一个日志和 MCP 实例。
-这样可以避免重复初始化导致的日志重复输出和 MCP 服务器多次启动。
+langgraph.json 中的图指向这里的工厂函数。导入本模块没有副作用：不初始化日志、不启动 MCP 服务器，
+也不导入 deepagents / langchain，服务进程可以立即开始处理健康检查。
+
+首次构建图时才导入对应的 Agent 模块并初始化日志系统（`setup_logging()` 带守卫，只生效一次）；
+MCP 工具在首次获取时初始化并缓存，所有 Agent 共享同一个 MCP 服务器进程。
 
 使用方式：
     langgraph.json 中配置：
     {
       "graphs": {
-        "universal_qa": "./main.py:universal_qa_agent"
+        "universal_qa": "./main.py:create_universal_qa_agent_async"
       }
     }
 """
 
-from app.agents.confluence_agent import initialize_mcp_tools_on_import
+from typing import Any
+
 from app.core.log_adapter import setup_logging
 
 # ============================================================================
-# 启动时全局初始化 - 仅执行一次
+# 导出 Agent 供 LangGraph 使用（按需导入 Agent 模块）
 # ============================================================================
 
-# 初始化日志系统（仅在模块导入时调用一次，后续调用会被守卫拦截）
-setup_logging()
 
-# 🔥 在模块导入时自动触发
-initialize_mcp_tools_on_import()
+async def create_universal_qa_agent_async() -> Any:
+    """构建通用问答 Agent（见 `app.agents.universal_assistant`）"""
+    setup_logging()
+    from app.agents.universal_assistant import create_universal_qa_agent_async as factory
 
-# ============================================================================
-# 导出 Agent 供 LangGraph 使用
-# ============================================================================
+    return await factory()
+
+
+async def create_confluence_research_agent_async() -> Any:
+    """构建 Confluence 深度研究 Agent（见 `app.agents.confluence_agent`）"""
+    setup_logging()
+    from app.agents.confluence_agent import create_confluence_research_agent_async as factory
+
+    return await factory()
 
-from app.agents.confluence_agent import create_confluence_research_agent_async  # noqa: E402
-from app.agents.universal_assistant import create_universal_qa_agent_async  # noqa: E402
 
 __all__ = ["create_universal_qa_agent_async", "create_confluence_research_agent_async"]